@@ -57,6 +57,25 @@ ARITY_MAP = {
 
 ANTHROPIC_API_KEY = os.environ.get("ANTHROPIC_API_KEY")
 
+# Start the Tier 2 Précis check alongside the Tier 1B LLM call in the
+# integrated pipelines (see utils/integrated_verifier.py)
+SPECULATIVE_TIER2 = os.environ.get("PRECIS_SPECULATIVE_TIER2", "").lower() in ("1", "true", "yes", "on")
+
+def get_llm_client():
+    """
+    LLM client for the natural language front end, as (client, provider)
+    Anthropic when ANTHROPIC_API_KEY is set, otherwise OpenAI when
+    OPENAI_API_KEY is set. The SDK is imported here, on first use, so
+    modules that never call an LLM do not need it installed.
+    """
+    if os.environ.get("ANTHROPIC_API_KEY"):
+        from anthropic import Anthropic
+        return Anthropic(api_key=os.environ["ANTHROPIC_API_KEY"]), "anthropic"
+    if os.environ.get("OPENAI_API_KEY"):
+        from openai import OpenAI
+        return OpenAI(api_key=os.environ["OPENAI_API_KEY"]), "openai"
+    raise RuntimeError("No LLM configured: set ANTHROPIC_API_KEY or OPENAI_API_KEY")
+
 def get_precis_path():
     """
     Automatically find précis executable in any environment
@@ -4,13 +4,15 @@ Integrates with LLM for natural language query processing
 """
 
 import json
-import subprocess
 import sys
 import os
-from typing import Dict, List, Optional, Any, Tuple
-from dataclasses import dataclass, asdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from dataclasses import dataclass, asdict, field, replace
 from pathlib import Path
 from config import get_llm_client
+from utils.witnesses import describe_witness, is_simple
+from utils.reference_evaluator import engine_for
+from utils.precis_engine import get_engine
 
 @dataclass
 class Fact:
@@ -25,6 +27,12 @@ class QueryRequest:
     formula: str
     facts: List[Fact]
     regulation: Optional[str] = None
+    workers: Optional[int] = None  # Précis worker processes (PRECIS_WORKERS if unset)
+    # Evaluation budgets: {"policy": {...}, "request": {...}} with optional
+    # max_assignments / max_lookups / timeout_ms in each scope
+    budget: Optional[Dict[str, Dict[str, int]]] = None
+    stats: bool = False  # ask Précis for performance counters
+    formula_text: Optional[bool] = None  # include each evaluation's formula text (engine default: yes)
     
     def to_json(self) -> str:
         """Convert to JSON for OCaml"""
@@ -41,6 +49,14 @@ class QueryRequest:
         }
         if self.regulation:
             data["regulation"] = self.regulation
+        if self.workers:
+            data["workers"] = self.workers
+        if self.budget:
+            data["budget"] = self.budget
+        if self.stats:
+            data["stats"] = True
+        if self.formula_text is not None:
+            data["formula_text"] = self.formula_text
         return json.dumps(data)
 
 
@@ -65,6 +81,113 @@ class Evaluation:
     formula_text: str
     evaluation: bool 
     explanation: str
+    unknown: Optional[Dict[str, Any]] = None  # budget exhausted: reason and work done
+    witness: Optional[Dict[str, Any]] = None  # deciding binding and atoms (see utils/witnesses.py)
+
+
+class LeanPolicyMatch:
+    """PolicyMatch without a per-instance __dict__ (lean responses)"""
+    __slots__ = ("policy_id", "regulation", "section", "description", "relevance_score", "matched_terms")
+
+    def __init__(self, p: Dict[str, Any]):
+        self.policy_id = p["policy_id"]
+        self.regulation = p["regulation"]
+        self.section = p["section"]
+        self.description = p["description"]
+        self.relevance_score = p["relevance_score"]
+        self.matched_terms = p["matched_terms"]
+
+    def __repr__(self) -> str:
+        return f"LeanPolicyMatch({self.policy_id!r}, relevance_score={self.relevance_score!r})"
+
+
+class LeanEvaluation:
+    """
+    Evaluation without a per-instance __dict__ (lean responses)
+
+    Lean requests ask Précis to leave out formula_text, the largest field
+    of an evaluation. It is rebuilt from the policy files the first time
+    it is read, via `formula_texts(regulation, policy_id, section,
+    description)`; it stays "" if the policy files do not pin it down.
+    """
+    __slots__ = ("policy_id", "regulation", "section", "description", "evaluation",
+                 "explanation", "unknown", "witness", "_formula_text", "_formula_texts")
+
+    def __init__(self, e: Dict[str, Any], formula_texts: Optional[Callable[..., Optional[str]]] = None):
+        verdict = e["evaluation"]
+        self.policy_id = e["policy_id"]
+        self.regulation = e["regulation"]
+        self.section = e["section"]
+        self.description = e["description"]
+        self.evaluation = verdict["result"] == "true"
+        self.explanation = e["explanation"]
+        self.unknown = verdict if verdict["result"] == "unknown" else None
+        self.witness = e.get("witness")
+        self._formula_text = e.get("formula_text")
+        self._formula_texts = formula_texts
+
+    @property
+    def formula_text(self) -> str:
+        if self._formula_text is None:
+            text = None
+            if self._formula_texts is not None:
+                try:
+                    text = self._formula_texts(self.regulation, self.policy_id,
+                                               self.section, self.description)
+                except Exception:
+                    text = None  # unreadable policy files: same as an omitted text
+            self._formula_text = text or ""
+            self._formula_texts = None
+        return self._formula_text
+
+    def __repr__(self) -> str:
+        return f"LeanEvaluation({self.policy_id!r}, evaluation={self.evaluation!r})"
+
+
+def status_mark(e) -> str:
+    """✓ satisfied, ✗ violated, ? undecided (budget exhausted)"""
+    if e.unknown:
+        return "?"
+    return "✓" if e.evaluation else "✗"
+
+
+def verdict_line(response: "QueryResponse") -> str:
+    """One-line overall verdict; undecided policies are not violations"""
+    if response.overall_compliant:
+        return "✅ COMPLIANT"
+    if response.undecided and not response.violations:
+        return f"❓ UNDETERMINED: {len(response.undecided)} policy verdict(s) could not be decided"
+    line = f"❌ NON-COMPLIANT: {len(response.violations)} policy violation(s) detected"
+    if response.undecided:
+        line += f", {len(response.undecided)} undecided"
+    return line
+
+
+@dataclass
+class PolicyStats:
+    """Engine work spent on a single policy"""
+    policy_id: str
+    eval_ms: float
+    assignments: int
+    fact_lookups: int
+    memo_hits: int
+    memo_misses: int
+
+
+@dataclass
+class EngineStats:
+    """Performance counters returned when a request sets "stats": true"""
+    phases_ms: Dict[str, float]
+    total_ms: float
+    policies: List[PolicyStats]
+    assignments: int
+    fact_lookups: int
+    memo_hits: int
+    memo_misses: int
+    regulation_loads: List[Dict[str, Any]] = field(default_factory=list)  # per-regulation load_ms, resident
+
+    def slowest_phase(self) -> Optional[str]:
+        return max(self.phases_ms, key=self.phases_ms.get) if self.phases_ms else None
 
 
 @dataclass
@@ -75,12 +198,14 @@ class QueryResponse:
     overall_compliant: bool
     violations: List[str]
     error: Optional[str] = None
+    undecided: List[str] = field(default_factory=list)  # policies with unknown verdicts
+    stats: Optional[EngineStats] = None
 
 
 class PolicyChecker:
     """Interface to OCaml policy checking system"""
     
-    def __init__(self, ocaml_executable: str = "./_build/default/src/main.exe"):
+    def __init__(self, ocaml_executable: str = "./_build/default/src/main.exe", lean: bool = False):
         """
         Initialize policy checker
         
@@ -88,7 +213,12 @@ class PolicyChecker:
             ocaml_executable: Path to OCaml executable
                              Default: ./_build/default/src/main.exe (after dune build)
                              Alternative: ./policy_checker (if you created symlink)
+            lean: Return LeanPolicyMatch/LeanEvaluation objects and leave
+                  formula text out of responses unless a request asks for
+                  it (read lazily from the policy files instead). For
+                  batch runs that mostly need verdicts.
         """
+        self.lean = lean
         self.executable = Path(ocaml_executable)
         if not self.executable.exists():
             # Try alternative paths
@@ -112,6 +242,7 @@ class PolicyChecker:
                     f"Tried alternatives: {alternatives}\n"
                     f"Did you run 'dune build'?"
                 )
+        self.engine = get_engine(str(self.executable))
     
     def check_policy(self, request: QueryRequest, timeout: int = 30, verbose: bool = False) -> QueryResponse:
         """
@@ -126,8 +257,8 @@ class PolicyChecker:
             QueryResponse with evaluation results
         """
         try:
-            # Debug: Print what we're sending
-            json_input = request.to_json()
+            if self.lean and request.formula_text is None:
+                request = replace(request, formula_text=False)
             
             if verbose or os.getenv('DEBUG_POLICY_CHECKER'):
                 print("\n" + "="*60)
@@ -141,61 +272,39 @@ class PolicyChecker:
                 print(f"📜 Regulation Filter: {request.regulation or 'None'}")
                 print("="*60 + "\n")
             
-            # Run OCaml process
-            result = subprocess.run(
-                [str(self.executable), "--json"],
-                input=json_input,
-                capture_output=True,
-                text=True,
-                timeout=timeout
-            )
+            # Without an explicit budget the engine client gives Précis one
+            # inside the timeout, so finished policies are not lost
+            result = self.engine.request(json.loads(request.to_json()), timeout=timeout)
             
-            # Debug: Print what we received
             if verbose or os.getenv('DEBUG_POLICY_CHECKER'):
                 print("\n" + "="*60)
                 print("🔍 OCaml Pipeline Output")
                 print("="*60)
-                print(f"⚙️  Return code: {result.returncode}")
-                if result.returncode == 0:
-                    print("✅ OCaml execution successful")
+                if result.success:
+                    print(f"✅ OCaml execution successful ({result.elapsed_ms:.0f}ms)")
                 else:
-                    print(f"❌ OCaml execution failed (code {result.returncode})")
-                
-                if result.stdout:
+                    print(f"❌ OCaml execution failed: {result.error}")
+                if result.response:
+                    output = json.dumps(result.response)
                     print(f"\n📤 OCaml Response (first 500 chars):")
-                    print(result.stdout[:500])
-                    if len(result.stdout) > 500:
+                    print(output[:500])
+                    if len(output) > 500:
                         print("...")
-                
-                if result.stderr:
-                    print(f"\n⚠️  OCaml Stderr:")
-                    print(result.stderr)
                 print("="*60 + "\n")
             
-            # Parse response
-            if result.returncode != 0:
+            if not result.success:
                 return QueryResponse(
                     matched_policies=[],
                     evaluations=[],
                     overall_compliant=False,
                     violations=[],
-                    error=f"OCaml process error (code {result.returncode}):\nStdout: {result.stdout}\nStderr: {result.stderr}"
-                )
-            
-            response_data = json.loads(result.stdout)
-            
-            # Check for errors in response
-            if "error" in response_data:
-                return QueryResponse(
-                    matched_policies=[],
-                    evaluations=[],
-                    overall_compliant=False,
-                    violations=[],
-                    error=response_data["error"]
+                    error=result.error
                 )
             
             # Parse successful response
-            parsed_response = self._parse_response(response_data)
+            parsed_response = self.parse_response(
+                result.response, lean=self.lean, formula_texts=self._formula_texts if self.lean else None
+            )
             
             if verbose or os.getenv('DEBUG_POLICY_CHECKER'):
                 print("\n" + "="*60)
@@ -214,32 +323,12 @@ class PolicyChecker:
                 if parsed_response.evaluations:
                     print(f"\n🔍 Evaluations:")
                     for eval in parsed_response.evaluations[:3]:
-                        status = "✓" if eval.evaluation else "✗"
-                        print(f"   {status} {eval.policy_id}")
+                        print(f"   {status_mark(eval)} {eval.policy_id}")
                 
                 print("="*60 + "\n")
             
             return parsed_response
             
-            # Parse successful response
-            return self._parse_response(response_data)
-            
-        except subprocess.TimeoutExpired:
-            return QueryResponse(
-                matched_policies=[],
-                evaluations=[],
-                overall_compliant=False,
-                violations=[],
-                error=f"Query timeout after {timeout} seconds"
-            )
-        except json.JSONDecodeError as e:
-            return QueryResponse(
-                matched_policies=[],
-                evaluations=[],
-                overall_compliant=False,
-                violations=[],
-                error=f"Invalid JSON response: {e}"
-            )
         except Exception as e:
             return QueryResponse(
                 matched_policies=[],
@@ -249,8 +338,30 @@ class PolicyChecker:
                 error=f"Unexpected error: {str(e)}"
             )
     
-    def _parse_response(self, data: Dict[str, Any]) -> QueryResponse:
-        """Parse JSON response from OCaml"""
+    def _formula_texts(self, regulation: str, policy_id: str, section: str,
+                       description: str) -> Optional[str]:
+        return engine_for(str(self.executable)).formula_text(regulation, policy_id, section, description)
+
+    @staticmethod
+    def parse_response(data: Dict[str, Any], lean: bool = False,
+                       formula_texts: Optional[Callable[..., Optional[str]]] = None) -> QueryResponse:
+        """
+        Parse JSON response from OCaml
+
+        lean: build LeanPolicyMatch/LeanEvaluation instead of the
+        dataclasses; formula_texts(regulation, policy_id, section,
+        description) supplies formula text the response left out.
+        """
+        if lean:
+            return QueryResponse(
+                matched_policies=[LeanPolicyMatch(p) for p in data.get("matched_policies", [])],
+                evaluations=[LeanEvaluation(e, formula_texts) for e in data.get("evaluations", [])],
+                overall_compliant=data.get("overall_compliant", False),
+                violations=data.get("violations", []),
+                undecided=data.get("undecided", []),
+                stats=PolicyChecker._parse_stats(data)
+            )
+
         matched_policies = [
             PolicyMatch(
                 policy_id=p["policy_id"],
@@ -268,9 +379,11 @@ class PolicyChecker:
                 regulation=e["regulation"],
                 section=e["section"],
                 description=e["description"],
-                formula_text=e["formula_text"],
+                formula_text=e.get("formula_text", ""),
                 evaluation=(e["evaluation"]["result"] == "true"),
-                explanation=e["explanation"]
+                explanation=e["explanation"],
+                unknown=e["evaluation"] if e["evaluation"]["result"] == "unknown" else None,
+                witness=e.get("witness")
             ) for e in data.get("evaluations", [])
         ]
         
@@ -278,9 +391,28 @@ class PolicyChecker:
             matched_policies=matched_policies,
             evaluations=evaluations,
             overall_compliant=data.get("overall_compliant", False),
-            violations=data.get("violations", [])
+            violations=data.get("violations", []),
+            undecided=data.get("undecided", []),
+            stats=PolicyChecker._parse_stats(data)
         )
 
+    @staticmethod
+    def _parse_stats(data: Dict[str, Any]) -> Optional[EngineStats]:
+        stats = None
+        if "stats" in data:
+            s = data["stats"]
+            stats = EngineStats(
+                phases_ms=s.get("phases_ms", {}),
+                total_ms=s.get("total_ms", 0.0),
+                policies=[PolicyStats(**p) for p in s.get("policies", [])],
+                assignments=s.get("assignments", 0),
+                fact_lookups=s.get("fact_lookups", 0),
+                memo_hits=s.get("memo_hits", 0),
+                memo_misses=s.get("memo_misses", 0),
+                regulation_loads=s.get("regulation_loads", [])
+            )
+        return stats
+
 
 class LLMIntegration:
     """
@@ -548,6 +680,11 @@ Output JSON array only, no explanation:"""
         if response.error:
             return self._format_error_with_llm(response.error)
         
+        # Violations with small witnesses explain themselves; skip LLM2
+        templated = self._format_witnesses(response)
+        if templated:
+            return templated
+        
         # Use LLM2 to generate natural language explanation
         if self.client:
             return self._llm2_explain(response)
@@ -555,19 +692,32 @@ Output JSON array only, no explanation:"""
             # Fallback to template-based formatting
             return self._format_basic(response)
     
+    def _format_witnesses(self, response: QueryResponse) -> Optional[str]:
+        """Template the violations from their witnesses, if all are simple"""
+        violated = [e for e in response.evaluations if not e.evaluation and not e.unknown]
+        if response.undecided or not violated or not all(is_simple(e.witness) for e in violated):
+            return None
+        
+        output = [f"❌ NON-COMPLIANT: {len(violated)} policy violation(s)."]
+        for e in violated:
+            output.append(f"- {e.regulation} {e.section} ({e.description}): "
+                          f"violated {describe_witness(e.witness)}.")
+        return "\n".join(output)
+    
     def _llm2_explain(self, response: QueryResponse) -> str:
         """Use LLM2 to generate natural language explanation"""
         
         # Prepare structured data for LLM
         evaluation_summary = "\n".join([
-            f"- {e.regulation} {e.section}: {'✓ Satisfied' if e.evaluation else '✗ Violated'}"
+            f"- {e.regulation} {e.section}: "
+            f"{'? Undecided' if e.unknown else '✓ Satisfied' if e.evaluation else '✗ Violated'}"
             f"\n  {e.description}\n  {e.explanation}"
             for e in response.evaluations
         ])
         
         prompt = f"""Explain these policy compliance results in clear, user-friendly language.
 
-COMPLIANCE STATUS: {"✅ COMPLIANT" if response.overall_compliant else "❌ NON-COMPLIANT"}
+COMPLIANCE STATUS: {verdict_line(response)}
 VIOLATIONS: {len(response.violations)}
 
 POLICY EVALUATIONS:
@@ -648,12 +798,11 @@ Explain this to a non-technical user in simple terms. Suggest what might be wron
         if response.overall_compliant:
             lines.append("✅ COMPLIANT: All relevant policies are satisfied.")
         else:
-            lines.append(f"❌ NON-COMPLIANT: {len(response.violations)} policy violation(s) detected.")
+            lines.append(f"{verdict_line(response)}.")
         
         lines.append("\nPolicy Evaluations:")
         for e in response.evaluations:
-            status = "✓" if e.evaluation else "✗"
-            lines.append(f"{status} {e.regulation} {e.section}")
+            lines.append(f"{status_mark(e)} {e.regulation} {e.section}")
             lines.append(f"   {e.description}")
             lines.append(f"   {e.explanation}")
         
@@ -758,13 +907,15 @@ Explain this to a non-technical user in simple terms. Suggest what might be wron
         # Overall verdict
         if response.overall_compliant:
             output.append("✅ COMPLIANT: The scenario satisfies all relevant policies.\n")
+        elif response.undecided and not response.violations:
+            output.append(f"❓ UNDETERMINED: {len(response.undecided)} policy verdict(s) could not be decided.\n")
         else:
             output.append(f"❌ VIOLATIONS FOUND: {len(response.violations)} policy violations detected.\n")
         
         # Detail each evaluation
         output.append("Policy Evaluations:")
         for eval in response.evaluations:
-            status = "✅" if eval.evaluation else "❌"
+            status = "❓" if eval.unknown else "✅" if eval.evaluation else "❌"
             output.append(f"\n{status} {eval.regulation} {eval.section}")
             output.append(f"   Description: {eval.description}")
             output.append(f"   Explanation: {eval.explanation}")
@@ -869,8 +1020,7 @@ def main():
         
         print(f"\nEvaluations:")
         for eval in response.evaluations:
-            status = "✓" if eval.evaluation else "✗"
-            print(f"  {status} {eval.policy_id}: {eval.explanation}")
+            print(f"  {status_mark(eval)} {eval.policy_id}: {eval.explanation}")
         
         if response.violations:
             print(f"\nViolations:")
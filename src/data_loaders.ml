@@ -187,6 +187,169 @@ module FunctionsDB = struct
     |> List.sort_uniq String.compare
 end
 
+(* ============================================ *)
+(* BINARY COLUMNAR DATA                        *)
+(* ============================================ *)
+
+(* Bulk exports are compiled once into a columnar binary file and then
+   memory-mapped, so loading is a linear scan with no text parsing and no
+   list membership checks.
+
+   Layout (all integers unsigned 32-bit little-endian):
+     "PRECISB1"
+     n_symbols, blob_len
+     offsets[n_symbols + 1]       start of each symbol in the blob
+     blob                         symbol bytes, concatenated
+     then three tables: domain, facts, functions, each
+       n_rows, n_args
+       names[n_rows]              symbol id of the entity/predicate/function
+       arities[n_rows]
+       args[n_args]               symbol ids, row after row
+   Domain rows have arity 0. A function row's last argument is its value. *)
+module BinaryData = struct
+  type bytes_map = (char, Bigarray.int8_unsigned_elt, Bigarray.c_layout) Bigarray.Array1.t
+  
+  let magic = "PRECISB1"
+  
+  type t = {
+    domain: string list;
+    store: Fact_store.t;
+    func_values: (string * string list * string) list;
+  }
+  
+  (* ---------- writing ---------- *)
+  
+  let write (filename: string) (domain: DomainDB.t) (facts: FactsDB.t) (funcs: FunctionsDB.t) : unit =
+    let ids = Hashtbl.create 4096 in
+    let symbols = Buffer.create 65536 in
+    let offsets = ref [0] and count = ref 0 in
+    let intern (s: string) : int =
+      match Hashtbl.find_opt ids s with
+      | Some id -> id
+      | None ->
+          let id = !count in
+          Hashtbl.replace ids s id;
+          incr count;
+          Buffer.add_string symbols s;
+          offsets := Buffer.length symbols :: !offsets;
+          id
+    in
+    let table (rows: (string * string list) list) : Buffer.t =
+      let names = Buffer.create 4096 and arities = Buffer.create 4096 and args = Buffer.create 4096 in
+      let n_rows = ref 0 and n_args = ref 0 in
+      List.iter (fun (name, row_args) ->
+        Buffer.add_int32_le names (Int32.of_int (intern name));
+        Buffer.add_int32_le arities (Int32.of_int (List.length row_args));
+        List.iter (fun a -> Buffer.add_int32_le args (Int32.of_int (intern a)); incr n_args) row_args;
+        incr n_rows
+      ) rows;
+      let out = Buffer.create (8 + Buffer.length names + Buffer.length arities + Buffer.length args) in
+      Buffer.add_int32_le out (Int32.of_int !n_rows);
+      Buffer.add_int32_le out (Int32.of_int !n_args);
+      Buffer.add_buffer out names;
+      Buffer.add_buffer out arities;
+      Buffer.add_buffer out args;
+      out
+    in
+    let tables = [
+      table (List.map (fun e -> (e, [])) domain.DomainDB.entities);
+      table facts.FactsDB.facts;
+      table (List.map (fun (f, args, r) -> (f, args @ [r])) funcs.FunctionsDB.func_values);
+    ] in
+    let oc = open_out_bin filename in
+    let header = Buffer.create 64 in
+    Buffer.add_string header magic;
+    Buffer.add_int32_le header (Int32.of_int !count);
+    Buffer.add_int32_le header (Int32.of_int (Buffer.length symbols));
+    List.iter (fun off -> Buffer.add_int32_le header (Int32.of_int off)) (List.rev !offsets);
+    Buffer.output_buffer oc header;
+    Buffer.output_buffer oc symbols;
+    List.iter (Buffer.output_buffer oc) tables;
+    close_out oc
+  
+  (* Compile the text data files into one binary file *)
+  let convert_text ~(domain_file: string) ~(facts_file: string) ~(functions_file: string) (output: string) : unit =
+    write output
+      (DomainDB.load_from_file domain_file)
+      (FactsDB.load_from_file facts_file)
+      (FunctionsDB.load_from_file functions_file)
+  
+  (* ---------- reading ---------- *)
+  
+  let u32 (map: bytes_map) (pos: int) : int =
+    if pos + 4 > Bigarray.Array1.dim map then failwith "Truncated binary data file";
+    Char.code (Bigarray.Array1.unsafe_get map pos)
+    lor (Char.code (Bigarray.Array1.unsafe_get map (pos + 1)) lsl 8)
+    lor (Char.code (Bigarray.Array1.unsafe_get map (pos + 2)) lsl 16)
+    lor (Char.code (Bigarray.Array1.unsafe_get map (pos + 3)) lsl 24)
+  
+  let is_binary (filename: string) : bool =
+    try
+      let ic = open_in_bin filename in
+      let header = try really_input_string ic (String.length magic) with End_of_file -> "" in
+      close_in ic;
+      header = magic
+    with Sys_error _ -> false
+  
+  (* Walk one table starting at [pos], calling [row name args] per row;
+     returns the position after the table *)
+  let iter_table (map: bytes_map) (symbols: string array) (pos: int)
+      (row: string -> string list -> unit) : int =
+    let n_rows = u32 map pos and n_args = u32 map (pos + 4) in
+    let names = pos + 8 in
+    let arities = names + 4 * n_rows in
+    let args = arities + 4 * n_rows in
+    let symbol i = u32 map i |> Array.get symbols in
+    let next_arg = ref args in
+    for r = 0 to n_rows - 1 do
+      let arity = u32 map (arities + 4 * r) in
+      let start = !next_arg in
+      next_arg := start + 4 * arity;
+      row (symbol (names + 4 * r)) (List.init arity (fun k -> symbol (start + 4 * k)))
+    done;
+    args + 4 * n_args
+  
+  (* Map a binary data file and load its facts into [store] (a fresh store
+     by default). Symbols are decoded once, so facts share their strings.
+     [offset] is the byte position of the "PRECISB1" header, for files
+     holding several sections back to back; the mapping starts there and
+     runs to the end of the file. *)
+  let load ?store ?(offset = 0) (filename: string) : t =
+    let fd = Unix.openfile filename [Unix.O_RDONLY] 0 in
+    Fun.protect ~finally:(fun () -> Unix.close fd) (fun () ->
+      if offset < 0 || offset > (Unix.fstat fd).Unix.st_size then
+        failwith (Printf.sprintf "%s: offset %d is outside the file" filename offset);
+      let map : bytes_map =
+        Bigarray.array1_of_genarray
+          (Unix.map_file fd ~pos:(Int64.of_int offset) Bigarray.char Bigarray.c_layout false [| -1 |])
+      in
+      let len = String.length magic in
+      if Bigarray.Array1.dim map < len + 8
+         || String.init len (fun i -> Bigarray.Array1.get map i) <> magic then
+        failwith (filename ^ ": not a binary data file");
+      let n_symbols = u32 map len and blob_len = u32 map (len + 4) in
+      let offsets = len + 8 in
+      let blob = offsets + 4 * (n_symbols + 1) in
+      if blob + blob_len > Bigarray.Array1.dim map then failwith "Truncated binary data file";
+      let symbols = Array.init n_symbols (fun i ->
+        let start = u32 map (offsets + 4 * i) in
+        let stop = u32 map (offsets + 4 * (i + 1)) in
+        String.init (stop - start) (fun k -> Bigarray.Array1.get map (blob + start + k)))
+      in
+      let domain = ref [] and func_values = ref [] in
+      let pos = iter_table map symbols (blob + blob_len) (fun e _ -> domain := e :: !domain) in
+      let store = match store with
+        | Some s -> s
+        | None -> Fact_store.create ~size:(max 16 (u32 map pos)) ()
+      in
+      let pos = iter_table map symbols pos (fun p args -> ignore (Fact_store.add store p args)) in
+      let _ = iter_table map symbols pos (fun f args ->
+        match List.rev args with
+        | result :: rev_args -> func_values := (f, List.rev rev_args, result) :: !func_values
+        | [] -> ()) in
+      { domain = List.rev !domain; store; func_values = List.rev !func_values })
+end
+
 (* ============================================ *)
 (* UNIFIED LOADER                              *)
 (* ============================================ *)
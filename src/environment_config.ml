@@ -15,8 +15,9 @@ module Config = struct
   
   type runtime_environment = {
     type_env: type_environment;
+    checker_env: Type_checker.type_environment;   (* indexed, built once *)
     domain: domain_db;
-    facts: facts_db;
+    facts: Fact_store.t;  (* indexed; filled straight from data.bin when it is used *)
     functions: functions_db;
     policy_manager: Policy_loader.policy_manager;
   }
@@ -33,14 +34,16 @@ let default_config () : runtime_config =
     policies_dir = Filename.concat exe_dir "policies";
     cache_enabled = true;
   }
-let load_multi_regulation_types (data_dir: string) : type_environment =
-    (* List of type system files to load *)
-    let type_files = [
+(* Per-regulation type system files; add more regulations here as needed *)
+let type_system_files (data_dir: string) : string list =
+    [
       Filename.concat data_dir "hipaa_types.txt";
       Filename.concat data_dir "gdpr_types.txt";
       Filename.concat data_dir "ccpa_types.txt";
-      (* Add more regulations here as needed *)
-    ] in
+    ]
+
+let load_multi_regulation_types (data_dir: string) : type_environment =
+    let type_files = type_system_files data_dir in
     
     (* Load all files that exist *)
     let systems = List.filter_map (fun file ->
@@ -58,6 +61,72 @@ let load_multi_regulation_types (data_dir: string) : type_environment =
     
     (* Convert to type environment *)
     Type_system_db.to_type_environment merged
+
+  (* Compiled domain/facts/functions, written by "precis convert-data" *)
+  let binary_data_file (config: runtime_config) : string =
+    Filename.concat config.data_dir "data.bin"
+  
+  let text_data_files (config: runtime_config) : string list =
+    [
+      Filename.concat config.data_dir "domain.txt";
+      Filename.concat config.data_dir "facts.txt";
+      Filename.concat config.data_dir "functions.txt";
+    ]
+  
+  (* Every data file initialize reads; watched for hot reload *)
+  let data_files (config: runtime_config) : string list =
+    type_system_files config.data_dir @ text_data_files config @ [binary_data_file config]
+  
+  (* data.bin is used when it is at least as new as every text file it was
+     compiled from; a stale one is ignored with a warning *)
+  let use_binary_data (config: runtime_config) : bool =
+    let mtime f = try Some (Unix.stat f).Unix.st_mtime with Unix.Unix_error _ -> None in
+    match mtime (binary_data_file config) with
+    | None -> false
+    | Some bin_mtime ->
+        let stale = List.exists (fun f ->
+          match mtime f with Some m -> m > bin_mtime | None -> false
+        ) (text_data_files config) in
+        if stale then
+          Printf.eprintf "Warning: %s is older than the text data files, ignoring it\n"
+            (binary_data_file config);
+        not stale
+  
+  (* Type system, domain, facts and functions, without the policy manager.
+     Facts from data.bin stay in the Fact_store the loader filled. *)
+  let load_data (config: runtime_config) : type_environment * domain_db * Fact_store.t * functions_db =
+    let type_env = load_multi_regulation_types config.data_dir in
+    if use_binary_data config then
+      let data = Data_loaders.BinaryData.load (binary_data_file config) in
+      (type_env,
+       { entities = data.Data_loaders.BinaryData.domain },
+       data.Data_loaders.BinaryData.store,
+       { func_values = data.Data_loaders.BinaryData.func_values })
+    else
+      let domain_db = Data_loaders.DomainDB.load_from_file 
+        (Filename.concat config.data_dir "domain.txt") in
+      let facts_db = Data_loaders.FactsDB.load_from_file 
+        (Filename.concat config.data_dir "facts.txt") in
+      let funcs_db = Data_loaders.FunctionsDB.load_from_file 
+        (Filename.concat config.data_dir "functions.txt") in
+      (type_env,
+       Data_loaders.DomainDB.to_domain_db domain_db,
+       Fact_store.of_facts_db (Data_loaders.FactsDB.to_facts_db facts_db),
+       Data_loaders.FunctionsDB.to_functions_db funcs_db)
+  
+  (* Swap freshly loaded data into an environment, keeping its policy manager *)
+  let with_data (env: runtime_environment)
+      ((type_env, domain, facts, functions): type_environment * domain_db * Fact_store.t * functions_db)
+      : runtime_environment =
+    {
+      env with
+      type_env;
+      checker_env = Type_checker.checker_env_for type_env;
+      domain;
+      facts;
+      functions;
+    }
+  
   (* let default_config () : runtime_config =
     {
       data_dir = "data";
@@ -67,16 +136,8 @@ let load_multi_regulation_types (data_dir: string) : type_environment =
   
   (* Initialize complete runtime environment *)
   let initialize ?(config = default_config ()) () : runtime_environment =
-    (* Load type system - NOW SUPPORTS MULTIPLE FILES *)
-    let type_env = load_multi_regulation_types config.data_dir in
-    
-    (* Load domain, facts, functions (UNCHANGED) *)
-    let domain_db = Data_loaders.DomainDB.load_from_file 
-      (Filename.concat config.data_dir "domain.txt") in
-    let facts_db = Data_loaders.FactsDB.load_from_file 
-      (Filename.concat config.data_dir "facts.txt") in
-    let funcs_db = Data_loaders.FunctionsDB.load_from_file 
-      (Filename.concat config.data_dir "functions.txt") in
+    (* Load type system, domain, facts, functions *)
+    let (type_env, domain, facts, functions) = load_data config in
     
     (* Initialize policy manager (UNCHANGED) *)
     let policy_manager = Policy_loader.create_manager config.policies_dir in
@@ -84,9 +145,10 @@ let load_multi_regulation_types (data_dir: string) : type_environment =
     
     {
       type_env;
-      domain = Data_loaders.DomainDB.to_domain_db domain_db;
-      facts = Data_loaders.FactsDB.to_facts_db facts_db;
-      functions = Data_loaders.FunctionsDB.to_functions_db funcs_db;
+      checker_env = Type_checker.checker_env_for type_env;
+      domain;
+      facts;
+      functions;
       policy_manager;
     }
   
@@ -110,8 +172,7 @@ let load_multi_regulation_types (data_dir: string) : type_environment =
   (* Get policies for specific regulation *)
   let get_policies_for_regulation (env: runtime_environment) (regulation: string) 
       : Policy_loader.policy_database =
-    let all_policies = get_all_policies env in
-    Policy_loader.filter_by_regulation regulation all_policies
+    Policy_loader.get_regulation_database env.policy_manager regulation
 end
 
 (* ============================================ *)
@@ -144,8 +205,9 @@ module CachedConfig = struct
     
     {
       type_env = loaded_data.type_env;
+      checker_env = Type_checker.checker_env_for loaded_data.type_env;
       domain = loaded_data.domain;
-      facts = loaded_data.facts;
+      facts = Fact_store.of_facts_db loaded_data.facts;
       functions = loaded_data.functions;
       policy_manager = cache.policy_manager;
     }
@@ -156,8 +218,9 @@ module CachedConfig = struct
     
     {
       type_env = loaded_data.type_env;
+      checker_env = Type_checker.checker_env_for loaded_data.type_env;
       domain = loaded_data.domain;
-      facts = loaded_data.facts;
+      facts = Fact_store.of_facts_db loaded_data.facts;
       functions = loaded_data.functions;
       policy_manager = cache.policy_manager;
     }
@@ -49,8 +49,110 @@ let eval_comparison (op: string) (v1: string) (v2: string) : bool =
   | ">=" -> (try int_of_string v1 >= int_of_string v2 with _ -> false)
   | _ -> false
 
-(* Main Evaluation Engine *)
-let rec eval_formula (assignment: var_assignment) (domain: domain_db) 
+(* Ground-fact lookup: does predicate [p] hold for these argument values? *)
+type fact_lookup = string -> string list -> bool
+
+(* Evaluate an atomic formula (comparison or fact) under an assignment *)
+let eval_atom (assignment: var_assignment) (funcs: functions_db) (holds: fact_lookup)
+              (p: string) (args: term list) : eval_result =
+  (* Evaluate all arguments *)
+  let eval_args = List.map (eval_term assignment funcs) args in
+  if List.exists (fun x -> x = None) eval_args then
+    False (* If any arg is unbound, predicate is false *)
+  else
+    let arg_values = List.filter_map (fun x -> x) eval_args in
+    (* Check if it's a comparison operator *)
+    (match p with
+     | "=" | "!=" | "<" | "<=" | ">" | ">=" ->
+         (match arg_values with
+          | [v1; v2] ->
+              if eval_comparison p v1 v2 then True else False
+          | _ -> False)
+     | _ ->
+         (* Regular predicate: check facts database *)
+         if holds p arg_values then True else False)
+
+(* ============================================ *)
+(* EVALUATION BUDGETS                          *)
+(* ============================================ *)
+
+type budget_limits = {
+  max_assignments: int option;    (* quantifier assignments tried *)
+  max_lookups: int option;        (* ground fact lookups *)
+  timeout_ms: int option;         (* wall-clock allowance *)
+}
+
+let no_limits : budget_limits =
+  { max_assignments = None; max_lookups = None; timeout_ms = None }
+
+(* Work counters for one policy or one request. A policy budget draws from
+   its request budget too, so either can run out first. *)
+type budget = {
+  scope: string;
+  limits: budget_limits;
+  started: float;
+  mutable assignments: int;
+  mutable lookups: int;
+  parent: budget option;
+}
+
+(* Work done by an evaluation that ran out of budget *)
+type budget_usage = {
+  exhausted: string;
+  used_assignments: int;
+  used_lookups: int;
+  elapsed_ms: float;
+}
+
+exception Budget_exceeded of string
+
+let start_budget ?parent ~(scope: string) (limits: budget_limits) : budget =
+  { scope; limits; started = Unix.gettimeofday (); assignments = 0; lookups = 0; parent }
+
+let budget_elapsed_ms (b: budget) : float =
+  (Unix.gettimeofday () -. b.started) *. 1000.0
+
+(* The clock is only read every 256 units of work unless [force] is set *)
+let rec check_budget ?(force = false) (b: budget) : unit =
+  let over limit used = match limit with Some n -> used > n | None -> false in
+  if over b.limits.max_assignments b.assignments then
+    raise (Budget_exceeded (Printf.sprintf "%s assignment budget exceeded" b.scope));
+  if over b.limits.max_lookups b.lookups then
+    raise (Budget_exceeded (Printf.sprintf "%s fact lookup budget exceeded" b.scope));
+  (match b.limits.timeout_ms with
+   | Some ms when (force || (b.assignments + b.lookups) land 255 = 0)
+                  && budget_elapsed_ms b > float_of_int ms ->
+       raise (Budget_exceeded (Printf.sprintf "%s deadline of %dms exceeded" b.scope ms))
+   | _ -> ());
+  if force then Option.iter (check_budget ~force) b.parent
+
+let rec charge_assignment (b: budget) : unit =
+  b.assignments <- b.assignments + 1;
+  check_budget b;
+  Option.iter charge_assignment b.parent
+
+let rec charge_lookup (b: budget) : unit =
+  b.lookups <- b.lookups + 1;
+  check_budget b;
+  Option.iter charge_lookup b.parent
+
+(* Count every fact lookup made through [holds] against the budget *)
+let metered (budget: budget option) (holds: fact_lookup) : fact_lookup =
+  match budget with
+  | None -> holds
+  | Some b -> fun p args -> charge_lookup b; holds p args
+
+let budget_usage (b: budget) (exhausted: string) : budget_usage =
+  {
+    exhausted;
+    used_assignments = b.assignments;
+    used_lookups = b.lookups;
+    elapsed_ms = budget_elapsed_ms b;
+  }
+
+(* Main Evaluation Engine. With a [budget], assignments and fact lookups are
+   charged as they happen and Budget_exceeded is raised when it runs out. *)
+let rec eval_formula ?budget (assignment: var_assignment) (domain: domain_db) 
                      (facts: facts_db) (funcs: functions_db) (f: formula) : eval_result =
   match f with
   | True -> 
@@ -60,62 +162,47 @@ let rec eval_formula (assignment: var_assignment) (domain: domain_db)
       False
   
   | Predicate (p, args) ->
-      (* Evaluate all arguments *)
-      let eval_args = List.map (eval_term assignment funcs) args in
-      if List.exists (fun x -> x = None) eval_args then
-        False (* If any arg is unbound, predicate is false *)
-      else
-        let arg_values = List.filter_map (fun x -> x) eval_args in
-        (* Check if it's a comparison operator *)
-        (match p with
-         | "=" | "!=" | "<" | "<=" | ">" | ">=" ->
-             (match arg_values with
-              | [v1; v2] ->
-                  if eval_comparison p v1 v2 then True else False
-              | _ -> False)
-         | _ ->
-             (* Regular predicate: check facts database *)
-             if check_fact facts p arg_values then True else False)
+      eval_atom assignment funcs (metered budget (check_fact facts)) p args
   
   | Not f ->
-      (match eval_formula assignment domain facts funcs f with
+      (match eval_formula ?budget assignment domain facts funcs f with
        | True -> False
        | False -> True)
   
   | BinLogicalOp (And, f1, f2) ->
-      (match eval_formula assignment domain facts funcs f1 with
+      (match eval_formula ?budget assignment domain facts funcs f1 with
        | False -> False
        | True ->
-           (match eval_formula assignment domain facts funcs f2 with
+           (match eval_formula ?budget assignment domain facts funcs f2 with
             | True -> True
             | False -> False))
   
   | BinLogicalOp (Or, f1, f2) ->
-      (match eval_formula assignment domain facts funcs f1 with
+      (match eval_formula ?budget assignment domain facts funcs f1 with
        | True -> True
        | False ->
-           (match eval_formula assignment domain facts funcs f2 with
+           (match eval_formula ?budget assignment domain facts funcs f2 with
             | True -> True
             | False -> False))
   
   | BinLogicalOp (Implies, f1, f2) ->
-      (match eval_formula assignment domain facts funcs f1 with
+      (match eval_formula ?budget assignment domain facts funcs f1 with
        | False -> True (* False implies anything *)
        | True ->
-           (match eval_formula assignment domain facts funcs f2 with
+           (match eval_formula ?budget assignment domain facts funcs f2 with
             | True -> True
             | False -> False))
   
   | BinLogicalOp (Iff, f1, f2) ->
-      let v1 = eval_formula assignment domain facts funcs f1 in
-      let v2 = eval_formula assignment domain facts funcs f2 in
+      let v1 = eval_formula ?budget assignment domain facts funcs f1 in
+      let v2 = eval_formula ?budget assignment domain facts funcs f2 in
       (match (v1, v2) with
        | (True, True) | (False, False) -> True
        | _ -> False)
   
   | BinLogicalOp (Xor, f1, f2) ->
-      let v1 = eval_formula assignment domain facts funcs f1 in
-      let v2 = eval_formula assignment domain facts funcs f2 in
+      let v1 = eval_formula ?budget assignment domain facts funcs f1 in
+      let v2 = eval_formula ?budget assignment domain facts funcs f2 in
       (match (v1, v2) with
        | (True, False) | (False, True) -> True
        | _ -> False)
@@ -135,10 +222,11 @@ let rec eval_formula (assignment: var_assignment) (domain: domain_db)
       let all_assignments = generate_assignments vars domain.entities in
       (* Forall is true if formula is true for ALL assignments *)
       (match List.find_opt (fun assign ->
+        Option.iter charge_assignment budget;
         let new_assignment = List.fold_left (fun acc (v, e) ->
           (v, e) :: acc
         ) assignment assign in
-        match eval_formula new_assignment domain facts funcs f with
+        match eval_formula ?budget new_assignment domain facts funcs f with
         | False -> true
         | True -> false
       ) all_assignments with
@@ -158,10 +246,11 @@ let rec eval_formula (assignment: var_assignment) (domain: domain_db)
       let all_assignments = generate_assignments vars domain.entities in
       (* Exists is true if formula is true for SOME assignment *)
       (match List.find_opt (fun assign ->
+        Option.iter charge_assignment budget;
         let new_assignment = List.fold_left (fun acc (v, e) ->
           (v, e) :: acc
         ) assignment assign in
-        match eval_formula new_assignment domain facts funcs f with
+        match eval_formula ?budget new_assignment domain facts funcs f with
         | True -> true
         | False -> false
       ) all_assignments with
@@ -170,19 +259,342 @@ let rec eval_formula (assignment: var_assignment) (domain: domain_db)
   
   | BinTemporalOp (_, f1, f2, _) ->
       (* Simplified: Evaluate both sides with AND semantics *)
-      (match eval_formula assignment domain facts funcs f1 with
+      (match eval_formula ?budget assignment domain facts funcs f1 with
        | True ->
-           (match eval_formula assignment domain facts funcs f2 with
+           (match eval_formula ?budget assignment domain facts funcs f2 with
             | True -> True
             | False -> False)
        | False -> False)
   
   | UnTemporalOp (_, f, _) ->
       (* Simplified: Just evaluate the formula *)
-      eval_formula assignment domain facts funcs f
+      eval_formula ?budget assignment domain facts funcs f
   
   | Annotated (f, _) ->
-      eval_formula assignment domain facts funcs f
+      eval_formula ?budget assignment domain facts funcs f
+
+(* ============================================ *)
+(* SHARED SUBFORMULA DAG                       *)
+(* ============================================ *)
+
+(* Hash-consed formula node. Structurally equal subformulas of all the
+   policies compiled into the same DAG are interned to one node, so a
+   subformula shared by many policies is evaluated once per binding.
+   [vars] holds the node's free variables, sorted. *)
+type dag_node = {
+  uid: int;
+  shape: dag_shape;
+  vars: string list;
+}
+and dag_shape =
+  | DTrue
+  | DFalse
+  | DPredicate of string * term list
+  | DNot of dag_node
+  | DBinLogical of binaryLogicalOp * dag_node * dag_node
+  | DBinTemporal of binaryTemporalOp * dag_node * dag_node * (int * int) option
+  | DUnTemporal of unaryTemporalOp * dag_node * (int * int) option
+  | DQuantified of quantifier * dag_node
+
+(* Interning key: the node's shape with children replaced by their uids *)
+type dag_key =
+  | KTrue
+  | KFalse
+  | KPredicate of string * term list
+  | KNot of int
+  | KBinLogical of binaryLogicalOp * int * int
+  | KBinTemporal of binaryTemporalOp * int * int * (int * int) option
+  | KUnTemporal of unaryTemporalOp * int * (int * int) option
+  | KQuantified of quantifier * int
+
+type formula_dag = {
+  table: (dag_key, dag_node) Hashtbl.t;
+  mutable next_uid: int;
+}
+
+let create_dag () : formula_dag =
+  { table = Hashtbl.create 256; next_uid = 0 }
+
+let rec term_vars (t: term) : string list =
+  match t with
+  | Var v -> [v]
+  | Const _ -> []
+  | Func (_, args) -> List.concat_map term_vars args
+
+let key_of_shape (shape: dag_shape) : dag_key =
+  match shape with
+  | DTrue -> KTrue
+  | DFalse -> KFalse
+  | DPredicate (p, args) -> KPredicate (p, args)
+  | DNot n -> KNot n.uid
+  | DBinLogical (op, n1, n2) -> KBinLogical (op, n1.uid, n2.uid)
+  | DBinTemporal (op, n1, n2, bound) -> KBinTemporal (op, n1.uid, n2.uid, bound)
+  | DUnTemporal (op, n, bound) -> KUnTemporal (op, n.uid, bound)
+  | DQuantified (quant, n) -> KQuantified (quant, n.uid)
+
+let vars_of_shape (shape: dag_shape) : string list =
+  let vars = match shape with
+    | DTrue | DFalse -> []
+    | DPredicate (_, args) -> List.concat_map term_vars args
+    | DNot n | DUnTemporal (_, n, _) -> n.vars
+    | DBinLogical (_, n1, n2) | DBinTemporal (_, n1, n2, _) -> n1.vars @ n2.vars
+    | DQuantified ((Forall bound | Exists bound), n) ->
+        List.filter (fun v -> not (List.mem v bound)) n.vars
+  in
+  List.sort_uniq String.compare vars
+
+let intern (dag: formula_dag) (shape: dag_shape) : dag_node =
+  let key = key_of_shape shape in
+  match Hashtbl.find_opt dag.table key with
+  | Some node -> node
+  | None ->
+      let node = { uid = dag.next_uid; shape; vars = vars_of_shape shape } in
+      dag.next_uid <- dag.next_uid + 1;
+      Hashtbl.add dag.table key node;
+      node
+
+(* Compile a formula into the DAG. Annotations do not affect evaluation,
+   so annotated and bare copies of a formula share a node. *)
+let rec compile_formula (dag: formula_dag) (f: formula) : dag_node =
+  match f with
+  | True -> intern dag DTrue
+  | False -> intern dag DFalse
+  | Predicate (p, args) -> intern dag (DPredicate (p, args))
+  | Not f' -> intern dag (DNot (compile_formula dag f'))
+  | BinLogicalOp (op, f1, f2) ->
+      let n1 = compile_formula dag f1 in
+      let n2 = compile_formula dag f2 in
+      intern dag (DBinLogical (op, n1, n2))
+  | BinTemporalOp (op, f1, f2, bound) ->
+      let n1 = compile_formula dag f1 in
+      let n2 = compile_formula dag f2 in
+      intern dag (DBinTemporal (op, n1, n2, bound))
+  | UnTemporalOp (op, f', bound) ->
+      intern dag (DUnTemporal (op, compile_formula dag f', bound))
+  | Quantified (quant, f') ->
+      intern dag (DQuantified (quant, compile_formula dag f'))
+  | Annotated (f', _) -> compile_formula dag f'
+
+type memo_key = int * string option list
+
+(* Per-query memo table: (node uid, values of the node's free variables).
+   [witnesses] keeps, for each quantifier that was decided by a single
+   binding (a violated Forall or a satisfied Exists), the values of its
+   bound variables in that binding. *)
+type eval_memo = {
+  results: (memo_key, eval_result) Hashtbl.t;
+  witnesses: (memo_key, var_assignment) Hashtbl.t;
+  mutable hits: int;
+  mutable misses: int;
+}
+
+let create_memo () : eval_memo =
+  { results = Hashtbl.create 1024; witnesses = Hashtbl.create 16; hits = 0; misses = 0 }
+
+let memo_key (node: dag_node) (assignment: var_assignment) : memo_key =
+  (node.uid, List.map (fun v -> List.assoc_opt v assignment) node.vars)
+
+(* Enumerate assignments of [vars] over [entities] lazily, extending
+   [assignment]; returns true as soon as [found] holds for one of them *)
+let rec exists_assignment (vars: string list) (entities: string list)
+    (assignment: var_assignment) (found: var_assignment -> bool) : bool =
+  match vars with
+  | [] -> found assignment
+  | v :: rest ->
+      List.exists (fun e ->
+        exists_assignment rest entities ((v, e) :: assignment) found
+      ) entities
+
+(* Memoised evaluation of a DAG node; same semantics as eval_formula.
+   Quantifier assignments are charged to [budget]; fact lookups are
+   charged by passing a [metered] lookup as [holds]. *)
+let rec eval_node ?budget (memo: eval_memo) (assignment: var_assignment) (domain: domain_db)
+                  (holds: fact_lookup) (funcs: functions_db) (node: dag_node) : eval_result =
+  match node.shape with
+  | DTrue -> True
+  | DFalse -> False
+  | _ ->
+      let key = memo_key node assignment in
+      (match Hashtbl.find_opt memo.results key with
+       | Some result ->
+           memo.hits <- memo.hits + 1;
+           result
+       | None ->
+           memo.misses <- memo.misses + 1;
+           let result = eval_shape ?budget memo assignment domain holds funcs node in
+           Hashtbl.add memo.results key result;
+           result)
+
+and eval_shape ?budget (memo: eval_memo) (assignment: var_assignment) (domain: domain_db)
+               (holds: fact_lookup) (funcs: functions_db) (node: dag_node) : eval_result =
+  let eval = eval_node ?budget memo assignment domain holds funcs in
+  (* The binding that decided a quantifier is [a] minus the outer assignment *)
+  let record_witness vars a =
+    let bound = List.filteri (fun i _ -> i < List.length vars) a in
+    Hashtbl.replace memo.witnesses (memo_key node assignment) (List.rev bound)
+  in
+  match node.shape with
+  | DTrue -> True
+  | DFalse -> False
+  | DPredicate (p, args) ->
+      eval_atom assignment funcs holds p args
+  | DNot n ->
+      (match eval n with
+       | True -> False
+       | False -> True)
+  | DBinLogical (And, n1, n2) ->
+      (match eval n1 with
+       | False -> False
+       | True -> eval n2)
+  | DBinLogical (Or, n1, n2) ->
+      (match eval n1 with
+       | True -> True
+       | False -> eval n2)
+  | DBinLogical (Implies, n1, n2) ->
+      (match eval n1 with
+       | False -> True
+       | True -> eval n2)
+  | DBinLogical (Iff, n1, n2) ->
+      (match (eval n1, eval n2) with
+       | (True, True) | (False, False) -> True
+       | _ -> False)
+  | DBinLogical (Xor, n1, n2) ->
+      (match (eval n1, eval n2) with
+       | (True, False) | (False, True) -> True
+       | _ -> False)
+  | DQuantified (Forall vars, body) ->
+      let violated = exists_assignment vars domain.entities assignment (fun a ->
+        Option.iter charge_assignment budget;
+        match eval_node ?budget memo a domain holds funcs body with
+        | False -> record_witness vars a; true
+        | True -> false
+      ) in
+      if violated then False else True
+  | DQuantified (Exists vars, body) ->
+      let witnessed = exists_assignment vars domain.entities assignment (fun a ->
+        Option.iter charge_assignment budget;
+        match eval_node ?budget memo a domain holds funcs body with
+        | True -> record_witness vars a; true
+        | False -> false
+      ) in
+      if witnessed then True else False
+  | DBinTemporal (_, n1, n2, _) ->
+      (* Same simplification as eval_formula: AND semantics *)
+      (match eval n1 with
+       | False -> False
+       | True -> eval n2)
+  | DUnTemporal (_, n, _) ->
+      eval n
+
+(* ============================================ *)
+(* COUNTEREXAMPLE WITNESSES                    *)
+(* ============================================ *)
+
+(* Why a node got its verdict: the quantifier bindings along the deciding
+   path and the ground atoms at its leaves, with their truth values.
+   A failed Exists or satisfied Forall on the path has no single binding
+   to show; it is kept in [quantified] as ("exists" | "forall", its
+   variables, its body with the enclosing binding filled in), e.g.
+   ("exists", ["y"], "hasConsent(alice, y)"). *)
+type witness = {
+  binding: (string * string) list;
+  atoms: (string * string list * bool) list;
+  quantified: (string * string list * string) list;
+}
+
+let max_witness_atoms = 16
+
+(* The formula a node was compiled from, with the variables bound in
+   [assignment] replaced by their values (annotations are not kept) *)
+let rec formula_of_node (assignment: var_assignment) (node: dag_node) : formula =
+  let rec subst t = match t with
+    | Var v -> (match List.assoc_opt v assignment with Some e -> Const e | None -> t)
+    | Const _ -> t
+    | Func (f, args) -> Func (f, List.map subst args)
+  in
+  match node.shape with
+  | DTrue -> Ast.True
+  | DFalse -> Ast.False
+  | DPredicate (p, args) -> Predicate (p, List.map subst args)
+  | DNot n -> Not (formula_of_node assignment n)
+  | DBinLogical (op, n1, n2) ->
+      BinLogicalOp (op, formula_of_node assignment n1, formula_of_node assignment n2)
+  | DBinTemporal (op, n1, n2, bound) ->
+      BinTemporalOp (op, formula_of_node assignment n1, formula_of_node assignment n2, bound)
+  | DUnTemporal (op, n, bound) -> UnTemporalOp (op, formula_of_node assignment n, bound)
+  | DQuantified (q, n) ->
+      let vars = match q with Forall vs | Exists vs -> vs in
+      let inner = List.filter (fun (v, _) -> not (List.mem v vars)) assignment in
+      Quantified (q, formula_of_node inner n)
+
+(* Read the witness of an already evaluated node off the memo table. No
+   fact is looked up and no assignment enumerated: every verdict on the
+   deciding path is in [memo.results] and every quantifier binding in
+   [memo.witnesses]. Returns None if the node was not fully evaluated
+   (e.g. the budget ran out). *)
+let witness_of (memo: eval_memo) (funcs: functions_db) (root: dag_node) : witness option =
+  let binding = ref [] in
+  let atoms = ref [] in
+  let quantified = ref [] in
+  let count = ref 0 in
+  let verdict assignment (node: dag_node) =
+    match node.shape with
+    | DTrue -> Some True
+    | DFalse -> Some False
+    | _ -> Hashtbl.find_opt memo.results (memo_key node assignment)
+  in
+  let rec walk assignment (node: dag_node) =
+    if !count < max_witness_atoms then
+      match verdict assignment node with
+      | None -> ()
+      | Some v ->
+          (match node.shape, v with
+           | (DTrue | DFalse), _ -> ()
+           | DPredicate (p, args), _ ->
+               let values = List.map (fun t ->
+                 match eval_term assignment funcs t with
+                 | Some value -> value
+                 | None -> "?"
+               ) args in
+               incr count;
+               atoms := (p, values, v = True) :: !atoms
+           | DNot n, _ | DUnTemporal (_, n, _), _ -> walk assignment n
+           (* A single child decides these; prefer the left one, as the
+              evaluator short-circuits left to right *)
+           | (DBinLogical (And, n1, n2) | DBinTemporal (_, n1, n2, _)), False ->
+               walk assignment (if verdict assignment n1 = Some False then n1 else n2)
+           | DBinLogical (Or, n1, n2), True ->
+               walk assignment (if verdict assignment n1 = Some True then n1 else n2)
+           | DBinLogical (Implies, n1, n2), True ->
+               walk assignment (if verdict assignment n1 = Some False then n1 else n2)
+           | (DBinLogical (_, n1, n2) | DBinTemporal (_, n1, n2, _)), _ ->
+               walk assignment n1;
+               walk assignment n2
+           | DQuantified (q, body), _ ->
+               (* A violated Forall or satisfied Exists has one binding to
+                  show; a failed Exists or satisfied Forall holds for every
+                  binding, so the claim itself is the explanation (except
+                  at the root, where it would only restate the policy) *)
+               (match Hashtbl.find_opt memo.witnesses (memo_key node assignment) with
+                | Some bound ->
+                    binding := !binding @ bound;
+                    walk (bound @ assignment) body
+                | None ->
+                    let claim kind vars =
+                      incr count;
+                      let outer = List.filter (fun (w, _) -> not (List.mem w vars)) assignment in
+                      let text = Ast.string_of_formula (formula_of_node outer body) in
+                      quantified := (kind, vars, text) :: !quantified
+                    in
+                    (match q, v with
+                     | _ when node.uid = root.uid -> ()
+                     | Exists vars, False -> claim "exists" vars
+                     | Forall vars, True -> claim "forall" vars
+                     | _ -> ())))
+  in
+  walk [] root;
+  if !binding = [] && !atoms = [] && !quantified = [] then None
+  else Some { binding = !binding; atoms = List.rev !atoms; quantified = List.rev !quantified }
 
 (* Evaluate all formulas in a policy *)
 let eval_policy (domain: domain_db) (facts: facts_db) (funcs: functions_db) 
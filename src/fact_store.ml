@@ -0,0 +1,73 @@
+(* fact_store.ml - Hashed fact store with incremental updates *)
+
+open Ast
+
+(* ============================================ *)
+(* INDEXED FACT STORE                          *)
+(* ============================================ *)
+
+type t = {
+  facts: (string * string list, unit) Hashtbl.t;   (* ground facts *)
+  predicate_counts: (string, int) Hashtbl.t;         (* facts per predicate *)
+  entity_counts: (string, int) Hashtbl.t;            (* facts mentioning each entity *)
+}
+
+let create ?(size = 1024) () : t =
+  {
+    facts = Hashtbl.create size;
+    predicate_counts = Hashtbl.create 64;
+    entity_counts = Hashtbl.create size;
+  }
+
+let bump (tbl: (string, int) Hashtbl.t) (key: string) (delta: int) : unit =
+  let n = (try Hashtbl.find tbl key with Not_found -> 0) + delta in
+  if n <= 0 then Hashtbl.remove tbl key else Hashtbl.replace tbl key n
+
+let mem (store: t) (pred: string) (args: string list) : bool =
+  Hashtbl.mem store.facts (pred, args)
+
+(* Add a fact; returns false if it was already present *)
+let add (store: t) (pred: string) (args: string list) : bool =
+  if mem store pred args then false
+  else begin
+    Hashtbl.replace store.facts (pred, args) ();
+    bump store.predicate_counts pred 1;
+    List.iter (fun a -> bump store.entity_counts a 1) args;
+    true
+  end
+
+(* Remove a fact; returns false if it was not present *)
+let remove (store: t) (pred: string) (args: string list) : bool =
+  if not (mem store pred args) then false
+  else begin
+    Hashtbl.remove store.facts (pred, args);
+    bump store.predicate_counts pred (-1);
+    List.iter (fun a -> bump store.entity_counts a (-1)) args;
+    true
+  end
+
+let size (store: t) : int =
+  Hashtbl.length store.facts
+
+let has_entity (store: t) (entity: string) : bool =
+  Hashtbl.mem store.entity_counts entity
+
+(* Entities mentioned by at least one fact, sorted *)
+let entities (store: t) : string list =
+  Hashtbl.fold (fun e _ acc -> e :: acc) store.entity_counts []
+  |> List.sort String.compare
+
+(* ============================================ *)
+(* CONVERSION                                  *)
+(* ============================================ *)
+
+let of_facts_db (db: facts_db) : t =
+  let store = create ~size:(max 16 (List.length db.facts)) () in
+  List.iter (fun (pred, args) -> ignore (add store pred args)) db.facts;
+  store
+
+let to_facts_db (store: t) : facts_db =
+  { facts = Hashtbl.fold (fun fact () acc -> fact :: acc) store.facts [] }
+
+let to_domain_db (store: t) : domain_db =
+  { entities = entities store }
@@ -184,15 +184,19 @@ let facts_to_json (facts: Ast.facts_db) : Yojson.Basic.t =
     ) facts.facts))
   ]
 
-(* Parse JSON to facts database *)
-let json_to_facts (j: Yojson.Basic.t) : Ast.facts_db =
+(* Parse a JSON list of {"predicate", "arguments"} objects *)
+let json_to_fact_list (j: Yojson.Basic.t) : (string * string list) list =
   let open Yojson.Basic.Util in
-  let facts_list = j |> member "facts" |> to_list in
-  let facts = List.map (fun fact ->
+  List.map (fun fact ->
     let pred = fact |> member "predicate" |> to_string in
     let args = fact |> member "arguments" |> to_list |> List.map to_string in
     (pred, args)
-  ) facts_list in
+  ) (to_list j)
+
+(* Parse JSON to facts database *)
+let json_to_facts (j: Yojson.Basic.t) : Ast.facts_db =
+  let open Yojson.Basic.Util in
+  let facts = j |> member "facts" |> json_to_fact_list in
   { facts }
 
 (* Convert evaluation result to JSON *)
@@ -201,8 +205,58 @@ let eval_result_to_json (result: eval_result) : Yojson.Basic.t =
   | True -> `Assoc [("result", `String "true")]
   | False -> `Assoc [("result", `String "false")]
 
+(* An unknown verdict carries the work done before the budget ran out *)
+let budget_usage_to_json (usage: budget_usage) : Yojson.Basic.t =
+  `Assoc [
+    ("result", `String "unknown");
+    ("reason", `String usage.exhausted);
+    ("assignments", `Int usage.used_assignments);
+    ("fact_lookups", `Int usage.used_lookups);
+    ("elapsed_ms", `Float usage.elapsed_ms)
+  ]
+
+(* Convert a single policy evaluation to JSON; the formula text is the
+   bulkiest field and can be left out *)
+(* {"binding": {var: entity}, "atoms": [{"predicate", "arguments", "holds"}],
+    "quantified": [{"quantifier", "variables", "formula"}]}; "quantified"
+   only when a failed exists or satisfied forall is on the path *)
+let witness_to_json (w: witness) : Yojson.Basic.t =
+  `Assoc ([
+    ("binding", `Assoc (List.map (fun (v, e) -> (v, `String e)) w.binding));
+    ("atoms", `List (List.map (fun (p, args, holds) ->
+      `Assoc [
+        ("predicate", `String p);
+        ("arguments", `List (List.map (fun a -> `String a) args));
+        ("holds", `Bool holds)
+      ]
+    ) w.atoms))
+  ] @ (match w.quantified with
+    | [] -> []
+    | qs -> [("quantified", `List (List.map (fun (kind, vars, text) ->
+        `Assoc [
+          ("quantifier", `String kind);
+          ("variables", `List (List.map (fun v -> `String v) vars));
+          ("formula", `String text)
+        ]
+      ) qs))]))
+
+let evaluation_to_json ?(formula_text = true) (e: evaluation_result) : Yojson.Basic.t =
+  `Assoc ([
+    ("policy_id", `String e.policy_id);
+    ("regulation", `String e.regulation);
+    ("section", `String e.section);
+    ("description", `String e.description)
+  ] @ (if formula_text then [("formula_text", `String e.formula_text)] else []) @ [
+    ("evaluation", (match e.unknown with
+      | Some usage -> budget_usage_to_json usage
+      | None -> eval_result_to_json e.evaluation));
+    ("explanation", `String e.explanation)
+  ] @ (match e.witness with
+    | Some w -> [("witness", witness_to_json w)]
+    | None -> []))
+
 (* Convert query response to JSON *)
-let query_response_to_json (response: query_response) : Yojson.Basic.t =
+let query_response_to_json ?formula_text (response: query_response) : Yojson.Basic.t =
   `Assoc [
     ("query_formula", formula_to_json response.query_formula);
     ("matched_policies", `List (List.map (fun m ->
@@ -215,101 +269,270 @@ let query_response_to_json (response: query_response) : Yojson.Basic.t =
         ("matched_terms", `List (List.map (fun t -> `String t) m.matched_terms))
       ]
     ) response.matched_policies));
-    ("evaluations", `List (List.map (fun e ->
-      `Assoc [
-        ("policy_id", `String e.policy_id);
-        ("regulation", `String e.regulation);
-        ("section", `String e.section);
-        ("description", `String e.description);
-        ("formula_text", `String e.formula_text);
-        ("evaluation", eval_result_to_json e.evaluation);
-        ("explanation", `String e.explanation)
-      ]
-    ) response.evaluations));
+    ("evaluations", `List (List.map (evaluation_to_json ?formula_text) response.evaluations));
     ("overall_compliant", `Bool response.overall_compliant);
-    ("violations", `List (List.map (fun v -> `String v) response.violations))
+    ("violations", `List (List.map (fun v -> `String v) response.violations));
+    ("undecided", `List (List.map (fun v -> `String v) response.undecided))
   ]
 
 type query_request = {
   formula_string: string;
-  facts: Ast.facts_db;
+  facts: Fact_store.t;
   regulation_filter: string option;
+  workers: int option;
+  policy_budget: budget_limits;
+  request_budget: budget_limits;
+  stats: bool;                     (* include engine performance counters *)
+  formula_text: bool option;       (* include formula text; connection default if unset *)
 }
 
-(* Parse a query request from JSON *)
-let parse_query_request (json_str: string) : query_request =
+(* {"max_assignments": n, "max_lookups": n, "timeout_ms": n}, all optional *)
+let budget_limits_of_json (j: Yojson.Basic.t) : budget_limits =
+  let open Yojson.Basic.Util in
+  let field name = match j |> member name with
+    | `Null -> None
+    | v -> Some (to_int v)
+  in
+  match j with
+  | `Null -> no_limits
+  | _ ->
+      {
+        max_assignments = field "max_assignments";
+        max_lookups = field "max_lookups";
+        timeout_ms = field "timeout_ms";
+      }
+
+(* "facts_file": {"path": "...", "offset": 0} names a binary data file
+   (Data_loaders.BinaryData layout) whose fact table is loaded straight
+   from a memory mapping, so large fact sets never pass through the
+   request pipe. Its facts are added to [store]. *)
+let load_facts_file (store: Fact_store.t) (j: Yojson.Basic.t) : unit =
+  let open Yojson.Basic.Util in
+  match j with
+  | `Null -> ()
+  | _ ->
+      let path = j |> member "path" |> to_string in
+      let offset = match j |> member "offset" with
+        | `Null -> 0
+        | o -> to_int o
+      in
+      ignore (Data_loaders.BinaryData.load ~store ~offset path)
+
+(* The request's facts: inline "facts" (unless [store] already holds
+   them) plus any "facts_file" *)
+let facts_of_json ?store (json: Yojson.Basic.t) : Fact_store.t =
+  let open Yojson.Basic.Util in
+  let store = match store, json |> member "facts" with
+    | Some store, _ -> store
+    | None, `Null -> Fact_store.create ()
+    | None, facts -> Fact_store.of_facts_db (json_to_facts facts)
+  in
+  load_facts_file store (json |> member "facts_file");
+  store
+
+(* Parse a query request from a JSON document. When [store] is given the
+   facts were already read into it and the "facts" member is ignored. *)
+let query_request_of_json ?store (json: Yojson.Basic.t) : query_request =
   try
     let open Yojson.Basic.Util in
-    let json = Yojson.Basic.from_string json_str in
     
     let formula_str = json |> member "formula" |> to_string in
-    let facts = json |> member "facts" |> json_to_facts in
+    let facts = facts_of_json ?store json in
     let regulation = 
       try Some (json |> member "regulation" |> to_string)
       with _ -> None
     in
+    let workers =
+      try Some (json |> member "workers" |> to_int)
+      with _ -> None
+    in
+    (* "budget": {"policy": {...}, "request": {...}} *)
+    let budget = json |> member "budget" in
+    let limits scope = match budget with
+      | `Null -> no_limits
+      | _ -> budget |> member scope |> budget_limits_of_json
+    in
+    
+    let stats =
+      try json |> member "stats" |> to_bool
+      with _ -> false
+    in
     
-    { formula_string = formula_str; facts; regulation_filter = regulation }
+    let formula_text =
+      try Some (json |> member "formula_text" |> to_bool)
+      with _ -> None
+    in
+    
+    { formula_string = formula_str; facts; regulation_filter = regulation; workers;
+      policy_budget = limits "policy"; request_budget = limits "request"; stats;
+      formula_text }
   with e ->
     failwith (Printf.sprintf "Failed to parse query request: %s" (Printexc.to_string e))
 
-(* Helper: Extract unique entities from facts *)
+(* Parse a query request from JSON *)
+let parse_query_request (json_str: string) : query_request =
+  let json =
+    try Yojson.Basic.from_string json_str
+    with e -> failwith (Printf.sprintf "Failed to parse query request: %s" (Printexc.to_string e))
+  in
+  query_request_of_json json
+
+(* ============================================ *)
+(* STREAMING REQUEST READER                    *)
+(* ============================================ *)
+
+(* Bulk requests carry tens of thousands of facts. The streaming reader
+   pulls tokens from a lexbuf and adds each fact to the store as soon as it
+   is read; only the small remaining fields are built as JSON values, so
+   no document tree or full copy of the input is ever held in memory. *)
+
+(* {"predicate": "p", "arguments": ["a", "b"]}, fields in any order *)
+let read_fact (store: Fact_store.t) (ls: Yojson.Basic.lexer_state) (lexbuf: Lexing.lexbuf) : unit =
+  let (pred, args) = Yojson.Basic.read_fields (fun (pred, args) key ls lexbuf ->
+    match key with
+    | "predicate" -> (Some (Yojson.Basic.read_string ls lexbuf), args)
+    | "arguments" -> (pred, Yojson.Basic.read_list Yojson.Basic.read_string ls lexbuf)
+    | _ -> Yojson.Basic.skip_json ls lexbuf; (pred, args)
+  ) (None, []) ls lexbuf in
+  match pred with
+  | Some p -> ignore (Fact_store.add store p args)
+  | None -> failwith "Fact without a predicate"
+
+(* {"facts": [fact, ...]} *)
+let read_facts_field (store: Fact_store.t) (ls: Yojson.Basic.lexer_state) (lexbuf: Lexing.lexbuf) : unit =
+  Yojson.Basic.read_fields (fun () key ls lexbuf ->
+    match key with
+    | "facts" ->
+        Yojson.Basic.read_sequence (fun () ls lexbuf -> read_fact store ls lexbuf) () ls lexbuf
+    | _ -> Yojson.Basic.skip_json ls lexbuf
+  ) () ls lexbuf
+
+(* True once nothing but whitespace is left in the input *)
+let at_end_of_input (ls: Yojson.Basic.lexer_state) (lexbuf: Lexing.lexbuf) : bool =
+  Yojson.Basic.read_space ls lexbuf;
+  lexbuf.Lexing.lex_eof_reached && lexbuf.Lexing.lex_curr_pos >= lexbuf.Lexing.lex_buffer_len
+
+(* Read one query request, streaming its facts into a fresh store *)
+let read_query_request (lexbuf: Lexing.lexbuf) : query_request =
+  let ls = Yojson.Basic.init_lexer () in
+  let store = Fact_store.create ~size:4096 () in
+  let fields =
+    try
+      Yojson.Basic.read_space ls lexbuf;
+      Yojson.Basic.read_fields (fun acc key ls lexbuf ->
+        match key with
+        | "facts" -> read_facts_field store ls lexbuf; acc
+        | _ -> (key, Yojson.Basic.read_json ls lexbuf) :: acc
+      ) [] ls lexbuf
+    with e -> failwith (Printf.sprintf "Failed to parse query request: %s" (Printexc.to_string e))
+  in
+  query_request_of_json ~store (`Assoc (List.rev fields))
+
+(* Helper: Extract unique entities from facts, sorted *)
 let extract_entities_from_facts (facts: Ast.facts_db) : string list =
-  List.fold_left (fun acc (_, args) ->
-    List.fold_left (fun acc2 arg ->
-      if List.mem arg acc2 then acc2 else arg :: acc2
-    ) acc args
-  ) [] facts.facts
-  |> List.sort_uniq String.compare
+  let seen = Hashtbl.create 1024 in
+  List.iter (fun (_, args) ->
+    List.iter (fun arg -> Hashtbl.replace seen arg ()) args
+  ) facts.facts;
+  Hashtbl.fold (fun e () acc -> e :: acc) seen []
+  |> List.sort String.compare
+
 
+(* Parse a request's formula string and return its first formula *)
+let parse_query_formula (formula_string: string) : formula =
+  let formula = 
+    try
+      let lexbuf = Lexing.from_string formula_string in
+      (* Add position tracking *)
+      lexbuf.lex_curr_p <- { lexbuf.lex_curr_p with pos_fname = "query" };
+      
+      Parser.main Lexer.read lexbuf
+    with
+    | Parser.Error ->
+        let pos = Lexing.lexeme_start_p (Lexing.from_string formula_string) in
+        failwith (Printf.sprintf "Parse error at position %d in formula: %s" 
+          pos.pos_cnum formula_string)
+    | e ->
+        failwith (Printf.sprintf "Parse error: %s\nFormula: %s" 
+          (Printexc.to_string e) formula_string)
+  in
+  
+  (* Extract the first formula from the policy file *)
+  match formula.policies with
+  | [] -> failwith "No formula provided"
+  | f :: _ -> f
+
+(* Engine performance counters: phase timings plus per-policy work *)
+let stats_to_json (timings: (string * float) list) (response: query_response)
+                  (policy_manager: Policy_loader.policy_manager) : Yojson.Basic.t =
+  let sum f = List.fold_left (fun acc e -> acc + f e.work) 0 response.evaluations in
+  `Assoc [
+    ("regulation_loads", `List (List.map (fun (reg, ms, resident) ->
+      `Assoc [
+        ("regulation", `String reg);
+        ("load_ms", `Float ms);
+        ("resident", `Bool resident)
+      ]
+    ) (Policy_loader.regulation_load_times policy_manager)));
+    ("phases_ms", `Assoc (List.map (fun (name, ms) -> (name, `Float ms)) timings));
+    ("total_ms", `Float (List.fold_left (fun acc (_, ms) -> acc +. ms) 0.0 timings));
+    ("policies", `List (List.map (fun e ->
+      `Assoc [
+        ("policy_id", `String e.policy_id);
+        ("eval_ms", `Float e.work.eval_ms);
+        ("assignments", `Int e.work.enumerated);
+        ("fact_lookups", `Int e.work.fact_lookups);
+        ("memo_hits", `Int e.work.memo_hits);
+        ("memo_misses", `Int e.work.memo_misses)
+      ]
+    ) response.evaluations));
+    ("assignments", `Int (sum (fun w -> w.enumerated)));
+    ("fact_lookups", `Int (sum (fun w -> w.fact_lookups)));
+    ("memo_hits", `Int (sum (fun w -> w.memo_hits)));
+    ("memo_misses", `Int (sum (fun w -> w.memo_misses)))
+  ]
+
+(* Answer a decoded request; [timings] already holds the decode phase *)
+let answer_query_request ?(formula_text = true) ?domain (timings: (string * float) list ref) (request: query_request)
+    (ast_env: Ast.type_environment) (policy_manager: Policy_loader.policy_manager) : Yojson.Basic.t =
+  let query_formula = time_phase timings "parse" (fun () ->
+    parse_query_formula request.formula_string) in
+  
+  (* Setup databases; a fact session supplies its precomputed domain *)
+  let domain = match domain with
+    | Some d -> d
+    | None -> time_phase timings "domain" (fun () -> Fact_store.to_domain_db request.facts)
+  in
+  let funcs = { Ast.func_values = [] } in (* Empty for now *)
+  
+  (* Process the query - now with correct types *)
+  let response = Query_engine.process_query_store 
+    ?workers:request.workers
+    ~policy_budget:request.policy_budget
+    ~request_budget:request.request_budget
+    query_formula 
+    request.regulation_filter
+    domain 
+    request.facts 
+    funcs 
+    ast_env
+    policy_manager
+  in
+  
+  (* Return JSON response *)
+  let formula_text = Option.value request.formula_text ~default:formula_text in
+  let json = query_response_to_json ~formula_text response in
+  match json with
+  | `Assoc fields when request.stats ->
+      `Assoc (fields @ [("stats", stats_to_json (!timings @ response.timings) response policy_manager)])
+  | _ -> json
 
 (* In handle_query_json *)
 let rec handle_query_json (json_str: string) (ast_env: Ast.type_environment) (policy_manager: Policy_loader.policy_manager) : string =
   try
-    let request = parse_query_request json_str in
-    
-    (* Parse the formula string *)
-    let formula = 
-      try
-        let lexbuf = Lexing.from_string request.formula_string in
-        (* Add position tracking *)
-        lexbuf.lex_curr_p <- { lexbuf.lex_curr_p with pos_fname = "query" };
-        
-        Parser.main Lexer.read lexbuf
-      with
-      | Parser.Error ->
-          let pos = Lexing.lexeme_start_p (Lexing.from_string request.formula_string) in
-          failwith (Printf.sprintf "Parse error at position %d in formula: %s" 
-            pos.pos_cnum request.formula_string)
-      | e ->
-          failwith (Printf.sprintf "Parse error: %s\nFormula: %s" 
-            (Printexc.to_string e) request.formula_string)
-    in
-    
-    (* Extract the first formula from the policy file *)
-    let query_formula = match formula.policies with
-      | [] -> failwith "No formula provided"
-      | f :: _ -> f
-    in
-    
-    (* Setup databases *)
-    let domain = { Ast.entities = extract_entities_from_facts request.facts } in
-    let funcs = { Ast.func_values = [] } in (* Empty for now *)
-    
-    (* Process the query - now with correct types *)
-    let response = Query_engine.process_query 
-      query_formula 
-      request.regulation_filter
-      domain 
-      request.facts 
-      funcs 
-      ast_env
-      policy_manager
-    in
-    
-    (* Return JSON response *)
-    query_response_to_json response |> Yojson.Basic.to_string
-    
+    let timings = ref [] in
+    let request = time_phase timings "decode" (fun () -> parse_query_request json_str) in
+    answer_query_request timings request ast_env policy_manager |> Yojson.Basic.to_string
   with e ->
     (* Return error as JSON *)
     `Assoc [
@@ -317,51 +540,560 @@ let rec handle_query_json (json_str: string) (ast_env: Ast.type_environment) (po
       ("success", `Bool false)
     ] |> Yojson.Basic.to_string
 
+(* Same as handle_query_json, streaming the request from a channel *)
+let handle_query_channel (ic: in_channel) (ast_env: Ast.type_environment) (policy_manager: Policy_loader.policy_manager) : string =
+  try
+    let timings = ref [] in
+    let lexbuf = Lexing.from_channel ic in
+    let ls = Yojson.Basic.init_lexer () in
+    if at_end_of_input ls lexbuf then failwith "No input provided";
+    let request = time_phase timings "decode" (fun () -> read_query_request lexbuf) in
+    answer_query_request timings request ast_env policy_manager |> Yojson.Basic.to_string
+  with e ->
+    `Assoc [
+      ("error", `String (Printexc.to_string e));
+      ("success", `Bool false)
+    ] |> Yojson.Basic.to_string
+
 (* ============================================ *)
 (* COMMAND-LINE INTERFACE                      *)
 (* ============================================ *)
 
 (* Read JSON from stdin, process, write JSON to stdout *)
 let run_stdio_mode (runtime_env: Environment_config.Config.runtime_environment) : unit =
+  (* The request is streamed from stdin; facts go straight into the store *)
+  let output = handle_query_channel stdin runtime_env.type_env runtime_env.policy_manager in
+  print_endline output
+
+(* ============================================ *)
+(* RESIDENT SERVER MODE                        *)
+(* ============================================ *)
+
+(* Idle session lifetime in seconds from PRECIS_SESSION_TTL; defaults to
+   15 minutes *)
+let session_ttl () : float =
+  match Sys.getenv_opt "PRECIS_SESSION_TTL" with
+  | Some s -> (try max 1.0 (float_of_string (String.trim s)) with _ -> 900.0)
+  | None -> 900.0
+
+type 'a expiring = {
+  value: 'a;
+  mutable last_used: float;
+}
+
+(* Facts uploaded once and queried many times. The store is only read by
+   queries; the domain is derived once and refreshed on updates. *)
+type fact_session = {
+  fact_store: Fact_store.t;
+  mutable fact_domain: Ast.domain_db;
+}
+
+(* Open incremental sessions and fact sessions, keyed by session id *)
+let sessions : (string, Query_engine.session expiring) Hashtbl.t = Hashtbl.create 16
+let fact_sessions : (string, fact_session expiring) Hashtbl.t = Hashtbl.create 16
+let next_session_id = ref 0
+
+let new_session_id (prefix: string) : string =
+  incr next_session_id;
+  Printf.sprintf "%s%d" prefix !next_session_id
+
+(* Drop sessions idle for longer than the TTL *)
+let expire_sessions () : unit =
+  let cutoff = Unix.gettimeofday () -. session_ttl () in
+  let sweep tbl =
+    let stale = Hashtbl.fold (fun id e acc ->
+      if e.last_used < cutoff then id :: acc else acc) tbl [] in
+    List.iter (Hashtbl.remove tbl) stale
+  in
+  sweep sessions;
+  sweep fact_sessions
+
+let error_json (msg: string) : Yojson.Basic.t =
+  `Assoc [
+    ("error", `String msg);
+    ("success", `Bool false)
+  ]
+
+let touch (tbl: (string, 'a expiring) Hashtbl.t) (kind: string) (id: string) : 'a =
+  match Hashtbl.find_opt tbl id with
+  | Some e ->
+      e.last_used <- Unix.gettimeofday ();
+      e.value
+  | None -> failwith (Printf.sprintf "Unknown %s: %s" kind id)
+
+let find_session (json: Yojson.Basic.t) : string * Query_engine.session =
+  let open Yojson.Basic.Util in
+  let id = json |> member "session_id" |> to_string in
+  (id, touch sessions "session" id)
+
+let find_fact_session (json: Yojson.Basic.t) : string * fact_session =
+  let open Yojson.Basic.Util in
+  let id = json |> member "fact_session" |> to_string in
+  (id, touch fact_sessions "fact session" id)
+
+(* {"op": "session_open", "formula", "facts", "regulation"}: evaluate the
+   query once and keep its state under a new session id *)
+let handle_session_open ?formula_text (json: Yojson.Basic.t) (runtime_env: Environment_config.Config.runtime_environment) : Yojson.Basic.t =
+  let request = query_request_of_json json in
+  let query_formula = parse_query_formula request.formula_string in
+  let session = Query_engine.open_session
+    query_formula
+    request.regulation_filter
+    request.facts
+    { Ast.func_values = [] }
+    runtime_env.type_env
+    runtime_env.policy_manager
+  in
+  let id = new_session_id "s" in
+  Hashtbl.replace sessions id { value = session; last_used = Unix.gettimeofday () };
+  let formula_text = match request.formula_text with
+    | Some b -> Some b
+    | None -> formula_text
+  in
+  match query_response_to_json ?formula_text (Query_engine.session_response session) with
+  | `Assoc fields -> `Assoc (("session_id", `String id) :: fields)
+  | other -> other
+
+(* {"op": "session_delta", "session_id", "add": [...], "remove": [...]}:
+   apply a fact delta and return only the verdicts that changed *)
+let handle_session_delta ?formula_text (json: Yojson.Basic.t) : Yojson.Basic.t =
+  let open Yojson.Basic.Util in
+  let (id, session) = find_session json in
+  let fact_list field =
+    match json |> member field with
+    | `Null -> []
+    | j -> json_to_fact_list j
+  in
+  let delta = Query_engine.apply_delta session
+    ~add:(fact_list "add") ~remove:(fact_list "remove") in
+  let response = Query_engine.session_response session in
+  `Assoc [
+    ("session_id", `String id);
+    ("changed", `List (List.map (evaluation_to_json ?formula_text) delta.changed));
+    ("reevaluated", `Int delta.reevaluated);
+    ("domain_changed", `Bool delta.domain_changed);
+    ("overall_compliant", `Bool response.overall_compliant);
+    ("violations", `List (List.map (fun v -> `String v) response.violations));
+    ("undecided", `List (List.map (fun v -> `String v) response.undecided))
+  ]
+
+let handle_session_close (json: Yojson.Basic.t) : Yojson.Basic.t =
+  let (id, _) = find_session json in
+  Hashtbl.remove sessions id;
+  `Assoc [("session_id", `String id); ("closed", `Bool true)]
+
+let fact_session_json (id: string) (fs: fact_session) : Yojson.Basic.t =
+  `Assoc [
+    ("fact_session", `String id);
+    ("facts", `Int (Fact_store.size fs.fact_store));
+    ("entities", `Int (List.length fs.fact_domain.entities));
+    ("ttl_s", `Float (session_ttl ()))
+  ]
+
+(* {"op": "facts_open", "facts": {"facts": [...]}} (or "facts_file"):
+   index the facts once and return a fact session id for later queries *)
+let handle_facts_open (json: Yojson.Basic.t) : Yojson.Basic.t =
+  let open Yojson.Basic.Util in
+  let store = facts_of_json json in
+  let fs = { fact_store = store; fact_domain = Fact_store.to_domain_db store } in
+  let id = new_session_id "f" in
+  Hashtbl.replace fact_sessions id { value = fs; last_used = Unix.gettimeofday () };
+  fact_session_json id fs
+
+(* {"op": "facts_update", "fact_session", "add": [...], "remove": [...]} *)
+let handle_facts_update (json: Yojson.Basic.t) : Yojson.Basic.t =
+  let open Yojson.Basic.Util in
+  let (id, fs) = find_fact_session json in
+  let fact_list field =
+    match json |> member field with
+    | `Null -> []
+    | j -> json_to_fact_list j
+  in
+  List.iter (fun (p, args) -> ignore (Fact_store.remove fs.fact_store p args)) (fact_list "remove");
+  List.iter (fun (p, args) -> ignore (Fact_store.add fs.fact_store p args)) (fact_list "add");
+  fs.fact_domain <- Fact_store.to_domain_db fs.fact_store;
+  fact_session_json id fs
+
+let handle_facts_close (json: Yojson.Basic.t) : Yojson.Basic.t =
+  let (id, _) = find_fact_session json in
+  Hashtbl.remove fact_sessions id;
+  `Assoc [("fact_session", `String id); ("closed", `Bool true)]
+
+(* Wire format of a server connection. Connections start with one JSON
+   document per line; a client may negotiate length-prefixed MessagePack
+   frames with a "hello" request. *)
+type wire = Json_lines | Msgpack_frames
+
+type connection = {
+  mutable wire: wire;
+  mutable formula_text: bool;      (* default for requests that do not say *)
+}
+
+(* Protocol revision and optional request features, reported by
+   `precis version` and the hello reply so clients can check once at
+   start-up what this engine accepts *)
+let protocol_version = 1
+
+let features = [
+  "json"; "serve"; "listen"; "msgpack"; "budget"; "stats"; "formula_text";
+  "witness"; "sessions"; "fact_sessions"; "facts_file";
+]
+
+let version_json () : Yojson.Basic.t =
+  `Assoc [
+    ("protocol", `Int protocol_version);
+    ("features", `List (List.map (fun f -> `String f) features))
+  ]
+
+(* {"op": "hello", "wire": ["msgpack", "json"], "formula_text": false}:
+   pick the first wire format we support, in the client's order of
+   preference. The reply is sent in the old format; everything after it
+   uses the new one. Clients that negotiate get formula text only on
+   request. *)
+let handle_hello (conn: connection) (json: Yojson.Basic.t) : Yojson.Basic.t * wire =
+  let open Yojson.Basic.Util in
+  let offered = try json |> member "wire" |> to_list |> List.map to_string with _ -> ["json"] in
+  let wire = match List.find_opt (fun w -> w = "msgpack" || w = "json") offered with
+    | Some "msgpack" -> Msgpack_frames
+    | _ -> Json_lines
+  in
+  conn.formula_text <- (try json |> member "formula_text" |> to_bool with _ -> false);
+  (`Assoc [
+    ("op", `String "hello");
+    ("protocol", `Int protocol_version);
+    ("features", `List (List.map (fun f -> `String f) features));
+    ("wire", `String (match wire with Msgpack_frames -> "msgpack" | Json_lines -> "json"));
+    ("formula_text", `Bool conn.formula_text)
+  ], wire)
+
+(* Dispatch one request on its "op" field; plain query requests (no "op")
+   behave exactly like json mode *)
+let handle_server_value (conn: connection) (json: Yojson.Basic.t)
+    (runtime_env: Environment_config.Config.runtime_environment) : Yojson.Basic.t =
   try
-    (* Read ALL lines from stdin, not just first line *)
-    let rec read_all_lines acc =
-      try
-        let line = read_line () in
-        read_all_lines (line :: acc)
-      with End_of_file ->
-        List.rev acc
+    let open Yojson.Basic.Util in
+    expire_sessions ();
+    let op = try json |> member "op" |> to_string with _ -> "query" in
+    let formula_text = conn.formula_text in
+    match op with
+    | "query" when json |> member "fact_session" <> `Null ->
+        (* Formula against uploaded facts: nothing to decode or index *)
+        let (_, fs) = find_fact_session json in
+        if json |> member "facts_file" <> `Null then
+          failwith "facts_file cannot be combined with fact_session";
+        if json |> member "facts" <> `Null then
+          failwith "facts cannot be combined with fact_session; send them with facts_update";
+        let timings = ref [] in
+        let request = time_phase timings "decode" (fun () ->
+          query_request_of_json ~store:fs.fact_store json) in
+        answer_query_request ~formula_text ~domain:fs.fact_domain timings request
+          runtime_env.type_env runtime_env.policy_manager
+    | "query" ->
+        let timings = ref [] in
+        let request = time_phase timings "decode" (fun () -> query_request_of_json json) in
+        answer_query_request ~formula_text timings request runtime_env.type_env runtime_env.policy_manager
+    | "session_open" -> handle_session_open ~formula_text json runtime_env
+    | "session_delta" -> handle_session_delta ~formula_text json
+    | "session_close" -> handle_session_close json
+    | "facts_open" -> handle_facts_open json
+    | "facts_update" -> handle_facts_update json
+    | "facts_close" -> handle_facts_close json
+    | other -> error_json ("Unknown op: " ^ other)
+  with e ->
+    error_json (Printexc.to_string e)
+
+(* Resident mode: one request per line on stdin, one response per line on
+   stdout (or one frame each, once MessagePack is negotiated), until end
+   of input. While idle the server polls policies/ and data/ and swaps in
+   background reloads between requests. [input]/[output] default to the
+   standard streams; listen mode passes a socket. *)
+let run_server_mode ?(config = Environment_config.Config.default_config ()) ?watcher
+    ?(input = Unix.stdin) ?(output = stdout)
+    (runtime_env: Environment_config.Config.runtime_environment) : unit =
+  let env = ref runtime_env in
+  let conn = { wire = Json_lines; formula_text = true } in
+  let watcher = match watcher with
+    | Some w -> w
+    | None -> Watcher.create config
+  in
+  (* Bytes read but not yet served live in [!buf] between [!start] and
+     [!stop]; [!scanned] is how far a line search has already looked, so
+     each byte is searched once however many reads a long line takes *)
+  let buf = ref (Bytes.create 65536) in
+  let start = ref 0 and stop = ref 0 and scanned = ref 0 in
+  let chunk = Bytes.create 65536 in
+  let append n =
+    if !stop + n > Bytes.length !buf then begin
+      (* Drop served requests; grow only if the unserved bytes need it *)
+      let live = !stop - !start in
+      let target =
+        if live + n <= Bytes.length !buf then !buf
+        else Bytes.create (max (2 * Bytes.length !buf) (live + n))
+      in
+      Bytes.blit !buf !start target 0 live;
+      buf := target;
+      scanned := !scanned - !start;
+      start := 0;
+      stop := live
+    end;
+    Bytes.blit chunk 0 !buf !stop n;
+    stop := !stop + n
+  in
+  (* The [len] bytes at [skip] past the start, consuming the first [n] *)
+  let take ~n ~skip ~len =
+    let raw = Bytes.sub_string !buf (!start + skip) len in
+    start := !start + n;
+    scanned := !start;
+    if !start = !stop then begin start := 0; stop := 0; scanned := 0 end;
+    raw
+  in
+  (* Next complete request already read from stdin, if any *)
+  let take_request () =
+    match conn.wire with
+    | Json_lines ->
+        let rec find i =
+          if i >= !stop then (scanned := !stop; None)
+          else if Bytes.get !buf i = '\n' then Some i
+          else find (i + 1)
+        in
+        (match find (max !start !scanned) with
+         | None -> None
+         | Some i -> Some (take ~n:(i - !start + 1) ~skip:0 ~len:(i - !start)))
+    | Msgpack_frames ->
+        if !stop - !start < 4 then None
+        else
+          let n = Int32.to_int (Bytes.get_int32_be !buf !start) land 0xffffffff in
+          if !stop - !start < 4 + n then None
+          else Some (take ~n:(4 + n) ~skip:4 ~len:n)
+  in
+  let reply wire (json: Yojson.Basic.t) =
+    (match wire with
+     | Json_lines ->
+         output_string output (Yojson.Basic.to_string json);
+         output_char output '\n'
+     | Msgpack_frames ->
+         output_string output (Msgpack.frame (Msgpack.encode json)));
+    flush output
+  in
+  let serve raw =
+    let wire = conn.wire in
+    match wire with
+    | Json_lines when String.trim raw = "" -> ()
+    | _ ->
+        let decoded =
+          try Ok (match wire with
+            | Json_lines -> Yojson.Basic.from_string raw
+            | Msgpack_frames -> Msgpack.decode raw)
+          with e -> Error (Printexc.to_string e)
+        in
+        match decoded with
+        | Error msg -> reply wire (error_json msg)
+        | Ok json ->
+            let open Yojson.Basic.Util in
+            if (try json |> member "op" |> to_string = "hello" with _ -> false) then begin
+              let (response, negotiated) = handle_hello conn json in
+              reply wire response;
+              conn.wire <- negotiated
+            end else
+              reply wire (handle_server_value conn json !env)
+  in
+  let rec loop () =
+    match take_request () with
+    | Some raw -> serve raw; loop ()
+    | None ->
+        if Watcher.due watcher then Watcher.poll watcher (!env).policy_manager;
+        let jobs = Watcher.pending watcher in
+        let (ready, _, _) =
+          try Unix.select (input :: jobs) [] [] (Watcher.next_timeout watcher)
+          with Unix.Unix_error (Unix.EINTR, _, _) -> ([], [], [])
+        in
+        let finished = List.filter (fun fd -> fd <> input) ready in
+        if finished <> [] then env := Watcher.complete watcher finished !env;
+        if List.mem input ready then begin
+          match (try Unix.read input chunk 0 (Bytes.length chunk)
+                 with Unix.Unix_error (Unix.ECONNRESET, _, _) -> 0) with
+          | 0 ->
+              (* End of input: serve a final unterminated line *)
+              if conn.wire = Json_lines then
+                serve (Bytes.sub_string !buf !start (!stop - !start))
+          | n ->
+              append n;
+              loop ()
+        end else
+          loop ()
+  in
+  loop ()
+
+(* "host:port" is a TCP address; anything else is a Unix socket path *)
+let socket_address (address: string) : Unix.sockaddr =
+  match String.rindex_opt address ':' with
+  | Some i when not (String.contains address '/') ->
+      let host = String.sub address 0 i in
+      let port = int_of_string (String.sub address (i + 1) (String.length address - i - 1)) in
+      let host = if host = "" then "127.0.0.1" else host in
+      Unix.ADDR_INET ((Unix.gethostbyname host).Unix.h_addr_list.(0), port)
+  | _ -> Unix.ADDR_UNIX address
+
+(* Listen mode: serve each connection like stdin in a forked child, so
+   coordinators can drive several engines, possibly on other hosts. The
+   parent keeps the policies and data hot; pending reloads are finished
+   before forking, so every connection starts from the current state. *)
+let run_listen_mode ?(config = Environment_config.Config.default_config ())
+    (address: string) (runtime_env: Environment_config.Config.runtime_environment) : unit =
+  let addr = socket_address address in
+  let domain = Unix.domain_of_sockaddr addr in
+  (match addr with
+   | Unix.ADDR_UNIX path when Sys.file_exists path -> Sys.remove path
+   | _ -> ());
+  let sock = Unix.socket domain Unix.SOCK_STREAM 0 in
+  if domain <> Unix.PF_UNIX then Unix.setsockopt sock Unix.SO_REUSEADDR true;
+  Unix.bind sock addr;
+  Unix.listen sock 64;
+  Printf.eprintf "Listening on %s\n%!" address;
+  let env = ref runtime_env in
+  let watcher = Watcher.create config in
+  let rec reap () =
+    match (try Unix.waitpid [Unix.WNOHANG] (-1) with Unix.Unix_error _ -> (0, Unix.WEXITED 0)) with
+    | (0, _) -> ()
+    | _ -> reap ()
+  in
+  let rec loop () =
+    if Watcher.due watcher then Watcher.poll watcher (!env).policy_manager;
+    let jobs = Watcher.pending watcher in
+    let (ready, _, _) =
+      try Unix.select (sock :: jobs) [] [] (Watcher.next_timeout watcher)
+      with Unix.Unix_error (Unix.EINTR, _, _) -> ([], [], [])
     in
-    let lines = read_all_lines [] in
-    let input = String.concat "\n" lines in
-    
-    if String.length input = 0 then
-      let error_json = `Assoc [
-        ("error", `String "No input provided");
-        ("success", `Bool false)
-      ] |> Yojson.Basic.to_string in
-      print_endline error_json
-    else
-      let output = handle_query_json input runtime_env.type_env runtime_env.policy_manager in
-      print_endline output
-  with e -> 
-      let error_json = `Assoc [
-        ("error", `String (Printexc.to_string e));
-        ("success", `Bool false)
-      ] |> Yojson.Basic.to_string in
-      print_endline error_json
+    let finished = List.filter (fun fd -> fd <> sock) ready in
+    if finished <> [] then env := Watcher.complete watcher finished !env;
+    if List.mem sock ready then begin
+      let (client, _) = Unix.accept sock in
+      env := Watcher.settle watcher !env;
+      flush stdout;
+      flush stderr;
+      match Unix.fork () with
+      | 0 ->
+          Unix.close sock;
+          (try
+            run_server_mode ~config ~watcher ~input:client
+              ~output:(Unix.out_channel_of_descr client) !env
+          with _ -> ());
+          Unix._exit 0
+      | _ ->
+          Unix.close client;
+          reap ()
+    end;
+    loop ()
+  in
+  loop ()
 
 (* File-based mode: read JSON from file, write response to stdout *)
 let run_file_mode (filename: string) (runtime_env: Environment_config.Config.runtime_environment) : unit =
   try
     let ic = open_in filename in
-    let input = really_input_string ic (in_channel_length ic) in
+    let output = handle_query_channel ic runtime_env.type_env runtime_env.policy_manager in
     close_in ic;
-    let output = handle_query_json input runtime_env.type_env runtime_env.policy_manager in
     print_endline output
   with e ->
     let error_json = `Assoc [
       ("error", `String (Printexc.to_string e));
       ("success", `Bool false)
     ] |> Yojson.Basic.to_string in
-    print_endline error_json
\ No newline at end of file
+    print_endline error_json
+
+(* ============================================ *)
+(* WORKER SCALING BENCHMARK                    *)
+(* ============================================ *)
+
+(* Evaluate a request file's matched policies with 1..max_workers workers
+   and print wall-clock time and speedup over the single-worker run *)
+let run_bench_mode (filename: string) (max_workers: int) (runtime_env: Environment_config.Config.runtime_environment) : unit =
+  let ic = open_in filename in
+  let request = read_query_request (Lexing.from_channel ic) in
+  close_in ic;
+  let query_formula = parse_query_formula request.formula_string in
+  let domain = Fact_store.to_domain_db request.facts in
+  let funcs = { Ast.func_values = [] } in
+  let all_policies = Policy_loader.get_combined_database runtime_env.policy_manager in
+  let db = match request.regulation_filter with
+    | Some reg -> Policy_loader.filter_by_regulation reg all_policies
+    | None -> all_policies
+  in
+  let matched = Query_engine.find_relevant_policies query_formula db 0.1 in
+  Printf.printf "Matched policies: %d  Facts: %d  Domain: %d\n\n"
+    (List.length matched) (Fact_store.size request.facts) (List.length domain.entities);
+  Printf.printf "%-8s %12s %10s\n" "workers" "time (s)" "speedup";
+  let baseline = ref 0.0 in
+  for workers = 1 to max 1 max_workers do
+    let start = Unix.gettimeofday () in
+    ignore (Query_engine.evaluate_matched_policies ~workers matched domain request.facts funcs);
+    let elapsed = Unix.gettimeofday () -. start in
+    if workers = 1 then baseline := elapsed;
+    let speedup = if elapsed > 0.0 then !baseline /. elapsed else 0.0 in
+    Printf.printf "%-8d %12.4f %9.2fx\n%!" workers elapsed speedup
+  done
+
+(* ============================================ *)
+(* REQUEST DECODING BENCHMARK                  *)
+(* ============================================ *)
+
+(* Write a synthetic request with [n] facts over a few predicates *)
+let write_synthetic_request (n: int) : string =
+  let filename = Filename.temp_file "precis_request" ".json" in
+  let oc = open_out filename in
+  output_string oc "{\"formula\": \"coveredEntity(hospital)\", \"facts\": {\"facts\": [";
+  for i = 0 to n - 1 do
+    if i > 0 then output_char oc ',';
+    Printf.fprintf oc
+      "{\"predicate\": \"disclose\", \"arguments\": [\"entity%d\", \"patient%d\", \"phi%d\"]}"
+      (i mod 97) i (i mod 13)
+  done;
+  output_string oc "]}}\n";
+  close_out oc;
+  filename
+
+(* Decode a request file in a forked child and report wall-clock time,
+   peak major heap and resulting fact count. Each run gets its own process
+   so one decoder's peak heap does not hide the other's. *)
+let measure_decode (decode: string -> query_request) (filename: string) : float * float * int =
+  let run _ =
+    Gc.compact ();
+    let start = Unix.gettimeofday () in
+    let request = decode filename in
+    let elapsed = Unix.gettimeofday () -. start in
+    let peak_mb = float_of_int ((Gc.quick_stat ()).Gc.top_heap_words * (Sys.word_size / 8))
+                  /. (1024.0 *. 1024.0) in
+    [(elapsed, peak_mb, Fact_store.size request.facts)]
+  in
+  match Parallel.collect run [()] (Parallel.spawn run [()]) with
+  | [result] -> result
+  | _ -> failwith "decode benchmark produced no result"
+
+(* Compare the document-tree decoder with the streaming reader on a
+   request file, or on a synthetic request with [n] facts *)
+let run_decode_bench_mode (source: string) : unit =
+  let (filename, synthetic) =
+    match int_of_string_opt source with
+    | Some n -> (write_synthetic_request n, true)
+    | None -> (source, false)
+  in
+  let read_file filename =
+    let ic = open_in filename in
+    let input = really_input_string ic (in_channel_length ic) in
+    close_in ic;
+    input
+  in
+  let tree filename = parse_query_request (read_file filename) in
+  let streaming filename =
+    let ic = open_in filename in
+    let request = read_query_request (Lexing.from_channel ic) in
+    close_in ic;
+    request
+  in
+  Printf.printf "Request: %s (%d bytes)\n\n" filename (Unix.stat filename).Unix.st_size;
+  Printf.printf "%-10s %12s %14s %10s\n" "decoder" "time (s)" "peak heap (MB)" "facts";
+  List.iter (fun (name, decode) ->
+    let (elapsed, peak_mb, facts) = measure_decode decode filename in
+    Printf.printf "%-10s %12.4f %14.1f %10d\n%!" name elapsed peak_mb facts
+  ) [("tree", tree); ("streaming", streaming)];
+  if synthetic then Sys.remove filename
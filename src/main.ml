@@ -17,7 +17,8 @@ let get_default_config () =
 (* EVALUATION HELPERS                          *)
 (* ============================================ *)
 
-let eval_policy (domain: domain_db) (facts: facts_db) (funcs: functions_db) (formulas: formula list) =
+let eval_policy (domain: domain_db) (store: Fact_store.t) (funcs: functions_db) (formulas: formula list) =
+  let facts = Fact_store.to_facts_db store in
   List.map (fun f -> Evaluator.eval_formula [] domain facts funcs f) formulas
 
 let print_eval_results results =
@@ -115,6 +116,61 @@ let run_query_mode query_string regulation_filter =
   with
   | e -> Printf.printf "Error processing query: %s\n" (Printexc.to_string e)
 
+(* ============================================ *)
+(* TRACE MONITORING MODE                       *)
+(* ============================================ *)
+
+let run_monitor_mode policy_file trace_file =
+  try
+    let ic = open_in policy_file in
+    let input = really_input_string ic (in_channel_length ic) in
+    close_in ic;
+    
+    let ast = Parser.main Lexer.read (Lexing.from_string input) in
+    let monitors = List.mapi (fun idx f -> Monitor.create_monitor (idx + 1) f) ast.policies in
+    
+    (* Single streaming pass; "-" reads the trace from stdin *)
+    let trace = if trace_file = "-" then stdin else open_in trace_file in
+    let start = Unix.gettimeofday () in
+    let summary = Monitor.monitor_channel monitors trace (fun m out ->
+      print_endline (Monitor.string_of_violation m out)) in
+    if trace != stdin then close_in trace;
+    
+    Printf.printf "\nMonitored %d time points (%d events) in %.2fs: %d violation(s)\n"
+      summary.Monitor.points summary.Monitor.events
+      (Unix.gettimeofday () -. start) summary.Monitor.violations;
+    List.iter (fun m ->
+      Printf.printf "  Policy %d: %d violation(s) - %s\n"
+        m.Monitor.policy_index m.Monitor.violation_count
+        (Ast.string_of_formula m.Monitor.policy)
+    ) monitors
+  with
+  | Monitor.Unmonitorable msg -> Printf.printf "Policy not monitorable: %s\n" msg
+  | Sys_error msg -> Printf.printf "Error reading file: %s\n" msg
+  | e -> Printf.printf "Error: %s\n" (Printexc.to_string e)
+
+(* ============================================ *)
+(* BINARY DATA CONVERSION                      *)
+(* ============================================ *)
+
+(* Missing input files (or "") contribute nothing *)
+let run_convert_data_mode facts_file output domain_file functions_file =
+  try
+    let start = Unix.gettimeofday () in
+    Data_loaders.BinaryData.convert_text ~domain_file ~facts_file ~functions_file output;
+    let converted = Unix.gettimeofday () -. start in
+    let start = Unix.gettimeofday () in
+    let data = Data_loaders.BinaryData.load output in
+    Printf.printf "Wrote %s: %d entities, %d facts, %d function values\n"
+      output (List.length data.Data_loaders.BinaryData.domain)
+      (Fact_store.size data.Data_loaders.BinaryData.store)
+      (List.length data.Data_loaders.BinaryData.func_values);
+    Printf.printf "Text load + convert: %.3fs, binary load: %.3fs\n"
+      converted (Unix.gettimeofday () -. start)
+  with
+  | Sys_error msg -> Printf.printf "Error reading file: %s\n" msg
+  | e -> Printf.printf "Error: %s\n" (Printexc.to_string e)
+
 (* ============================================ *)
 (* POLICY MANAGEMENT MODE - NEW!               *)
 (* ============================================ *)
@@ -196,12 +252,20 @@ let run_inspect_mode () =
   
   (* Show facts *)
   Printf.printf "Facts Database:\n";
-  Printf.printf "  Total facts: %d\n\n" (List.length runtime_env.facts.facts);
+  Printf.printf "  Total facts: %d\n\n" (Fact_store.size runtime_env.facts);
   
   (* Show policies *)
   let policies = Environment_config.Config.get_all_policies runtime_env in
   Printf.printf "Policies:\n";
-  Printf.printf "  Total policies: %d\n" (List.length policies.policies)
+  Printf.printf "  Total policies: %d\n" (List.length policies.policies);
+  
+  (* Show per-regulation load times *)
+  let limit = runtime_env.policy_manager.Policy_loader.max_resident in
+  Printf.printf "  Regulation load times (resident limit %s):\n"
+    (if limit > 0 then string_of_int limit else "none");
+  List.iter (fun (reg, ms, resident) ->
+    Printf.printf "    %-20s %8.2fms%s\n" reg ms (if resident then "  [resident]" else "")
+  ) (Policy_loader.regulation_load_times runtime_env.policy_manager)
 
 (* ============================================ *)
 (* COMMAND LINE INTERFACE                      *)
@@ -211,15 +275,26 @@ let print_usage () =
   Printf.printf "Usage:\n";
   Printf.printf "  precis file <filename>              Process a policy file\n";
   Printf.printf "  precis json                         Run in JSON mode (for Python)\n";
+  Printf.printf "  precis version                      Protocol revision and features, as JSON\n";
+  Printf.printf "  precis serve                        Resident line-delimited JSON mode with sessions\n";
+  Printf.printf "                                      (hot-reloads policies/ and data/; PRECIS_WATCH_INTERVAL=0 disables)\n";
+  Printf.printf "                                      (a {\"op\": \"hello\"} request can switch to MessagePack frames)\n";
+  Printf.printf "  precis serve --listen <host:port|path>  Same, one forked server per socket connection\n";
   Printf.printf "  precis query \"<formula>\" [reg]      Query policies\n";
   Printf.printf "  precis list                         List all policies\n";
   Printf.printf "  precis reload [regulation]          Reload policies\n";
   Printf.printf "  precis inspect                      Inspect system configuration\n";
+  Printf.printf "  precis bench <request.json> [N]     Time evaluation with 1..N workers\n";
+  Printf.printf "  precis bench-decode <request.json|N>  Peak memory of tree vs streaming request decoding\n";
+  Printf.printf "  precis convert-data [facts.txt out.bin [domain.txt functions.txt]]\n";
+  Printf.printf "                                      Compile text data files to data.bin (memory-mapped)\n";
+  Printf.printf "  precis monitor <policy> <trace|->   Monitor temporal policies over an event trace\n";
   Printf.printf "\n";
   Printf.printf "Examples:\n";
   Printf.printf "  precis file examples/hipaa.policy\n";
   Printf.printf "  precis query \"disclose(hospital, patient, phi)\" HIPAA\n";
   Printf.printf "  precis reload HIPAA\n";
+  Printf.printf "  precis monitor breach_notification.policy disclosures.log\n";
   Printf.printf "  precis list\n"
 
 let () =
@@ -232,16 +307,31 @@ let () =
   | [_; "file"; filename] -> run_file_mode filename
   
   (* JSON mode for Python *)
+  | [_; "version"] ->
+      print_endline (Yojson.Basic.to_string (Json_interface.version_json ()))
+  
   | [_; "json"] ->
       let runtime_env = Environment_config.Config.initialize () in
       run_json_mode runtime_env
   
+  (* Resident mode: one request per line, incremental sessions *)
+  | [_; "serve"] ->
+      let runtime_env = Environment_config.Config.initialize () in
+      Json_interface.run_server_mode runtime_env
+  | [_; "serve"; "--listen"; address] ->
+      let runtime_env = Environment_config.Config.initialize () in
+      Json_interface.run_listen_mode address runtime_env
+  
   (* Query mode *)
   | [_; "query"; query] ->
       run_query_mode query None
   | [_; "query"; query; regulation] ->
       run_query_mode query (Some regulation)
   
+  (* Trace monitoring: "@<time> pred(args)" per line *)
+  | [_; "monitor"; policy_file; trace_file] ->
+      run_monitor_mode policy_file trace_file
+  
   (* Policy management *)
   | [_; "list"] ->
       run_policy_list_mode ()
@@ -255,6 +345,32 @@ let () =
   | [_; "inspect"] ->
       run_inspect_mode ()
   
+  (* Parallel evaluation scaling benchmark *)
+  | [_; "bench"; filename] ->
+      let runtime_env = Environment_config.Config.initialize () in
+      Json_interface.run_bench_mode filename 4 runtime_env
+  | [_; "bench"; filename; max_workers] ->
+      let runtime_env = Environment_config.Config.initialize () in
+      Json_interface.run_bench_mode filename (int_of_string max_workers) runtime_env
+  
+  (* Compile text data files into the binary columnar format *)
+  | [_; "convert-data"] ->
+      let config = Environment_config.Config.default_config () in
+      let dir = config.Environment_config.Config.data_dir in
+      run_convert_data_mode
+        (Filename.concat dir "facts.txt")
+        (Environment_config.Config.binary_data_file config)
+        (Filename.concat dir "domain.txt")
+        (Filename.concat dir "functions.txt")
+  | [_; "convert-data"; facts_file; output] ->
+      run_convert_data_mode facts_file output "" ""
+  | [_; "convert-data"; facts_file; output; domain_file; functions_file] ->
+      run_convert_data_mode facts_file output domain_file functions_file
+  
+  (* Request decoding memory benchmark, e.g. "precis bench-decode 100000" *)
+  | [_; "bench-decode"; source] ->
+      Json_interface.run_decode_bench_mode source
+  
   (* Unknown command *)
   | _ -> 
       Printf.printf "Unknown command\n\n";
@@ -0,0 +1,621 @@
+(* monitor.ml - Streaming monitor for metric temporal policies over
+   timestamped event traces *)
+
+open Ast
+
+(* ============================================ *)
+(* RELATIONS                                   *)
+(* ============================================ *)
+
+(* Satisfying assignments of a subformula at one time point. [vars] is
+   sorted; each row holds the values of [vars] in that order. A closed
+   subformula holds iff its relation has the single empty row. *)
+type rel = {
+  vars: string list;
+  rows: string list list;
+}
+
+let make_rel (vars: string list) (rows: string list list) : rel =
+  { vars; rows = List.sort_uniq compare rows }
+
+let empty_rel (vars: string list) : rel = { vars; rows = [] }
+
+let true_rel : rel = { vars = []; rows = [[]] }
+
+(* Positions of the [sub] variables within [vars] *)
+let positions (vars: string list) (sub: string list) : int list =
+  let rec index v i = function
+    | [] -> failwith ("Monitor: unknown variable " ^ v)
+    | x :: rest -> if x = v then i else index v (i + 1) rest
+  in
+  List.map (fun v -> index v 0 vars) sub
+
+let project_row (pos: int list) (row: string list) : string list =
+  let values = Array.of_list row in
+  List.map (fun i -> values.(i)) pos
+
+let row_set (r: rel) : (string list, unit) Hashtbl.t =
+  let set = Hashtbl.create (max 16 (List.length r.rows)) in
+  List.iter (fun row -> Hashtbl.replace set row ()) r.rows;
+  set
+
+(* Natural join on the shared variables *)
+let join (r1: rel) (r2: rel) : rel =
+  let vars = List.sort_uniq String.compare (r1.vars @ r2.vars) in
+  let common = List.filter (fun v -> List.mem v r2.vars) r1.vars in
+  let pos1 = positions r1.vars common and pos2 = positions r2.vars common in
+  let index = Hashtbl.create (max 16 (List.length r2.rows)) in
+  List.iter (fun row -> Hashtbl.add index (project_row pos2 row) row) r2.rows;
+  let pick = List.map (fun v ->
+    if List.mem v r1.vars then (true, List.hd (positions r1.vars [v]))
+    else (false, List.hd (positions r2.vars [v]))
+  ) vars in
+  let rows = List.concat_map (fun row1 ->
+    let a1 = Array.of_list row1 in
+    List.map (fun row2 ->
+      let a2 = Array.of_list row2 in
+      List.map (fun (left, i) -> if left then a1.(i) else a2.(i)) pick
+    ) (Hashtbl.find_all index (project_row pos1 row1))
+  ) r1.rows in
+  make_rel vars rows
+
+(* Rows of [r1] with no matching row in [r2]; r2's variables must be a
+   subset of r1's *)
+let antijoin (r1: rel) (r2: rel) : rel =
+  let pos = positions r1.vars r2.vars in
+  let excluded = row_set r2 in
+  { r1 with rows = List.filter (fun row ->
+      not (Hashtbl.mem excluded (project_row pos row))) r1.rows }
+
+let union (r1: rel) (r2: rel) : rel =
+  make_rel r1.vars (r1.rows @ r2.rows)
+
+let project_away (bound: string list) (r: rel) : rel =
+  let vars = List.filter (fun v -> not (List.mem v bound)) r.vars in
+  make_rel vars (List.map (project_row (positions r.vars vars)) r.rows)
+
+(* Negation is only ever applied to closed subformulas *)
+let complement (r: rel) : rel =
+  if r.rows = [] then true_rel else empty_rel []
+
+(* ============================================ *)
+(* ATOMS                                       *)
+(* ============================================ *)
+
+(* Events of one time point, indexed by predicate *)
+type point_facts = (string, string list) Hashtbl.t
+
+let is_comparison (p: string) : bool =
+  List.mem p ["="; "!="; "<"; "<="; ">"; ">="]
+
+let atom_rel (facts: point_facts) (p: string) (args: term list) : rel =
+  let vars = List.sort_uniq String.compare
+    (List.filter_map (function Var v -> Some v | _ -> None) args) in
+  let rec bind acc terms values =
+    match terms, values with
+    | [], [] -> Some acc
+    | Const c :: ts, v :: vs -> if c = v then bind acc ts vs else None
+    | Var x :: ts, v :: vs ->
+        (match List.assoc_opt x acc with
+         | Some v' -> if v = v' then bind acc ts vs else None
+         | None -> bind ((x, v) :: acc) ts vs)
+    | _ -> None
+  in
+  let rows = List.filter_map (fun fact_args ->
+    match bind [] args fact_args with
+    | Some binding -> Some (List.map (fun v -> List.assoc v binding) vars)
+    | None -> None
+  ) (Hashtbl.find_all facts p) in
+  make_rel vars rows
+
+let filter_rel (op: string) (t1: term) (t2: term) (r: rel) : rel =
+  let value row t =
+    match t with
+    | Const c -> Some c
+    | Var v -> Some (List.nth row (List.hd (positions r.vars [v])))
+    | Func _ -> None
+  in
+  { r with rows = List.filter (fun row ->
+      match value row t1, value row t2 with
+      | Some a, Some b -> Evaluator.eval_comparison op a b
+      | _ -> false
+    ) r.rows }
+
+(* ============================================ *)
+(* MONITORABLE PLANS                           *)
+(* ============================================ *)
+
+(* [lower, upper] distance between timestamps; None = unbounded *)
+type interval = int * int option
+
+type plan =
+  | PTrue
+  | PFalse
+  | PAtom of string * term list
+  | PFilter of plan * string * term * term
+  | PNeg of plan                               (* closed operands only *)
+  | PAnd of plan * plan
+  | PAndNot of plan * plan                     (* right's variables within left's *)
+  | POr of plan * plan
+  | PExists of string list * plan
+  | PPrev of interval * plan
+  | POnce of interval * plan
+  | PSince of interval * bool * plan * plan    (* bool: left operand negated *)
+  | PNext of interval * plan
+  | PEventually of interval * plan
+  | PUntil of interval * bool * plan * plan
+
+exception Unmonitorable of string
+
+let unmonitorable fmt = Printf.ksprintf (fun msg -> raise (Unmonitorable msg)) fmt
+
+let rec term_vars (t: term) : string list =
+  match t with
+  | Var v -> [v]
+  | Const _ -> []
+  | Func (_, args) -> List.concat_map term_vars args
+
+let rec free_vars (f: formula) : string list =
+  let vars = match f with
+    | True | False -> []
+    | Predicate (_, args) -> List.concat_map term_vars args
+    | Not g | UnTemporalOp (_, g, _) | Annotated (g, _) -> free_vars g
+    | BinLogicalOp (_, g1, g2) | BinTemporalOp (_, g1, g2, _) -> free_vars g1 @ free_vars g2
+    | Quantified ((Forall vs | Exists vs), g) ->
+        List.filter (fun v -> not (List.mem v vs)) (free_vars g)
+  in
+  List.sort_uniq String.compare vars
+
+let subset (xs: string list) (ys: string list) : bool =
+  List.for_all (fun x -> List.mem x ys) xs
+
+let rec strip (f: formula) : formula =
+  match f with
+  | Annotated (g, _) -> strip g
+  | _ -> f
+
+let past_interval (bound: (int * int) option) : interval =
+  match bound with
+  | None -> (0, None)
+  | Some (l, u) -> (l, Some u)
+
+(* Future operators delay verdicts until their window has passed, so they
+   need a finite upper bound *)
+let future_interval (bound: (int * int) option) : interval =
+  match bound with
+  | None -> unmonitorable "future operators need a bound [l,u] in monitor mode"
+  | Some (l, u) -> (l, Some u)
+
+(* Translate a formula into a plan over finite relations. Negation and
+   universal quantification of open subformulas are only accepted where
+   they can become an antijoin (f and not g, with g's variables bound by
+   f); closed subformulas may always be negated. *)
+let rec compile (f: formula) : plan =
+  try compile_direct f
+  with Unmonitorable _ as e when free_vars f = [] ->
+    (try PNeg (compile_direct (Not f)) with Unmonitorable _ -> raise e)
+
+and compile_direct (f: formula) : plan =
+  match f with
+  | True -> PTrue
+  | False -> PFalse
+  | Annotated (g, _) -> compile_direct g
+  | Predicate (p, args) ->
+      if is_comparison p then
+        unmonitorable "comparison %s must be conjoined with a formula binding its variables"
+          (string_of_formula f)
+      else if List.exists (function Func _ -> true | _ -> false) args then
+        unmonitorable "function terms are not supported in monitor mode: %s" (string_of_formula f)
+      else PAtom (p, args)
+  | Not g -> compile_not g
+  | BinLogicalOp (And, f1, f2) -> compile_and f1 f2
+  | BinLogicalOp (Or, f1, f2) -> compile_or f1 f2
+  | BinLogicalOp (Implies, f1, f2) -> compile_or (Not f1) f2
+  | BinLogicalOp (Iff, f1, f2) ->
+      compile_or (BinLogicalOp (And, f1, f2)) (BinLogicalOp (And, Not f1, Not f2))
+  | BinLogicalOp (Xor, f1, f2) ->
+      compile_or (BinLogicalOp (And, f1, Not f2)) (BinLogicalOp (And, Not f1, f2))
+  | Quantified (Exists vs, g) -> PExists (vs, compile g)
+  | Quantified (Forall _, _) ->
+      unmonitorable "open universal quantification: %s" (string_of_formula f)
+  | UnTemporalOp (Once, g, b) -> POnce (past_interval b, compile g)
+  | UnTemporalOp (Yesterday, g, b) -> PPrev (past_interval b, compile g)
+  | UnTemporalOp (Eventually, g, b) -> PEventually (future_interval b, compile g)
+  | UnTemporalOp (Next, g, b) -> PNext (past_interval b, compile g)
+  | UnTemporalOp ((Historically | Always), _, _) ->
+      unmonitorable "open Historically/Always: %s" (string_of_formula f)
+  | BinTemporalOp (op, f1, f2, b) ->
+      if not (subset (free_vars f1) (free_vars f2)) then
+        unmonitorable "left operand of Since/Until may only use variables of the right: %s"
+          (string_of_formula f);
+      let (negated, left) = match strip f1 with
+        | Not g -> (true, compile g)
+        | _ -> (false, compile f1)
+      in
+      (match op with
+       | Since -> PSince (past_interval b, negated, left, compile f2)
+       | Until -> PUntil (future_interval b, negated, left, compile f2))
+
+(* Push a negation one level down *)
+and compile_not (g: formula) : plan =
+  match g with
+  | True -> PFalse
+  | False -> PTrue
+  | Annotated (h, _) -> compile_not h
+  | Not h -> compile h
+  | BinLogicalOp (And, a, b) -> compile_or (Not a) (Not b)
+  | BinLogicalOp (Or, a, b) -> compile_and (Not a) (Not b)
+  | BinLogicalOp (Implies, a, b) -> compile_and a (Not b)
+  | BinLogicalOp (Iff, a, b) -> compile (BinLogicalOp (Xor, a, b))
+  | BinLogicalOp (Xor, a, b) -> compile (BinLogicalOp (Iff, a, b))
+  | Quantified (Forall vs, h) -> PExists (vs, compile (Not h))
+  | UnTemporalOp (Historically, h, b) -> POnce (past_interval b, compile (Not h))
+  | UnTemporalOp (Always, h, b) -> PEventually (future_interval b, compile (Not h))
+  | _ when free_vars g = [] -> PNeg (compile_direct g)
+  | _ -> unmonitorable "negation of open subformula: %s" (string_of_formula g)
+
+and compile_and (a: formula) (b: formula) : plan =
+  let fa = free_vars a and fb = free_vars b in
+  match strip a, strip b with
+  | _, Predicate (p, [t1; t2]) when is_comparison p && subset fb fa ->
+      PFilter (compile a, p, t1, t2)
+  | Predicate (p, [t1; t2]), _ when is_comparison p && subset fa fb ->
+      PFilter (compile b, p, t1, t2)
+  | _ ->
+      (try
+         let pa = compile a in
+         PAnd (pa, compile b)
+       with Unmonitorable _ as e ->
+         try
+           if subset fb fa then PAndNot (compile a, compile (Not b))
+           else if subset fa fb then PAndNot (compile b, compile (Not a))
+           else raise e
+         with Unmonitorable _ -> raise e)
+
+and compile_or (a: formula) (b: formula) : plan =
+  if free_vars a <> free_vars b then
+    unmonitorable "disjuncts with different free variables: %s or %s"
+      (string_of_formula a) (string_of_formula b)
+  else
+    let pa = compile a in
+    POr (pa, compile b)
+
+(* ============================================ *)
+(* STREAMING EVALUATION                        *)
+(* ============================================ *)
+
+(* A node consumes time points and returns the verdicts it can now decide,
+   in time-point order. Past operators answer immediately; future
+   operators hold points back until their window has closed. *)
+type output = int * int * rel    (* time point index, timestamp, satisfying rows *)
+
+type input =
+  | Point of int * int * point_facts
+  | End_of_trace
+
+type node = input -> output list
+
+let is_end (input: input) : bool =
+  match input with
+  | End_of_trace -> true
+  | Point _ -> false
+
+let in_interval ((lo, hi): interval) (d: int) : bool =
+  d >= lo && (match hi with None -> true | Some u -> d <= u)
+
+let immediate (f: point_facts -> rel) : node = function
+  | Point (i, t, facts) -> [(i, t, f facts)]
+  | End_of_trace -> []
+
+let map_node (f: rel -> rel) (child: node) : node =
+  fun input -> List.map (fun (i, t, r) -> (i, t, f r)) (child input)
+
+(* Pair up the outputs of two children point by point *)
+let aligned (left: node) (right: node) : input -> (int * int * rel * rel) list =
+  let q1 = Queue.create () and q2 = Queue.create () in
+  fun input ->
+    List.iter (fun o -> Queue.push o q1) (left input);
+    List.iter (fun o -> Queue.push o q2) (right input);
+    let rec drain acc =
+      if Queue.is_empty q1 || Queue.is_empty q2 then List.rev acc
+      else
+        let (i, t, r1) = Queue.pop q1 in
+        let (_, _, r2) = Queue.pop q2 in
+        drain ((i, t, r1, r2) :: acc)
+    in
+    drain []
+
+let binary (f: rel -> rel -> rel) (left: node) (right: node) : node =
+  let pairs = aligned left right in
+  fun input -> List.map (fun (i, t, r1, r2) -> (i, t, f r1 r2)) (pairs input)
+
+(* Per-row timestamps at which a past operator's operand held, newest
+   first. With no upper bound only the earliest timestamp matters, so a row
+   keeps one entry; otherwise entries older than the window are dropped. *)
+type past_state = (string list, int list) Hashtbl.t
+
+let remember (state: past_state) ((_, hi): interval) (row: string list) (t: int) : unit =
+  match hi, Hashtbl.find_opt state row with
+  | None, Some _ -> ()
+  | None, None -> Hashtbl.replace state row [t]
+  | Some _, existing -> Hashtbl.replace state row (t :: Option.value existing ~default:[])
+
+let expire (state: past_state) ((_, hi): interval) (now: int) : unit =
+  match hi with
+  | None -> ()
+  | Some u ->
+      Hashtbl.filter_map_inplace (fun _ ts ->
+        match List.filter (fun t -> now - t <= u) ts with
+        | [] -> None
+        | kept -> Some kept
+      ) state
+
+let satisfied (state: past_state) (interval: interval) (vars: string list) (now: int) : rel =
+  let rows = Hashtbl.fold (fun row ts acc ->
+    if List.exists (fun t -> in_interval interval (now - t)) ts then row :: acc else acc
+  ) state [] in
+  make_rel vars rows
+
+let once_node (interval: interval) (child: node) : node =
+  let state : past_state = Hashtbl.create 64 in
+  fun input ->
+    List.map (fun (i, t, r) ->
+      List.iter (fun row -> remember state interval row t) r.rows;
+      expire state interval t;
+      (i, t, satisfied state interval r.vars t)
+    ) (child input)
+
+let since_node (interval: interval) (negated: bool) (left: node) (right: node) : node =
+  let state : past_state = Hashtbl.create 64 in
+  let pairs = aligned left right in
+  fun input ->
+    List.map (fun (i, t, r1, r2) ->
+      let pos = positions r2.vars r1.vars in
+      let holds = row_set r1 in
+      Hashtbl.filter_map_inplace (fun row ts ->
+        if Hashtbl.mem holds (project_row pos row) <> negated then Some ts else None
+      ) state;
+      List.iter (fun row -> remember state interval row t) r2.rows;
+      expire state interval t;
+      (i, t, satisfied state interval r2.vars t)
+    ) (pairs input)
+
+let prev_node (interval: interval) (child: node) : node =
+  let last = ref None in
+  fun input ->
+    List.map (fun (i, t, r) ->
+      let out = match !last with
+        | Some (tp, rp) when in_interval interval (t - tp) -> rp
+        | _ -> empty_rel r.vars
+      in
+      last := Some (t, r);
+      (i, t, out)
+    ) (child input)
+
+let next_node (interval: interval) (child: node) : node =
+  let pending = ref None in
+  fun input ->
+    let outs = List.concat_map (fun (i, t, r) ->
+      let decided = match !pending with
+        | Some (ip, tp, _) ->
+            [(ip, tp, if in_interval interval (t - tp) then r else empty_rel r.vars)]
+        | None -> []
+      in
+      pending := Some (i, t, r);
+      decided
+    ) (child input) in
+    match input, !pending with
+    | End_of_trace, Some (ip, tp, r) ->
+        pending := None;
+        outs @ [(ip, tp, empty_rel r.vars)]
+    | _ -> outs
+
+(* Points still waiting for their future window; the buffer never spans
+   more than the operator's upper bound *)
+let drain_ready (buffer: 'a Queue.t) (timestamp: 'a -> int) (upper: int)
+                (latest: int) (final: bool) (decide: unit -> output) : output list =
+  let rec loop acc =
+    if Queue.is_empty buffer then List.rev acc
+    else if final || latest > timestamp (Queue.peek buffer) + upper then
+      let out = decide () in
+      loop (out :: acc)
+    else List.rev acc
+  in
+  loop []
+
+let upper_bound ((_, hi): interval) : int =
+  match hi with
+  | Some u -> u
+  | None -> unmonitorable "future operators need a bound [l,u] in monitor mode"
+
+let eventually_node (interval: interval) (child: node) : node =
+  let upper = upper_bound interval in
+  let buffer : output Queue.t = Queue.create () in
+  let latest = ref min_int in
+  let decide () =
+    let (i, ti, r) = Queue.pop buffer in
+    let rows = Queue.fold (fun acc (_, tj, rj) ->
+      if in_interval interval (tj - ti) then rj.rows @ acc else acc
+    ) (if in_interval interval 0 then r.rows else []) buffer in
+    (i, ti, make_rel r.vars rows)
+  in
+  fun input ->
+    List.iter (fun ((_, t, _) as o) -> Queue.push o buffer; latest := t) (child input);
+    drain_ready buffer (fun (_, t, _) -> t) upper !latest (is_end input) decide
+
+type until_entry = {
+  index: int;
+  time: int;
+  left_vars: string list;
+  left_holds: (string list, unit) Hashtbl.t;
+  right: rel;
+}
+
+let until_node (interval: interval) (negated: bool) (left: node) (right: node) : node =
+  let upper = upper_bound interval in
+  let pairs = aligned left right in
+  let buffer : until_entry Queue.t = Queue.create () in
+  let latest = ref min_int in
+  let decide () =
+    let front = Queue.peek buffer in
+    let rec scan acc guards = function
+      | [] -> acc
+      | e :: rest ->
+          let d = e.time - front.time in
+          if d > upper then acc
+          else
+            let pos = positions e.right.vars e.left_vars in
+            let acc =
+              if in_interval interval d then
+                List.filter (fun row ->
+                  List.for_all (fun g -> Hashtbl.mem g (project_row pos row) <> negated) guards
+                ) e.right.rows @ acc
+              else acc
+            in
+            scan acc (e.left_holds :: guards) rest
+    in
+    let rows = scan [] [] (List.of_seq (Queue.to_seq buffer)) in
+    ignore (Queue.pop buffer);
+    (front.index, front.time, make_rel front.right.vars rows)
+  in
+  fun input ->
+    List.iter (fun (i, t, r1, r2) ->
+      Queue.push { index = i; time = t; left_vars = r1.vars;
+                   left_holds = row_set r1; right = r2 } buffer;
+      latest := t
+    ) (pairs input);
+    drain_ready buffer (fun e -> e.time) upper !latest (is_end input) decide
+
+let rec instantiate (p: plan) : node =
+  match p with
+  | PTrue -> immediate (fun _ -> true_rel)
+  | PFalse -> immediate (fun _ -> empty_rel [])
+  | PAtom (name, args) -> immediate (fun facts -> atom_rel facts name args)
+  | PFilter (q, op, t1, t2) -> map_node (filter_rel op t1 t2) (instantiate q)
+  | PNeg q -> map_node complement (instantiate q)
+  | PAnd (q1, q2) -> binary join (instantiate q1) (instantiate q2)
+  | PAndNot (q1, q2) -> binary antijoin (instantiate q1) (instantiate q2)
+  | POr (q1, q2) -> binary union (instantiate q1) (instantiate q2)
+  | PExists (vs, q) -> map_node (project_away vs) (instantiate q)
+  | PPrev (i, q) -> prev_node i (instantiate q)
+  | POnce (i, q) -> once_node i (instantiate q)
+  | PSince (i, neg, q1, q2) -> since_node i neg (instantiate q1) (instantiate q2)
+  | PNext (i, q) -> next_node i (instantiate q)
+  | PEventually (i, q) -> eventually_node i (instantiate q)
+  | PUntil (i, neg, q1, q2) -> until_node i neg (instantiate q1) (instantiate q2)
+
+(* ============================================ *)
+(* POLICY MONITORS                             *)
+(* ============================================ *)
+
+(* A policy is checked at every time point. Leading universal quantifiers
+   are kept open so a violation reports the offending binding. *)
+type policy_monitor = {
+  policy_index: int;
+  policy: formula;
+  violations_node: node;
+  mutable violation_count: int;
+}
+
+let create_monitor (index: int) (policy: formula) : policy_monitor =
+  let rec open_foralls f =
+    match f with
+    | Annotated (g, _) -> open_foralls g
+    | Quantified (Forall _, g) -> open_foralls g
+    | _ -> f
+  in
+  {
+    policy_index = index;
+    policy;
+    violations_node = instantiate (compile (Not (open_foralls policy)));
+    violation_count = 0;
+  }
+
+(* "@<timestamp> pred(a, b)" adds an event; a bare "@<timestamp>" marks a
+   time point with no events. Consecutive lines with the same timestamp
+   form one time point. *)
+let parse_trace_line (line: string) : (int * (string * string list) option) option =
+  if String.length line < 2 || line.[0] <> '@' then None
+  else
+    let body = String.sub line 1 (String.length line - 1) in
+    let (stamp, rest) = match String.index_opt body ' ' with
+      | Some k -> (String.sub body 0 k, String.trim (String.sub body k (String.length body - k)))
+      | None -> (body, "")
+    in
+    match int_of_string_opt stamp with
+    | None -> None
+    | Some t when rest = "" -> Some (t, None)
+    | Some t ->
+        (match Data_loaders.FactsDB.parse_fact_line rest with
+         | Some fact -> Some (t, Some fact)
+         | None -> None)
+
+type monitor_summary = {
+  points: int;
+  events: int;
+  violations: int;
+}
+
+(* Run the monitors over a trace in one pass. [report] is called for every
+   violated time point as soon as it is decided. *)
+let monitor_channel
+    (monitors: policy_monitor list)
+    (ic: in_channel)
+    (report: policy_monitor -> output -> unit) : monitor_summary =
+
+  let points = ref 0 and events = ref 0 in
+  let current : (int * point_facts) option ref = ref None in
+  let step input =
+    List.iter (fun m ->
+      List.iter (fun ((_, _, r) as out) ->
+        if r.rows <> [] then begin
+          m.violation_count <- m.violation_count + 1;
+          report m out
+        end
+      ) (m.violations_node input)
+    ) monitors
+  in
+  let close_point () =
+    match !current with
+    | Some (t, facts) ->
+        step (Point (!points, t, facts));
+        incr points;
+        current := None
+    | None -> ()
+  in
+  (try
+    while true do
+      let line = String.trim (input_line ic) in
+      if line <> "" && line.[0] <> '#' then
+        match parse_trace_line line with
+        | None -> Printf.eprintf "Warning: skipping malformed trace line: %s\n" line
+        | Some (t, fact) ->
+            (match !current with
+             | Some (t', _) when t' = t -> ()
+             | Some (t', _) when t < t' ->
+                 failwith (Printf.sprintf "Trace timestamps must not decrease (%d after %d)" t t')
+             | _ ->
+                 close_point ();
+                 current := Some (t, Hashtbl.create 16));
+            (match fact, !current with
+             | Some (pred, args), Some (_, facts) ->
+                 Hashtbl.add facts pred args;
+                 incr events
+             | _ -> ())
+    done
+  with End_of_file -> ());
+  close_point ();
+  step End_of_trace;
+  {
+    points = !points;
+    events = !events;
+    violations = List.fold_left (fun acc m -> acc + m.violation_count) 0 monitors;
+  }
+
+let string_of_violation (m: policy_monitor) ((i, t, r): output) : string =
+  let bindings = List.map (fun row ->
+    String.concat ", " (List.map2 (fun v x -> v ^ "=" ^ x) r.vars row)
+  ) (List.filter (fun row -> row <> []) r.rows) in
+  Printf.sprintf "VIOLATION policy %d @%d (point %d)%s"
+    m.policy_index t i
+    (if bindings = [] then "" else ": " ^ String.concat "; " bindings)
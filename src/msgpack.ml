@@ -0,0 +1,141 @@
+(* msgpack.ml - MessagePack encoding of JSON values for the binary wire format *)
+
+(* Only the subset needed to carry Yojson.Basic values is supported: nil,
+   booleans, integers, floats, strings, arrays and maps with string keys.
+   Binary blobs decode as strings; extension types are rejected. *)
+
+exception Decode_error of string
+
+(* ============================================ *)
+(* ENCODING                                    *)
+(* ============================================ *)
+
+let add_length (buf: Buffer.t) ~(fix: int) ~(fix_max: int) ~(tag16: int) ~(tag32: int) (n: int) : unit =
+  if n <= fix_max then Buffer.add_uint8 buf (fix lor n)
+  else if n < 0x10000 then begin
+    Buffer.add_uint8 buf tag16;
+    Buffer.add_uint16_be buf n
+  end else begin
+    Buffer.add_uint8 buf tag32;
+    Buffer.add_int32_be buf (Int32.of_int n)
+  end
+
+let add_int (buf: Buffer.t) (n: int) : unit =
+  if n >= 0 then begin
+    if n < 0x80 then Buffer.add_uint8 buf n
+    else if n < 0x100 then (Buffer.add_uint8 buf 0xcc; Buffer.add_uint8 buf n)
+    else if n < 0x10000 then (Buffer.add_uint8 buf 0xcd; Buffer.add_uint16_be buf n)
+    else if n < 0x100000000 then (Buffer.add_uint8 buf 0xce; Buffer.add_int32_be buf (Int32.of_int n))
+    else (Buffer.add_uint8 buf 0xcf; Buffer.add_int64_be buf (Int64.of_int n))
+  end else begin
+    if n >= -32 then Buffer.add_uint8 buf (n land 0xff)
+    else if n >= -0x80 then (Buffer.add_uint8 buf 0xd0; Buffer.add_int8 buf n)
+    else if n >= -0x8000 then (Buffer.add_uint8 buf 0xd1; Buffer.add_int16_be buf n)
+    else if n >= -0x80000000 then (Buffer.add_uint8 buf 0xd2; Buffer.add_int32_be buf (Int32.of_int n))
+    else (Buffer.add_uint8 buf 0xd3; Buffer.add_int64_be buf (Int64.of_int n))
+  end
+
+let add_string (buf: Buffer.t) (s: string) : unit =
+  let n = String.length s in
+  if n < 32 then Buffer.add_uint8 buf (0xa0 lor n)
+  else if n < 0x100 then (Buffer.add_uint8 buf 0xd9; Buffer.add_uint8 buf n)
+  else add_length buf ~fix:0 ~fix_max:(-1) ~tag16:0xda ~tag32:0xdb n;
+  Buffer.add_string buf s
+
+let rec add_value (buf: Buffer.t) (v: Yojson.Basic.t) : unit =
+  match v with
+  | `Null -> Buffer.add_uint8 buf 0xc0
+  | `Bool false -> Buffer.add_uint8 buf 0xc2
+  | `Bool true -> Buffer.add_uint8 buf 0xc3
+  | `Int n -> add_int buf n
+  | `Float f ->
+      Buffer.add_uint8 buf 0xcb;
+      Buffer.add_int64_be buf (Int64.bits_of_float f)
+  | `String s -> add_string buf s
+  | `List items ->
+      add_length buf ~fix:0x90 ~fix_max:15 ~tag16:0xdc ~tag32:0xdd (List.length items);
+      List.iter (add_value buf) items
+  | `Assoc fields ->
+      add_length buf ~fix:0x80 ~fix_max:15 ~tag16:0xde ~tag32:0xdf (List.length fields);
+      List.iter (fun (k, v) -> add_string buf k; add_value buf v) fields
+
+let encode (v: Yojson.Basic.t) : string =
+  let buf = Buffer.create 1024 in
+  add_value buf v;
+  Buffer.contents buf
+
+(* ============================================ *)
+(* DECODING                                    *)
+(* ============================================ *)
+
+let decode (s: string) : Yojson.Basic.t =
+  let pos = ref 0 in
+  let need n =
+    if !pos + n > String.length s then raise (Decode_error "truncated message")
+  in
+  let u8 () = need 1; let b = String.get_uint8 s !pos in incr pos; b in
+  let i8 () = need 1; let b = String.get_int8 s !pos in incr pos; b in
+  let u16 () = need 2; let b = String.get_uint16_be s !pos in pos := !pos + 2; b in
+  let i16 () = need 2; let b = String.get_int16_be s !pos in pos := !pos + 2; b in
+  let i32 () = need 4; let b = String.get_int32_be s !pos in pos := !pos + 4; b in
+  let u32 () = Int32.to_int (i32 ()) land 0xffffffff in
+  let i64 () = need 8; let b = String.get_int64_be s !pos in pos := !pos + 8; b in
+  let str n = need n; let r = String.sub s !pos n in pos := !pos + n; r in
+  let rec value () : Yojson.Basic.t =
+    let tag = u8 () in
+    if tag < 0x80 then `Int tag
+    else if tag < 0x90 then map (tag land 0x0f)
+    else if tag < 0xa0 then array (tag land 0x0f)
+    else if tag < 0xc0 then `String (str (tag land 0x1f))
+    else if tag >= 0xe0 then `Int (tag - 0x100)
+    else match tag with
+      | 0xc0 -> `Null
+      | 0xc2 -> `Bool false
+      | 0xc3 -> `Bool true
+      | 0xc4 | 0xd9 -> `String (str (u8 ()))
+      | 0xc5 | 0xda -> `String (str (u16 ()))
+      | 0xc6 | 0xdb -> `String (str (u32 ()))
+      | 0xca -> `Float (Int32.float_of_bits (i32 ()))
+      | 0xcb -> `Float (Int64.float_of_bits (i64 ()))
+      | 0xcc -> `Int (u8 ())
+      | 0xcd -> `Int (u16 ())
+      | 0xce -> `Int (u32 ())
+      | 0xcf | 0xd3 -> `Int (Int64.to_int (i64 ()))
+      | 0xd0 -> `Int (i8 ())
+      | 0xd1 -> `Int (i16 ())
+      | 0xd2 -> `Int (Int32.to_int (i32 ()))
+      | 0xdc -> array (u16 ())
+      | 0xdd -> array (u32 ())
+      | 0xde -> map (u16 ())
+      | 0xdf -> map (u32 ())
+      | _ -> raise (Decode_error (Printf.sprintf "unsupported type tag 0x%02x" tag))
+  and array n = `List (List.init n (fun _ -> value ()))
+  and map n =
+    `Assoc (List.init n (fun _ ->
+      let key = match value () with
+        | `String k -> k
+        | _ -> raise (Decode_error "map keys must be strings")
+      in
+      (key, value ())))
+  in
+  let v = value () in
+  if !pos <> String.length s then raise (Decode_error "trailing bytes after message");
+  v
+
+(* ============================================ *)
+(* FRAMING                                     *)
+(* ============================================ *)
+
+(* Each message is a 4-byte big-endian length followed by its body *)
+let frame (body: string) : string =
+  let buf = Buffer.create (String.length body + 4) in
+  Buffer.add_int32_be buf (Int32.of_int (String.length body));
+  Buffer.add_string buf body;
+  Buffer.contents buf
+
+(* Length of the first complete frame's body in [data], if one is there *)
+let frame_length (data: string) : int option =
+  if String.length data < 4 then None
+  else
+    let n = Int32.to_int (String.get_int32_be data 0) land 0xffffffff in
+    if String.length data >= 4 + n then Some n else None
@@ -0,0 +1,117 @@
+(* parallel.ml - Fork-based worker group for evaluating work items in parallel *)
+
+(* ============================================ *)
+(* CONFIGURATION                               *)
+(* ============================================ *)
+
+(* Worker count from PRECIS_WORKERS; defaults to 1 (sequential) *)
+let default_workers () : int =
+  match Sys.getenv_opt "PRECIS_WORKERS" with
+  | Some s -> (try max 1 (int_of_string (String.trim s)) with _ -> 1)
+  | None -> 1
+
+(* Split a list into at most [n] contiguous chunks of near-equal size,
+   preserving element order *)
+let chunk (n: int) (items: 'a list) : 'a list list =
+  let len = List.length items in
+  let n = max 1 (min n len) in
+  let base = len / n and extra = len mod n in
+  let rec take k lst acc =
+    if k = 0 then (List.rev acc, lst)
+    else match lst with
+      | [] -> (List.rev acc, [])
+      | x :: rest -> take (k - 1) rest (x :: acc)
+  in
+  let rec split i lst =
+    if i = n then []
+    else
+      let size = base + (if i < extra then 1 else 0) in
+      let (c, rest) = take size lst [] in
+      c :: split (i + 1) rest
+  in
+  if len = 0 then [] else split 0 items
+
+(* ============================================ *)
+(* FORK-BASED MAP                              *)
+(* ============================================ *)
+
+type 'b worker = {
+  pid: int;
+  input: in_channel;
+}
+
+(* Run [f] over a chunk in a forked child; the child marshals its results
+   (or the failure message) back through a pipe and exits without running
+   the parent's at_exit handlers *)
+let spawn (f: 'a list -> 'b list) (items: 'a list) : 'b worker =
+  let (rd, wr) = Unix.pipe () in
+  flush stdout;
+  flush stderr;
+  match Unix.fork () with
+  | 0 ->
+      Unix.close rd;
+      let oc = Unix.out_channel_of_descr wr in
+      let payload : ('b list, string) result =
+        try Ok (f items) with e -> Error (Printexc.to_string e)
+      in
+      (try Marshal.to_channel oc payload []; close_out oc with _ -> ());
+      Unix._exit 0
+  | pid ->
+      Unix.close wr;
+      { pid; input = Unix.in_channel_of_descr rd }
+
+(* A worker's chunk raised; carries the exception text the child reported.
+   Exceptions cannot cross the pipe as values, since a constructor is only
+   recognised by address within one process. *)
+exception Worker_failed of string
+
+let () =
+  Printexc.register_printer (function
+    | Worker_failed msg -> Some msg
+    | _ -> None)
+
+(* Read a worker's report, close its pipe and reap it. A worker that died
+   without reporting has its chunk re-evaluated in the parent, so results
+   are never lost. Failures are returned, not raised, so the caller can
+   finish with its other workers first. *)
+let finish (f: 'a list -> 'b list) (items: 'a list) (w: 'b worker) : ('b list, exn) result =
+  let payload : ('b list, string) result option =
+    try Some (Marshal.from_channel w.input) with _ -> None
+  in
+  close_in_noerr w.input;
+  (try ignore (Unix.waitpid [] w.pid) with Unix.Unix_error _ -> ());
+  match payload with
+  | Some (Ok results) -> Ok results
+  | Some (Error msg) -> Error (Worker_failed msg)
+  | None ->
+      Printf.eprintf "Warning: worker %d exited without results, re-evaluating its chunk\n" w.pid;
+      (try Ok (f items) with e -> Error e)
+
+(* Collect a worker's results; raises Worker_failed if its chunk raised *)
+let collect (f: 'a list -> 'b list) (items: 'a list) (w: 'b worker) : 'b list =
+  match finish f items w with
+  | Ok results -> results
+  | Error e -> raise e
+
+(* Map [f] over chunks of [items] using up to [workers] forked processes.
+   Results come back in input order regardless of completion order. Every
+   spawned worker is drained and reaped before anything is raised, so a
+   failing chunk leaks neither pipes nor zombies; the first failure in
+   input order is then raised. *)
+let map_chunks ~(workers: int) (f: 'a list -> 'b list) (items: 'a list) : 'b list =
+  if workers <= 1 || List.length items <= 1 then f items
+  else
+    let chunks = chunk workers items in
+    let spawned =
+      List.fold_left (fun acc c ->
+        match spawn f c with
+        | w -> (c, w) :: acc
+        | exception e ->
+            (* fork or pipe failed: reap the workers already running *)
+            List.iter (fun (c, w) -> ignore (finish f c w)) acc;
+            raise e
+      ) [] chunks
+      |> List.rev
+    in
+    let outcomes = List.map (fun (c, w) -> finish f c w) spawned in
+    List.concat_map (function Ok results -> results | Error e -> raise e) outcomes
@@ -196,37 +196,258 @@ module PolicyCache = struct
     Hashtbl.clear cache.last_modified
 end
 
+(* ============================================ *)
+(* LAZY REGULATION LOADING                     *)
+(* ============================================ *)
+
+(* Resident regulation limit from PRECIS_RESIDENT_REGULATIONS. The default,
+   0, keeps every regulation resident once loaded: unfiltered queries use
+   all of them, and a limit below the number of regulations makes each such
+   query evict and re-parse files. Set a limit only to bound memory. *)
+let default_max_resident () : int =
+  match Sys.getenv_opt "PRECIS_RESIDENT_REGULATIONS" with
+  | Some s -> (try max 0 (int_of_string (String.trim s)) with _ -> 0)
+  | None -> 0
+
+(* The .policy files of a directory, sorted *)
+let policy_files (dir: string) : string list =
+  if not (Sys.file_exists dir && Sys.is_directory dir) then []
+  else
+    Array.to_list (Sys.readdir dir)
+    |> List.filter (fun f -> Filename.check_suffix f ".policy")
+    |> List.sort String.compare
+    |> List.map (fun f -> Filename.concat dir f)
+
+(* Remove the comments from one line. [in_comment] says whether the line
+   starts inside a comment; returns the remaining text and whether a
+   comment is still open at the end of the line. As in lexer.mll, comments
+   do not nest: the first "*)" closes one. *)
+let strip_comments (in_comment: bool) (line: string) : string * bool =
+  let find marker from =
+    try Some (Str.search_forward (Str.regexp_string marker) line from)
+    with Not_found -> None
+  in
+  let rec strip in_comment from acc =
+    if in_comment then
+      match find "*)" from with
+      | Some j -> strip false (j + 2) acc
+      | None -> (acc, true)
+    else
+      match find "(*" from with
+      | Some j -> strip true (j + 2) (acc ^ String.sub line from (j - from) ^ " ")
+      | None -> (acc ^ String.sub line from (String.length line - from), false)
+  in
+  strip in_comment 0 ""
+
+(* Regulation named by a file's header ("regulation NAME ...") without
+   parsing the file: the first line with anything but comments and blanks.
+   Falls back to the file name like load_database does. *)
+let peek_regulation (filename: string) : string =
+  let fallback = Filename.basename filename in
+  try
+    let ic = open_in filename in
+    let rec first_code in_comment =
+      let (code, in_comment) = strip_comments in_comment (input_line ic) in
+      if String.trim code = "" then first_code in_comment else code
+    in
+    let line = try first_code false with End_of_file -> "" in
+    close_in ic;
+    match Str.split (Str.regexp "[ \t\r]+") line with
+    | "regulation" :: name :: _ -> name
+    | _ -> fallback
+  with Sys_error _ -> fallback
+
+type resident_regulation = {
+  files: string list;
+  loaded: policy_database list;
+  load_ms: float;
+  mutable last_used: int;
+}
+
 (* ============================================ *)
 (* HOT-RELOAD SUPPORT                          *)
 (* ============================================ *)
 
+(* Regulations are loaded on first use and kept in a resident set of at
+   most [max_resident] regulations (0: no limit), evicting the least
+   recently used. *)
 type policy_manager = {
   policy_dir: string;
   cache: PolicyCache.t;
-  mutable databases: policy_database list;
+  mutable databases: policy_database list;     (* databases currently resident *)
+  mutable regulation_files: (string, string list) Hashtbl.t option;  (* built on first use *)
+  resident: (string, resident_regulation) Hashtbl.t;
+  max_resident: int;
+  load_times: (string, float) Hashtbl.t;       (* most recent load time per regulation, ms *)
+  mutable clock: int;
 }
 
-let create_manager (dir: string) : policy_manager =
+let create_manager ?(max_resident = default_max_resident ()) (dir: string) : policy_manager =
   {
     policy_dir = dir;
     cache = PolicyCache.create ();
     databases = [];
+    regulation_files = None;
+    resident = Hashtbl.create 8;
+    max_resident = max 0 max_resident;
+    load_times = Hashtbl.create 8;
+    clock = 0;
   }
 
+(* Regulation -> policy files, from the header of each file *)
+let regulation_files (manager: policy_manager) : (string, string list) Hashtbl.t =
+  match manager.regulation_files with
+  | Some index -> index
+  | None ->
+      let index = Hashtbl.create 16 in
+      List.iter (fun f ->
+        let reg = peek_regulation f in
+        let existing = try Hashtbl.find index reg with Not_found -> [] in
+        Hashtbl.replace index reg (existing @ [f])
+      ) (policy_files manager.policy_dir);
+      manager.regulation_files <- Some index;
+      index
+
+let list_regulations (manager: policy_manager) : string list =
+  Hashtbl.fold (fun reg _ acc -> reg :: acc) (regulation_files manager) []
+  |> List.sort String.compare
+
+let refresh_databases (manager: policy_manager) : unit =
+  manager.databases <-
+    Hashtbl.fold (fun reg r acc -> (reg, r.loaded) :: acc) manager.resident []
+    |> List.sort (fun (a, _) (b, _) -> String.compare a b)
+    |> List.concat_map snd
+
+let forget_regulation (manager: policy_manager) (reg: string) : unit =
+  match Hashtbl.find_opt manager.resident reg with
+  | Some r ->
+      List.iter (fun f ->
+        Hashtbl.remove manager.cache.PolicyCache.cache f;
+        Hashtbl.remove manager.cache.PolicyCache.last_modified f
+      ) r.files;
+      Hashtbl.remove manager.resident reg
+  | None -> ()
+
+let evict_lru (manager: policy_manager) : unit =
+  while manager.max_resident > 0 && Hashtbl.length manager.resident > manager.max_resident do
+    let victim = Hashtbl.fold (fun reg r acc ->
+      match acc with
+      | Some (_, used) when used <= r.last_used -> acc
+      | _ -> Some (reg, r.last_used)
+    ) manager.resident None in
+    match victim with
+    | Some (reg, _) -> forget_regulation manager reg
+    | None -> ()
+  done
+
+let load_regulation (manager: policy_manager) (reg: string) : resident_regulation option =
+  match Hashtbl.find_opt (regulation_files manager) reg with
+  | None -> None
+  | Some files ->
+      let start = Unix.gettimeofday () in
+      let loaded = List.filter_map (fun f ->
+        try Some (PolicyCache.load manager.cache f)
+        with e ->
+          Printf.eprintf "Warning: Failed to load %s: %s\n" f (Printexc.to_string e);
+          None
+      ) files in
+      let load_ms = (Unix.gettimeofday () -. start) *. 1000.0 in
+      Hashtbl.replace manager.load_times reg load_ms;
+      Some { files; loaded; load_ms; last_used = 0 }
+
+(* Databases of one regulation, loading it if it is not resident *)
+let use_regulation (manager: policy_manager) (reg: string) : policy_database list =
+  manager.clock <- manager.clock + 1;
+  match Hashtbl.find_opt manager.resident reg with
+  | Some r ->
+      r.last_used <- manager.clock;
+      r.loaded
+  | None ->
+      (match load_regulation manager reg with
+       | None -> []
+       | Some r ->
+           r.last_used <- manager.clock;
+           Hashtbl.replace manager.resident reg r;
+           evict_lru manager;
+           refresh_databases manager;
+           r.loaded)
+
+(* Forget everything loaded; regulations are re-read on next use *)
 let reload_all (manager: policy_manager) : unit =
-  manager.databases <- load_all_from_directory manager.policy_dir
+  Hashtbl.reset manager.resident;
+  PolicyCache.clear manager.cache;
+  manager.regulation_files <- None;
+  manager.databases <- []
+
+let get_regulation_database (manager: policy_manager) (reg: string) : policy_database =
+  filter_by_regulation reg (merge_databases (use_regulation manager reg))
 
+(* All regulations; loads each one in turn. With a resident limit below the
+   number of regulations only the most recently used stay resident
+   afterwards, so the next call re-parses the rest. *)
 let get_combined_database (manager: policy_manager) : policy_database =
-  merge_databases manager.databases
+  merge_databases (List.concat_map (use_regulation manager) (list_regulations manager))
 
 let reload_single (manager: policy_manager) (regulation: string) : unit =
-  let filename = Filename.concat manager.policy_dir (regulation ^ ".policy") in
-  if Sys.file_exists filename then
-    try
-      let db = PolicyCache.load manager.cache filename in
-      manager.databases <- db :: (List.filter (fun d -> d.name <> regulation) manager.databases)
-    with e ->
-      Printf.eprintf "Warning: Failed to reload %s: %s\n" regulation (Printexc.to_string e)
+  manager.regulation_files <- None;
+  forget_regulation manager regulation;
+  refresh_databases manager;
+  if use_regulation manager regulation = [] then
+    Printf.eprintf "Warning: No policy files for regulation %s\n" regulation
+
+(* Regulations a file belongs to, before and after an edit: its entry in
+   the current index and its header now *)
+let file_regulations (manager: policy_manager) (file: string) : string list =
+  let before = Hashtbl.fold (fun reg files acc ->
+    if List.mem file files then reg :: acc else acc
+  ) (regulation_files manager) [] in
+  let after = if Sys.file_exists file then [peek_regulation file] else [] in
+  List.sort_uniq String.compare (before @ after)
+
+(* Changed files worth re-parsing ahead of time: those of resident
+   regulations. Files of other regulations are parsed lazily on next use. *)
+let resident_files (manager: policy_manager) (files: string list) : string list =
+  List.filter (fun f ->
+    List.exists (Hashtbl.mem manager.resident) (file_regulations manager f)
+  ) files
+
+(* Swap re-parsed files into the manager. [parsed] holds (file, mtime,
+   database) for files parsed elsewhere; [invalidated] files are simply
+   dropped from the cache. Only resident regulations touching these files
+   are rebuilt, from the cache, so unchanged files are not re-parsed.
+   Returns the regulations that were rebuilt. *)
+let swap_reparsed (manager: policy_manager)
+    ~(parsed: (string * float * policy_database) list)
+    ~(invalidated: string list) : string list =
+  let touched = List.map (fun (f, _, _) -> f) parsed @ invalidated in
+  let affected = List.concat_map (file_regulations manager) touched in
+  List.iter (fun (f, mtime, db) ->
+    Hashtbl.replace manager.cache.PolicyCache.cache f db;
+    Hashtbl.replace manager.cache.PolicyCache.last_modified f mtime
+  ) parsed;
+  List.iter (fun f ->
+    Hashtbl.remove manager.cache.PolicyCache.cache f;
+    Hashtbl.remove manager.cache.PolicyCache.last_modified f
+  ) invalidated;
+  manager.regulation_files <- None;
+  let rebuilt = List.sort_uniq String.compare affected
+    |> List.filter (Hashtbl.mem manager.resident) in
+  List.iter (fun reg ->
+    let last_used = (Hashtbl.find manager.resident reg).last_used in
+    match load_regulation manager reg with
+    | Some r ->
+        r.last_used <- last_used;
+        Hashtbl.replace manager.resident reg r
+    | None -> Hashtbl.remove manager.resident reg
+  ) rebuilt;
+  refresh_databases manager;
+  rebuilt
+
+(* (regulation, last load time in ms, resident?) for every regulation loaded so far *)
+let regulation_load_times (manager: policy_manager) : (string * float * bool) list =
+  Hashtbl.fold (fun reg ms acc -> (reg, ms, Hashtbl.mem manager.resident reg) :: acc)
+    manager.load_times []
+  |> List.sort (fun (a, _, _) (b, _, _) -> String.compare a b)
 
 (* ============================================ *)
 (* USAGE EXAMPLE                               *)
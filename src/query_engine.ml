@@ -10,6 +10,18 @@ type match_result = {
   matched_terms: string list;
 }
 
+(* Work spent evaluating one policy *)
+type policy_work = {
+  eval_ms: float;
+  enumerated: int;        (* quantifier assignments *)
+  fact_lookups: int;
+  memo_hits: int;
+  memo_misses: int;
+}
+
+let no_work : policy_work =
+  { eval_ms = 0.0; enumerated = 0; fact_lookups = 0; memo_hits = 0; memo_misses = 0 }
+
 type evaluation_result = {
   policy_id: string;
   regulation: string;
@@ -17,7 +29,10 @@ type evaluation_result = {
   description: string;
   formula_text: string;
   evaluation: eval_result;
+  unknown: budget_usage option;   (* set when the budget ran out: verdict unknown *)
   explanation: string;
+  witness: witness option;        (* deciding binding and atoms, when known *)
+  work: policy_work;
 }
 
 type query_response = {
@@ -26,8 +41,17 @@ type query_response = {
   evaluations: evaluation_result list;
   overall_compliant: bool;
   violations: string list;
+  undecided: string list;           (* policies whose verdict is unknown *)
+  timings: (string * float) list;   (* per-phase wall-clock milliseconds, in order *)
 }
 
+(* Run [f], appending its wall-clock time in ms to [timings] under [name] *)
+let time_phase (timings: (string * float) list ref) (name: string) (f: unit -> 'a) : 'a =
+  let start = Unix.gettimeofday () in
+  let result = f () in
+  timings := !timings @ [(name, (Unix.gettimeofday () -. start) *. 1000.0)];
+  result
+
 (* Extract predicates from a formula *)
 let rec extract_predicates (f: formula) : string list =
   match f with
@@ -73,15 +97,8 @@ let find_relevant_policies
   ) db.policies
   |> List.sort (fun a b -> compare b.relevance_score a.relevance_score)
 
-(* Evaluate a policy against facts *)
-let evaluate_policy
-    (policy: policy_entry)
-    (domain: Ast.domain_db)
-    (facts: Ast.facts_db)
-    (funcs: Ast.functions_db) : evaluation_result =
-  
-  let result = eval_formula [] domain facts funcs policy.formula in
-  
+(* Build the evaluation record for a policy from its verdict *)
+let make_evaluation (policy: policy_entry) (result: eval_result) : evaluation_result =
   let formula_text = Ast.string_of_formula policy.formula in
   
   let explanation = match result with
@@ -96,57 +113,183 @@ let evaluate_policy
     description = policy.description;
     formula_text;
     evaluation = result;
+    unknown = None;
     explanation;
+    witness = None;
+    work = no_work;
   }
 
-(* Evaluate all matched policies *)
+(* "for x=alice: disclose(alice) and no y such that hasConsent(alice, y)";
+   utils/witnesses.py describe_witness says the same *)
+let describe_witness (w: witness) : string =
+  let binding = String.concat ", " (List.map (fun (v, e) -> v ^ "=" ^ e) w.binding) in
+  let atoms = List.map (fun (p, args, holds) ->
+    let call = Printf.sprintf "%s(%s)" p (String.concat ", " args) in
+    if holds then call else "not " ^ call
+  ) w.atoms in
+  let claims = List.map (fun (kind, vars, text) ->
+    let vars = String.concat ", " vars in
+    if kind = "exists" then Printf.sprintf "no %s such that %s" vars text
+    else Printf.sprintf "%s for every %s" text vars
+  ) w.quantified in
+  let facts = String.concat " and " (atoms @ claims) in
+  match binding, facts with
+  | "", _ -> facts
+  | _, "" -> "for " ^ binding
+  | _ -> Printf.sprintf "for %s: %s" binding facts
+
+(* Attach the witness read off [memo] and say it in the explanation *)
+let with_witness (memo: eval_memo) (funcs: Ast.functions_db) (root: dag_node)
+    (eval: evaluation_result) : evaluation_result =
+  match witness_of memo funcs root with
+  | None -> eval
+  | Some w ->
+      { eval with
+        witness = Some w;
+        explanation = Printf.sprintf "%s (%s)" eval.explanation (describe_witness w) }
+
+(* Evaluation record for a policy that ran out of budget *)
+let make_unknown (policy: policy_entry) (usage: budget_usage) : evaluation_result =
+  {
+    (make_evaluation policy False) with
+    unknown = Some usage;
+    explanation = Printf.sprintf "Policy %s is UNKNOWN: %s after %d assignments, %d fact lookups, %.0fms"
+      policy.id usage.exhausted usage.used_assignments usage.used_lookups usage.elapsed_ms;
+  }
+
+let is_violation (eval: evaluation_result) : bool =
+  eval.unknown = None && eval.evaluation = False
+
+let is_undecided (eval: evaluation_result) : bool =
+  eval.unknown <> None
+
+(* Violated and undecided policy ids; compliant only when neither exists *)
+let summarize (evaluations: evaluation_result list) : string list * string list * bool =
+  let ids pred = List.filter_map (fun eval ->
+    if pred eval then Some eval.policy_id else None) evaluations in
+  let violations = ids is_violation and undecided = ids is_undecided in
+  (violations, undecided, violations = [] && undecided = [])
+
+(* Evaluate a policy against facts *)
+let evaluate_policy
+    (policy: policy_entry)
+    (domain: Ast.domain_db)
+    (facts: Ast.facts_db)
+    (funcs: Ast.functions_db) : evaluation_result =
+  
+  make_evaluation policy (eval_formula [] domain facts funcs policy.formula)
+
+(* Evaluate matched policies sequentially. The policies are compiled into
+   one shared DAG and evaluated against a single memo table, so a subformula
+   common to several policies (e.g. the coveredEntity/protectedHealthInfo
+   guard) is evaluated once per distinct binding for the whole query. *)
+let evaluate_policies_indexed
+    ?(limits = no_limits)
+    ?request
+    (policies: policy_entry list)
+    (domain: Ast.domain_db)
+    (store: Fact_store.t)
+    (funcs: Ast.functions_db) : evaluation_result list =
+  
+  let dag = create_dag () in
+  let memo = create_memo () in
+  let roots = List.map (fun policy -> (policy, compile_formula dag policy.formula)) policies in
+  (* Each policy gets its own budget drawing from the request budget; one
+     that runs out is reported unknown and the rest still evaluate. Memo
+     entries are only stored for completed subformulas, so a partial run
+     leaves nothing stale behind. *)
+  List.map (fun (policy, root) ->
+    let budget = start_budget ?parent:request ~scope:"policy" limits in
+    let hits = memo.hits and misses = memo.misses in
+    let work () = {
+      eval_ms = budget_elapsed_ms budget;
+      enumerated = budget.assignments;
+      fact_lookups = budget.lookups;
+      memo_hits = memo.hits - hits;
+      memo_misses = memo.misses - misses;
+    } in
+    let result =
+      try
+        check_budget ~force:true budget;
+        let holds = metered (Some budget) (Fact_store.mem store) in
+        make_evaluation policy (eval_node ~budget memo [] domain holds funcs root)
+        |> with_witness memo funcs root
+      with Budget_exceeded reason ->
+        make_unknown policy (budget_usage budget reason)
+    in
+    { result with work = work () }
+  ) roots
+
+let evaluate_policies_shared
+    ?limits
+    ?request
+    (policies: policy_entry list)
+    (domain: Ast.domain_db)
+    (facts: Ast.facts_db)
+    (funcs: Ast.functions_db) : evaluation_result list =
+  
+  evaluate_policies_indexed ?limits ?request policies domain (Fact_store.of_facts_db facts) funcs
+
+(* Evaluate all matched policies, partitioned across [workers] forked
+   processes (PRECIS_WORKERS by default). Each worker shares subformulas
+   within its own chunk; results keep the order of [matched]. Workers
+   inherit the request budget's deadline, but count their work separately. *)
 let evaluate_matched_policies
+    ?(workers = Parallel.default_workers ())
+    ?limits
+    ?request
     (matched: match_result list)
     (domain: Ast.domain_db)
-    (facts: Ast.facts_db)
+    (store: Fact_store.t)
     (funcs: Ast.functions_db) : evaluation_result list =
   
-  List.map (fun m -> evaluate_policy m.policy domain facts funcs) matched
+  let policies = List.map (fun m -> m.policy) matched in
+  Parallel.map_chunks ~workers
+    (fun chunk -> evaluate_policies_indexed ?limits ?request chunk domain store funcs)
+    policies
 
-(* CHANGED: New signature that accepts policy_manager *)
-let process_query
+(* Answer a query over facts already in an indexed store *)
+let process_query_store
+    ?(workers = Parallel.default_workers ())
+    ?(policy_budget = no_limits)
+    ?(request_budget = no_limits)
     (query_formula: formula)
     (regulation_filter: string option)
     (domain: Ast.domain_db)
-    (facts: Ast.facts_db)
+    (store: Fact_store.t)
     (funcs: Ast.functions_db)
     (env: Ast.type_environment)
     (policy_manager: policy_manager) : query_response =
   
+  let request = start_budget ~scope:"request" request_budget in
+  let timings = ref [] in
+  
   (* Step 1: Type check query - convert Ast env to Type_checker env *)
-  let checker_env = Type_checker.ast_env_to_checker_env env in
-  let type_check_result = typecheck_formula empty_context checker_env query_formula in
+  let type_check_result = time_phase timings "type_check" (fun () ->
+    let checker_env = Type_checker.checker_env_for env in
+    Type_checker.typecheck_query checker_env query_formula) in
   (match type_check_result with
    | Error e ->
        failwith (Printf.sprintf "Query type error: %s" (string_of_type_error e))
    | Ok () -> ());
   
-  (* Step 2: Select policy database - CHANGED to use policy_manager *)
-  let all_policies = get_combined_database policy_manager in
-  let db = match regulation_filter with
-    | Some reg -> filter_by_regulation reg all_policies
-    | None -> all_policies
-  in
-  
-  (* Step 3: Find relevant policies *)
-  let matched_policies = find_relevant_policies query_formula db 0.1 in
+  (* Step 2-3: Select policy database and find relevant policies *)
+  let matched_policies = time_phase timings "policy_matching" (fun () ->
+    (* Only the requested regulation is loaded (or kept resident) *)
+    let db = match regulation_filter with
+      | Some reg -> get_regulation_database policy_manager reg
+      | None -> get_combined_database policy_manager
+    in
+    find_relevant_policies query_formula db 0.1) in
   
   (* Step 4: Evaluate matched policies *)
-  let evaluations = evaluate_matched_policies matched_policies domain facts funcs in
+  let evaluations = time_phase timings "evaluation" (fun () ->
+    evaluate_matched_policies ~workers ~limits:policy_budget ~request
+      matched_policies domain store funcs) in
   
-  (* Step 5: Determine overall compliance *)
-  let violations = List.filter_map (fun eval ->
-    match eval.evaluation with
-    | False -> Some eval.policy_id
-    | True -> None
-  ) evaluations in
-  
-  let overall_compliant = List.length violations = 0 in
+  (* Step 5: Determine overall compliance; unknown verdicts are not
+     violations, but they do prevent a compliant answer *)
+  let (violations, undecided, overall_compliant) = summarize evaluations in
   
   {
     query_formula;
@@ -154,15 +297,40 @@ let process_query
     evaluations;
     overall_compliant;
     violations;
+    undecided;
+    timings = !timings;
   }
 
+(* CHANGED: New signature that accepts policy_manager *)
+let process_query
+    ?workers
+    ?policy_budget
+    ?request_budget
+    (query_formula: formula)
+    (regulation_filter: string option)
+    (domain: Ast.domain_db)
+    (facts: Ast.facts_db)
+    (funcs: Ast.functions_db)
+    (env: Ast.type_environment)
+    (policy_manager: policy_manager) : query_response =
+  
+  process_query_store ?workers ?policy_budget ?request_budget
+    query_formula regulation_filter domain (Fact_store.of_facts_db facts)
+    funcs env policy_manager
+
 (* ADDED: Convenience wrapper using runtime_environment *)
 let process_query_with_env
+    ?workers
+    ?policy_budget
+    ?request_budget
     (query_formula: formula)
     (regulation_filter: string option)
     (runtime_env: Environment_config.Config.runtime_environment) : query_response =
   
-  process_query
+  process_query_store
+    ?workers
+    ?policy_budget
+    ?request_budget
     query_formula
     regulation_filter
     runtime_env.domain
@@ -171,6 +339,134 @@ let process_query_with_env
     runtime_env.type_env
     runtime_env.policy_manager
 
+(* ============================================ *)
+(* INCREMENTAL SESSIONS                        *)
+(* ============================================ *)
+
+(* A session keeps the matched policies and their verdicts for one query
+   over a mutable fact set, so a fact delta only re-evaluates the policies
+   it can affect. *)
+type session = {
+  session_formula: formula;
+  session_regulation: string option;
+  store: Fact_store.t;
+  session_funcs: Ast.functions_db;
+  session_matched: match_result array;
+  policy_predicates: string list array;       (* predicates used by each matched policy *)
+  quantified: bool array;                     (* does the policy range over the domain? *)
+  mutable session_domain: Ast.domain_db;
+  verdicts: evaluation_result array;
+}
+
+type delta_result = {
+  changed: evaluation_result list;   (* policies whose verdict flipped *)
+  reevaluated: int;                  (* policies re-evaluated for this delta *)
+  domain_changed: bool;
+}
+
+let rec has_quantifier (f: formula) : bool =
+  match f with
+  | True | False | Predicate _ -> false
+  | Quantified _ -> true
+  | Not f' | UnTemporalOp (_, f', _) | Annotated (f', _) -> has_quantifier f'
+  | BinLogicalOp (_, f1, f2) | BinTemporalOp (_, f1, f2, _) ->
+      has_quantifier f1 || has_quantifier f2
+
+(* Type-check and match the query, then evaluate every matched policy.
+   The session takes ownership of [store] and updates it in place. *)
+let open_session
+    (query_formula: formula)
+    (regulation_filter: string option)
+    (store: Fact_store.t)
+    (funcs: Ast.functions_db)
+    (env: Ast.type_environment)
+    (policy_manager: policy_manager) : session =
+  
+  let checker_env = Type_checker.checker_env_for env in
+  (match Type_checker.typecheck_query checker_env query_formula with
+   | Error e ->
+       failwith (Printf.sprintf "Query type error: %s" (string_of_type_error e))
+   | Ok () -> ());
+  
+  let db = match regulation_filter with
+    | Some reg -> get_regulation_database policy_manager reg
+    | None -> get_combined_database policy_manager
+  in
+  let matched = Array.of_list (find_relevant_policies query_formula db 0.1) in
+  let domain = Fact_store.to_domain_db store in
+  let policies = Array.to_list (Array.map (fun m -> m.policy) matched) in
+  {
+    session_formula = query_formula;
+    session_regulation = regulation_filter;
+    store;
+    session_funcs = funcs;
+    session_matched = matched;
+    policy_predicates = Array.map (fun m ->
+      List.sort_uniq String.compare (extract_predicates m.policy.formula)) matched;
+    quantified = Array.map (fun m -> has_quantifier m.policy.formula) matched;
+    session_domain = domain;
+    verdicts = Array.of_list (evaluate_policies_indexed policies domain store funcs);
+  }
+
+(* Apply a fact delta. Policies are re-evaluated when they mention one of
+   the delta's predicates, or when the domain changed and they quantify
+   over it; all other verdicts are reused. *)
+let apply_delta
+    (session: session)
+    ~(add: (string * string list) list)
+    ~(remove: (string * string list) list) : delta_result =
+  
+  let touched = Hashtbl.create 16 in
+  let delta_entities = List.concat_map snd (add @ remove) |> List.sort_uniq String.compare in
+  let present () = List.map (Fact_store.has_entity session.store) delta_entities in
+  let present_before = present () in
+  List.iter (fun (pred, args) ->
+    if Fact_store.remove session.store pred args then Hashtbl.replace touched pred ()
+  ) remove;
+  List.iter (fun (pred, args) ->
+    if Fact_store.add session.store pred args then Hashtbl.replace touched pred ()
+  ) add;
+  
+  let domain_changed = present () <> present_before in
+  if domain_changed then
+    session.session_domain <- Fact_store.to_domain_db session.store;
+  
+  let affected = ref [] in
+  Array.iteri (fun i preds ->
+    if List.exists (fun p -> Hashtbl.mem touched p) preds
+       || (domain_changed && session.quantified.(i))
+    then affected := i :: !affected
+  ) session.policy_predicates;
+  let affected = List.rev !affected in
+  
+  let policies = List.map (fun i -> session.session_matched.(i).policy) affected in
+  let results = evaluate_policies_indexed
+    policies session.session_domain session.store session.session_funcs in
+  
+  let changed = List.fold_left2 (fun acc i result ->
+    let previous = session.verdicts.(i) in
+    session.verdicts.(i) <- result;
+    if previous.evaluation <> result.evaluation
+       || is_undecided previous <> is_undecided result
+    then result :: acc else acc
+  ) [] affected results in
+  
+  { changed = List.rev changed; reevaluated = List.length affected; domain_changed }
+
+(* Current verdicts of a session as a full query response *)
+let session_response (session: session) : query_response =
+  let evaluations = Array.to_list session.verdicts in
+  let (violations, undecided, overall_compliant) = summarize evaluations in
+  {
+    query_formula = session.session_formula;
+    matched_policies = Array.to_list session.session_matched;
+    evaluations;
+    overall_compliant;
+    violations;
+    undecided;
+    timings = [];
+  }
+
 let format_query_response (response: query_response) : string =
   let buffer = Buffer.create 1024 in
   
@@ -182,9 +478,10 @@ let format_query_response (response: query_response) : string =
   
   Buffer.add_string buffer "--- POLICY EVALUATIONS ---\n\n";
   List.iter (fun eval ->
-    let status = match eval.evaluation with
-      | True -> "✓ COMPLIANT"
-      | False -> "✗ VIOLATION"
+    let status = match eval.unknown, eval.evaluation with
+      | Some _, _ -> "? UNKNOWN"
+      | None, True -> "✓ COMPLIANT"
+      | None, False -> "✗ VIOLATION"
     in
     Buffer.add_string buffer (Printf.sprintf "[%s] %s (%s %s)\n" status eval.policy_id eval.regulation eval.section);
     Buffer.add_string buffer (Printf.sprintf "    Description: %s\n" eval.description);
@@ -199,7 +496,13 @@ let format_query_response (response: query_response) : string =
     Buffer.add_string buffer (Printf.sprintf "✗ %d VIOLATIONS FOUND\n" (List.length response.violations));
     List.iter (fun v ->
       Buffer.add_string buffer (Printf.sprintf "  - %s\n" v)
-    ) response.violations
+    ) response.violations;
+    if response.undecided <> [] then begin
+      Buffer.add_string buffer (Printf.sprintf "? %d POLICIES UNDECIDED (budget exhausted)\n" (List.length response.undecided));
+      List.iter (fun v ->
+        Buffer.add_string buffer (Printf.sprintf "  - %s\n" v)
+      ) response.undecided
+    end
   end;
   
   Buffer.contents buffer
@@ -40,13 +40,41 @@ type function_signature =
   return_type: expr_type; 
 }
 
+(* The lists keep declaration order for inspection; lookups go through the
+   hashed indexes, which are built once per environment *)
 type type_environment = 
 {
   predicates: predicate_signature list;
   functions: function_signature list;
   constants: (string * expr_type) list;
+  predicate_index: (string, predicate_signature) Hashtbl.t;
+  function_index: (string, function_signature) Hashtbl.t;
+  constant_index: (string, expr_type) Hashtbl.t;
 }
 
+(* Index a list so that the first binding of a name wins, matching the
+   List.find_opt / List.assoc_opt semantics of the list representation *)
+let index_by (key: 'a -> string) (value: 'a -> 'b) (items: 'a list) : (string, 'b) Hashtbl.t =
+  let tbl = Hashtbl.create (max 16 (List.length items)) in
+  List.iter (fun item ->
+    let k = key item in
+    if not (Hashtbl.mem tbl k) then Hashtbl.add tbl k (value item)
+  ) items;
+  tbl
+
+let make_type_environment
+    (predicates: predicate_signature list)
+    (functions: function_signature list)
+    (constants: (string * expr_type) list) : type_environment =
+  {
+    predicates;
+    functions;
+    constants;
+    predicate_index = index_by (fun (p: predicate_signature) -> p.name) Fun.id predicates;
+    function_index = index_by (fun (f: function_signature) -> f.name) Fun.id functions;
+    constant_index = index_by fst snd constants;
+  }
+
 (* ============================================ *)
 (* TYPE CONVERSION: Ast <-> Type_checker       *)
 (* ============================================ *)
@@ -88,11 +116,22 @@ let ast_func_to_checker (fs: Ast.function_signature) : function_signature =
 
 (* Convert Ast.type_environment to Type_checker.type_environment *)
 let ast_env_to_checker_env (env: Ast.type_environment) : type_environment =
-  {
-    predicates = List.map ast_pred_to_checker env.Ast.predicates;
-    functions = List.map ast_func_to_checker env.Ast.functions;
-    constants = List.map (fun (name, typ) -> (name, ast_type_to_checker_type typ)) env.Ast.constants;
-  }
+  make_type_environment
+    (List.map ast_pred_to_checker env.Ast.predicates)
+    (List.map ast_func_to_checker env.Ast.functions)
+    (List.map (fun (name, typ) -> (name, ast_type_to_checker_type typ)) env.Ast.constants)
+
+(* The runtime type environment is loaded once per process, so keep the
+   converted environment for the last Ast environment seen (by identity) *)
+let checker_env_cache : (Ast.type_environment * type_environment) option ref = ref None
+
+let checker_env_for (env: Ast.type_environment) : type_environment =
+  match !checker_env_cache with
+  | Some (ast_env, checker_env) when ast_env == env -> checker_env
+  | _ ->
+      let checker_env = ast_env_to_checker_env env in
+      checker_env_cache := Some (env, checker_env);
+      checker_env
 
 (* ============================================ *)
 (* COMPARISON OPERATORS                        *)
@@ -118,12 +157,7 @@ let string_of_comparison_operator = function
 (* EMPTY CONTEXTS                              *)
 (* ============================================ *)
 
-let empty_type_environment = 
-  {
-    predicates = [];
-    functions = [];
-    constants = [];
-  }
+let empty_type_environment = make_type_environment [] [] []
 
 let empty_context = []
 
@@ -138,13 +172,13 @@ let lookup_context ctx var_name =
   List.assoc_opt var_name ctx
 
 let lookup_constant_type (env : type_environment) (const_name: string) : expr_type option =
-  List.assoc_opt const_name env.constants
+  Hashtbl.find_opt env.constant_index const_name
 
 let lookup_function_signature (env : type_environment) (func_name: string) : function_signature option =
-  List.find_opt (fun sig_ -> sig_.name = func_name) env.functions
+  Hashtbl.find_opt env.function_index func_name
 
 let lookup_predicate (env : type_environment) (pred_name : string) : predicate_signature option =
-  List.find_opt (fun (p : predicate_signature) -> String.equal p.name pred_name) env.predicates
+  Hashtbl.find_opt env.predicate_index pred_name
 
 let type_equals t1 t2 =
   match (t1, t2) with
@@ -300,6 +334,41 @@ let rec typecheck_formula (ctx: type_context) (env: type_environment) (formula:
   | Annotated (f, _cite) ->
       typecheck_formula ctx env f
 
+(* ============================================ *)
+(* MEMOISED QUERY TYPE CHECKING                *)
+(* ============================================ *)
+
+module FormulaTbl = Hashtbl.Make (struct
+  type t = formula
+  let equal = ( = )
+  (* Look deeper than Hashtbl.hash so templated queries that share a long
+     prefix still spread across buckets *)
+  let hash = Hashtbl.hash_param 64 256
+end)
+
+let max_cached_verdicts = 4096
+
+(* Verdicts for closed formulas, valid for one checker environment *)
+let verdict_cache : (type_environment * (unit, type_error) result FormulaTbl.t) option ref = ref None
+
+(* Type-check a closed query formula, reusing the verdict of an identical
+   formula checked earlier against the same environment *)
+let typecheck_query (env: type_environment) (formula: formula) : (unit, type_error) result =
+  let table = match !verdict_cache with
+    | Some (cached_env, table) when cached_env == env -> table
+    | _ ->
+        let table = FormulaTbl.create 256 in
+        verdict_cache := Some (env, table);
+        table
+  in
+  match FormulaTbl.find_opt table formula with
+  | Some verdict -> verdict
+  | None ->
+      let verdict = typecheck_formula empty_context env formula in
+      if FormulaTbl.length table >= max_cached_verdicts then FormulaTbl.reset table;
+      FormulaTbl.add table formula verdict;
+      verdict
+
 (* ============================================ *)
 (* POLICY FILE TYPE CHECKING                   *)
 (* ============================================ *)
@@ -320,5 +389,5 @@ let typecheck_policy_file (pf: ast) (env: type_environment) : (unit, type_error
 
 (* Convenience function that accepts Ast.type_environment *)
 let typecheck_policy_file_with_ast_env (pf: ast) (ast_env: Ast.type_environment) : (unit, type_error list) result =
-  let checker_env = ast_env_to_checker_env ast_env in
+  let checker_env = checker_env_for ast_env in
   typecheck_policy_file pf checker_env
\ No newline at end of file
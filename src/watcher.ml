@@ -0,0 +1,207 @@
+(* watcher.ml - Hot reload of policies/ and data/ for resident workers *)
+
+(* OCaml's standard distribution has no inotify binding, so changes are
+   found by polling stat (mtime and size) at a fixed interval. Changed
+   files are parsed in a forked child while the server keeps answering
+   requests; the results are swapped in between two requests, so a query
+   always sees either the old or the new state, never a mix. *)
+
+open Ast
+
+(* ============================================ *)
+(* CONFIGURATION                               *)
+(* ============================================ *)
+
+(* Poll interval in seconds from PRECIS_WATCH_INTERVAL; 0 disables
+   watching. Defaults to 1 second. *)
+let default_interval () : float =
+  match Sys.getenv_opt "PRECIS_WATCH_INTERVAL" with
+  | Some s -> (try max 0.0 (float_of_string (String.trim s)) with _ -> 1.0)
+  | None -> 1.0
+
+(* ============================================ *)
+(* FILE SNAPSHOTS                              *)
+(* ============================================ *)
+
+type stamp = {
+  mtime: float;
+  size: int;
+}
+
+type snapshot = (string, stamp) Hashtbl.t
+
+let stamp_of (file: string) : stamp option =
+  try
+    let st = Unix.stat file in
+    Some { mtime = st.Unix.st_mtime; size = st.Unix.st_size }
+  with Unix.Unix_error _ -> None
+
+let take_snapshot (files: string list) : snapshot =
+  let snap = Hashtbl.create 16 in
+  List.iter (fun f ->
+    match stamp_of f with
+    | Some s -> Hashtbl.replace snap f s
+    | None -> ()
+  ) files;
+  snap
+
+(* Files added or modified, and files removed, between two snapshots *)
+let diff (before: snapshot) (after: snapshot) : string list * string list =
+  let changed = Hashtbl.fold (fun f s acc ->
+    match Hashtbl.find_opt before f with
+    | Some old when old = s -> acc
+    | _ -> f :: acc
+  ) after [] in
+  let removed = Hashtbl.fold (fun f _ acc ->
+    if Hashtbl.mem after f then acc else f :: acc
+  ) before [] in
+  (List.sort String.compare changed, List.sort String.compare removed)
+
+(* ============================================ *)
+(* BACKGROUND RELOADS                          *)
+(* ============================================ *)
+
+type data = type_environment * domain_db * facts_db * functions_db
+
+type parsed_file = string * float * (Policy_loader.policy_database, string) result
+
+type job =
+  | Policy_job of string list * parsed_file Parallel.worker * string list
+      (* files being parsed, worker, files already invalidated *)
+  | Data_job of data Parallel.worker
+
+type t = {
+  config: Environment_config.Config.runtime_config;
+  interval: float;
+  mutable policy_snapshot: snapshot;
+  mutable data_snapshot: snapshot;
+  mutable last_poll: float;
+  mutable policy_job: job option;
+  mutable data_job: job option;
+  mutable swaps: int;
+}
+
+let create ?(interval = default_interval ()) (config: Environment_config.Config.runtime_config) : t =
+  {
+    config;
+    interval;
+    policy_snapshot = take_snapshot (Policy_loader.policy_files config.Environment_config.Config.policies_dir);
+    data_snapshot = take_snapshot (Environment_config.Config.data_files config);
+    last_poll = Unix.gettimeofday ();
+    policy_job = None;
+    data_job = None;
+    swaps = 0;
+  }
+
+let enabled (w: t) : bool = w.interval > 0.0
+
+let parse_files (files: string list) : parsed_file list =
+  List.map (fun f ->
+    let mtime = match stamp_of f with Some s -> s.mtime | None -> 0.0 in
+    let result =
+      try Ok (Policy_loader.load_database f)
+      with e -> Error (Printexc.to_string e)
+    in
+    (f, mtime, result)
+  ) files
+
+let load_data (config: Environment_config.Config.runtime_config) (_: unit list) : data list =
+  [Environment_config.Config.load_data config]
+
+(* Look for changed files and start a background parse for them. Files of
+   regulations that are not resident are only invalidated; they are parsed
+   when a query next needs them. *)
+let poll (w: t) (manager: Policy_loader.policy_manager) : unit =
+  w.last_poll <- Unix.gettimeofday ();
+  if w.policy_job = None then begin
+    let current = take_snapshot (Policy_loader.policy_files w.config.Environment_config.Config.policies_dir) in
+    let (changed, removed) = diff w.policy_snapshot current in
+    if changed <> [] || removed <> [] then begin
+      w.policy_snapshot <- current;
+      let to_parse = Policy_loader.resident_files manager changed in
+      let invalidated =
+        removed @ List.filter (fun f -> not (List.mem f to_parse)) changed in
+      if to_parse = [] then begin
+        ignore (Policy_loader.swap_reparsed manager ~parsed:[] ~invalidated);
+        w.swaps <- w.swaps + 1
+      end else
+        w.policy_job <- Some (Policy_job (to_parse, Parallel.spawn parse_files to_parse, invalidated))
+    end
+  end;
+  if w.data_job = None then begin
+    let current = take_snapshot (Environment_config.Config.data_files w.config) in
+    let (changed, removed) = diff w.data_snapshot current in
+    if changed <> [] || removed <> [] then begin
+      w.data_snapshot <- current;
+      w.data_job <- Some (Data_job (Parallel.spawn (load_data w.config) [()]))
+    end
+  end
+
+let due (w: t) : bool =
+  enabled w && Unix.gettimeofday () -. w.last_poll >= w.interval
+
+(* Seconds until the next poll, for use as a select timeout *)
+let next_timeout (w: t) : float =
+  if not (enabled w) then (-1.0)
+  else max 0.0 (w.interval -. (Unix.gettimeofday () -. w.last_poll))
+
+let job_descr (job: job) : Unix.file_descr =
+  match job with
+  | Policy_job (_, worker, _) -> Unix.descr_of_in_channel worker.Parallel.input
+  | Data_job worker -> Unix.descr_of_in_channel worker.Parallel.input
+
+(* Descriptors of running reloads; readable once a reload has finished *)
+let pending (w: t) : Unix.file_descr list =
+  List.filter_map (Option.map job_descr) [w.policy_job; w.data_job]
+
+(* Swap in every reload whose descriptor is in [ready]. A file that fails
+   to parse keeps its previous version until it is edited again. *)
+let complete (w: t) (ready: Unix.file_descr list) (env: Environment_config.Config.runtime_environment)
+    : Environment_config.Config.runtime_environment =
+  let finished job =
+    match job with
+    | Some j when List.mem (job_descr j) ready -> true
+    | _ -> false
+  in
+  let env =
+    match w.data_job with
+    | Some (Data_job worker as j) when finished (Some j) ->
+        w.data_job <- None;
+        (match Parallel.collect (load_data w.config) [()] worker with
+         | [data] ->
+             w.swaps <- w.swaps + 1;
+             Printf.eprintf "Reloaded data files from %s\n%!" w.config.Environment_config.Config.data_dir;
+             Environment_config.Config.with_data env data
+         | _ -> env
+         | exception e ->
+             Printf.eprintf "Warning: Data reload failed: %s\n%!" (Printexc.to_string e);
+             env)
+    | _ -> env
+  in
+  (match w.policy_job with
+   | Some (Policy_job (files, worker, invalidated) as j) when finished (Some j) ->
+       w.policy_job <- None;
+       let results = Parallel.collect parse_files files worker in
+       let manager = env.Environment_config.Config.policy_manager in
+       let parsed = List.filter_map (fun (f, mtime, result) ->
+         match result with
+         | Ok db -> Some (f, mtime, db)
+         | Error msg ->
+             Printf.eprintf "Warning: Failed to reload %s: %s\n%!" f msg;
+             (match Hashtbl.find_opt manager.Policy_loader.cache.Policy_loader.PolicyCache.cache f with
+              | Some old -> Some (f, mtime, old)
+              | None -> None)
+       ) results in
+       let rebuilt = Policy_loader.swap_reparsed manager ~parsed ~invalidated in
+       w.swaps <- w.swaps + 1;
+       if rebuilt <> [] then
+         Printf.eprintf "Reloaded regulations: %s\n%!" (String.concat ", " rebuilt)
+   | _ -> ());
+  env
+
+(* Wait for running reloads and swap them in *)
+let settle (w: t) (env: Environment_config.Config.runtime_environment)
+    : Environment_config.Config.runtime_environment =
+  match pending w with
+  | [] -> env
+  | ready -> complete w ready env
@@ -10,12 +10,12 @@ Addresses all identified issues:
 import re
 import json
 import time
-import subprocess
 from typing import List, Dict, Tuple
 from anthropic import Anthropic
 from utils.cfr_parser import load_policy_database
 import os
 from utils.policy_filtering import RobustPolicyFilterAgent
+from utils.precis_engine import get_engine, response_verified
 policy_filter = RobustPolicyFilterAgent()
 # ============================================================================
 # VALIDATION HELPERS
@@ -490,21 +490,8 @@ class VerifierAgent(Agent):
         NEW: Can optionally filter to only relevant_policies
         """
         
-        # Try to find Précis executable
-        possible_paths = [
-            os.path.join(os.getcwd(), "precis"),
-            "./precis",
-            "/app/precis",
-            os.path.join(os.path.dirname(__file__), "precis"),
-        ]
-        
-        PRECIS_PATH = None
-        for path in possible_paths:
-            if os.path.exists(path):
-                PRECIS_PATH = path
-                break
-        
-        if PRECIS_PATH is None:
+        engine = get_engine()
+        if not engine.available:
             return {
                 "success": False,
                 "verified": False,
@@ -515,113 +502,57 @@ class VerifierAgent(Agent):
                 "pipeline_steps": ["❌ Précis not found"]
             }
         
-        try:
-            # Prepare facts
-            facts_for_ocaml = [
-                {"predicate": f[0], "arguments": f[1:]}
-                for f in facts if len(f) >= 2
-            ]
-            
-            # Wrap formula
-            wrapped = f"""regulation HIPAA version "1.0"
-policy starts
-{formula}
-;
-policy ends"""
-            
-            # Build request
-            request = {
-                "formula": wrapped,
-                "facts": {"facts": facts_for_ocaml},
-                "regulation": "HIPAA"
-            }
-            
-            # NEW: If relevant_policies provided, could filter here
-            # (For now, OCaml will check all policies in its database)
-            
-            # Call OCaml
-            proc = subprocess.Popen(
-                [PRECIS_PATH, "json"],
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                cwd=os.path.dirname(PRECIS_PATH) if os.path.dirname(PRECIS_PATH) else "."
-            )
-            
-            output, error = proc.communicate(input=json.dumps(request), timeout=30)
-            
-            if proc.returncode == 0 and output.strip():
-                result = json.loads(output)
-                
-                # NEW: Filter results to only relevant policies if provided
-                if relevant_policies:
-                    result = self._filter_results(result, relevant_policies)
-                
-                # Parse verification result
-                overall_compliant = result.get("overall_compliant", None)
-                violations = result.get("violations", [])
-                evaluations = result.get("evaluations", [])
-                
-                if overall_compliant is not None:
-                    verified = overall_compliant
-                elif evaluations:
-                    verified = all(
-                        e.get("evaluation", {}).get("result") == "true"
-                        for e in evaluations
-                    )
-                else:
-                    verified = False
-                
-                pipeline_steps = [
-                    "✅ Step 1: Parsing (Lexer → Parser → AST)",
-                    "✅ Step 2: Type Checking",
-                    "✅ Step 3: Evaluation Engine",
-                    "✅ Step 4: Results Generated",
-                ]
-                
-                if verified:
-                    pipeline_steps.append("✅ Verification: PASSED")
-                else:
-                    pipeline_steps.append(f"❌ Verification: FAILED ({len(violations)} violations)")
-                
-                return {
-                    "success": True,
-                    "verified": verified,
-                    "result": result,
-                    "output": json.dumps(result, indent=2),
-                    "error": "",
-                    "json_response": result,
-                    "pipeline_steps": pipeline_steps,
-                    "violations_count": len(violations),
-                    "compliant_count": len(evaluations) - len(violations) if evaluations else 0
-                }
-            else:
-                return {
-                    "success": False,
-                    "verified": False,
-                    "result": {},
-                    "output": output,
-                    "error": error,
-                    "json_response": {},
-                    "pipeline_steps": ["❌ Précis execution failed"]
-                }
-        
-        except Exception as e:
+        outcome = engine.verify(formula, facts)
+        if not outcome.success:
             return {
                 "success": False,
                 "verified": False,
                 "result": {},
                 "output": "",
-                "error": str(e),
+                "error": outcome.error,
                 "json_response": {},
-                "pipeline_steps": [f"❌ Error: {str(e)}"]
+                "pipeline_steps": ["❌ Précis execution failed"]
             }
+        
+        result = outcome.response
+        
+        # NEW: Filter results to only relevant policies if provided
+        if relevant_policies:
+            result = self._filter_results(result, relevant_policies)
+        verified = response_verified(result)
+        
+        violations = result.get("violations", [])
+        evaluations = result.get("evaluations", [])
+        
+        pipeline_steps = [
+            "✅ Step 1: Parsing (Lexer → Parser → AST)",
+            "✅ Step 2: Type Checking",
+            "✅ Step 3: Evaluation Engine",
+            "✅ Step 4: Results Generated",
+        ]
+        
+        if verified:
+            pipeline_steps.append("✅ Verification: PASSED")
+        else:
+            pipeline_steps.append(f"❌ Verification: FAILED ({len(violations)} violations)")
+        
+        return {
+            "success": True,
+            "verified": verified,
+            "result": result,
+            "output": json.dumps(result, indent=2),
+            "error": "",
+            "json_response": result,
+            "pipeline_steps": pipeline_steps,
+            "violations_count": len(violations),
+            "compliant_count": len(evaluations) - len(violations) if evaluations else 0
+        }
     
     def _filter_results(self, result: Dict, relevant_policies: List[Dict]) -> Dict:
         """Filter OCaml results to only include relevant policies"""
         
         relevant_ids = {p['policy_id'] for p in relevant_policies}
+        result = dict(result)  # the engine's response is left as it was
         
         # Filter evaluations
         if 'evaluations' in result:
@@ -6,11 +6,11 @@ Each agent is a specialized LLM call with specific tools and context.
 """
 
 import json
-import subprocess
 import re
 import time
 from typing import List, Dict, Optional, Tuple
 from anthropic import Anthropic
+from utils.precis_engine import get_engine
 
 # ============================================
 # AGENT TOOLS (Simple Python Functions)
@@ -341,89 +341,27 @@ class VerifierAgent(Agent):
     def verify(self, formula: str, facts: List[List[str]]) -> Dict:
         """Call OCaml Précis verification engine"""
         
-        PRECIS_PATH = "/Users/priscilladanso/Documents/STONYBROOK/RESEARCH/TOWARDDISSERTATION/WIP/REGULATORY_POLICY_CHECKER/precis"
-        
-        try:
-            # Prepare facts for OCaml
-            facts_for_ocaml = [
-                {"predicate": f[0], "arguments": f[1:]}
-                for f in facts if len(f) >= 2
-            ]
-            
-            # Wrap formula
-            wrapped = f"""regulation HIPAA version "1.0"
-policy starts
-{formula}
-;
-policy ends"""
-            
-            # Build request
-            request = {
-                "formula": wrapped,
-                "facts": {"facts": facts_for_ocaml},
-                "regulation": "HIPAA"
-            }
-            
-            # Call OCaml
-            proc = subprocess.Popen(
-                [PRECIS_PATH, "json"],
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                cwd="/Users/priscilladanso/Documents/STONYBROOK/RESEARCH/TOWARDDISSERTATION/WIP/REGULATORY_POLICY_CHECKER"
-            )
-            
-            output, error = proc.communicate(input=json.dumps(request), timeout=30)
-            
-            if proc.returncode == 0 and output.strip():
-                result = json.loads(output)
-                
-                # Parse verification result correctly
-                overall_compliant = result.get("overall_compliant", None)
-                violations = result.get("violations", [])
-                evaluations = result.get("evaluations", [])
-                
-                # Determine verification status
-                if overall_compliant is not None:
-                    # Use overall_compliant if present (most reliable)
-                    verified = overall_compliant
-                elif evaluations:
-                    # Fallback: check if all evaluations passed
-                    verified = all(
-                        e.get("evaluation", {}).get("result") == "true"
-                        for e in evaluations
-                    )
-                else:
-                    # No evaluations found
-                    verified = False
-                
-                return {
-                    "success": True,
-                    "verified": verified,
-                    "result": result,
-                    "output": output,
-                    "error": "",
-                    "violations_count": len(violations),
-                    "compliant_count": len(evaluations) - len(violations) if evaluations else 0
-                }
-            else:
-                return {
-                    "success": False,
-                    "verified": False,
-                    "result": {},
-                    "output": output,
-                    "error": error
-                }
-        
-        except Exception as e:
+        outcome = get_engine().verify(formula, facts)
+        if not outcome.success:
             return {
                 "success": False,
                 "verified": False,
                 "result": {},
                 "output": "",
-                "error": str(e)
+                "error": outcome.error
             }
+        
+        violations = outcome.violations
+        evaluations = outcome.evaluations
+        return {
+            "success": True,
+            "verified": outcome.verified,
+            "result": outcome.response,
+            "output": json.dumps(outcome.response),
+            "error": "",
+            "violations_count": len(violations),
+            "compliant_count": len(evaluations) - len(violations) if evaluations else 0
+        }
 
 
 class ExplainerAgent(Agent):
@@ -3,9 +3,10 @@ from anthropic import Anthropic
 import time
 import json
 import re
-import subprocess
 import os
 from config import get_precis_path, ARITY_MAP
+from utils.precis_engine import get_engine
+from utils.fotl_parser import check_formula, repair_formula
 PRECIS_PATH = get_precis_path()
 
 def validate_and_fix_formula(formula: str) -> tuple:
@@ -20,30 +21,19 @@ def validate_and_fix_formula(formula: str) -> tuple:
         formula = re.sub(r'\s+and\s+\w+\s*=\s*@\w+', '', formula)
         formula = re.sub(r'\s+and\s+purposeIsPurpose\([^)]+\)', '', formula)
     
-    # Check for unbound variables
-    declared_vars = set()
-    if formula.startswith("forall"):
-        try:
-            forall_part = formula.split('.')[0]
-            var_list = forall_part.replace("forall", "").strip()
-            declared_vars = set(v.strip() for v in var_list.split(','))
-        except:
-            warnings.append("⚠️ Could not parse forall clause")
-    
-    # Find all variables in formula body
-    all_vars_in_body = set(re.findall(r'\b([a-z_][a-z0-9_]*)\b', formula))
-    
-    # Remove keywords and predicates
-    keywords = {'forall', 'exists', 'and', 'or', 'implies', 'not', 'iff', 'xor', 'true', 'false'}
-    predicates = {p.lower() for p in ARITY_MAP.keys()}
-    used_vars = all_vars_in_body - keywords - predicates
+    # Parse in-process; repair what can be repaired before Précis sees it
+    formula, repairs = repair_formula(formula)
+    warnings.extend(f"🔧 {note}" for note in repairs)
+    check = check_formula(formula)
+    for error in check.errors:
+        warnings.append(f"⚠️ {error.kind.capitalize()} error: {error}")
     
     # Check for unbound variables
-    unbound = used_vars - declared_vars
+    unbound = check.free_vars
     if unbound:
-        warnings.append(f"⚠️ Unbound variables detected: {unbound}, will attempt to fix")
+        warnings.append(f"⚠️ Unbound variables detected: {set(unbound)}, will attempt to fix")
     
-    return formula, warnings, list(unbound) if unbound else []
+    return formula, warnings, unbound
 
 def validate_facts(extracted_facts: list) -> tuple:
     """Validate fact structure and return (valid_facts, warnings)"""
@@ -360,106 +350,38 @@ Output ONLY the corrected formula:"""
         "pipeline_steps": []
     }
     
-    # Prepare facts for OCaml
-    facts_for_ocaml = []
-    for fact in validated_facts:
-        if len(fact) >= 2:
-            facts_for_ocaml.append({
-                "predicate": fact[0],
-                "arguments": fact[1:]
-            })
-    
-    # Wrap formula in policy structure
-    wrapped_formula = f"""regulation HIPAA version "1.0"
-policy starts
-{formula}
-;
-policy ends"""
-    
-    # Build request
-    precis_request = {
-        "formula": wrapped_formula,
-        "facts": {
-            "facts": facts_for_ocaml
-        },
-        "regulation": "HIPAA"
-    }
-    
-    try:
-        proc = subprocess.Popen(
-            [PRECIS_PATH, "json"],
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            cwd=os.path.dirname(PRECIS_PATH) if os.path.dirname(PRECIS_PATH) else "."
-        )
+    outcome = get_engine(PRECIS_PATH).verify(formula, validated_facts)
+    if outcome.success:
+        # Check evaluation result
+        evaluations = outcome.evaluations
+        if evaluations:
+            verified = evaluations[0].get("evaluation", {}).get("result") == "true"
         
-        precis_output, precis_error = proc.communicate(
-            input=json.dumps(precis_request),
-            timeout=30
-        )
+        pipeline_steps = [
+            "✅ Step 1: Parsing (Lexer → Parser → AST)",
+            "✅ Step 2: Type Checking",
+            "✅ Step 3: Evaluation Engine",
+            "✅ Step 4: Results Generated",
+        ]
         
-        if proc.returncode == 0 and precis_output.strip():
-            try:
-                precis_json = json.loads(precis_output)
-                
-                # Check evaluation result
-                if "evaluations" in precis_json and len(precis_json["evaluations"]) > 0:
-                    eval_result = precis_json["evaluations"][0].get("evaluation", {})
-                    if eval_result.get("result") == "true":
-                        verified = True
-                    else:
-                        verified = False
-                
-                pipeline_steps = [
-                    "✅ Step 1: Parsing (Lexer → Parser → AST)",
-                    "✅ Step 2: Type Checking",
-                    "✅ Step 3: Evaluation Engine",
-                    "✅ Step 4: Results Generated",
-                ]
-                
-                if verified:
-                    pipeline_steps.append("✅ Verification: PASSED")
-                else:
-                    pipeline_steps.append("❌ Verification: FAILED")
-                
-                precis_result = {
-                    "success": True,
-                    "output": json.dumps(precis_json, indent=2),
-                    "error": "",
-                    "pipeline_steps": pipeline_steps,
-                    "json_response": precis_json
-                }
-                
-            except json.JSONDecodeError:
-                precis_result = {
-                    "success": False,
-                    "output": precis_output,
-                    "error": f"JSON parse failed: {precis_output[:200]}",
-                    "pipeline_steps": ["❌ JSON parsing failed"]
-                }
+        if verified:
+            pipeline_steps.append("✅ Verification: PASSED")
         else:
-            precis_result = {
-                "success": False,
-                "output": precis_output,
-                "error": precis_error,
-                "pipeline_steps": ["❌ Précis execution failed"]
-            }
-    
-    except subprocess.TimeoutExpired:
+            pipeline_steps.append("❌ Verification: FAILED")
+        
         precis_result = {
-            "success": False,
-            "output": "",
-            "error": "Timeout (30s)",
-            "pipeline_steps": ["❌ Timeout"]
+            "success": True,
+            "output": json.dumps(outcome.response, indent=2),
+            "error": "",
+            "pipeline_steps": pipeline_steps,
+            "json_response": outcome.response
         }
-    except Exception as e:
+    else:
         precis_result = {
             "success": False,
             "output": "",
-            "error": str(e),
-            "pipeline_steps": [f"❌ Error: {str(e)}"]
+            "error": outcome.error,
+            "pipeline_steps": ["❌ Précis execution failed"]
         }
     
     steps.append(f"✅ OCaml processing complete")
@@ -17,6 +17,7 @@ from utils.comparison_utils import display_comparison_table_st
 from utils.pipeline_integrated import pipeline_with_two_tier_verification
 from utils.multi_agent_integrated import multi_agent_with_two_tier_verification
 from utils.comparison_utils import display_comparison_table_st
+from utils.precis_client import PrecisServer, PrecisSession
 load_dotenv()
 
 st.set_page_config(
@@ -509,6 +510,60 @@ elif page == "What-If Simulator":
     if current_facts and st.button("🗑️ Clear All Facts"):
         st.session_state.facts = []
         st.rerun()
+    
+    # Incremental re-evaluation: the session lives in a resident Précis
+    # process, so each edit only re-checks the policies it can affect
+    st.markdown("### ⚖️ Compliance")
+    
+    whatif_formula = st.text_input(
+        "Query formula",
+        value=st.session_state.get('whatif_formula', ''),
+        placeholder="e.g., disclose(HospitalA, ResearcherCarol, PHI_001)"
+    )
+    whatif_regulation = st.selectbox("Regulation", ["HIPAA", "GDPR", "CCPA"], key="whatif_regulation")
+    
+    if whatif_formula:
+        if 'precis_server' not in st.session_state:
+            st.session_state.precis_server = PrecisServer(PRECIS_PATH)
+        
+        session = st.session_state.get('whatif_session')
+        key = (whatif_formula, whatif_regulation)
+        
+        try:
+            if session is None or st.session_state.get('whatif_key') != key:
+                if session is not None:
+                    session.close()
+                session = PrecisSession(
+                    st.session_state.precis_server,
+                    whatif_formula,
+                    current_facts,
+                    regulation=whatif_regulation
+                )
+                st.session_state.whatif_session = session
+                st.session_state.whatif_key = key
+                st.session_state.whatif_formula = whatif_formula
+                result = session.initial
+                changed = []
+            else:
+                result = session.sync(current_facts)
+                changed = result.get("changed", [])
+            
+            if "error" in result:
+                st.error(f"❌ {result['error']}")
+            else:
+                if result.get("overall_compliant"):
+                    st.success("✅ Compliant")
+                else:
+                    st.error(f"❌ Violations: {', '.join(result.get('violations', []))}")
+                
+                if "reevaluated" in result:
+                    st.caption(f"Re-evaluated {result['reevaluated']} policies for this change")
+                for ev in changed:
+                    status = "✅ now satisfied" if ev["evaluation"].get("result") == "true" else "❌ now violated"
+                    st.markdown(f"- **{ev['policy_id']}** ({ev['section']}): {status}")
+        except Exception as e:
+            st.session_state.pop('whatif_session', None)
+            st.error(f"❌ Evaluation failed: {e}")
 
 # ============================================
 # PAGE 4: SYSTEM STATUS
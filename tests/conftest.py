@@ -0,0 +1,34 @@
+import os
+import stat
+import sys
+
+import pytest
+
+# The modules under test import each other as top-level modules
+# (config, policy_checker, utils.*), as they do when run from the repo root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def fake_precis(tmp_path, monkeypatch):
+    """
+    Factory for stand-in `precis` executables: fake_precis(body) writes the
+    Python script `body` and returns its path. Verification caching and
+    in-process routing are turned off so every request reaches the script.
+    """
+    from utils import verification_cache
+
+    monkeypatch.setenv("PRECIS_CACHE_SIZE", "0")
+    monkeypatch.delenv("PRECIS_CACHE_DIR", raising=False)
+    monkeypatch.setenv("PRECIS_INPROCESS_MAX_COST", "0")
+    monkeypatch.setattr(verification_cache, "_default_cache", None)
+
+    def make(body: str) -> str:
+        script = tmp_path / "precis"
+        script.write_text(f"#!{sys.executable}\n" + body)
+        script.chmod(script.stat().st_mode | stat.S_IXUSR)
+        return str(script)
+
+    return make
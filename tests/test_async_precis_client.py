@@ -0,0 +1,137 @@
+"""AsyncPrecisClient against a stand-in `precis serve`"""
+
+import asyncio
+import dataclasses
+import textwrap
+
+import pytest
+
+from utils.async_precis_client import AsyncPrecisClient
+from policy_checker import Fact, QueryRequest
+
+# Answers hello, then every query with one evaluation of policy "p1":
+# violated when the formula mentions "violate", satisfied otherwise. The
+# request's budget is echoed back. "sleep <seconds>" formulas sleep first.
+FAKE_SERVE = textwrap.dedent('''\
+    import json, sys, time
+
+    if sys.argv[1:] == ["version"]:
+        print(json.dumps({"protocol": 1, "features": ["json", "serve", "budget"]}))
+        sys.exit()
+
+    def answer(req):
+        if req.get("op") == "hello":
+            return {"op": "hello", "protocol": 1, "wire": "json"}
+        if req.get("formula", "").startswith("sleep"):
+            time.sleep(float(req["formula"].split()[1]))
+        result = "false" if "violate" in req.get("formula", "") else "true"
+        return {
+            "matched_policies": [{"policy_id": "p1", "regulation": "HIPAA", "section": "164.502",
+                                  "description": "test policy", "relevance_score": 1.0,
+                                  "matched_terms": ["disclose"]}],
+            "evaluations": [{"policy_id": "p1", "regulation": "HIPAA", "section": "164.502",
+                             "description": "test policy", "evaluation": {"result": result},
+                             "explanation": "test"}],
+            "overall_compliant": result == "true",
+            "violations": [] if result == "true" else ["p1"],
+            "budget": req.get("budget"),
+        }
+
+    for line in sys.stdin:
+        print(json.dumps(answer(json.loads(line))), flush=True)
+    ''')
+
+
+@pytest.fixture
+def precis(fake_precis):
+    return fake_precis(FAKE_SERVE)
+
+
+def run(precis, method, *args):
+    async def go():
+        async with AsyncPrecisClient(precis_path=precis, max_workers=2, timeout=10) as client:
+            return await getattr(client, method)(*args)
+    return asyncio.run(go())
+
+
+def test_query(precis):
+    response = run(precis, "query", "regulation R version \"1\" policy starts forall x. p(x); policy ends",
+                   [["p", "alice"]])
+    assert response["overall_compliant"] is True
+    assert response["evaluations"][0]["evaluation"]["result"] == "true"
+    # the engine advertises budgets: 80% of the 10 s deadline
+    assert response["budget"] == {"request": {"timeout_ms": 8000}}
+
+
+def test_no_budget_for_engines_without_budgets(precis):
+    async def go():
+        async with AsyncPrecisClient(precis_path=precis, timeout=10) as client:
+            client.info = dataclasses.replace(client.info, features=frozenset({"json", "serve"}))
+            return await client.query("p(x)", [])
+    assert asyncio.run(go())["budget"] is None
+
+
+def test_verify(precis):
+    result = run(precis, "verify", "violate(x)", [["coveredEntity", "hospital"]])
+    assert result["success"] is True
+    assert result["verified"] is False
+    assert result["violations"] == ["p1"]
+
+
+def test_check_policy(precis):
+    request = QueryRequest(formula="disclose(a, b, c)", facts=[Fact("disclose", ["a", "b", "c"])])
+    response = run(precis, "check_policy", request)
+    assert response.overall_compliant is True
+    assert [e.policy_id for e in response.evaluations] == ["p1"]
+    assert response.evaluations[0].evaluation is True
+
+
+def test_concurrent_requests_share_workers(precis):
+    async def go():
+        async with AsyncPrecisClient(precis_path=precis, max_workers=2, timeout=10) as client:
+            results = await asyncio.gather(*(client.verify(f"p{i}(x)", []) for i in range(6)))
+            return results, client.metrics()
+    results, metrics = asyncio.run(go())
+    assert all(r["verified"] for r in results)
+    assert metrics["workers"] <= 2
+    assert metrics["recycled"] == 0
+
+
+def recycle(precis, interrupt):
+    """Run a slow request that [interrupt] stops; returns the recycled
+    count and whether the next request got a new process, with the old one
+    gone"""
+    async def go():
+        async with AsyncPrecisClient(precis_path=precis, max_workers=1, timeout=10) as client:
+            await client.request({"formula": "warm up"})
+            old = client._idle[0]
+            await interrupt(client)
+            # the old process was killed: it exits instead of finishing its sleep
+            await asyncio.wait_for(old._proc.wait(), timeout=2)
+            recycled = client.recycled
+            assert (await client.request({"formula": "after"}))["overall_compliant"] is True
+            return recycled, client._idle[0]._proc.pid != old._proc.pid
+    return asyncio.run(go())
+
+
+def test_cancelled_task_recycles_its_worker(precis):
+    async def cancel(client):
+        task = asyncio.create_task(client.request({"formula": "sleep 5"}))
+        await asyncio.sleep(0.3)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    assert recycle(precis, cancel) == (1, True)
+
+
+def test_deadline_recycles_its_worker(precis):
+    async def time_out(client):
+        response = await client.request({"formula": "sleep 5"}, timeout=0.3)
+        assert response["success"] is False and "timed out" in response["error"]
+    assert recycle(precis, time_out) == (1, True)
+
+
+def test_missing_executable(tmp_path):
+    result = run(str(tmp_path / "nowhere"), "query", "p(x)", [])
+    assert result["success"] is False
+    assert "unavailable" in result["error"]
@@ -0,0 +1,143 @@
+"""
+The in-process reference evaluator against Précis
+
+- recorded Précis answers in tests/fixtures/precis (written by
+  `python -m utils.differential_check --record tests/fixtures/precis`)
+  are replayed without the binary;
+- the live comparison runs when an engine that runs here is found
+  (config.get_precis_path, PRECIS_PATH to point elsewhere);
+- every bundled policy is checked against a plain recursive reading of
+  the semantics, which needs neither.
+"""
+
+import itertools
+import os
+import random
+
+import pytest
+
+from config import get_precis_path
+from utils.differential_check import check, fixture_files, predicates_of, random_facts, replay
+from utils.fotl_parser import (Annotated, BinLogical, BinTemporal, FalseF, Not, Predicate, Quantified,
+                               TrueF, UnTemporal)
+from utils.precis_engine import handshake
+from utils.reference_evaluator import (COMPARISONS, FactEvaluator, ReferenceEngine, _compare, _term_value,
+                                      peek_regulation)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "precis")
+BUNDLED = ReferenceEngine(ROOT)
+REGULATIONS = sorted(r for r in BUNDLED.store.regulation_files() if BUNDLED.store.policies(r))
+
+
+def _engine():
+    path = get_precis_path()
+    if path is None:
+        return None, "Précis executable not found"
+    info = handshake(path)
+    if info.error:
+        return None, f"Précis executable does not run here: {info.error}"
+    return path, ""
+
+
+PRECIS, SKIP_REASON = _engine()
+
+
+# ============================================================================
+# RECORDED AND LIVE PRÉCIS ANSWERS
+# ============================================================================
+
+@pytest.mark.parametrize("fixture", fixture_files(FIXTURES) or [None],
+                         ids=lambda f: os.path.basename(f) if f else "none")
+def test_recorded_answers(fixture):
+    if fixture is None:
+        pytest.skip(f"no recorded Précis answers in {FIXTURES}")
+    compared, declined, mismatches = replay(BUNDLED, fixture)
+    assert mismatches == 0, f"{mismatches} mismatch(es); see the captured output"
+
+
+@pytest.mark.skipif(PRECIS is None, reason=SKIP_REASON)
+@pytest.mark.parametrize("regulation", REGULATIONS)
+def test_live_precis(regulation):
+    engine = ReferenceEngine(handshake(PRECIS).root)
+    compared, declined, mismatches = check(PRECIS, engine, regulation, cases=5, entities=3,
+                                           density=0.3, seed=0, timeout=30)
+    assert mismatches == 0, f"{mismatches} mismatch(es); see the captured output"
+
+
+# ============================================================================
+# PLAIN SEMANTICS
+# ============================================================================
+
+def plain_holds(f, facts, entities, a):
+    """The verdict read straight off the definitions: no sharing, no memo,
+    every binding of a quantifier tried. Temporal operators are evaluated
+    at the single point a `precis json` request describes, as the engine
+    does: a unary one is its body, a binary one the conjunction."""
+    if isinstance(f, Annotated):
+        return plain_holds(f.body, facts, entities, a)
+    if isinstance(f, TrueF):
+        return True
+    if isinstance(f, FalseF):
+        return False
+    if isinstance(f, Predicate):
+        values = [_term_value(t, a) for t in f.args]
+        if None in values:
+            return False
+        if f.name in COMPARISONS:
+            return len(values) == 2 and _compare(f.name, *values)
+        return (f.name, tuple(values)) in facts
+    if isinstance(f, Not):
+        return not plain_holds(f.body, facts, entities, a)
+    if isinstance(f, UnTemporal):
+        return plain_holds(f.body, facts, entities, a)
+    if isinstance(f, (BinLogical, BinTemporal)):
+        l = plain_holds(f.left, facts, entities, a)
+        r = plain_holds(f.right, facts, entities, a)
+        op = f.op if isinstance(f, BinLogical) else "and"
+        return {"and": l and r, "or": l or r, "implies": (not l) or r,
+                "iff": l == r, "xor": l != r}[op]
+    if isinstance(f, Quantified):
+        verdicts = (plain_holds(f.body, facts, entities, {**a, **dict(zip(f.variables, values))})
+                    for values in itertools.product(entities, repeat=len(f.variables)))
+        return any(verdicts) if f.quantifier == "exists" else all(verdicts)
+    raise ValueError(f"Cannot evaluate {f!r}")
+
+
+@pytest.mark.parametrize("regulation", REGULATIONS)
+def test_reference_matches_plain_semantics(regulation):
+    policies = BUNDLED.store.policies(regulation)
+    predicates = {}
+    for p in policies:
+        predicates.update(predicates_of(p.formula))
+    rng = random.Random(regulation)
+    for _ in range(20):
+        entities = rng.randint(1, 3)
+        facts = [(f["predicate"], tuple(f["arguments"]))
+                 for f in random_facts(rng, predicates, entities, rng.choice([0.2, 0.5, 0.8]))]
+        # One evaluator for the whole regulation, so subformulas are shared
+        # across policies as in the engine
+        evaluator = FactEvaluator(facts)
+        fact_set = set(facts)
+        for p in policies:
+            expected = plain_holds(p.formula, fact_set, evaluator.entities, {})
+            assert evaluator.holds(p.formula) == expected, (p.id, facts)
+
+
+# ============================================================================
+# POLICY FILES
+# ============================================================================
+
+@pytest.mark.parametrize("text, expected", [
+    ('regulation GDPR version "1.0"\n', "GDPR"),
+    ('(* header comment\n   over two lines *)\n\n  regulation GDPR version "1.0"\n', "GDPR"),
+    ('(* a *) (* b *) regulation GDPR\n', "GDPR"),
+    # comments do not nest, as in lexer.mll
+    ('(* a (* b *) regulation GDPR\n', "GDPR"),
+    ('(* unterminated\nregulation GDPR\n', "rules.policy"),
+    ('policy starts\n', "rules.policy"),
+])
+def test_peek_regulation(tmp_path, text, expected):
+    path = tmp_path / "rules.policy"
+    path.write_text(text)
+    assert peek_regulation(str(path)) == expected
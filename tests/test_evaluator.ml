@@ -0,0 +1,91 @@
+(* test_evaluator.ml - The shared-subformula DAG evaluator must agree with
+   eval_formula on every bundled policy, over random fact sets *)
+
+open Ast
+
+let seeds = 20
+let pool = ["alice"; "bob"; "clinic"; "record1"]
+
+(* Predicates (with arity) and constants used by a formula *)
+let rec term_consts (t: term) : string list =
+  match t with
+  | Var _ -> []
+  | Const c -> [c]
+  | Func (_, args) -> List.concat_map term_consts args
+
+let rec atoms (f: formula) : (string * term list) list =
+  match f with
+  | True | False -> []
+  | Predicate (p, args) -> [(p, args)]
+  | Not g | UnTemporalOp (_, g, _) | Quantified (_, g) | Annotated (g, _) -> atoms g
+  | BinLogicalOp (_, g1, g2) | BinTemporalOp (_, g1, g2, _) -> atoms g1 @ atoms g2
+
+let is_comparison (p: string) : bool =
+  List.mem p ["="; "!="; "<"; "<="; ">"; ">="]
+
+(* A few constants of the policies join the entity pool, so that atoms
+   naming them can hold *)
+let domain_of (policies: formula list) : domain_db =
+  let consts = List.concat_map (fun f ->
+    List.concat_map (fun (_, args) -> List.concat_map term_consts args) (atoms f)
+  ) policies |> List.sort_uniq String.compare in
+  let picked = List.filteri (fun i _ -> i < 3) consts in
+  { entities = List.sort_uniq String.compare (pool @ picked) }
+
+(* Three random ground facts per predicate *)
+let random_facts (policies: formula list) (domain: domain_db) : facts_db =
+  let preds = List.concat_map (fun f ->
+    List.filter_map (fun (p, args) ->
+      if is_comparison p then None else Some (p, List.length args)
+    ) (atoms f)
+  ) policies |> List.sort_uniq compare in
+  let entities = Array.of_list domain.entities in
+  let pick () = entities.(Random.int (Array.length entities)) in
+  let facts = List.concat_map (fun (p, arity) ->
+    List.init 3 (fun _ -> (p, List.init arity (fun _ -> pick ())))
+  ) preds in
+  { facts }
+
+let no_funcs : functions_db = { func_values = [] }
+
+let check_file (file: string) : int =
+  match Policy_loader.load_policy_file file with
+  | exception Failure msg ->
+      Printf.printf "  skipped %s: %s\n" (Filename.basename file) msg;
+      0
+  | pf ->
+      let policies = pf.policies in
+      let domain = domain_of policies in
+      (* One DAG for the whole file, so policies share subformulas *)
+      let dag = Evaluator.create_dag () in
+      let nodes = List.map (Evaluator.compile_formula dag) policies in
+      let failures = ref 0 in
+      for seed = 1 to seeds do
+        Random.init seed;
+        let facts = random_facts policies domain in
+        let memo = Evaluator.create_memo () in
+        List.iteri (fun idx (f, node) ->
+          let expected = Evaluator.eval_formula [] domain facts no_funcs f in
+          let actual = Evaluator.eval_node memo [] domain (Evaluator.check_fact facts)
+                         no_funcs node in
+          if actual <> expected then begin
+            incr failures;
+            Printf.printf "  MISMATCH %s policy %d seed %d: eval_formula %s, eval_node %s\n"
+              (Filename.basename file) (idx + 1) seed
+              (Evaluator.string_of_eval_result expected)
+              (Evaluator.string_of_eval_result actual)
+          end
+        ) (List.combine policies nodes)
+      done;
+      Printf.printf "  %s: %d policies x %d fact sets\n"
+        (Filename.basename file) (List.length policies) seeds;
+      !failures
+
+let () =
+  let files = Policy_loader.policy_files "../policies" in
+  if files = [] then failwith "no bundled policies found";
+  let failures = List.fold_left (fun acc file -> acc + check_file file) 0 files in
+  if failures > 0 then begin
+    Printf.printf "%d mismatches\n" failures;
+    exit 1
+  end
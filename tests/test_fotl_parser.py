@@ -0,0 +1,168 @@
+"""utils/fotl_parser.py against the grammar in src/parser.mly"""
+
+import glob
+import os
+
+import pytest
+
+from utils.fotl_parser import (BinLogical, BinTemporal, Const, FOTLSyntaxError, Not, Predicate,
+                               Quantified, UnTemporal, Var, check_formula, parse_formula,
+                               parse_policy_file, to_source)
+
+POLICY_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "policies")
+POLICY_FILES = sorted(glob.glob(os.path.join(POLICY_DIR, "*.policy")))
+
+# Files parser.mly rejects as well: regulation_metadata has no
+# `description` clause, so `precis` fails on line 2 of these
+REJECTED = {"HIPAA_PRIMARY.policy": 2, "HIPAA_PROCEDURAL.policy": 2}
+
+
+def P(name, *args):
+    return Predicate(name, tuple(Var(a) for a in args))
+
+
+a, b, c = P("a"), P("b"), P("c")
+
+
+def And(l, r):
+    return BinLogical("and", l, r)
+
+
+def Or(l, r):
+    return BinLogical("or", l, r)
+
+
+def Implies(l, r):
+    return BinLogical("implies", l, r)
+
+
+def Iff(l, r):
+    return BinLogical("iff", l, r)
+
+
+# ============================================================================
+# SHIPPED POLICIES
+# ============================================================================
+
+@pytest.mark.parametrize("path", POLICY_FILES, ids=os.path.basename)
+def test_shipped_policy_files(path):
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    name = os.path.basename(path)
+    if name in REJECTED:
+        with pytest.raises(FOTLSyntaxError) as e:
+            parse_policy_file(text)
+        assert e.value.line == REJECTED[name]
+        return
+    policies = parse_policy_file(text).policies
+    assert policies
+    # to_source is fully parenthesised and must parse back to the same AST
+    for policy in policies:
+        assert parse_formula(to_source(policy)) == policy
+
+
+def test_policy_file_metadata():
+    pf = parse_policy_file('regulation R version "1.0" effective_date "2024-01-01"\n'
+                           'type declaration starts type Entity type declaration ends\n'
+                           'policy starts a; @["§1"] b and c; policy ends')
+    assert (pf.regulation, pf.version, pf.effective_date) == ("R", "1.0", "2024-01-01")
+    assert pf.type_decls == ["Entity"]
+    assert len(pf.policies) == 2
+    assert pf.policies[1].citation == "§1"
+    assert pf.policies[1].body == And(b, c)
+
+
+# ============================================================================
+# PRECEDENCE AND ASSOCIATIVITY (%right IFF, %right IMPLIES, %right UNTIL
+# SINCE, %left OR XOR, %left AND, %nonassoc NOT)
+# ============================================================================
+
+@pytest.mark.parametrize("text, expected", [
+    # and binds tighter than or
+    ("a and b or c", Or(And(a, b), c)),
+    ("a or b and c", Or(a, And(b, c))),
+    # or binds tighter than implies
+    ("a or b implies c", Implies(Or(a, b), c)),
+    ("a implies b or c", Implies(a, Or(b, c))),
+    ("a and b implies c", Implies(And(a, b), c)),
+    # implies binds tighter than iff
+    ("a iff b implies c", Iff(a, Implies(b, c))),
+    ("a implies b iff c", Iff(Implies(a, b), c)),
+    # associativity
+    ("a and b and c", And(And(a, b), c)),
+    ("a or b or c", Or(Or(a, b), c)),
+    ("a or b xor c", BinLogical("xor", Or(a, b), c)),
+    ("a implies b implies c", Implies(a, Implies(b, c))),
+    ("a iff b iff c", Iff(a, Iff(b, c))),
+    ("a until b until c", BinTemporal("until", a, BinTemporal("until", b, c))),
+    # until sits between implies and or
+    ("a or b until c implies a", Implies(BinTemporal("until", Or(a, b), c), a)),
+    # parentheses override
+    ("(a implies b) implies c", Implies(Implies(a, b), c)),
+    ("a and (b or c)", And(a, Or(b, c))),
+    # prefix operators take a simple formula
+    ("not a and b", And(Not(a), b)),
+    ("not (a and b)", Not(And(a, b))),
+    ("always a implies b", Implies(UnTemporal("always", a), b)),
+    ("eventually[0, 5] a", UnTemporal("eventually", a, (0, 5))),
+])
+def test_precedence(text, expected):
+    assert parse_formula(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    # a quantifier's body extends as far right as possible
+    ("forall x. p(x) implies q(x)", Quantified("forall", ("x",), Implies(P("p", "x"), P("q", "x")))),
+    ("exists x, y. p(x) and q(y) or c",
+     Quantified("exists", ("x", "y"), Or(And(P("p", "x"), P("q", "y")), c))),
+    ("a and forall x. p(x) or c", And(a, Quantified("forall", ("x",), Or(P("p", "x"), c)))),
+    ("forall x. exists y. p(x) implies q(y)",
+     Quantified("forall", ("x",), Quantified("exists", ("y",), Implies(P("p", "x"), P("q", "y"))))),
+    # unless parenthesised
+    ("(forall x. p(x)) implies c", Implies(Quantified("forall", ("x",), P("p", "x")), c)),
+    ("not forall x. p(x) and c", Not(Quantified("forall", ("x",), And(P("p", "x"), c)))),
+])
+def test_quantifier_scope(text, expected):
+    assert parse_formula(text) == expected
+
+
+def test_terms_and_comparisons():
+    assert parse_formula('p(x, @Const, "s", 3)') == Predicate(
+        "p", (Var("x"), Const("Const"), Const("s"), Const("3")))
+    assert parse_formula("x = y and x != @A") == And(
+        Predicate("=", (Var("x"), Var("y"))), Predicate("!=", (Var("x"), Const("A"))))
+
+
+# ============================================================================
+# ERRORS
+# ============================================================================
+
+@pytest.mark.parametrize("text", [
+    "a and",
+    "forall x p(x)",
+    "p(x",
+    "a b",
+    "@A",
+    "a (* unterminated",
+    "a (* x (* y *) z *)",
+])
+def test_syntax_errors(text):
+    with pytest.raises(FOTLSyntaxError):
+        parse_formula(text)
+
+
+def test_comments_do_not_nest():
+    # As in lexer.mll, the first *) closes a comment and an inner (* is text
+    assert parse_formula("a (* x (* y *) and b") == And(P("a"), P("b"))
+
+
+def test_error_position():
+    with pytest.raises(FOTLSyntaxError) as e:
+        parse_formula("a and\n  (b or )")
+    assert (e.value.line, e.value.column) == (2, 9)
+
+
+def test_check_formula_reports_free_variables():
+    check = check_formula("forall x. coveredEntity(x) implies protectedHealthInfo(y)")
+    assert check.ok
+    assert check.free_vars == ["y"]
@@ -0,0 +1,141 @@
+(* test_monitor.ml - Streaming monitor verdicts on small timestamped traces *)
+
+open Ast
+
+let failures = ref 0
+
+let expect (name: string) (expected: 'a) (actual: 'a) (show: 'a -> string) : unit =
+  if expected = actual then Printf.printf "  ok  %s\n" name
+  else begin
+    incr failures;
+    Printf.printf "  FAIL %s: expected %s, got %s\n" name (show expected) (show actual)
+  end
+
+let show_stamps (ts: int list) : string =
+  "[" ^ String.concat "; " (List.map string_of_int ts) ^ "]"
+
+let p = Predicate ("p", [])
+let q = Predicate ("q", [])
+
+(* A trace point: timestamp and the nullary events that happen at it *)
+let point_facts (events: string list) : Monitor.point_facts =
+  let facts = Hashtbl.create 4 in
+  List.iter (fun e -> Hashtbl.add facts e []) events;
+  facts
+
+(* Feed a trace to a closed formula. Returns the timestamps where the
+   formula holds as decided before the end of the trace, and those
+   decided by the end-of-trace flush. *)
+let run (f: formula) (trace: (int * string list) list) : int list * int list =
+  let node = Monitor.instantiate (Monitor.compile f) in
+  let holding outs =
+    List.filter_map (fun (_, t, r) -> if r.Monitor.rows <> [] then Some t else None) outs
+  in
+  let outs = List.concat (List.mapi (fun i (t, events) ->
+    node (Monitor.Point (i, t, point_facts events))
+  ) trace) in
+  let flushed = node Monitor.End_of_trace in
+  let indices = List.map (fun (i, _, _) -> i) (outs @ flushed) in
+  if indices <> List.init (List.length trace) (fun i -> i) then begin
+    incr failures;
+    Printf.printf "  FAIL %s: verdicts not one per point in order\n" (string_of_formula f)
+  end;
+  (holding outs, holding flushed)
+
+let holds_at (f: formula) (trace: (int * string list) list) : int list =
+  let (decided, flushed) = run f trace in
+  decided @ flushed
+
+let unmonitorable (f: formula) : bool =
+  match Monitor.compile f with
+  | exception Monitor.Unmonitorable _ -> true
+  | _ -> false
+
+let once b f = UnTemporalOp (Once, f, b)
+let eventually b f = UnTemporalOp (Eventually, f, b)
+let since b f1 f2 = BinTemporalOp (Since, f1, f2, b)
+let until b f1 f2 = BinTemporalOp (Until, f1, f2, b)
+
+let test_once () =
+  let trace = [(0, []); (1, ["p"]); (5, []); (20, [])] in
+  expect "once unbounded keeps the earliest event" [1; 5; 20]
+    (holds_at (once None p) trace) show_stamps;
+  expect "once [0,3] expires after the window" [1]
+    (holds_at (once (Some (0, 3)) p) [(1, ["p"]); (5, [])]) show_stamps;
+  expect "once [0,3] holds at the window edge" [1; 3; 4]
+    (holds_at (once (Some (0, 3)) p) [(1, ["p"]); (3, []); (4, []); (6, [])]) show_stamps;
+  expect "once [2,5] ignores events closer than the lower bound" [3; 6]
+    (holds_at (once (Some (2, 5)) p) [(1, ["p"]); (2, []); (3, []); (6, []); (7, [])]) show_stamps
+
+let test_since () =
+  let trace = [(1, ["q"]); (2, ["p"]); (3, ["p"]); (4, []); (5, ["p"])] in
+  expect "since unbounded holds while the left operand does" [1; 2; 3]
+    (holds_at (since None p q) trace) show_stamps;
+  let trace = [(1, ["q"]); (2, ["p"]); (3, ["p"]); (4, ["p"])] in
+  expect "since [0,2] expires after the window" [1; 2; 3]
+    (holds_at (since (Some (0, 2)) p q) trace) show_stamps;
+  expect "since with a negated left operand" [1; 2]
+    (holds_at (since None (Not p) q) [(1, ["q"]); (2, []); (3, ["p"])]) show_stamps
+
+let test_eventually () =
+  expect "unbounded eventually is rejected" true
+    (unmonitorable (eventually None p)) string_of_bool;
+  let trace = [(1, []); (2, []); (4, []); (5, ["p"]); (9, [])] in
+  let (decided, flushed) = run (eventually (Some (0, 3)) p) trace in
+  expect "eventually [0,3] decides once the window has passed" [2; 4; 5] decided show_stamps;
+  expect "eventually [0,3] flushes the last point" [] flushed show_stamps;
+  let (decided, flushed) = run (eventually (Some (0, 3)) p) [(8, []); (10, ["p"])] in
+  expect "eventually holds back points inside the window" [] decided show_stamps;
+  expect "end of trace decides the held-back points" [8; 10] flushed show_stamps;
+  expect "eventually [1,3] needs a later event" [8]
+    (holds_at (eventually (Some (1, 3)) p) [(8, []); (10, ["p"])]) show_stamps
+
+let test_until () =
+  expect "unbounded until is rejected" true
+    (unmonitorable (until None p q)) string_of_bool;
+  let trace = [(1, ["p"]); (2, ["p"]); (3, ["q"]); (7, ["p"]); (8, [])] in
+  let (decided, flushed) = run (until (Some (0, 4)) p q) trace in
+  expect "until [0,4] holds up to the right operand" [1; 2; 3] decided show_stamps;
+  expect "until [0,4] flushes without a right operand" [] flushed show_stamps;
+  expect "until fails when the left operand breaks" [3]
+    (holds_at (until (Some (0, 4)) p q) [(1, ["p"]); (2, []); (3, ["q"])]) show_stamps;
+  expect "until [0,1] expires before a late right operand" [2; 3]
+    (holds_at (until (Some (0, 1)) p q) [(1, ["p"]); (2, ["p"]); (3, ["q"])]) show_stamps
+
+(* End to end: a request must be granted within 5 time units *)
+let test_monitor_channel () =
+  let policy = Quantified (Forall ["x"],
+    BinLogicalOp (Implies, Predicate ("request", [Var "x"]),
+      eventually (Some (0, 5)) (Predicate ("grant", [Var "x"])))) in
+  let file = Filename.temp_file "trace" ".log" in
+  let oc = open_out file in
+  List.iter (output_string oc) [
+    "@1 request(alice)\n"; "@2 request(bob)\n"; "@3 grant(alice)\n";
+    "# bob's window closes before this point\n"; "@10\n"; "@12 request(carol)\n";
+  ];
+  close_out oc;
+  let ic = open_in file in
+  let reported = ref [] in
+  let summary = Monitor.monitor_channel [Monitor.create_monitor 1 policy] ic
+    (fun _ (i, t, r) -> reported := (i, t, r.Monitor.rows) :: !reported) in
+  close_in ic;
+  Sys.remove file;
+  let show vs = String.concat "; " (List.map (fun (i, t, rows) ->
+    Printf.sprintf "%d@%d %s" i t
+      (String.concat "," (List.map (String.concat " ") rows))) vs) in
+  expect "violations reported with their binding, the last one at the flush"
+    [(1, 2, [["bob"]]); (4, 12, [["carol"]])] (List.rev !reported) show;
+  expect "summary counts points, events and violations" (5, 4, 2)
+    (summary.Monitor.points, summary.Monitor.events, summary.Monitor.violations)
+    (fun (a, b, c) -> Printf.sprintf "(%d, %d, %d)" a b c)
+
+let () =
+  test_once ();
+  test_since ();
+  test_eventually ();
+  test_until ();
+  test_monitor_channel ();
+  if !failures > 0 then begin
+    Printf.printf "%d failures\n" !failures;
+    exit 1
+  end
@@ -0,0 +1,134 @@
+"""PatternMatcher against the pattern-by-pattern Tier 1A loop it replaced"""
+
+import os
+import random
+
+import pytest
+
+from utils.pattern_matcher import AhoCorasick, PatternMatcher, load_patterns
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PATTERNS = load_patterns(os.path.join(ROOT, "policies", "tier1a_patterns.json"))
+
+
+# ============================================================================
+# REFERENCE: IntegratedTwoTierVerifier._check_hardcoded_patterns before
+# PatternMatcher, with _match_pattern_in_facts and _fuzzy_match
+# ============================================================================
+
+def _fuzzy_match(pattern, text):
+    pattern_clean = pattern.lower().replace('_', '').replace('-', '')
+    text_clean = str(text).lower().replace('_', '').replace('-', '')
+    return pattern_clean in text_clean or text_clean in pattern_clean
+
+
+def _match_pattern_in_facts(pattern, facts, query_lower):
+    total_checks = 0
+    matches = 0
+    fact_predicates = {f[0]: f[1:] for f in facts if len(f) >= 2}
+    if "entity_type" in pattern:
+        total_checks += 1
+        entity = fact_predicates.get('coveredEntity', [''])[0]
+        if any(_fuzzy_match(et, entity) for et in pattern["entity_type"]):
+            matches += 1
+    if "purpose" in pattern:
+        total_checks += 1
+        for fact in facts:
+            if fact[0] in ['disclose', 'permittedUseOrDisclosure'] and len(fact) >= 5:
+                if any(_fuzzy_match(p, fact[4]) for p in pattern["purpose"]):
+                    matches += 1
+                    break
+        if any(p.lower().replace('@', '') in query_lower for p in pattern["purpose"]):
+            matches += 0.5
+    if "recipient_type" in pattern:
+        total_checks += 1
+        for fact in facts:
+            if fact[0] == 'disclose' and len(fact) >= 3:
+                if any(_fuzzy_match(rt, fact[2]) for rt in pattern["recipient_type"]):
+                    matches += 1
+                    break
+    if "phi_type" in pattern:
+        total_checks += 1
+        if any(phi_type in query_lower for phi_type in pattern["phi_type"]):
+            matches += 1
+    return matches / total_checks if total_checks > 0 else 0.0
+
+
+def reference_best(patterns, query, facts):
+    query_lower = query.lower()
+    best_match, best_confidence = None, 0.0
+    for pattern_def in patterns:
+        keywords = pattern_def["keywords"]
+        keyword_matches = sum(1 for kw in keywords if kw in query_lower)
+        if keyword_matches < pattern_def["min_keywords"]:
+            continue
+        pattern_score = _match_pattern_in_facts(pattern_def["pattern"], facts, query_lower)
+        keyword_conf = min(1.0, keyword_matches / len(keywords))
+        confidence = (0.4 * keyword_conf + 0.6 * pattern_score) * pattern_def["confidence_base"]
+        if confidence > best_confidence:
+            best_match, best_confidence = pattern_def, confidence
+    return (best_match, best_confidence) if best_match is not None else None
+
+
+# ============================================================================
+# EQUIVALENCE
+# ============================================================================
+
+WORDS = sorted({w for p in PATTERNS for w in p["keywords"] + sum(p["pattern"].values(), [])}
+               | {"x", "the", "about", "Treatment", "pick up"})
+VALUES = WORDS + ["@Treatment", "@Payment", "covered_entity", "Hospital-A", "", "dr_smith", "cdc_office"]
+PREDICATES = ["coveredEntity", "disclose", "permittedUseOrDisclosure", "protectedHealthInfo"]
+
+
+def random_case(rng):
+    query = " ".join(rng.choice(WORDS) for _ in range(rng.randint(0, 8)))
+    facts = [[rng.choice(PREDICATES)] + [rng.choice(VALUES) for _ in range(rng.randint(0, 5))]
+             for _ in range(rng.randint(0, 5))]
+    return query, facts
+
+
+def test_shipped_patterns_load():
+    assert len(PATTERNS) == 6
+    assert all({"name", "cite", "keywords", "min_keywords", "pattern", "confidence_base"} <= p.keys()
+               for p in PATTERNS)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_same_result_as_reference(seed):
+    matcher = PatternMatcher(PATTERNS)
+    rng = random.Random(seed)
+    for _ in range(2500):
+        query, facts = random_case(rng)
+        assert matcher.best(query, facts) == reference_best(PATTERNS, query, facts), (query, facts)
+
+
+def test_same_result_with_many_patterns():
+    rng = random.Random(7)
+    patterns = [{**rng.choice(PATTERNS), "name": f"p{i}",
+                 "keywords": [f"kw{i}a", f"kw{i}b", rng.choice(WORDS)], "min_keywords": rng.randint(0, 2)}
+                for i in range(300)]
+    matcher = PatternMatcher(patterns)
+    for _ in range(300):
+        query, facts = random_case(rng)
+        query += " " + " ".join(f"kw{rng.randrange(300)}{rng.choice('ab')}" for _ in range(3))
+        assert matcher.best(query, facts) == reference_best(patterns, query, facts), (query, facts)
+
+
+@pytest.mark.parametrize("query, facts, name", [
+    ("Can the hospital share records with the patient's doctor for treatment?",
+     [["coveredEntity", "hospital"], ["disclose", "hospital", "doctor", "phi", "@Treatment"]],
+     "Treatment Use (Internal)"),
+    ("What is the weather?", [], None),
+])
+def test_examples(query, facts, name):
+    best = PatternMatcher(PATTERNS).best(query, facts)
+    assert best == reference_best(PATTERNS, query, facts)
+    assert (best[0]["name"] if best else None) == name
+
+
+def test_aho_corasick_matches_naive_search():
+    rng = random.Random(0)
+    for _ in range(3000):
+        needles = ["".join(rng.choice("ab") for _ in range(rng.randint(0, 4))) for _ in range(6)]
+        text = "".join(rng.choice("abc") for _ in range(rng.randint(0, 12)))
+        assert AhoCorasick(needles).find(text) == {i for i, n in enumerate(needles) if n in text}
@@ -0,0 +1,100 @@
+"""PrecisServer's watchdog against a stand-in `precis serve`"""
+
+import textwrap
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from utils import precis_client
+from utils.precis_client import PrecisServer
+
+# Echoes each request's formula back; sleeps first when it asks to
+FAKE_SERVE = textwrap.dedent('''\
+    import json, sys, time
+
+    for line in sys.stdin:
+        req = json.loads(line)
+        if req.get("op") == "hello":
+            print(json.dumps({"op": "hello", "wire": "json"}), flush=True)
+            continue
+        formula = req.get("formula", "")
+        if formula.startswith("sleep"):
+            time.sleep(float(formula.split()[1]))
+        print(json.dumps({"formula": formula, "evaluations": [], "violations": []}), flush=True)
+    ''')
+
+
+@pytest.fixture
+def server(fake_precis):
+    s = PrecisServer(precis_path=fake_precis(FAKE_SERVE), wire="json")
+    yield s
+    s.close()
+
+
+def test_answers_on_one_process(server):
+    assert server.request({"formula": "a"}, timeout=5)["formula"] == "a"
+    pid = server._proc.pid
+    assert server.request({"formula": "b"}, timeout=5)["formula"] == "b"
+    assert server._proc.pid == pid
+
+
+def test_timeout_kills_and_restarts(server):
+    response = server.request({"formula": "sleep 5"}, timeout=0.2)
+    assert response["success"] is False and "timed out" in response["error"]
+    assert server.request({"formula": "after"}, timeout=5)["formula"] == "after"
+
+
+def test_cancel(server):
+    cancel = threading.Event()
+    threading.Timer(0.1, cancel.set).start()
+    response = server.request({"formula": "sleep 5"}, timeout=5, cancel=cancel)
+    assert response.get("cancelled") is True
+    assert server.request({"formula": "after"}, timeout=5)["formula"] == "after"
+
+
+def test_no_kill_after_an_answer(server, monkeypatch):
+    """The watchdog sees its deadline pass just as the answer comes back:
+    it must not kill the process, which may be serving the next request"""
+    server.request({"formula": "warm up"})
+    pid = server._proc.pid
+    main = threading.current_thread()
+    deadline_set, answered = threading.Event(), threading.Event()
+
+    def monotonic():
+        if threading.current_thread() is main:
+            return time.monotonic()
+        if not deadline_set.is_set():
+            deadline_set.set()  # the watchdog computing its deadline
+            return time.monotonic()
+        answered.wait(5)  # check the deadline only once the answer is back
+        return time.monotonic() + 100
+    monkeypatch.setattr(precis_client, "time", SimpleNamespace(monotonic=monotonic))
+    kills = []
+    real_kill = server.kill
+    server.kill = lambda: (kills.append(1), real_kill())
+
+    assert server.request({"formula": "q"}, timeout=5)["formula"] == "q"
+    answered.set()
+    time.sleep(0.2)  # the watchdog has finished by now
+    assert kills == []
+    assert server.request({"formula": "next"}, timeout=5)["formula"] == "next"
+    assert server._proc.pid == pid
+
+
+def test_deadline_passing_as_the_answer_arrives(server):
+    """The watchdog fires while the answer is being read: the answer is
+    kept, and the killed process is replaced for the next request"""
+    real_exchange = server._exchange
+
+    def slow_tail(payload):
+        response = real_exchange(payload)
+        if payload.get("formula") == "late":
+            time.sleep(0.3)
+        return response
+
+    server._exchange = slow_tail
+    server.request({"formula": "warm up"})
+    assert server.request({"formula": "late"}, timeout=0.1)["formula"] == "late"
+    assert server.request({"formula": "next"}, timeout=5)["formula"] == "next"
@@ -0,0 +1,97 @@
+"""Lean (__slots__) responses carry the same data as the dataclass ones"""
+
+import dataclasses
+import json
+import os
+
+import pytest
+
+from policy_checker import Evaluation, LeanEvaluation, LeanPolicyMatch, PolicyChecker, PolicyMatch
+from utils import response_benchmark
+from utils.reference_evaluator import ReferenceEngine
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PRECIS = os.path.join(ROOT, "precis")  # only its directory is used, for policies/ and data/
+
+MATCH_FIELDS = [f.name for f in dataclasses.fields(PolicyMatch)]
+EVALUATION_FIELDS = [f.name for f in dataclasses.fields(Evaluation)]
+
+SAMPLE = {
+    "matched_policies": [
+        {"policy_id": "p1", "regulation": "HIPAA", "section": "164.502", "description": "d1",
+         "relevance_score": 0.5, "matched_terms": ["disclose", "coveredEntity"]},
+        {"policy_id": "p2", "regulation": "HIPAA", "section": "164.508", "description": "d2",
+         "relevance_score": 0.25, "matched_terms": []},
+    ],
+    "evaluations": [
+        {"policy_id": "p1", "regulation": "HIPAA", "section": "164.502", "description": "d1",
+         "formula_text": "forall x. p(x)", "evaluation": {"result": "true"}, "explanation": "ok"},
+        {"policy_id": "p2", "regulation": "HIPAA", "section": "164.508", "description": "d2",
+         "formula_text": "exists y. q(y)", "evaluation": {"result": "false"}, "explanation": "no",
+         "witness": {"binding": {"x": "alice"}, "atoms": [{"predicate": "q", "arguments": ["alice"],
+                                                           "holds": False}]}},
+        {"policy_id": "p3", "regulation": "HIPAA", "section": "164.510", "description": "d3",
+         "formula_text": "r", "explanation": "budget",
+         "evaluation": {"result": "unknown", "reason": "max_assignments", "assignments": 10}},
+    ],
+    "overall_compliant": False,
+    "violations": ["p2"],
+    "undecided": ["p3"],
+}
+
+
+def assert_same(standard, lean):
+    assert all(type(m) is LeanPolicyMatch for m in lean.matched_policies)
+    assert all(type(e) is LeanEvaluation for e in lean.evaluations)
+    for top in ("overall_compliant", "violations", "error", "undecided", "stats"):
+        assert getattr(standard, top) == getattr(lean, top), top
+    assert len(standard.matched_policies) == len(lean.matched_policies)
+    for s, l in zip(standard.matched_policies, lean.matched_policies):
+        assert {f: getattr(s, f) for f in MATCH_FIELDS} == {f: getattr(l, f) for f in MATCH_FIELDS}
+    assert len(standard.evaluations) == len(lean.evaluations)
+    for s, l in zip(standard.evaluations, lean.evaluations):
+        assert {f: getattr(s, f) for f in EVALUATION_FIELDS} == {f: getattr(l, f) for f in EVALUATION_FIELDS}
+
+
+def test_lean_objects_have_no_dict():
+    response = PolicyChecker.parse_response(SAMPLE, lean=True)
+    for obj in response.matched_policies + response.evaluations:
+        assert not hasattr(obj, "__dict__")
+
+
+def test_lean_matches_standard():
+    assert_same(PolicyChecker.parse_response(SAMPLE), PolicyChecker.parse_response(SAMPLE, lean=True))
+
+
+def test_lean_rebuilds_formula_text():
+    stripped = json.loads(response_benchmark.strip_formula_text(json.dumps(SAMPLE)))
+    texts = {e["policy_id"]: e["formula_text"] for e in SAMPLE["evaluations"]}
+    calls = []
+
+    def formula_texts(regulation, policy_id, section, description):
+        calls.append(policy_id)
+        return texts[policy_id]
+
+    lean = PolicyChecker.parse_response(stripped, lean=True, formula_texts=formula_texts)
+    assert calls == []  # nothing is looked up until it is read
+    assert_same(PolicyChecker.parse_response(SAMPLE), lean)
+    assert_same(PolicyChecker.parse_response(SAMPLE), lean)
+    assert calls == ["p1", "p2", "p3"]  # each looked up once
+
+
+def test_recorded_responses_round_trip():
+    """Engine-shaped responses, formula_text left out and rebuilt from the policy files"""
+    engine = ReferenceEngine(ROOT)
+    texts = response_benchmark.record(PRECIS, cases=5, policies=5, entities=3, seed=1)
+    assert texts
+    for text in texts:
+        standard = PolicyChecker.parse_response(json.loads(text))
+        lean = PolicyChecker.parse_response(json.loads(response_benchmark.strip_formula_text(text)),
+                                            lean=True, formula_texts=engine.formula_text)
+        assert_same(standard, lean)
+
+
+def test_benchmark_runs(capsys):
+    assert response_benchmark.main(["--precis", PRECIS, "--cases", "2", "--policies", "2",
+                                    "--repeat", "1"]) == 0
+    assert "json / lean" in capsys.readouterr().out
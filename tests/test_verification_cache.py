@@ -0,0 +1,103 @@
+"""SingleFlight coalescing and the cache key"""
+
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from utils import verification_cache
+from utils.verification_cache import SingleFlight, VerificationCache
+
+
+def test_followers_share_the_leaders_result():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def work():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "result"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("k", work)))
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=lambda: results.append(flight.do("k", work)))
+    follower.start()
+    time.sleep(0.05)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    assert results == ["result", "result"]
+    assert len(calls) == 1
+    assert flight.stats()["coalesced"] == 1
+
+
+def test_follower_gives_up_after_its_own_timeout():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def work():
+        started.set()
+        release.wait(5)
+        return "late"
+
+    leader_result = []
+    leader = threading.Thread(target=lambda: leader_result.append(flight.do("k", work)))
+    leader.start()
+    started.wait(5)
+    begun = time.monotonic()
+    with pytest.raises(TimeoutError):
+        flight.do("k", work, timeout=0.1)
+    assert time.monotonic() - begun < 2
+    release.set()
+    leader.join(5)
+    assert leader_result == ["late"]  # the leader is not affected
+
+
+def test_cached_precis_call_follower_times_out(tmp_path, monkeypatch):
+    script = tmp_path / "precis"
+    script.write_text(f"#!{sys.executable}\nimport sys, time\nsys.stdin.read()\ntime.sleep(3)\nprint('{{}}')\n")
+    script.chmod(0o755)
+    monkeypatch.setenv("PRECIS_CACHE_SIZE", "0")
+    monkeypatch.setenv("PRECIS_INPROCESS_MAX_COST", "0")
+    monkeypatch.setattr(verification_cache, "_default_cache", None)
+    request = {"formula": "p(x)", "facts": {"facts": []}}
+
+    leader = threading.Thread(
+        target=lambda: verification_cache.cached_precis_call(str(script), request, timeout=10))
+    leader.start()
+    time.sleep(0.3)
+    with pytest.raises(subprocess.TimeoutExpired):
+        verification_cache.cached_precis_call(str(script), request, timeout=0.2)
+    leader.join(10)
+
+
+def test_key_depends_on_cwd(tmp_path):
+    cache = VerificationCache(max_entries=8)
+    request = {"formula": "p(x)", "facts": {"facts": []}}
+    precis = sys.executable
+    a, b = tmp_path / "a", tmp_path / "b"
+    a.mkdir()
+    b.mkdir()
+    assert cache.key(precis, request, cwd=str(a)) != cache.key(precis, request, cwd=str(b))
+    assert cache.key(precis, request, cwd=str(a)) == cache.key(precis, request, cwd=str(a))
+    assert cache.key(precis, request) == cache.key(precis, request)
+
+
+def test_key_ignores_the_budget():
+    cache = VerificationCache(max_entries=8)
+    request = {"formula": "p(x)", "facts": {"facts": []}}
+    keys = {cache.key(sys.executable, {**request, "budget": budget})
+            for budget in ({"request": {"timeout_ms": 24000}}, {"request": {"timeout_ms": 8000}})}
+    keys.add(cache.key(sys.executable, request))
+    assert len(keys) == 1
+
+
+def test_budget_limited_responses_are_not_cached():
+    assert verification_cache.cacheable('{"evaluations": [], "violations": []}')
+    assert not verification_cache.cacheable('{"evaluations": [], "undecided": ["p1"]}')
@@ -0,0 +1,236 @@
+"""
+async_precis_client.py - asyncio client for resident Précis workers
+
+AsyncPrecisClient keeps a small pool of `precis serve` processes driven
+through asyncio pipes, so a verification awaits instead of blocking a
+thread. At most `max_workers` requests run at once; the rest wait for a
+free worker. Every request has a deadline covering both the wait and the
+engine's work. Identical requests in flight at the same time share one
+evaluation. A request that is cancelled or runs past its deadline
+kills the worker it was using (its pipe may hold half a response), and a
+fresh worker is started for the next request.
+
+Usage:
+    client = AsyncPrecisClient(max_workers=4)
+    result = await client.verify(formula, facts)          # like OCamlPrecisVerifier.verify
+    response = await client.check_policy(request)         # like PolicyChecker.check_policy
+    await client.close()
+"""
+
+import asyncio
+import json
+import struct
+import time
+from typing import Any, Dict, List, Optional
+
+from config import get_precis_path
+from policy_checker import PolicyChecker, QueryRequest, QueryResponse
+from utils.precis_client import _fact_to_json, load_msgpack
+from utils.precis_engine import handshake, to_result, verifiable_facts, with_budget, wrap_policy
+from utils.reference_evaluator import route_small
+from utils.verification_cache import AsyncSingleFlight, cacheable, default_cache
+
+# Responses can be large (formula text, witnesses); asyncio's default
+# line limit is 64 KiB
+STREAM_LIMIT = 16 * 1024 * 1024
+
+
+class AsyncPrecisWorker:
+    """One resident `precis serve` process on asyncio pipes"""
+
+    def __init__(self, precis_path: str, wire: str = "auto", formula_text: bool = False):
+        self.precis_path = precis_path
+        self.wire = wire
+        self.formula_text = formula_text
+        self._proc: Optional[asyncio.subprocess.Process] = None
+        self._wire = "json"
+
+    @property
+    def alive(self) -> bool:
+        return self._proc is not None and self._proc.returncode is None
+
+    async def start(self):
+        self._proc = await asyncio.create_subprocess_exec(
+            self.precis_path, "serve",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            limit=STREAM_LIMIT
+        )
+        self._wire = "json"
+        offered = ["msgpack", "json"] if self.wire != "json" and load_msgpack() is not None else ["json"]
+        reply = await self.request({"op": "hello", "wire": offered, "formula_text": self.formula_text})
+        self._wire = reply.get("wire", "json") if "error" not in reply else "json"
+
+    async def _exchange(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        stdin, stdout = self._proc.stdin, self._proc.stdout
+        if self._wire == "msgpack":
+            msgpack = load_msgpack()
+            body = msgpack.packb(payload, use_bin_type=True)
+            stdin.write(struct.pack(">I", len(body)) + body)
+            await stdin.drain()
+            (length,) = struct.unpack(">I", await stdout.readexactly(4))
+            return msgpack.unpackb(await stdout.readexactly(length), raw=False)
+
+        stdin.write((json.dumps(payload) + "\n").encode("utf-8"))
+        await stdin.drain()
+        line = await stdout.readline()
+        if not line:
+            raise EOFError("Précis server exited unexpectedly")
+        return json.loads(line)
+
+    async def request(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Send one request and await its response. Any failure, including
+        cancellation, leaves the pipes in an unknown state, so the
+        process is killed before the exception propagates.
+        """
+        try:
+            return await self._exchange(payload)
+        except BaseException:
+            self.kill()
+            raise
+
+    def kill(self):
+        if self.alive:
+            self._proc.kill()
+
+    async def close(self):
+        if self.alive:
+            try:
+                self._proc.stdin.close()
+                await asyncio.wait_for(self._proc.wait(), timeout=5)
+            except Exception:
+                self.kill()
+        self._proc = None
+
+
+class AsyncPrecisClient:
+    """
+    Pool of resident Précis workers for asyncio callers
+
+    max_workers: requests evaluated concurrently (one process each).
+    timeout: default deadline in seconds per request, including the time
+    spent waiting for a free worker.
+    wire, formula_text: as for PrecisServer.
+    """
+
+    def __init__(self, precis_path: Optional[str] = None, max_workers: int = 4,
+                 timeout: float = 30, wire: str = "auto", formula_text: bool = False):
+        if wire == "msgpack" and load_msgpack() is None:
+            raise RuntimeError("wire='msgpack' requires the msgpack package")
+        self.precis_path = precis_path or get_precis_path()
+        self.info = handshake(self.precis_path) if self.precis_path else None
+        self.max_workers = max(1, max_workers)
+        self.timeout = timeout
+        self.wire = wire
+        self.formula_text = formula_text
+        self._slots = asyncio.Semaphore(self.max_workers)
+        self._idle: List[AsyncPrecisWorker] = []
+        self.recycled = 0  # workers killed by cancellation, deadlines or crashes
+        self._in_flight = AsyncSingleFlight()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Cache, coalescing and worker counters"""
+        return {"cache": default_cache().stats(), "in_flight": self._in_flight.stats(),
+                "workers": len(self._idle), "recycled": self.recycled}
+
+    async def _run(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        async with self._slots:
+            worker = self._idle.pop() if self._idle else None
+            if worker is None or not worker.alive:
+                worker = AsyncPrecisWorker(self.precis_path, self.wire, self.formula_text)
+                await worker.start()
+            try:
+                response = await worker.request(payload)
+            except BaseException:
+                self.recycled += 1
+                raise
+            self._idle.append(worker)
+            return response
+
+    async def request(self, payload: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Send one request to a free worker within the deadline. Transport
+        failures and missed deadlines come back as error responses;
+        cancellation of the awaiting task propagates.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        if self.precis_path is None:
+            return {"success": False, "error": "Précis executable not found"}
+        try:
+            return await asyncio.wait_for(self._run(payload), timeout)
+        except asyncio.TimeoutError:
+            return {"success": False, "retryable": True,
+                    "error": f"Précis request timed out after {timeout} seconds"}
+        except (EOFError, asyncio.IncompleteReadError, BrokenPipeError, OSError) as e:
+            return {"success": False, "retryable": True,
+                    "error": f"Précis server unavailable: {e}"}
+
+    async def _cached_request(self, payload: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        """request() through the verification cache, coalescing identical requests"""
+        if self.precis_path is None:
+            return await self.request(payload, timeout)
+        cache = default_cache()
+        key = cache.key(self.precis_path, payload, ("serve", str(self.formula_text)))
+        hit = cache.get(key) if cache.enabled else None
+        if hit is not None:
+            return json.loads(hit)
+
+        async def run() -> str:
+            # Small queries are answered in-process, off the event loop
+            routed = await asyncio.get_running_loop().run_in_executor(
+                None, route_small, self.precis_path, payload, self.formula_text)
+            text = json.dumps(routed if routed is not None else await self.request(payload, timeout))
+            if cache.enabled and cacheable(text):
+                cache.put(key, text)
+            return text
+
+        return json.loads(await self._in_flight.do(key, run))
+
+    async def query(self, formula: str, facts: list, regulation: Optional[str] = None,
+                    timeout: Optional[float] = None) -> Dict[str, Any]:
+        """One-shot query, same response shape as `precis json`"""
+        timeout = self.timeout if timeout is None else timeout
+        payload = {
+            "formula": formula,
+            "facts": {"facts": [_fact_to_json(f) for f in facts]}
+        }
+        if regulation:
+            payload["regulation"] = regulation
+        return await self._cached_request(with_budget(payload, timeout, self.info), timeout)
+
+    async def verify(self, formula: str, facts: List[List], regulation: str = "HIPAA",
+                     timeout: Optional[float] = None) -> Dict:
+        """Drop-in for OCamlPrecisVerifier.verify"""
+        start = time.perf_counter()
+        response = await self.query(wrap_policy(formula, regulation), verifiable_facts(facts),
+                                    regulation=regulation, timeout=timeout)
+        return to_result(response, (time.perf_counter() - start) * 1000).to_verification()
+
+    async def check_policy(self, request: QueryRequest, timeout: float = 30,
+                           verbose: bool = False) -> QueryResponse:
+        """Drop-in for PolicyChecker.check_policy"""
+        payload = with_budget(json.loads(request.to_json()), timeout, self.info)
+        data = await self._cached_request(payload, timeout)
+        if verbose:
+            print(f"📤 Précis response: {json.dumps(data)[:500]}")
+        if "error" in data:
+            return QueryResponse(
+                matched_policies=[],
+                evaluations=[],
+                overall_compliant=False,
+                violations=[],
+                error=data["error"]
+            )
+        return PolicyChecker.parse_response(data)
+
+    async def close(self):
+        workers, self._idle = self._idle, []
+        await asyncio.gather(*(w.close() for w in workers), return_exceptions=True)
+
+    async def __aenter__(self) -> "AsyncPrecisClient":
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
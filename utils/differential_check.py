@@ -0,0 +1,235 @@
+"""
+differential_check.py - Compare the reference evaluator with Précis
+
+Every bundled policy is sent as a query (so it matches itself and its
+neighbours) together with random fact sets over the predicates it uses,
+to both `precis json` and ReferenceEngine. The verdicts, violations,
+matched policies and witnesses must agree; any difference is printed.
+
+    python -m utils.differential_check                     # all policies, 5 fact sets each
+    python -m utils.differential_check --regulation HIPAA --cases 20 --seed 7
+
+Exits 1 if the engines disagreed on any case.
+
+The binary's answers can be recorded as fixtures, so the comparison also
+runs where no engine binary does (tests/test_differential.py replays
+them):
+
+    python -m utils.differential_check --record tests/fixtures/precis   # needs Précis
+    python -m utils.differential_check --replay tests/fixtures/precis   # reference only
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import get_precis_path
+from utils.fotl_parser import COMPARISONS, Formula, Predicate, to_source
+from utils.reference_evaluator import Declined, ReferenceEngine, engine_for
+
+
+def predicates_of(f: Formula) -> Dict[str, int]:
+    """Predicate names used in f (comparisons excluded) with their arities"""
+    found: Dict[str, int] = {}
+
+    def walk(g):
+        if isinstance(g, Predicate):
+            if g.name not in COMPARISONS:
+                found.setdefault(g.name, len(g.args))
+        elif hasattr(g, "body"):
+            walk(g.body)
+        elif hasattr(g, "left"):
+            walk(g.left)
+            walk(g.right)
+
+    walk(f)
+    return found
+
+
+def random_facts(rng: random.Random, predicates: Dict[str, int], entities: int,
+                 density: float) -> List[Dict[str, Any]]:
+    """About `density` of the possible ground atoms of each predicate, drawn at random"""
+    pool = [f"e{i}" for i in range(entities)]
+    facts = []
+    for name, arity in sorted(predicates.items()):
+        for _ in range(max(1, int(density * entities ** arity))):
+            facts.append({"predicate": name, "arguments": [rng.choice(pool) for _ in range(arity)]})
+    # Duplicates are harmless to both engines but make failures harder to read
+    unique = {json.dumps(f, sort_keys=True): f for f in facts}
+    return list(unique.values())
+
+
+def query_request(regulation: str, policy: Formula, facts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    formula = f"regulation {regulation}\npolicy starts\n{to_source(policy)}\n;\npolicy ends"
+    return {"formula": formula, "facts": {"facts": facts}, "regulation": regulation}
+
+
+def run_precis(precis_path: str, request: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+    # Straight to the binary: the cache and the in-process route would
+    # hand back the reference's own answer
+    proc = subprocess.run([precis_path, "json"], input=json.dumps(request), text=True,
+                          capture_output=True, timeout=timeout)
+    try:
+        return json.loads(proc.stdout)
+    except json.JSONDecodeError:
+        return {"error": proc.stderr or proc.stdout or f"exit status {proc.returncode}"}
+
+
+def normalise(response: Dict[str, Any]) -> Dict[str, Any]:
+    """The parts of a response both engines must agree on"""
+    return {
+        "matched": [(m["policy_id"], round(m["relevance_score"], 9), m["matched_terms"])
+                    for m in response.get("matched_policies", [])],
+        "evaluations": [(e["policy_id"], e["evaluation"]["result"], e.get("formula_text"),
+                         e["explanation"], e.get("witness"))
+                        for e in response.get("evaluations", [])],
+        "violations": response.get("violations"),
+        "overall_compliant": response.get("overall_compliant"),
+    }
+
+
+def differences(expected: Dict[str, Any], actual: Dict[str, Any]) -> List[str]:
+    out = []
+    for field in ("matched", "violations", "overall_compliant"):
+        if expected[field] != actual[field]:
+            out.append(f"{field}: precis={expected[field]!r} reference={actual[field]!r}")
+    for e, a in zip(expected["evaluations"], actual["evaluations"]):
+        if e != a:
+            out.append(f"evaluation {e[0]}: precis={e!r} reference={a!r}")
+    if len(expected["evaluations"]) != len(actual["evaluations"]):
+        out.append(f"evaluations: precis={len(expected['evaluations'])} "
+                   f"reference={len(actual['evaluations'])}")
+    return out
+
+
+def compare(engine: ReferenceEngine, label: str, request: Dict[str, Any],
+            expected: Dict[str, Any]) -> str:
+    """Compare the reference's answer to `request` with Précis's; prints any
+    difference. Returns "compared", "declined" or "mismatch"."""
+    try:
+        actual = engine.answer(request)
+    except Declined as e:
+        # Then the engine must have refused it too
+        if "error" not in expected:
+            print(f"✗ {label}: reference declined ({e}), precis answered")
+            return "mismatch"
+        return "declined"
+    if "error" in expected:
+        print(f"✗ {label}: precis failed: {expected['error']}")
+        return "mismatch"
+    diff = differences(normalise(expected), normalise(actual))
+    if diff:
+        print(f"✗ {label}:")
+        for line in diff:
+            print(f"    {line}")
+        print(f"    facts: {json.dumps(request['facts']['facts'])}")
+        return "mismatch"
+    return "compared"
+
+
+def cases_for(engine: ReferenceEngine, regulation: str, cases: int, entities: int,
+              density: float, rng: random.Random):
+    """(label, request) for `cases` random fact sets per policy of a regulation"""
+    for policy in engine.store.policies(regulation):
+        predicates = predicates_of(policy.formula)
+        for case in range(cases):
+            yield (f"{policy.id} case {case}",
+                   query_request(regulation, policy.formula,
+                                 random_facts(rng, predicates, entities, density)))
+
+
+def _tally(outcomes: List[str]) -> Tuple[int, int, int]:
+    return outcomes.count("compared"), outcomes.count("declined"), outcomes.count("mismatch")
+
+
+def check(precis_path: str, engine: ReferenceEngine, regulation: Optional[str], cases: int,
+          entities: int, density: float, seed: int, timeout: float) -> Tuple[int, int, int]:
+    """Returns (cases compared, cases declined by the reference, mismatches)"""
+    rng = random.Random(seed)
+    regulations = [regulation] if regulation else sorted(engine.store.regulation_files())
+    return _tally([compare(engine, label, request, run_precis(precis_path, request, timeout))
+                   for reg in regulations
+                   for label, request in cases_for(engine, reg, cases, entities, density, rng)])
+
+
+def record(precis_path: str, engine: ReferenceEngine, regulation: Optional[str], cases: int,
+           entities: int, density: float, seed: int, timeout: float, out_dir: str) -> int:
+    """Write Précis's answers as fixtures, one <REGULATION>.json per
+    regulation; returns the number of cases recorded"""
+    os.makedirs(out_dir, exist_ok=True)
+    rng = random.Random(seed)
+    regulations = [regulation] if regulation else sorted(engine.store.regulation_files())
+    recorded = 0
+    for reg in regulations:
+        fixture = [{"label": label, "request": request,
+                    "response": run_precis(precis_path, request, timeout)}
+                   for label, request in cases_for(engine, reg, cases, entities, density, rng)]
+        if not fixture:
+            continue
+        with open(os.path.join(out_dir, f"{reg}.json"), "w", encoding="utf-8") as f:
+            json.dump(fixture, f, indent=1, ensure_ascii=False, sort_keys=True)
+            f.write("\n")
+        recorded += len(fixture)
+    return recorded
+
+
+def fixture_files(fixture_dir: str) -> List[str]:
+    if not os.path.isdir(fixture_dir):
+        return []
+    return [os.path.join(fixture_dir, n) for n in sorted(os.listdir(fixture_dir)) if n.endswith(".json")]
+
+
+def replay(engine: ReferenceEngine, fixture: str) -> Tuple[int, int, int]:
+    """check() against the answers recorded in one fixture file"""
+    with open(fixture, encoding="utf-8") as f:
+        cases = json.load(f)
+    return _tally([compare(engine, c["label"], c["request"], c["response"]) for c in cases])
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare the reference evaluator with Précis")
+    parser.add_argument("--precis", help="Précis executable (default: config.get_precis_path())")
+    parser.add_argument("--regulation", help="only this regulation's policies")
+    parser.add_argument("--cases", type=int, default=5, help="random fact sets per policy")
+    parser.add_argument("--entities", type=int, default=3, help="entities per fact set")
+    parser.add_argument("--density", type=float, default=0.3,
+                        help="fraction of possible ground atoms per predicate")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--record", metavar="DIR", help="write Précis's answers as fixtures instead")
+    parser.add_argument("--replay", metavar="DIR", help="compare against recorded fixtures, without Précis")
+    args = parser.parse_args(argv)
+
+    precis_path = args.precis or get_precis_path()
+    if args.replay:
+        # Only policies/ and data/ beside the executable are read
+        engine = engine_for(precis_path or os.path.join(os.getcwd(), "precis"))
+        totals = [replay(engine, f) for f in fixture_files(args.replay)]
+        if not totals:
+            print(f"❌ No fixtures in {args.replay}")
+            return 2
+        compared, declined, mismatches = (sum(t[i] for t in totals) for i in range(3))
+        print(f"\n{compared} compared, {declined} declined by the reference, {mismatches} mismatch(es)")
+        return 1 if mismatches else 0
+
+    if precis_path is None:
+        print("❌ Précis executable not found")
+        return 2
+    if args.record:
+        recorded = record(precis_path, engine_for(precis_path), args.regulation, args.cases,
+                          args.entities, args.density, args.seed, args.timeout, args.record)
+        print(f"Recorded {recorded} case(s) in {args.record}")
+        return 0
+    compared, declined, mismatches = check(
+        precis_path, engine_for(precis_path), args.regulation, args.cases,
+        args.entities, args.density, args.seed, args.timeout)
+    print(f"\n{compared} compared, {declined} declined by the reference, {mismatches} mismatch(es)")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
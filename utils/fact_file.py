@@ -0,0 +1,202 @@
+"""
+fact_file.py - Hand large fact sets to Précis through a mapped file
+
+A request's facts normally travel inline as JSON through the subprocess
+pipe, and Précis decodes every one of them again. For very large fact
+sets a request can instead carry
+
+    "facts_file": {"path": "/tmp/precis-facts/3f9c....bin", "offset": 0}
+
+naming a file in the engine's binary data layout (Data_loaders.BinaryData:
+a symbol table followed by columnar name/arity/argument tables). Précis
+maps the file and reads the fact table straight from the mapping; the pipe
+carries only the formula.
+
+write_fact_file() writes such a file once. Files are named after their
+contents, so the same fact set written twice reuses the file already on
+disk, and its cache key stays stable. Several fact sets can share one file
+(append=True); each gets its own offset. Files produced by `precis
+convert` work as well.
+
+Configuration:
+    PRECIS_FACTS_FILE_MIN   fact count from which with_facts() switches to a
+                            facts file (default 100000; 0 never switches)
+    PRECIS_FACTS_FILE_DIR   directory for written files (default: <tmp>/precis-facts)
+    PRECIS_FACTS_FILE_KEEP  written files kept before the oldest are removed (default 16)
+
+Usage:
+    ff = write_fact_file(facts)
+    request = {"formula": formula, "facts_file": ff.to_json(), "regulation": "HIPAA"}
+"""
+
+import hashlib
+import os
+import sys
+import tempfile
+import time
+from array import array
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+MAGIC = b"PRECISB1"
+DEFAULT_MIN_FACTS = 100000
+DEFAULT_KEEP = 16
+
+
+@dataclass(frozen=True)
+class FactFile:
+    """A fact table inside a binary data file"""
+    path: str
+    offset: int = 0
+
+    def to_json(self) -> Dict[str, Any]:
+        return {"path": self.path, "offset": self.offset}
+
+
+def min_facts() -> int:
+    """PRECIS_FACTS_FILE_MIN; 0 keeps facts inline however many there are"""
+    try:
+        return int(os.environ.get("PRECIS_FACTS_FILE_MIN", DEFAULT_MIN_FACTS))
+    except ValueError:
+        return DEFAULT_MIN_FACTS
+
+
+def facts_dir() -> str:
+    return os.environ.get("PRECIS_FACTS_FILE_DIR") or os.path.join(tempfile.gettempdir(), "precis-facts")
+
+
+def _rows(facts: Iterable[Any]) -> List[Tuple[str, ...]]:
+    """Accept ["pred", "a", "b"], ("pred", ...), {"predicate", "arguments"} or Fact objects"""
+    rows = []
+    for f in facts:
+        if isinstance(f, dict):
+            rows.append((f["predicate"], *f.get("arguments", [])))
+        elif hasattr(f, "predicate"):
+            rows.append((f.predicate, *f.arguments))
+        else:
+            rows.append(tuple(f))
+    return rows
+
+
+def _u32(values) -> bytes:
+    a = array("I", values)
+    if a.itemsize != 4:  # pragma: no cover - every supported platform has 4-byte unsigned int
+        a = array("L", values)
+    if sys.byteorder == "big":
+        a.byteswap()
+    return a.tobytes()
+
+
+def encode_facts(facts: Iterable[Any]) -> bytes:
+    """One section in the BinaryData layout: symbols, then empty domain,
+    the fact table, and empty functions"""
+    ids: Dict[str, int] = {}
+    blob = bytearray()
+    offsets = [0]
+    names: List[int] = []
+    arities: List[int] = []
+    args: List[int] = []
+
+    def intern(s: str) -> int:
+        i = ids.get(s)
+        if i is None:
+            i = ids[s] = len(ids)
+            blob.extend(str(s).encode("utf-8"))
+            offsets.append(len(blob))
+        return i
+
+    for pred, *row_args in _rows(facts):
+        names.append(intern(pred))
+        arities.append(len(row_args))
+        args.extend(intern(a) for a in row_args)
+
+    empty_table = _u32([0, 0])
+    return b"".join([
+        MAGIC,
+        _u32([len(ids), len(blob)]),
+        _u32(offsets),
+        bytes(blob),
+        empty_table,
+        _u32([len(names), len(args)]), _u32(names), _u32(arities), _u32(args),
+        empty_table,
+    ])
+
+
+def _prune(directory: str, keep: int) -> None:
+    """Remove all but the `keep` most recently used (by atime) files we wrote"""
+    try:
+        entries = [os.path.join(directory, f) for f in os.listdir(directory)
+                   if f.startswith("facts-") and f.endswith(".bin")]
+        entries.sort(key=lambda p: os.stat(p).st_atime, reverse=True)
+    except OSError:
+        return
+    for p in entries[keep:]:
+        try:
+            os.remove(p)
+        except OSError:
+            pass
+
+
+def write_fact_file(facts: Iterable[Any], path: Optional[str] = None,
+                    append: bool = False) -> FactFile:
+    """
+    Write facts in the engine's binary layout and return where they are.
+
+    Without a path the file goes to PRECIS_FACTS_FILE_DIR under a name
+    derived from its contents; an identical file already there is reused.
+    With append=True the section is added to the end of `path` and the
+    returned offset points at it.
+    """
+    data = encode_facts(facts)
+    if path is None:
+        directory = facts_dir()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"facts-{hashlib.sha256(data).hexdigest()[:32]}.bin")
+        try:
+            st = os.stat(path)
+            if st.st_size == len(data):
+                # Mark it used for pruning; the mtime stays, as it is part
+                # of the verification cache key
+                os.utime(path, ns=(time.time_ns(), st.st_mtime_ns))
+                return FactFile(path)
+        except OSError:
+            pass
+        # Write then rename, so a concurrent reader never maps half a file
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        try:
+            keep = int(os.environ.get("PRECIS_FACTS_FILE_KEEP", DEFAULT_KEEP))
+        except ValueError:
+            keep = DEFAULT_KEEP
+        _prune(directory, max(1, keep))
+        return FactFile(path)
+
+    with open(path, "ab" if append else "wb") as f:
+        offset = f.tell()
+        f.write(data)
+    return FactFile(os.path.abspath(path), offset)
+
+
+def with_facts(request: Dict[str, Any], facts: List[Any],
+               facts_file: Any = None, allow_file: bool = True) -> Dict[str, Any]:
+    """
+    Put facts into a request. They go inline as {"facts": [...]} unless
+    there are at least PRECIS_FACTS_FILE_MIN of them (and allow_file, for
+    engines that read facts files), in which case they are written to a
+    facts file. An existing file (a FactFile or a path) given as
+    facts_file is sent along with any inline facts; the engine takes the
+    union.
+    """
+    threshold = min_facts()
+    if facts_file is None and allow_file and threshold and len(facts) >= threshold:
+        facts_file, facts = write_fact_file(facts), []
+    if facts or facts_file is None:
+        request["facts"] = {"facts": [{"predicate": r[0], "arguments": list(r[1:])}
+                                      for r in _rows(facts)]}
+    if facts_file is not None:
+        if isinstance(facts_file, str):
+            facts_file = FactFile(os.path.abspath(facts_file))
+        request["facts_file"] = facts_file.to_json()
+    return request
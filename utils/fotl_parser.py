@@ -0,0 +1,719 @@
+"""
+fotl_parser.py - In-process parser for Précis FOTL formulas
+
+A Python mirror of src/lexer.mll and src/parser.mly. It turns a formula
+(or a whole .policy file) into an AST with the same shape as src/ast.ml,
+reporting syntax errors with line and column. Arities are checked against
+ARITY_MAP and the PREDICATES / FUNCTIONS sections of data/*_types.txt.
+This lets callers reject or repair malformed LLM output before spawning
+the engine.
+
+Usage:
+    check = check_formula("forall x. coveredEntity(x) -> protectedHealthInfo(x)")
+    if not check.ok:
+        print(check.errors)          # [FormulaError(kind, message, line, column)]
+    check.ast, check.free_vars
+
+    fixed, notes = repair_formula(llm_output)
+"""
+
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+# ============================================================================
+# AST (mirrors src/ast.ml)
+# ============================================================================
+
+
+@dataclass(frozen=True)
+class Var:
+    name: str
+
+
+@dataclass(frozen=True)
+class Const:
+    value: str
+
+
+@dataclass(frozen=True)
+class Func:
+    name: str
+    args: Tuple["Term", ...]
+
+
+Term = Union[Var, Const, Func]
+
+
+@dataclass(frozen=True)
+class TrueF:
+    pass
+
+
+@dataclass(frozen=True)
+class FalseF:
+    pass
+
+
+@dataclass(frozen=True)
+class Predicate:
+    name: str                   # comparisons use "=", "!=", "<", "<=", ">", ">="
+    args: Tuple[Term, ...]
+
+
+@dataclass(frozen=True)
+class Not:
+    body: "Formula"
+
+
+@dataclass(frozen=True)
+class BinLogical:
+    op: str                     # "and", "or", "implies", "iff", "xor"
+    left: "Formula"
+    right: "Formula"
+
+
+@dataclass(frozen=True)
+class BinTemporal:
+    op: str                     # "until", "since"
+    left: "Formula"
+    right: "Formula"
+    bound: Optional[Tuple[int, int]] = None
+
+
+@dataclass(frozen=True)
+class UnTemporal:
+    op: str                     # "always", "eventually", "next", "historically", "once", "yesterday"
+    body: "Formula"
+    bound: Optional[Tuple[int, int]] = None
+
+
+@dataclass(frozen=True)
+class Quantified:
+    quantifier: str             # "forall" or "exists"
+    variables: Tuple[str, ...]
+    body: "Formula"
+
+
+@dataclass(frozen=True)
+class Annotated:
+    body: "Formula"
+    citation: str
+
+
+Formula = Union[TrueF, FalseF, Predicate, Not, BinLogical, BinTemporal,
+                UnTemporal, Quantified, Annotated]
+
+
+@dataclass
+class PolicyFile:
+    regulation: Optional[str]
+    version: Optional[str]
+    effective_date: Optional[str]
+    type_decls: List[str]
+    policies: List[Formula]
+
+
+COMPARISONS = ("=", "!=", "<", "<=", ">", ">=")
+
+# ============================================================================
+# LEXER (mirrors src/lexer.mll)
+# ============================================================================
+
+
+class FOTLSyntaxError(Exception):
+    """A lexing or parsing error at a 1-based line and column"""
+
+    def __init__(self, message: str, line: int, column: int):
+        super().__init__(f"line {line}, column {column}: {message}")
+        self.message = message
+        self.line = line
+        self.column = column
+
+
+@dataclass
+class Token:
+    kind: str                   # parser.mly token name, e.g. "ID", "AND", "EOF"
+    value: Union[str, int, None]
+    line: int
+    column: int
+
+
+# Keyword rules, in lexer.mll order; like ocamllex, the longest match
+# wins and an earlier rule wins a tie (so "forall" is FORALL but
+# "forallx" is an ID)
+_KEYWORD_RULES = [
+    ("REGULATION", ["regulation"]),
+    ("VERSION", ["version"]),
+    ("EFFECTIVE_DATE", ["effective_date", "effective date"]),
+    ("TYPE_DECL_START", ["type declaration start", "type declaration starts",
+                         "type_declaration_start", "type_declaration_starts"]),
+    ("TYPE_DECL_ENDS", ["type declaration end", "type declaration ends",
+                        "type_declaration_end", "type_declaration_ends"]),
+    ("POLICY_START", ["policy start", "policy starts", "policy_start", "policy_starts"]),
+    ("POLICY_END", ["policy end", "policy ends", "policy_end", "policy_ends"]),
+    ("TYPE", ["type"]),
+    ("TRUE", ["True", "true", "TRUE", "⊤"]),
+    ("FALSE", ["False", "false", "FALSE", "⊥"]),
+    ("FORALL", ["Forall", "forall", "∀"]),
+    ("EXISTS", ["Exists", "exists", "∃"]),
+    ("NOT", ["Not", "not"]),
+    ("AND", ["And", "and"]),
+    ("OR", ["Or", "or"]),
+    ("IMPLIES", ["Implies", "implies"]),
+    ("IFF", ["Iff", "iff"]),
+    ("XOR", ["Xor", "xor"]),
+    ("ALWAYS", ["Globally", "globally", "Always", "always", "G"]),
+    ("EVENTUALLY", ["Finally", "finally", "Eventually", "eventually", "F"]),
+    ("NEXT", ["Next", "next", "X"]),
+    ("UNTIL", ["Until", "until", "U"]),
+    ("HISTORICALLY", ["Historically", "historically", "H"]),
+    ("YESTERDAY", ["Yesterday", "yesterday", "Previously", "previously", "Y"]),
+    ("ONCE", ["Once", "once", "O"]),
+    ("SINCE", ["Since", "since", "S"]),
+    ("AT_LBRACKET", ["@["]),
+]
+
+_OPERATOR_RULES = [
+    ("NOT", ["!", "¬", "~"]),
+    ("AND", ["&&", "&", "∧", "/\\"]),
+    ("OR", ["||", "|", "∨", "\\/"]),
+    ("IMPLIES", ["=>", "→", "⇒", "==>", "-->", "->"]),
+    ("IFF", ["↔", "<=>", "<==>", "<-->", "<->"]),
+    ("XOR", ["⊕"]),
+    ("NOTEQUALS", ["!=", "≠"]),
+    ("LESSEQ", ["<=", "≤"]),
+    ("GREATEREQ", [">=", "≥"]),
+    ("LESS", ["<"]),
+    ("GREATER", [">"]),
+    ("EQUALS", ["="]),
+    ("LPAREN", ["("]),
+    ("RPAREN", [")"]),
+    ("LBRACKET", ["["]),
+    ("RBRACKET", ["]"]),
+    ("COMMA", [","]),
+    ("SEMICOLON", [";"]),
+    ("DOT", ["."]),
+]
+
+_FIXED = [(kind, text) for kind, texts in _KEYWORD_RULES + _OPERATOR_RULES for text in texts]
+_ID = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_INT = re.compile(r"[0-9]+")
+_WS = re.compile(r"[ \t\r\n]+")
+_STRING_ESCAPES = {'"': '"', "\\": "\\", "n": "\n", "t": "\t"}
+
+
+def tokenize(text: str) -> List[Token]:
+    tokens: List[Token] = []
+    pos = 0
+    line, line_start = 1, 0
+
+    def where(p: int) -> Tuple[int, int]:
+        return line, p - line_start + 1
+
+    def advance(to: int):
+        nonlocal pos, line, line_start
+        newlines = text.count("\n", pos, to)
+        if newlines:
+            line += newlines
+            line_start = text.rindex("\n", pos, to) + 1
+        pos = to
+
+    while pos < len(text):
+        ws = _WS.match(text, pos)
+        if ws:
+            advance(ws.end())
+            continue
+        ln, col = where(pos)
+
+        if text.startswith("(*", pos):
+            # Comments do not nest: the first "*)" closes one, as in lexer.mll
+            end = text.find("*)", pos + 2)
+            if end < 0:
+                raise FOTLSyntaxError("Unterminated comment", ln, col)
+            advance(end + 2)
+            continue
+
+        # Longest of: a fixed keyword/operator, an identifier
+        best_kind, best_len = None, 0
+        for kind, fixed in _FIXED:
+            if len(fixed) > best_len and text.startswith(fixed, pos):
+                best_kind, best_len = kind, len(fixed)
+        ident = _ID.match(text, pos)
+        if ident and len(ident.group()) > best_len:
+            best_kind, best_len = "ID", len(ident.group())
+
+        if best_kind is not None:
+            value = text[pos:pos + best_len] if best_kind == "ID" else None
+            tokens.append(Token(best_kind, value, ln, col))
+            advance(pos + best_len)
+        elif text[pos] == '"':
+            buf, p = [], pos + 1
+            while p < len(text) and text[p] != '"':
+                if text[p] == "\\" and p + 1 < len(text) and text[p + 1] in _STRING_ESCAPES:
+                    buf.append(_STRING_ESCAPES[text[p + 1]])
+                    p += 2
+                else:
+                    buf.append(text[p])
+                    p += 1
+            if p >= len(text):
+                raise FOTLSyntaxError("Unterminated string", ln, col)
+            tokens.append(Token("STRING", "".join(buf), ln, col))
+            advance(p + 1)
+        elif text[pos] == "@" and _ID.match(text, pos + 1):
+            name = _ID.match(text, pos + 1).group()
+            tokens.append(Token("CONST", name, ln, col))
+            advance(pos + 1 + len(name))
+        elif _INT.match(text, pos):
+            digits = _INT.match(text, pos).group()
+            tokens.append(Token("INT", int(digits), ln, col))
+            advance(pos + len(digits))
+        else:
+            c = text[pos]
+            raise FOTLSyntaxError(f"Unexpected character: {c} (code: {ord(c)})", ln, col)
+
+    ln, col = where(pos)
+    tokens.append(Token("EOF", None, ln, col))
+    return tokens
+
+
+# ============================================================================
+# PARSER (mirrors src/parser.mly)
+# ============================================================================
+
+# Binary operators: (precedence, right associative), lowest first as in
+# the %right/%left declarations
+_BINARY = {
+    "IFF": (1, True),
+    "IMPLIES": (2, True),
+    "UNTIL": (3, True),
+    "SINCE": (3, True),
+    "OR": (4, False),
+    "XOR": (4, False),
+    "AND": (5, False),
+}
+
+_LOGICAL_OPS = {"AND": "and", "OR": "or", "IMPLIES": "implies", "IFF": "iff", "XOR": "xor"}
+_UNARY_TEMPORAL = {"ALWAYS": "always", "EVENTUALLY": "eventually", "NEXT": "next",
+                   "HISTORICALLY": "historically", "ONCE": "once", "YESTERDAY": "yesterday"}
+_COMPARISON_TOKENS = {"EQUALS": "=", "NOTEQUALS": "!=", "LESS": "<", "LESSEQ": "<=",
+                      "GREATER": ">", "GREATEREQ": ">="}
+
+
+class _Parser:
+    def __init__(self, text: str):
+        self.tokens = tokenize(text)
+        self.pos = 0
+
+    def peek(self, offset: int = 0) -> Token:
+        return self.tokens[min(self.pos + offset, len(self.tokens) - 1)]
+
+    def next(self) -> Token:
+        tok = self.peek()
+        self.pos += 1
+        return tok
+
+    def error(self, expected: str, tok: Optional[Token] = None) -> FOTLSyntaxError:
+        tok = tok or self.peek()
+        found = "end of input" if tok.kind == "EOF" else (
+            repr(tok.value) if tok.value is not None else tok.kind)
+        return FOTLSyntaxError(f"expected {expected}, found {found}", tok.line, tok.column)
+
+    def expect(self, kind: str, what: Optional[str] = None) -> Token:
+        if self.peek().kind != kind:
+            raise self.error(what or kind)
+        return self.next()
+
+    # --- main / sections ---------------------------------------------------
+
+    def policy_file(self) -> PolicyFile:
+        regulation = version = date = None
+        if self.peek().kind == "REGULATION":
+            self.next()
+            regulation = self.expect("ID", "regulation name").value
+            if self.peek().kind == "VERSION":
+                self.next()
+                version = self.expect("STRING", "version string").value
+            if self.peek().kind == "EFFECTIVE_DATE":
+                self.next()
+                date = self.expect("STRING", "effective date string").value
+
+        types: List[str] = []
+        if self.peek().kind == "TYPE_DECL_START":
+            self.next()
+            while self.peek().kind == "TYPE":
+                self.next()
+                types.append(self.expect("ID", "type name").value)
+            self.expect("TYPE_DECL_ENDS", "'type declaration ends'")
+
+        self.expect("POLICY_START", "'policy starts'")
+        policies: List[Formula] = []
+        while self.peek().kind != "POLICY_END":
+            policies.append(self.annotated_formula())
+            self.expect("SEMICOLON", "';' after formula")
+        self.next()
+        self.expect("EOF", "end of input after 'policy ends'")
+        return PolicyFile(regulation, version, date, types, policies)
+
+    def annotated_formula(self) -> Formula:
+        if self.peek().kind == "AT_LBRACKET":
+            self.next()
+            cite = self.expect("STRING", "citation string").value
+            self.expect("RBRACKET", "']' after citation")
+            return Annotated(self.formula(), cite)
+        return self.formula()
+
+    # --- formulas ----------------------------------------------------------
+
+    def formula(self, min_prec: int = 0) -> Formula:
+        left = self.simple_formula()
+        while self.peek().kind in _BINARY:
+            kind = self.peek().kind
+            prec, right_assoc = _BINARY[kind]
+            if prec < min_prec:
+                break
+            self.next()
+            bound = self.timebound() if kind in ("UNTIL", "SINCE") else None
+            right = self.formula(prec if right_assoc else prec + 1)
+            if kind in _LOGICAL_OPS:
+                left = BinLogical(_LOGICAL_OPS[kind], left, right)
+            else:
+                left = BinTemporal(kind.lower(), left, right, bound)
+        return left
+
+    def timebound(self) -> Optional[Tuple[int, int]]:
+        if self.peek().kind != "LBRACKET":
+            return None
+        self.next()
+        lo = self.expect("INT", "lower time bound").value
+        self.expect("COMMA", "',' in time bound")
+        hi = self.expect("INT", "upper time bound").value
+        self.expect("RBRACKET", "']' after time bound")
+        return (lo, hi)
+
+    def simple_formula(self) -> Formula:
+        tok = self.peek()
+        kind = tok.kind
+        if kind == "TRUE":
+            self.next()
+            return TrueF()
+        if kind == "FALSE":
+            self.next()
+            return FalseF()
+        if kind == "NOT":
+            self.next()
+            return Not(self.simple_formula())
+        if kind in _UNARY_TEMPORAL:
+            self.next()
+            bound = self.timebound()
+            return UnTemporal(_UNARY_TEMPORAL[kind], self.simple_formula(), bound)
+        if kind == "LPAREN":
+            self.next()
+            f = self.formula()
+            self.expect("RPAREN", "')'")
+            return f
+        if kind in ("FORALL", "EXISTS"):
+            self.next()
+            variables = [self.expect("ID", "quantified variable").value]
+            while self.peek().kind == "COMMA":
+                self.next()
+                variables.append(self.expect("ID", "quantified variable").value)
+            self.expect("DOT", "'.' after quantified variables")
+            return Quantified(kind.lower(), tuple(variables), self.formula())
+        if kind in ("ID", "CONST", "INT", "STRING"):
+            return self.atom_or_comparison()
+        raise self.error("a formula")
+
+    def atom_or_comparison(self) -> Formula:
+        start = self.peek()
+        left = self.term()
+        if self.peek().kind in _COMPARISON_TOKENS:
+            op = _COMPARISON_TOKENS[self.next().kind]
+            return Predicate(op, (left, self.term()))
+        if isinstance(left, Var):
+            return Predicate(left.name, ())
+        if isinstance(left, Func):
+            return Predicate(left.name, left.args)
+        raise self.error("a comparison operator after constant")
+
+    def term(self) -> Term:
+        tok = self.next()
+        if tok.kind == "ID":
+            if self.peek().kind == "LPAREN":
+                self.next()
+                args: List[Term] = []
+                if self.peek().kind != "RPAREN":
+                    args.append(self.term())
+                    while self.peek().kind == "COMMA":
+                        self.next()
+                        args.append(self.term())
+                self.expect("RPAREN", "',' or ')' in argument list")
+                return Func(tok.value, tuple(args))
+            return Var(tok.value)
+        if tok.kind in ("CONST", "STRING"):
+            return Const(tok.value)
+        if tok.kind == "INT":
+            return Const(str(tok.value))
+        raise self.error("a term", tok)
+
+
+def parse_formula(text: str) -> Formula:
+    """Parse a single formula; raises FOTLSyntaxError"""
+    p = _Parser(text)
+    f = p.annotated_formula()
+    if p.peek().kind == "SEMICOLON":
+        p.next()
+    p.expect("EOF", "end of formula")
+    return f
+
+
+def parse_policy_file(text: str) -> PolicyFile:
+    """Parse a whole .policy file (what `precis json` receives); raises FOTLSyntaxError"""
+    return _Parser(text).policy_file()
+
+
+def _term_source(t: Term) -> str:
+    if isinstance(t, Var):
+        return t.name
+    if isinstance(t, Func):
+        return f"{t.name}({', '.join(_term_source(a) for a in t.args)})"
+    if t.value.isdigit():
+        return t.value
+    if _ID.fullmatch(t.value):
+        return "@" + t.value
+    return '"' + t.value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def to_source(f: Formula) -> str:
+    """Fully parenthesised FOTL text that parses back to f"""
+    if isinstance(f, TrueF):
+        return "true"
+    if isinstance(f, FalseF):
+        return "false"
+    if isinstance(f, Predicate):
+        if f.name in COMPARISONS:
+            return f"{_term_source(f.args[0])} {f.name} {_term_source(f.args[1])}"
+        if not f.args:
+            return f.name
+        return f"{f.name}({', '.join(_term_source(a) for a in f.args)})"
+    if isinstance(f, Not):
+        return f"not ({to_source(f.body)})"
+    bound = lambda b: "" if b is None else f"[{b[0]}, {b[1]}]"
+    if isinstance(f, BinLogical):
+        return f"({to_source(f.left)} {f.op} {to_source(f.right)})"
+    if isinstance(f, BinTemporal):
+        return f"({to_source(f.left)} {f.op}{bound(f.bound)} {to_source(f.right)})"
+    if isinstance(f, UnTemporal):
+        return f"{f.op}{bound(f.bound)} ({to_source(f.body)})"
+    if isinstance(f, Quantified):
+        return f"({f.quantifier} {', '.join(f.variables)}. {to_source(f.body)})"
+    return f'@["{f.citation}"] {to_source(f.body)}'
+
+
+# ============================================================================
+# ARITIES
+# ============================================================================
+
+_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+_arity_cache: Dict[str, Tuple[Dict[str, Set[int]], Dict[str, Set[int]]]] = {}
+
+
+def load_arities(data_dir: str = _DATA_DIR) -> Tuple[Dict[str, Set[int]], Dict[str, Set[int]]]:
+    """
+    (predicate arities, function arities) from ARITY_MAP and the type files
+    in data_dir, parsed like Type_system_db.load_type_system_file. A name
+    maps to every arity declared for it, since regulations may differ
+    (hasConsent is 2-ary in GDPR, 3-ary in HIPAA).
+    """
+    if data_dir in _arity_cache:
+        return _arity_cache[data_dir]
+    try:
+        from config import ARITY_MAP
+        predicates = {name: {arity} for name, arity in ARITY_MAP.items()}
+    except ImportError:
+        predicates = {}
+    functions: Dict[str, Set[int]] = {}
+
+    if os.path.isdir(data_dir):
+        for name in sorted(os.listdir(data_dir)):
+            if not name.endswith("_types.txt"):
+                continue
+            section = None
+            with open(os.path.join(data_dir, name), encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line or line.startswith("#"):
+                        continue
+                    if line in ("PREDICATES", "FUNCTIONS", "CONSTANTS"):
+                        section = line
+                        continue
+                    parts = line.split(":")
+                    if len(parts) != 2 or section not in ("PREDICATES", "FUNCTIONS"):
+                        continue
+                    types = [t for t in parts[1].split() if t != "->"]
+                    if not types:
+                        continue
+                    target = predicates if section == "PREDICATES" else functions
+                    target.setdefault(parts[0].strip(), set()).add(len(types) - 1)
+
+    _arity_cache[data_dir] = (predicates, functions)
+    return predicates, functions
+
+
+# ============================================================================
+# CHECKING
+# ============================================================================
+
+
+@dataclass
+class FormulaError:
+    kind: str                   # "syntax", "arity", "unknown_predicate"
+    message: str
+    line: Optional[int] = None
+    column: Optional[int] = None
+
+    def __str__(self) -> str:
+        where = f"line {self.line}, column {self.column}: " if self.line is not None else ""
+        return f"{where}{self.message}"
+
+
+@dataclass
+class FormulaCheck:
+    ast: Optional[Formula]
+    errors: List[FormulaError] = field(default_factory=list)
+    warnings: List[FormulaError] = field(default_factory=list)
+    free_vars: List[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return self.ast is not None and not self.errors
+
+
+def free_variables(f: Formula) -> List[str]:
+    """Variables used but not bound by an enclosing quantifier, in order of use"""
+    found: List[str] = []
+
+    def term(t: Term, bound: frozenset):
+        if isinstance(t, Var):
+            if t.name not in bound and t.name not in found:
+                found.append(t.name)
+        elif isinstance(t, Func):
+            for a in t.args:
+                term(a, bound)
+
+    def walk(g: Formula, bound: frozenset):
+        if isinstance(g, Predicate):
+            for a in g.args:
+                term(a, bound)
+        elif isinstance(g, (Not, UnTemporal, Annotated)):
+            walk(g.body, bound)
+        elif isinstance(g, (BinLogical, BinTemporal)):
+            walk(g.left, bound)
+            walk(g.right, bound)
+        elif isinstance(g, Quantified):
+            walk(g.body, bound | set(g.variables))
+
+    walk(f, frozenset())
+    return found
+
+
+def _arities(expected: Set[int]) -> str:
+    return " or ".join(str(n) for n in sorted(expected))
+
+
+def check_arities(f: Formula, predicates: Dict[str, Set[int]],
+                  functions: Dict[str, Set[int]]) -> Tuple[List[FormulaError], List[FormulaError]]:
+    """(errors for wrong arities, warnings for predicates no type file declares)"""
+    errors: List[FormulaError] = []
+    warnings: List[FormulaError] = []
+
+    def term(t: Term):
+        if isinstance(t, Func):
+            expected = functions.get(t.name)
+            if expected is not None and len(t.args) not in expected:
+                errors.append(FormulaError(
+                    "arity", f"function {t.name} takes {_arities(expected)} argument(s), got {len(t.args)}"))
+            for a in t.args:
+                term(a)
+
+    def walk(g: Formula):
+        if isinstance(g, Predicate):
+            if g.name not in COMPARISONS:
+                expected = predicates.get(g.name)
+                if expected is None:
+                    if not any(w.message.endswith(f" {g.name}") for w in warnings):
+                        warnings.append(FormulaError("unknown_predicate", f"unknown predicate {g.name}"))
+                elif len(g.args) not in expected:
+                    errors.append(FormulaError(
+                        "arity", f"{g.name} takes {_arities(expected)} argument(s), got {len(g.args)}"))
+            for a in g.args:
+                term(a)
+        elif isinstance(g, (Not, UnTemporal, Annotated, Quantified)):
+            walk(g.body)
+        elif isinstance(g, (BinLogical, BinTemporal)):
+            walk(g.left)
+            walk(g.right)
+
+    walk(f)
+    return errors, warnings
+
+
+def check_formula(text: str, data_dir: str = _DATA_DIR) -> FormulaCheck:
+    """Parse `text` as a single formula and check its arities"""
+    try:
+        ast = parse_formula(text)
+    except FOTLSyntaxError as e:
+        return FormulaCheck(ast=None, errors=[FormulaError("syntax", e.message, e.line, e.column)])
+    predicates, functions = load_arities(data_dir)
+    errors, warnings = check_arities(ast, predicates, functions)
+    return FormulaCheck(ast=ast, errors=errors, warnings=warnings, free_vars=free_variables(ast))
+
+
+# ============================================================================
+# REPAIR
+# ============================================================================
+
+def _candidates(text: str) -> List[Tuple[str, str]]:
+    """Repairs for common LLM output problems, cheapest first"""
+    out = []
+    fenced = re.search(r"```[^\n]*\n(.*?)\n?```", text, re.S)
+    if fenced:
+        text = fenced.group(1)
+        out.append((text, "removed markdown fence"))
+    stripped = text.strip().strip("`").strip()
+    if stripped != text:
+        text = stripped
+        out.append((text, "removed surrounding backticks/whitespace"))
+    lines = [l for l in text.split("\n") if l.strip()]
+    if len(lines) > 1:
+        text = lines[0].strip()
+        out.append((text, "kept only the first line"))
+    if text.endswith((".", ";")) and not text.endswith(".."):
+        text = text[:-1].rstrip()
+        out.append((text, "removed trailing punctuation"))
+    opened = text.count("(") - text.count(")")
+    if opened > 0:
+        text = text + ")" * opened
+        out.append((text, f"closed {opened} parenthes{'is' if opened == 1 else 'es'}"))
+    elif opened < 0 and text.endswith(")" * -opened):
+        text = text[:opened]
+        out.append((text, f"removed {-opened} unmatched ')'"))
+    return out
+
+
+def repair_formula(text: str, data_dir: str = _DATA_DIR) -> Tuple[str, List[str]]:
+    """
+    Apply cheap textual repairs until the formula parses
+
+    Returns (formula, notes). If nothing makes it parse, the input is
+    returned unchanged with no notes; call check_formula for the error.
+    """
+    if check_formula(text, data_dir).ast is not None:
+        return text, []
+    notes: List[str] = []
+    for candidate, note in _candidates(text):
+        notes.append(note)
+        if check_formula(candidate, data_dir).ast is not None:
+            return candidate, notes
+    return text, []
@@ -8,18 +8,31 @@ Combines:
 4. OCaml FOTL verification (rigorous, substantive rules)
 
 Architecture:
-- Tier 1A: Hardcoded pattern matching (60-70% coverage, <100ms)
+- Tier 1A: Hardcoded pattern matching (60-70% coverage, <1ms); patterns
+  come from policies/tier1a_patterns.json
 - Tier 1B: LLM + procedural JSON (15-20% coverage, 1-2s)
 - Tier 2: OCaml + primary FOTL (10-20% coverage, 5-10s)
+
+Speculative mode (speculative=True): when Tier 1A misses, the Tier 2
+OCaml check starts in the background while Tier 1B waits on the LLM. If
+Tier 1B finds an exception the OCaml run is cancelled (its time so far is
+reported as wasted work); otherwise Tier 2's answer is already under way
+and the overlap is reported as saved latency. Results are the same either
+way; counters are kept in speculation_stats. The integrated pipelines
+turn it on with PRECIS_SPECULATIVE_TIER2=1 (config.SPECULATIVE_TIER2).
 """
 
+import inspect
 import json
 import re
+import threading
+import time
 from typing import List, Dict, Optional
 from anthropic import Anthropic
 from dataclasses import dataclass
 from enum import Enum
 
+from utils.pattern_matcher import PatternMatcher, load_patterns
 from utils.policy_router import PolicyRouter
 
 
@@ -52,12 +65,55 @@ class VerificationResult:
     procedural_exception: Optional[ProceduralException] = None
     formal_result: Optional[Dict] = None
     warnings: List[str] = None
+    speculation: Optional[Dict] = None  # speculative Tier 2 outcome and timings
     
     def __post_init__(self):
         if self.warnings is None:
             self.warnings = []
 
 
+class _SpeculativeFormal:
+    """A Tier 2 verify() call running on its own thread, cancellable"""
+
+    def __init__(self, verifier, formula: str, facts: List[List]):
+        self.cancel_event = threading.Event()
+        # Verifiers without a cancel argument run to completion unobserved
+        kwargs = {}
+        try:
+            if "cancel" in inspect.signature(verifier.verify).parameters:
+                kwargs["cancel"] = self.cancel_event
+        except (TypeError, ValueError):
+            pass
+        self.cancellable = bool(kwargs)
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        self._result: Optional[Dict] = None
+        self._done = threading.Event()
+
+        def run():
+            try:
+                self._result = verifier.verify(formula, facts, **kwargs)
+            except Exception as e:
+                self._result = {"success": False, "verified": False, "error": str(e),
+                                "evaluations": [], "violations": []}
+            finally:
+                self.finished = time.perf_counter()
+                self._done.set()
+
+        self._thread = threading.Thread(target=run, name="tier2-speculative", daemon=True)
+        self._thread.start()
+
+    def result(self) -> Dict:
+        self._done.wait()
+        return self._result
+
+    def cancel(self) -> float:
+        """Stop the run; returns the milliseconds of Tier 2 work thrown away"""
+        self.cancel_event.set()
+        end = self.finished if self._done.is_set() else time.perf_counter()
+        return (end - self.started) * 1000
+
+
 class IntegratedTwoTierVerifier:
     """
     Complete two-tier verification system integrating:
@@ -73,22 +129,33 @@ class IntegratedTwoTierVerifier:
                  procedural_json: str = "policies/procedural_policies.json",
                  primary_json: str = "policies/primary_policies.json",
                  primary_fotl: str = "policies/HIPAA_PRIMARY.policy",
-                 procedural_fotl: str = "policies/HIPAA_PROCEDURAL.policy"):
+                 procedural_fotl: str = "policies/HIPAA_PROCEDURAL.policy",
+                 speculative: bool = False,
+                 patterns_json: str = "policies/tier1a_patterns.json"):
         
         self.client = client
         self.ocaml_verifier = ocaml_verifier
+        self.speculative = speculative
+        self.patterns_json = patterns_json
         self.primary_fotl = primary_fotl
         self.procedural_fotl = procedural_fotl
         
         # Initialize policy router (uses JSON files)
         self.router = PolicyRouter(procedural_json, primary_json)
         
-        # Load hardcoded patterns for common cases
+        # Load hardcoded patterns for common cases, compiled for Tier 1A
         self.hardcoded_patterns = self._load_hardcoded_patterns()
+        self.pattern_matcher = PatternMatcher(self.hardcoded_patterns)
         
         # LLM result cache
         self.llm_cache = {}
         
+        # Speculative Tier 2 counters (cumulative)
+        self.speculation_stats = {
+            "runs": 0, "tier2_used": 0, "tier2_cancelled": 0,
+            "wasted_ms": 0.0, "saved_ms": 0.0
+        }
+        
         print("✅ Integrated Two-Tier Verifier initialized")
     
     def verify(self, query: str, facts: List[List], formula: str) -> VerificationResult:
@@ -121,6 +188,7 @@ class IntegratedTwoTierVerifier:
         # ========================================
         
         tier, relevant_policies = self.router.route_query(query, facts)
+        speculation = None
         
         # ========================================
         # TIER 1: PROCEDURAL CHECKS
@@ -151,22 +219,47 @@ class IntegratedTwoTierVerifier:
             else:
                 print(f"   No pattern match (confidence: {pattern_result.confidence:.2%})")
             
+            # Start Tier 2 now, unless the LLM answer is already cached
+            if (self.speculative and self.ocaml_verifier is not None
+                    and (query, str(facts)) not in self.llm_cache):
+                print("⚡ Starting Tier 2 speculatively alongside Tier 1B...")
+                speculation = _SpeculativeFormal(
+                    self.ocaml_verifier, formula, self._filter_facts_for_formal(facts))
+                self.speculation_stats["runs"] += 1
+            
             # Try Tier 1B: LLM classification (flexible)
             print("\nTier 1B: Checking with LLM + procedural JSON...")
-            llm_result = self._check_procedural_with_llm(query, facts, relevant_policies)
+            tier1b_start = time.perf_counter()
+            try:
+                llm_result = self._check_procedural_with_llm(query, facts, relevant_policies)
+            except BaseException:
+                if speculation is not None:
+                    speculation.cancel()
+                raise
+            tier1b_ms = (time.perf_counter() - tier1b_start) * 1000
             
             if llm_result.applies and llm_result.confidence >= 0.65:
                 print(f"✅ Tier 1B: LLM found exception!")
                 print(f"   Exception: {llm_result.name}")
                 print(f"   Confidence: {llm_result.confidence:.2%}")
                 
+                report = None
+                if speculation is not None:
+                    wasted_ms = speculation.cancel()
+                    self.speculation_stats["tier2_cancelled"] += 1
+                    self.speculation_stats["wasted_ms"] += wasted_ms
+                    report = {"used": False, "cancelled": True,
+                              "wasted_ms": wasted_ms, "saved_ms": 0.0}
+                    print(f"   ⚡ Speculative Tier 2 cancelled ({wasted_ms:.0f}ms of work discarded)")
+                
                 return VerificationResult(
                     compliant=True,
                     tier=VerificationTier.TIER_1B_PROCEDURAL,
                     confidence=llm_result.confidence,
                     explanation=llm_result.description,
                     policy_citations=[llm_result.cite],
-                    procedural_exception=llm_result
+                    procedural_exception=llm_result,
+                    speculation=report
                 )
             else:
                 print(f"   No LLM match (confidence: {llm_result.confidence:.2%})")
@@ -185,6 +278,19 @@ class IntegratedTwoTierVerifier:
             print("❌ OCaml verifier not available")
             return self._heuristic_fallback(query, facts)
         
+        if speculation is not None:
+            # Already running since Tier 1A; the overlap with Tier 1B is saved
+            formal_result = speculation.result()
+            tier2_ms = (speculation.finished - speculation.started) * 1000
+            saved_ms = min(tier1b_ms, tier2_ms)
+            self.speculation_stats["tier2_used"] += 1
+            self.speculation_stats["saved_ms"] += saved_ms
+            print(f"⚡ Using speculative Tier 2 result ({saved_ms:.0f}ms saved)")
+            result = self._interpret_formal_result(formal_result, query, facts)
+            result.speculation = {"used": True, "cancelled": False,
+                                  "wasted_ms": 0.0, "saved_ms": saved_ms}
+            return result
+        
         # Filter facts for formal verification
         filtered_facts = self._filter_facts_for_formal(facts)
         print(f"Filtered {len(facts)} → {len(filtered_facts)} facts for OCaml")
@@ -197,225 +303,38 @@ class IntegratedTwoTierVerifier:
     
     def _load_hardcoded_patterns(self) -> List[Dict]:
         """
-        Hardcoded patterns for common procedural exceptions
-        
+        Patterns for common procedural exceptions, from patterns_json
+
         These are the most frequent cases that can be matched instantly
         without LLM or OCaml overhead
         """
-        return [
-            {
-                "name": "Treatment Use (Internal)",
-                "cite": "45 CFR §164.506(c)(1)",
-                "keywords": ["treatment", "use", "care", "patient", "records"],
-                "min_keywords": 1,
-                "pattern": {
-                    "entity_type": ["covered_entity", "provider", "hospital", "clinic", "pharmacy"],
-                    "purpose": ["treatment", "@Treatment", "care"]
-                },
-                "confidence_base": 0.95,
-                "description": (
-                    "A covered entity may use protected health information "
-                    "for its own treatment purposes without patient authorization "
-                    "(45 CFR §164.506(c)(1))."
-                )
-            },
-            {
-                "name": "Treatment Referral",
-                "cite": "45 CFR §164.506(c)(2)",
-                "keywords": ["treatment", "referral", "specialist", "consult", "refer"],
-                "min_keywords": 1,
-                "pattern": {
-                    "entity_type": ["provider", "hospital", "clinic"],
-                    "recipient_type": ["specialist", "provider", "doctor", "physician"],
-                    "purpose": ["treatment", "@Treatment", "referral"]
-                },
-                "confidence_base": 0.98,
-                "description": (
-                    "Covered entities may disclose PHI for treatment activities "
-                    "of another healthcare provider without authorization "
-                    "(45 CFR §164.506(c)(2))."
-                )
-            },
-            {
-                "name": "Family Prescription Pickup",
-                "cite": "45 CFR §164.510(b)(3)",
-                "keywords": ["family", "prescription", "pick", "medication", "relative"],
-                "min_keywords": 2,
-                "pattern": {
-                    "entity_type": ["pharmacy", "provider"],
-                    "recipient_type": ["family", "relative", "spouse", "parent"],
-                    "phi_type": ["prescription", "medication"],
-                    "purpose": ["pickup", "pick up"]
-                },
-                "confidence_base": 0.95,
-                "description": (
-                    "Professional judgment allows family members to pick up "
-                    "prescriptions, medical supplies, or X-rays without explicit "
-                    "authorization (45 CFR §164.510(b)(3))."
-                )
-            },
-            {
-                "name": "Payment Activities",
-                "cite": "45 CFR §164.506(c)(3)",
-                "keywords": ["payment", "billing", "insurance", "claim", "bill"],
-                "min_keywords": 1,
-                "pattern": {
-                    "purpose": ["payment", "@Payment", "billing"]
-                },
-                "confidence_base": 0.95,
-                "description": (
-                    "Covered entities may disclose PHI for payment purposes "
-                    "without patient authorization (45 CFR §164.506(c)(3))."
-                )
-            },
-            {
-                "name": "Healthcare Operations",
-                "cite": "45 CFR §164.506(c)(4)",
-                "keywords": ["operations", "quality", "improvement", "accreditation"],
-                "min_keywords": 1,
-                "pattern": {
-                    "purpose": ["@HealthcareOperations", "operations", "quality"]
-                },
-                "confidence_base": 0.85,
-                "description": (
-                    "Covered entities may use PHI for healthcare operations "
-                    "including quality assessment and improvement "
-                    "(45 CFR §164.506(c)(4))."
-                )
-            },
-            {
-                "name": "Public Health Reporting",
-                "cite": "45 CFR §164.512(b)",
-                "keywords": ["public health", "disease", "reporting", "outbreak", "cdc"],
-                "min_keywords": 2,
-                "pattern": {
-                    "recipient_type": ["public_health", "health_department", "cdc"],
-                    "purpose": ["@PublicHealth", "disease", "reporting"]
-                },
-                "confidence_base": 0.98,
-                "description": (
-                    "Covered entities may disclose PHI to public health authorities "
-                    "for public health activities including disease surveillance "
-                    "(45 CFR §164.512(b))."
-                )
-            }
-        ]
+        return load_patterns(self.patterns_json)
     
     def _check_hardcoded_patterns(self, query: str, facts: List[List]) -> ProceduralException:
         """
         Check hardcoded pattern exceptions (Tier 1A)
         
-        Fast pattern matching using keyword and fact analysis
+        Fast pattern matching using keyword and fact analysis; every
+        pattern is scored in one pass (see utils.pattern_matcher)
         """
         
-        query_lower = query.lower()
-        best_match = None
-        best_confidence = 0.0
-        
-        for pattern_def in self.hardcoded_patterns:
-            # Keyword matching
-            keywords = pattern_def["keywords"]
-            keyword_matches = sum(1 for kw in keywords if kw in query_lower)
-            
-            if keyword_matches < pattern_def["min_keywords"]:
-                continue  # Not enough keywords
-            
-            # Pattern matching in facts
-            pattern_score = self._match_pattern_in_facts(
-                pattern_def["pattern"],
-                facts,
-                query_lower
+        match = self.pattern_matcher.best(query, facts)
+        if match is None:
+            return ProceduralException(
+                name="None", cite="", description="",
+                applies=False, confidence=0.0, source="pattern"
             )
-            
-            # Calculate combined confidence
-            keyword_weight = 0.4
-            pattern_weight = 0.6
-            
-            keyword_conf = min(1.0, keyword_matches / len(keywords))
-            
-            confidence = (
-                keyword_weight * keyword_conf +
-                pattern_weight * pattern_score
-            ) * pattern_def["confidence_base"]
-            
-            if confidence > best_confidence:
-                best_confidence = confidence
-                best_match = ProceduralException(
-                    name=pattern_def["name"],
-                    cite=pattern_def["cite"],
-                    description=pattern_def["description"],
-                    applies=confidence >= 0.70,
-                    confidence=confidence,
-                    source="pattern"
-                )
         
-        return best_match or ProceduralException(
-            name="None", cite="", description="",
-            applies=False, confidence=0.0, source="pattern"
+        pattern_def, confidence = match
+        return ProceduralException(
+            name=pattern_def["name"],
+            cite=pattern_def["cite"],
+            description=pattern_def["description"],
+            applies=confidence >= 0.70,
+            confidence=confidence,
+            source="pattern"
         )
     
-    def _match_pattern_in_facts(self, pattern: Dict, facts: List[List], 
-                                query_lower: str) -> float:
-        """
-        Match pattern requirements against extracted facts
-        
-        Returns:
-            Score from 0.0 to 1.0
-        """
-        
-        total_checks = 0
-        matches = 0
-        
-        # Build fact index
-        fact_predicates = {f[0]: f[1:] for f in facts if len(f) >= 2}
-        
-        # Check entity_type
-        if "entity_type" in pattern:
-            total_checks += 1
-            entity = fact_predicates.get('coveredEntity', [''])[0]
-            if any(self._fuzzy_match(et, entity) for et in pattern["entity_type"]):
-                matches += 1
-        
-        # Check purpose
-        if "purpose" in pattern:
-            total_checks += 1
-            
-            # Check in facts
-            for fact in facts:
-                if fact[0] in ['disclose', 'permittedUseOrDisclosure'] and len(fact) >= 5:
-                    purpose = fact[4]
-                    if any(self._fuzzy_match(p, purpose) for p in pattern["purpose"]):
-                        matches += 1
-                        break
-            
-            # Also check in query
-            if any(p.lower().replace('@', '') in query_lower for p in pattern["purpose"]):
-                matches += 0.5  # Partial credit
-        
-        # Check recipient_type
-        if "recipient_type" in pattern:
-            total_checks += 1
-            for fact in facts:
-                if fact[0] == 'disclose' and len(fact) >= 3:
-                    recipient = fact[2]
-                    if any(self._fuzzy_match(rt, recipient) for rt in pattern["recipient_type"]):
-                        matches += 1
-                        break
-        
-        # Check PHI type
-        if "phi_type" in pattern:
-            total_checks += 1
-            if any(phi_type in query_lower for phi_type in pattern["phi_type"]):
-                matches += 1
-        
-        return matches / total_checks if total_checks > 0 else 0.0
-    
-    def _fuzzy_match(self, pattern: str, text: str) -> bool:
-        """Fuzzy string matching"""
-        pattern_clean = pattern.lower().replace('_', '').replace('-', '')
-        text_clean = str(text).lower().replace('_', '').replace('-', '')
-        return pattern_clean in text_clean or text_clean in pattern_clean
-    
     def _check_procedural_with_llm(self, query: str, facts: List[List],
                                   relevant_policies: List[Dict]) -> ProceduralException:
         """
@@ -613,13 +532,15 @@ Output ONLY valid JSON:
         )
 
 
-def create_integrated_verifier(client: Anthropic, ocaml_verifier=None) -> IntegratedTwoTierVerifier:
+def create_integrated_verifier(client: Anthropic, ocaml_verifier=None,
+                               speculative: bool = False) -> IntegratedTwoTierVerifier:
     """
     Factory function to create integrated two-tier verifier
     
     Args:
         client: Anthropic client for LLM calls
         ocaml_verifier: Optional OCaml Précis verifier instance
+        speculative: Start Tier 2 alongside Tier 1B (see module docstring)
         
     Returns:
         Configured IntegratedTwoTierVerifier
@@ -630,5 +551,7 @@ def create_integrated_verifier(client: Anthropic, ocaml_verifier=None) -> Integr
         procedural_json="policies/procedural_policies.json",
         primary_json="policies/primary_policies.json",
         primary_fotl="policies/HIPAA_PRIMARY.policy",
-        procedural_fotl="policies/HIPAA_PROCEDURAL.policy"
+        procedural_fotl="policies/HIPAA_PROCEDURAL.policy",
+        speculative=speculative,
+        patterns_json="policies/tier1a_patterns.json"
     )
@@ -19,11 +19,12 @@ This combines multi-agent architecture with integrated two-tier verification.
 import re
 import json
 import time
-import subprocess
 from typing import List, Dict, Tuple, Optional
 from anthropic import Anthropic
 import os
-from config import get_precis_path, ARITY_MAP
+from config import get_precis_path, ARITY_MAP, SPECULATIVE_TIER2
+from utils.witnesses import explain_violations
+from utils.precis_engine import get_engine
 from utils.integrated_verifier import (
     create_integrated_verifier,
     VerificationResult,
@@ -246,7 +247,8 @@ class IntegratedTwoTierVerifierAgent(Agent):
         # UPDATED: Create integrated verifier (uses JSON routing + FOTL)
         self.integrated_verifier = create_integrated_verifier(
             self.client,
-            self.ocaml_verifier
+            self.ocaml_verifier,
+            speculative=SPECULATIVE_TIER2
         )
     
     def _create_ocaml_verifier(self):
@@ -256,86 +258,9 @@ class IntegratedTwoTierVerifierAgent(Agent):
             def __init__(self, precis_path):
                 self.precis_path = precis_path
             
-            def verify(self, formula: str, facts: List[List]) -> Dict:
-                """Call OCaml Précis"""
-                
-                if self.precis_path is None:
-                    return {
-                        "success": False,
-                        "verified": False,
-                        "error": "Précis not found",
-                        "evaluations": [],
-                        "violations": []
-                    }
-                
-                try:
-                    # Prepare facts
-                    facts_for_ocaml = [
-                        {"predicate": f[0], "arguments": f[1:]}
-                        for f in facts if len(f) >= 2
-                    ]
-                    
-                    # Wrap formula
-                    wrapped = f"""regulation HIPAA version "1.0"
-policy starts
-{formula}
-;
-policy ends"""
-                    
-                    # Build request
-                    request = {
-                        "formula": wrapped,
-                        "facts": {"facts": facts_for_ocaml},
-                        "regulation": "HIPAA"
-                    }
-                    
-                    # Call OCaml
-                    proc = subprocess.Popen(
-                        [self.precis_path, "json"],
-                        stdin=subprocess.PIPE,
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.PIPE,
-                        text=True,
-                        cwd=os.path.dirname(self.precis_path) if os.path.dirname(self.precis_path) else "."
-                    )
-                    
-                    output, error = proc.communicate(input=json.dumps(request), timeout=30)
-                    
-                    if proc.returncode == 0 and output.strip():
-                        result = json.loads(output)
-                        
-                        evaluations = result.get("evaluations", [])
-                        violations = result.get("violations", [])
-                        
-                        verified = all(
-                            e.get("evaluation", {}).get("result") == "true"
-                            for e in evaluations
-                        ) if evaluations else len(violations) == 0
-                        
-                        return {
-                            "success": True,
-                            "verified": verified,
-                            "evaluations": evaluations,
-                            "violations": violations,
-                            "json_response": result
-                        }
-                    else:
-                        return {
-                            "success": False,
-                            "verified": False,
-                            "error": error or "OCaml execution failed",
-                            "evaluations": [],
-                            "violations": []
-                        }
-                
-                except Exception as e:
-                    return {
-                        "success": False,
-                        "verified": False,
-                        "error": str(e),
-                        "evaluations": [],
-                        "violations": []
-                    }
+            def verify(self, formula: str, facts: List[List], cancel=None) -> Dict:
+                """Call OCaml Précis; setting `cancel` stops the run"""
+                return get_engine(self.precis_path).verify(formula, facts, cancel=cancel).to_verification()
         
         return OCamlVerifier(PRECIS_PATH)
     
@@ -370,6 +295,13 @@ class ExplainerAgent(Agent):
                 verification_result: VerificationResult) -> str:
         """Generate explanation based on verification result"""
         
+        # Tier 2 violations with simple counterexample witnesses are
+        # templated directly; no LLM call needed
+        if not verification_result.compliant and verification_result.formal_result:
+            templated = explain_violations(verification_result.formal_result.get('evaluations', []))
+            if templated:
+                return templated
+        
         if verification_result.tier == VerificationTier.TIER_1A_PATTERN:
             # Tier 1A: Pattern match
             prompt = f"""Explain this HIPAA compliance result to a non-technical user.
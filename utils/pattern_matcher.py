@@ -0,0 +1,262 @@
+"""
+pattern_matcher.py - Compiled Tier 1A procedural-exception patterns
+
+Tier 1A scores every hardcoded procedural pattern against a query: its
+keywords in the query text, and its entity / recipient / purpose / PHI
+terms in the extracted facts. PatternMatcher compiles the patterns once:
+
+- every string a pattern looks for in the query (keywords, purpose and
+  PHI terms) goes into one Aho-Corasick automaton, so a single pass over
+  the query finds all of them;
+- the fact terms are interned, and the facts are indexed by predicate
+  once per query (FactIndex) rather than once per pattern; a fact value
+  matches the terms it contains through a second automaton and the terms
+  containing it through a substring index, never by scanning the terms;
+- each keyword points at the patterns using it, so only patterns with
+  enough keywords in the query are scored at all.
+
+Scores are the same as the pattern-by-pattern loop this replaces.
+
+Patterns are read from a JSON file (policies/tier1a_patterns.json): a
+list of {"name", "cite", "description", "keywords", "min_keywords",
+"confidence_base", "pattern": {"entity_type", "recipient_type",
+"purpose", "phi_type"}}.
+
+Usage:
+    matcher = PatternMatcher(load_patterns("policies/tier1a_patterns.json"))
+    best = matcher.best(query, facts)      # (pattern dict, confidence) or None
+"""
+
+import json
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+# Weights of the keyword and fact scores in a pattern's confidence
+KEYWORD_WEIGHT = 0.4
+PATTERN_WEIGHT = 0.6
+
+# Predicates whose arguments the fact terms are matched against
+PURPOSE_PREDICATES = ("disclose", "permittedUseOrDisclosure")
+
+
+def load_patterns(path: str) -> List[Dict]:
+    """Patterns from a JSON file (a list, or {"patterns": [...]})"""
+    path = Path(path)
+    if not path.exists():
+        print(f"⚠️ Warning: {path} not found, no Tier 1A patterns loaded")
+        return []
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception as e:
+        print(f"❌ Error loading {path}: {e}")
+        return []
+    if isinstance(data, dict):
+        data = data.get("patterns", [])
+    if not isinstance(data, list):
+        print(f"⚠️ Warning: Unexpected JSON format in {path}")
+        return []
+    return data
+
+
+def clean(text: Any) -> str:
+    """Normal form for fuzzy term matching"""
+    return str(text).lower().replace('_', '').replace('-', '')
+
+
+# ============================================================================
+# AHO-CORASICK
+# ============================================================================
+
+class AhoCorasick:
+    """Finds which of a fixed set of needles occur in a text, in one pass"""
+
+    def __init__(self, needles: List[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._out: List[Tuple[int, ...]] = [()]
+        fail = [0]
+        # An empty needle occurs in every text
+        self._always = tuple(i for i, n in enumerate(needles) if not n)
+
+        for i, needle in enumerate(needles):
+            if not needle:
+                continue
+            node = 0
+            for ch in needle:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._out.append(())
+                    fail.append(0)
+                node = nxt
+            self._out[node] += (i,)
+
+        # Breadth-first failure links; each node's outputs include those
+        # of its failure node
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                f = fail[node]
+                while f and ch not in self._goto[f]:
+                    f = fail[f]
+                fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] += self._out[fail[nxt]]
+        self._fail = fail
+
+    def find(self, text: str) -> Set[int]:
+        """Indices of the needles occurring in text"""
+        goto, fail, out = self._goto, self._fail, self._out
+        found = set(self._always)
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                found.update(out[node])
+        return found
+
+
+# ============================================================================
+# FACTS
+# ============================================================================
+
+class FactIndex:
+    """The fact values Tier 1A looks at, pulled out of a query's facts once"""
+
+    def __init__(self, facts: Iterable[List]):
+        entity = None
+        purposes: Set[str] = set()
+        recipients: Set[str] = set()
+        for f in facts:
+            if len(f) < 2:
+                continue
+            pred = f[0]
+            if pred == 'coveredEntity':
+                entity = f[1]  # the last one wins
+            if pred in PURPOSE_PREDICATES and len(f) >= 5:
+                purposes.add(clean(f[4]))
+            if pred == 'disclose' and len(f) >= 3:
+                recipients.add(clean(f[2]))
+        # With no covered entity every entity term matches, as before
+        self.values = {
+            "entity_type": {clean(entity) if entity is not None else ''},
+            "purpose": purposes,
+            "recipient_type": recipients,
+        }
+
+
+# ============================================================================
+# MATCHER
+# ============================================================================
+
+class _Compiled:
+    """One pattern with its strings replaced by interned ids"""
+    __slots__ = ("index", "pattern", "keywords", "min_keywords", "fields",
+                 "purpose_query", "phi", "checks")
+
+    def __init__(self, index: int, pattern: Dict, needle, term):
+        self.index = index
+        self.pattern = pattern
+        self.keywords = [needle(k) for k in pattern.get("keywords", [])]
+        self.min_keywords = pattern.get("min_keywords", 1)
+        spec = pattern.get("pattern", {})
+        self.fields = [(name, frozenset(term(clean(t)) for t in spec[name]))
+                       for name in ("entity_type", "purpose", "recipient_type") if name in spec]
+        self.purpose_query = frozenset(needle(p.lower().replace('@', ''))
+                                       for p in spec.get("purpose", []))
+        self.phi = frozenset(needle(p) for p in spec["phi_type"]) if "phi_type" in spec else None
+        self.checks = len(self.fields) + (self.phi is not None)
+
+
+class PatternMatcher:
+    """Tier 1A patterns compiled for one-pass scoring"""
+
+    def __init__(self, patterns: List[Dict]):
+        self.patterns = patterns
+        needles: Dict[str, int] = {}
+        terms: Dict[str, int] = {}
+
+        def needle(s: str) -> int:
+            return needles.setdefault(s, len(needles))
+
+        def term(s: str) -> int:
+            return terms.setdefault(s, len(terms))
+
+        self._compiled = [_Compiled(i, p, needle, term) for i, p in enumerate(patterns)]
+        self._automaton = AhoCorasick(list(needles))
+        self._terms = list(terms)
+        self._term_automaton = AhoCorasick(self._terms)
+        # every substring of a term (the empty one included) -> the terms
+        # containing it
+        self._containing: Dict[str, Set[int]] = {}
+        for i, t in enumerate(self._terms):
+            for start in range(len(t) + 1):
+                for end in range(start, len(t) + 1):
+                    self._containing.setdefault(t[start:end], set()).add(i)
+
+        # keyword needle -> patterns using it (once per use, as counted)
+        self._by_keyword: Dict[int, List[int]] = {}
+        self._always: List[int] = []
+        for c in self._compiled:
+            for k in c.keywords:
+                self._by_keyword.setdefault(k, []).append(c.index)
+            if c.min_keywords <= 0:
+                self._always.append(c.index)
+
+    def _term_hits(self, values: Set[str]) -> Set[int]:
+        """Terms fuzzily matching any of the values: either contains the other"""
+        hits: Set[int] = set()
+        for v in values:
+            hits |= self._term_automaton.find(v)
+            hits |= self._containing.get(v, set())
+        return hits
+
+    def scores(self, query: str, facts: List[List]) -> List[Tuple[Dict, float]]:
+        """(pattern, confidence) for every pattern with enough keywords in
+        the query, in pattern order"""
+        found = self._automaton.find(query.lower())
+
+        keyword_counts: Dict[int, int] = {i: 0 for i in self._always}
+        for k in found:
+            for i in self._by_keyword.get(k, ()):
+                keyword_counts[i] = keyword_counts.get(i, 0) + 1
+        candidates = [self._compiled[i] for i in sorted(keyword_counts)
+                      if keyword_counts[i] >= self._compiled[i].min_keywords]
+        if not candidates:
+            return []
+
+        index = FactIndex(facts)
+        hits = {name: self._term_hits(values) for name, values in index.values.items()}
+
+        out = []
+        for c in candidates:
+            matches = 0.0
+            for name, field_terms in c.fields:
+                if not field_terms.isdisjoint(hits[name]):
+                    matches += 1
+            if not c.purpose_query.isdisjoint(found):
+                matches += 0.5  # purpose named in the query: partial credit
+            if c.phi is not None and not c.phi.isdisjoint(found):
+                matches += 1
+            pattern_score = matches / c.checks if c.checks else 0.0
+
+            keyword_conf = min(1.0, keyword_counts[c.index] / len(c.keywords)) if c.keywords else 0.0
+            confidence = (KEYWORD_WEIGHT * keyword_conf +
+                          PATTERN_WEIGHT * pattern_score) * c.pattern["confidence_base"]
+            out.append((c.pattern, confidence))
+        return out
+
+    def best(self, query: str, facts: List[List]) -> Optional[Tuple[Dict, float]]:
+        """The highest-scoring pattern (the first on ties), or None when
+        no pattern scores above zero"""
+        best, best_confidence = None, 0.0
+        for pattern, confidence in self.scores(query, facts):
+            if confidence > best_confidence:
+                best, best_confidence = pattern, confidence
+        return (best, best_confidence) if best is not None else None
@@ -21,11 +21,13 @@ This eliminates false negatives while maintaining formal rigor.
 import re
 import json
 import time
-import subprocess
 from typing import List, Dict, Tuple, Optional
 from anthropic import Anthropic
-from config import get_precis_path, ARITY_MAP
+from config import get_precis_path, ARITY_MAP, SPECULATIVE_TIER2
 import os
+from utils.witnesses import explain_violations
+from utils.precis_engine import get_engine
+from utils.fotl_parser import Quantified, check_formula, repair_formula
 
 # UPDATED: Use integrated verifier instead of old wrapper
 from utils.integrated_verifier import (
@@ -90,47 +92,33 @@ def validate_and_fix_formula(formula: str) -> Tuple[str, List[str], List[str]]:
     """
     Validate formula and attempt auto-fixes
     
+    Parses the formula in-process (utils.fotl_parser), so malformed LLM
+    output is repaired or reported before it reaches Précis.
+    
     Returns:
         (fixed_formula, warnings, unbound_variables)
     """
     warnings = []
     
-    # Remove markdown formatting
-    if "```" in formula:
-        match = re.search(r'```.*?\n(.*?)\n```', formula, re.DOTALL)
-        if match:
-            formula = match.group(1).strip()
-            warnings.append("🔧 Removed markdown formatting from formula")
+    # Strip markdown, extra lines, trailing punctuation, unbalanced parens
+    formula, repairs = repair_formula(formula)
+    for note in repairs:
+        warnings.append(f"🔧 {note[0].upper()}{note[1:]}")
     
-    # Take only first line if multi-line
-    formula_lines = formula.split('\n')
-    if len(formula_lines) > 1:
-        formula = formula_lines[0].strip()
-        warnings.append("🔧 Using only first line of formula")
+    check = check_formula(formula)
+    for error in check.errors:
+        warnings.append(f"❌ {error.kind.capitalize()} error: {error}")
+    for warning in check.warnings:
+        warnings.append(f"⚠️ {warning}")
     
     # Check for unbound variables
     unbound_vars = []
     
-    if formula.startswith('forall'):
-        # Extract quantified variables
-        match = re.search(r'forall\s+([\w,\s]+)\.', formula)
-        if match:
-            quantified_vars = {v.strip() for v in match.group(1).split(',')}
-            
-            # Extract all variables used in formula
-            var_pattern = r'\b([a-z][a-z0-9_]*)\b'
-            used_vars = set(re.findall(var_pattern, formula))
-            
-            # Exclude keywords and predicates
-            keywords = {'forall', 'implies', 'and', 'or', 'not', 'true', 'false'}
-            predicates = set(ARITY_MAP.keys())
-            used_vars = used_vars - keywords - predicates
-            
-            # Find unbound
-            unbound_vars = list(used_vars - quantified_vars)
-            
-            if unbound_vars:
-                warnings.append(f"⚠️ Unbound variables detected: {unbound_vars}")
+    if isinstance(check.ast, Quantified):
+        unbound_vars = check.free_vars
+        
+        if unbound_vars:
+            warnings.append(f"⚠️ Unbound variables detected: {unbound_vars}")
     
     return formula, warnings, unbound_vars
 
@@ -147,112 +135,20 @@ class OCamlPrecisVerifier:
     def __init__(self, precis_path: Optional[str] = None):
         self.precis_path = precis_path or PRECIS_PATH
     
-    def verify(self, formula: str, facts: List[List]) -> Dict:
+    def verify(self, formula: str, facts: List[List], facts_file=None, cancel=None) -> Dict:
         """
         Call OCaml Précis to verify formula against facts
+
+        Fact lists of PRECIS_FACTS_FILE_MIN or more go to Précis as a
+        memory-mapped facts file; facts_file reuses one already written
+        (a utils.fact_file.FactFile or path). Setting the `cancel` event
+        (a threading.Event) stops the run.
         
         Returns:
             Dictionary with verification results
         """
-        
-        if self.precis_path is None:
-            return {
-                "success": False,
-                "verified": False,
-                "error": "Précis executable not found",
-                "output": "",
-                "evaluations": [],
-                "violations": []
-            }
-        
-        try:
-            # Prepare facts for OCaml
-            facts_for_ocaml = [
-                {"predicate": f[0], "arguments": f[1:]}
-                for f in facts if len(f) >= 2
-            ]
-            
-            # Wrap formula in policy structure
-            wrapped_formula = f"""regulation HIPAA version "1.0"
-policy starts
-{formula}
-;
-policy ends"""
-            
-            # Build request
-            request = {
-                "formula": wrapped_formula,
-                "facts": {"facts": facts_for_ocaml},
-                "regulation": "HIPAA"
-            }
-            
-            # Call OCaml
-            proc = subprocess.Popen(
-                [self.precis_path, "json"],
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                cwd=os.path.dirname(self.precis_path) if os.path.dirname(self.precis_path) else "."
-            )
-            
-            output, error = proc.communicate(
-                input=json.dumps(request),
-                timeout=30
-            )
-            
-            if proc.returncode == 0 and output.strip():
-                result = json.loads(output)
-                
-                # Extract verification status
-                evaluations = result.get("evaluations", [])
-                violations = result.get("violations", [])
-                
-                if evaluations:
-                    verified = all(
-                        e.get("evaluation", {}).get("result") == "true"
-                        for e in evaluations
-                    )
-                else:
-                    verified = len(violations) == 0
-                
-                return {
-                    "success": True,
-                    "verified": verified,
-                    "output": json.dumps(result, indent=2),
-                    "error": "",
-                    "evaluations": evaluations,
-                    "violations": violations,
-                    "json_response": result
-                }
-            else:
-                return {
-                    "success": False,
-                    "verified": False,
-                    "output": output,
-                    "error": error,
-                    "evaluations": [],
-                    "violations": []
-                }
-        
-        except subprocess.TimeoutExpired:
-            return {
-                "success": False,
-                "verified": False,
-                "output": "",
-                "error": "Timeout (30s)",
-                "evaluations": [],
-                "violations": []
-            }
-        except Exception as e:
-            return {
-                "success": False,
-                "verified": False,
-                "output": "",
-                "error": str(e),
-                "evaluations": [],
-                "violations": []
-            }
+        return get_engine(self.precis_path).verify(
+            formula, facts, facts_file=facts_file, cancel=cancel).to_verification()
 
 
 # ============================================================================
@@ -478,6 +374,13 @@ def generate_explanation_with_llm(query: str, facts: List[List],
     Generate user-friendly explanation of verification result
     """
     
+    # Tier 2 violations with simple counterexample witnesses are
+    # templated directly; no LLM call needed
+    if not verification_result.compliant and verification_result.formal_result:
+        templated = explain_violations(verification_result.formal_result.get('evaluations', []))
+        if templated:
+            return templated
+    
     if verification_result.tier == VerificationTier.TIER_1A_PATTERN:
         # Tier 1A: Pattern match
         explain_prompt = f"""Explain this HIPAA compliance result to a non-technical user.
@@ -597,7 +500,8 @@ def pipeline_with_two_tier_verification(query: str, client: Anthropic) -> Dict:
         ocaml_verifier = OCamlPrecisVerifier(PRECIS_PATH)
         
         # UPDATED: Create integrated verifier (uses JSON routing + FOTL)
-        integrated_verifier = create_integrated_verifier(client, ocaml_verifier)
+        integrated_verifier = create_integrated_verifier(client, ocaml_verifier,
+                                                         speculative=SPECULATIVE_TIER2)
         
         # Run verification
         verification_result = integrated_verifier.verify(query, facts, formula)
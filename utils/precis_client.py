@@ -0,0 +1,441 @@
+"""
+precis_client.py - Resident Précis process and incremental fact sessions
+
+Runs `precis serve` once and talks to it over line-delimited JSON, so
+repeated queries skip process start-up and policy loading. A PrecisSession
+keeps one query's verdicts alive inside the engine; syncing a new fact set
+sends only the added/removed facts and gets back the verdicts that changed.
+
+PrecisServerPool spreads one-shot queries over several such processes;
+utils.precis_engine uses it when PRECIS_POOL_SIZE is set.
+
+When the `msgpack` package is installed, the client negotiates
+length-prefixed MessagePack frames with the engine at start-up instead of
+JSON lines. Either way, evaluations omit `formula_text` unless the client
+was created with formula_text=True.
+"""
+
+import json
+import queue
+import socket
+import struct
+import subprocess
+import threading
+import time
+from typing import Dict, List, Optional, Any, Tuple
+
+from config import get_precis_path
+from utils.reference_evaluator import route_small
+from utils.verification_cache import (
+    CANCEL_POLL_SECONDS, VerificationCache, cacheable, default_cache, in_flight,
+)
+
+_msgpack_module = None
+
+
+def load_msgpack():
+    """The msgpack module, imported on first use; None when not installed
+    (JSON lines are used without it)"""
+    global _msgpack_module
+    if _msgpack_module is None:
+        try:
+            import msgpack
+        except ImportError:
+            return None
+        _msgpack_module = msgpack
+    return _msgpack_module
+
+FactTuple = Tuple[str, ...]
+
+
+def _fact_to_json(fact) -> Dict[str, Any]:
+    """Accept ("pred", "a", "b"), ["pred", "a", "b"] or {"predicate", "arguments"}"""
+    if isinstance(fact, dict):
+        return {"predicate": fact["predicate"], "arguments": list(fact["arguments"])}
+    pred, *args = fact
+    return {"predicate": pred, "arguments": list(args)}
+
+
+def _fact_key(fact) -> FactTuple:
+    f = _fact_to_json(fact)
+    return (f["predicate"], *f["arguments"])
+
+
+class PrecisServer:
+    """
+    A resident `precis serve` process answering one request at a time
+
+    wire: "auto" uses MessagePack when the package is installed, "json"
+    forces JSON lines, "msgpack" requires MessagePack.
+    formula_text: include each evaluation's formula text in responses
+    (a request may still override it with its own "formula_text" field).
+    One-shot queries go through the verification cache, and identical
+    queries in flight from other threads are coalesced.
+    """
+
+    def __init__(self, precis_path: Optional[str] = None, timeout: int = 30,
+                 wire: str = "auto", formula_text: bool = False):
+        if wire == "msgpack" and load_msgpack() is None:
+            raise RuntimeError("wire='msgpack' requires the msgpack package")
+        self.precis_path = precis_path or get_precis_path()
+        self.timeout = timeout
+        self.wire = wire
+        self.formula_text = formula_text
+        self._lock = threading.Lock()
+        self._proc: Optional[subprocess.Popen] = None
+        self._rfile = None  # engine -> client stream
+        self._wfile = None  # client -> engine stream
+        self._wire = "json"  # format negotiated with the running process
+        self.cache: Optional[VerificationCache] = default_cache()
+
+    def _ensure_started(self):
+        if self._proc is None or self._proc.poll() is not None:
+            self._proc = subprocess.Popen(
+                [self.precis_path, "serve"],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL
+            )
+            self._rfile, self._wfile = self._proc.stdout, self._proc.stdin
+            self._wire = "json"
+            self._negotiate()
+
+    def _negotiate(self):
+        """Agree on a wire format and the formula_text default"""
+        offered = ["msgpack", "json"] if self.wire != "json" and load_msgpack() is not None else ["json"]
+        reply = self._exchange({"op": "hello", "wire": offered, "formula_text": self.formula_text})
+        # Engines without negotiation answer with an error and stay on JSON
+        self._wire = reply.get("wire", "json") if "error" not in reply else "json"
+
+    def _read_exact(self, n: int) -> bytes:
+        data = self._rfile.read(n)
+        if len(data) < n:
+            raise EOFError("Précis server exited unexpectedly")
+        return data
+
+    def _exchange(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Write one request and read one response in the negotiated format"""
+        if self._wire == "msgpack":
+            msgpack = load_msgpack()
+            body = msgpack.packb(payload, use_bin_type=True)
+            self._wfile.write(struct.pack(">I", len(body)) + body)
+            self._wfile.flush()
+            (length,) = struct.unpack(">I", self._read_exact(4))
+            return msgpack.unpackb(self._read_exact(length), raw=False)
+
+        self._wfile.write((json.dumps(payload) + "\n").encode("utf-8"))
+        self._wfile.flush()
+        line = self._rfile.readline()
+        if not line:
+            raise EOFError("Précis server exited unexpectedly")
+        return json.loads(line)
+
+    def request(self, payload: Dict[str, Any], timeout: Optional[float] = None,
+                cancel: Optional[threading.Event] = None) -> Dict[str, Any]:
+        """
+        Send one request and wait for its response. If the response has not
+        arrived within `timeout`, or `cancel` is set first, the process is
+        killed (its pipe may hold half a response) and restarted on the
+        next request.
+        """
+        with self._lock:
+            done = threading.Event()
+            # Held while the watchdog kills and while a finished exchange
+            # sets `done`, so the process is never killed after answering
+            guard = threading.Lock()
+            stopped: List[str] = []  # why the watchdog killed the process
+
+            def watch():
+                deadline = None if timeout is None else time.monotonic() + timeout
+                while not done.is_set():
+                    if cancel is not None and cancel.is_set():
+                        reason = "cancelled"
+                    elif deadline is not None and time.monotonic() >= deadline:
+                        reason = "timeout"
+                    else:
+                        done.wait(CANCEL_POLL_SECONDS)
+                        continue
+                    with guard:
+                        if not done.is_set():
+                            stopped.append(reason)
+                            self.kill()
+                    return
+
+            try:
+                self._ensure_started()
+                if timeout is not None or cancel is not None:
+                    threading.Thread(target=watch, daemon=True).start()
+                response = self._exchange(payload)
+                with guard:
+                    done.set()
+                if stopped:
+                    # Killed just as the response arrived: keep the answer,
+                    # start a new process for the next request
+                    self.close()
+                return response
+            except (BrokenPipeError, OSError, EOFError, ValueError) as e:
+                with guard:
+                    done.set()
+                self.close()
+                if stopped == ["timeout"]:
+                    return {"success": False, "retryable": True,
+                            "error": f"Précis request timed out after {round(timeout, 2)} seconds"}
+                if stopped == ["cancelled"]:
+                    return {"success": False, "retryable": True, "cancelled": True,
+                            "error": "Précis request cancelled"}
+                if isinstance(e, EOFError):
+                    return {"success": False, "retryable": True, "error": str(e)}
+                return {"success": False, "retryable": True,
+                        "error": f"Précis server unavailable: {e}"}
+            finally:
+                done.set()
+
+    def kill(self):
+        """Stop the process at once; safe to call from another thread"""
+        proc = self._proc
+        if proc is not None and proc.poll() is None:
+            proc.kill()
+
+    def query(self, formula: str, facts: list, regulation: Optional[str] = None) -> Dict[str, Any]:
+        """One-shot query, same response shape as `precis json`"""
+        payload = {
+            "formula": formula,
+            "facts": {"facts": [_fact_to_json(f) for f in facts]}
+        }
+        if regulation:
+            payload["regulation"] = regulation
+        return self.cached_request(payload)
+
+    def cached_request(self, payload: Dict[str, Any], timeout: Optional[float] = None,
+                       cancel: Optional[threading.Event] = None) -> Dict[str, Any]:
+        """
+        request() through the verification cache and the in-process route.
+        Cancellable requests run on their own instead of sharing a run
+        with identical ones, like cached_precis_call.
+        """
+        if self.cache is None:
+            return self.request(payload, timeout, cancel)
+
+        key = self.cache.key(self.precis_path, payload, ("serve", str(self.formula_text)))
+        hit = self.cache.get(key) if self.cache.enabled else None
+        if hit is not None:
+            return json.loads(hit)
+
+        def run() -> str:
+            # Small queries are answered in-process, without a round trip
+            routed = route_small(self.precis_path, payload, self.formula_text)
+            text = json.dumps(routed if routed is not None else self.request(payload, timeout, cancel))
+            if self.cache.enabled and cacheable(text):
+                self.cache.put(key, text)
+            return text
+
+        if cancel is not None:
+            return json.loads(run())
+        # Identical queries from other threads share this one
+        try:
+            return json.loads(in_flight().do(key, run, timeout))
+        except TimeoutError:
+            return {"success": False, "retryable": True,
+                    "error": f"Précis request timed out after {round(timeout, 2)} seconds"}
+
+    def close(self):
+        if self._proc is not None:
+            try:
+                self._proc.stdin.close()
+                self._proc.wait(timeout=5)
+            except Exception:
+                self._proc.kill()
+            self._proc = None
+
+
+class RemotePrecisServer(PrecisServer):
+    """
+    A `precis serve --listen` engine reached over a socket
+
+    address: "host:port" for TCP, or a Unix socket path. Each connection
+    is served by its own forked engine process on the remote side.
+    """
+
+    def __init__(self, address: str, timeout: int = 30,
+                 wire: str = "auto", formula_text: bool = False):
+        super().__init__(precis_path=address, timeout=timeout, wire=wire,
+                         formula_text=formula_text)
+        self.address = address
+        self._sock: Optional[socket.socket] = None
+        self.cache = None  # the remote engine's files cannot be fingerprinted here
+
+    def _ensure_started(self):
+        if self._sock is None:
+            if ":" in self.address and "/" not in self.address:
+                host, port = self.address.rsplit(":", 1)
+                self._sock = socket.create_connection((host or "127.0.0.1", int(port)),
+                                                      timeout=self.timeout)
+            else:
+                self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                self._sock.settimeout(self.timeout)
+                self._sock.connect(self.address)
+            self._rfile = self._sock.makefile("rb")
+            self._wfile = self._sock.makefile("wb")
+            self._wire = "json"
+            self._negotiate()
+
+    def close(self):
+        if self._sock is not None:
+            for f in (self._wfile, self._rfile):
+                try:
+                    f.close()
+                except Exception:
+                    pass
+            self._sock.close()
+            self._sock = None
+
+
+class PrecisServerPool(PrecisServer):
+    """
+    Up to `size` resident `precis serve` processes answering requests
+    concurrently, one request per process at a time
+
+    Workers start on first use. A request waits for a free worker within
+    its own deadline; a worker whose request times out is killed and
+    replaced by a fresh one on its next use. Sessions live inside one
+    process, so PrecisSession and PrecisFactSession need a PrecisServer.
+    """
+
+    def __init__(self, precis_path: Optional[str] = None, size: int = 4, timeout: int = 30,
+                 wire: str = "auto", formula_text: bool = False):
+        super().__init__(precis_path=precis_path, timeout=timeout, wire=wire,
+                         formula_text=formula_text)
+        self.size = max(1, size)
+        self._idle: "queue.LifoQueue[PrecisServer]" = queue.LifoQueue()
+        for _ in range(self.size):
+            self._idle.put(PrecisServer(self.precis_path, timeout, wire, formula_text))
+
+    def request(self, payload: Dict[str, Any], timeout: Optional[float] = None,
+                cancel: Optional[threading.Event] = None) -> Dict[str, Any]:
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        try:
+            worker = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            return {"success": False, "retryable": True,
+                    "error": f"No Précis worker free within {timeout} seconds"}
+        try:
+            return worker.request(payload, max(0.0, deadline - time.monotonic()), cancel)
+        finally:
+            self._idle.put(worker)
+
+    def kill(self):
+        pass  # workers are killed one by one, by their own deadlines
+
+    def close(self):
+        workers = []
+        while True:
+            try:
+                workers.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        for w in workers:
+            w.close()
+            self._idle.put(w)
+
+
+class PrecisSession:
+    """
+    Incremental evaluation of one query over a changing fact set
+
+    Usage:
+        session = PrecisSession(server, formula, facts, regulation="HIPAA")
+        result = session.sync(new_facts)   # only changed verdicts come back
+    """
+
+    def __init__(self, server: PrecisServer, formula: str, facts: list,
+                 regulation: Optional[str] = None):
+        self.server = server
+        self.formula = formula
+        self.regulation = regulation
+        self.session_id: Optional[str] = None
+        self._synced: set = set()
+
+        payload = {
+            "op": "session_open",
+            "formula": formula,
+            "facts": {"facts": [_fact_to_json(f) for f in facts]}
+        }
+        if regulation:
+            payload["regulation"] = regulation
+
+        self.initial = server.request(payload)
+        if "error" in self.initial:
+            raise RuntimeError(self.initial["error"])
+
+        self.session_id = self.initial["session_id"]
+        self._synced = {_fact_key(f) for f in facts}
+
+    def sync(self, facts: list) -> Dict[str, Any]:
+        """
+        Bring the engine's fact set in line with `facts`
+
+        Returns the engine's delta response: `changed` evaluations,
+        `reevaluated` count, `domain_changed`, `overall_compliant`, `violations`.
+        """
+        target = {_fact_key(f) for f in facts}
+        added = sorted(target - self._synced)
+        removed = sorted(self._synced - target)
+
+        response = self.server.request({
+            "op": "session_delta",
+            "session_id": self.session_id,
+            "add": [_fact_to_json(f) for f in added],
+            "remove": [_fact_to_json(f) for f in removed]
+        })
+        if "error" not in response:
+            self._synced = target
+        return response
+
+    def close(self):
+        if self.session_id is not None:
+            self.server.request({"op": "session_close", "session_id": self.session_id})
+            self.session_id = None
+
+
+class PrecisFactSession:
+    """
+    Facts uploaded once, queried with many formulas
+
+    Usage:
+        case = PrecisFactSession(server, facts)
+        r1 = case.query("disclose(hospital, patient, phi)", regulation="HIPAA")
+        r2 = case.query("hasConsent(patient, hospital, phi)")
+
+    The engine drops sessions idle for longer than PRECIS_SESSION_TTL; an
+    expired session is re-uploaded transparently on the next query.
+    """
+
+    def __init__(self, server: PrecisServer, facts: list):
+        self.server = server
+        self._facts = [_fact_to_json(f) for f in facts]
+        self.session_id: Optional[str] = None
+        self._open()
+
+    def _open(self):
+        response = self.server.request({"op": "facts_open", "facts": {"facts": self._facts}})
+        if "error" in response:
+            raise RuntimeError(response["error"])
+        self.session_id = response["fact_session"]
+
+    def query(self, formula: str, regulation: Optional[str] = None) -> Dict[str, Any]:
+        """Same response shape as PrecisServer.query"""
+        payload = {"formula": formula, "fact_session": self.session_id}
+        if regulation:
+            payload["regulation"] = regulation
+        response = self.server.request(payload)
+        if "Unknown fact session" in str(response.get("error", "")):
+            self._open()
+            payload["fact_session"] = self.session_id
+            response = self.server.request(payload)
+        return response
+
+    def close(self):
+        if self.session_id is not None:
+            self.server.request({"op": "facts_close", "fact_session": self.session_id})
+            self.session_id = None
@@ -0,0 +1,344 @@
+"""
+precis_engine.py - One client for every call into Précis
+
+PrecisEngine is the single way the Python side reaches the engine. It
+finds the executable (config.get_precis_path) and runs `precis version`
+once per binary, so callers can check what the engine supports. Every
+request then takes the same path:
+
+  verification cache -> in-process reference evaluator -> coalescing of
+  identical in-flight requests -> a `precis json` process, or a pool of
+  resident `precis serve` workers (PRECIS_POOL_SIZE)
+
+One deadline covers the whole request. It is also passed to the engine as
+a request budget, so policies finished before it still come back. Results
+come back as a PrecisResult whatever went wrong: a missing binary, a
+timeout, a crash or an engine error.
+
+Configuration:
+    PRECIS_POOL_SIZE    resident workers per engine (default 0: a `precis json`
+                        process per request)
+    PRECIS_TIMEOUT      default deadline in seconds (default 30)
+
+Usage:
+    engine = get_engine()
+    result = engine.verify(formula, facts)       # PrecisResult
+    if result.success and result.verified: ...
+    ok, message = engine.validate(formula)
+"""
+
+import json
+import os
+import subprocess
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+from config import get_precis_path
+from utils.fact_file import with_facts
+from utils.precis_client import PrecisServerPool
+from utils.verification_cache import PrecisCancelled, cached_precis_call, metrics as cache_metrics
+
+try:
+    import orjson
+except ImportError:  # optional: responses are decoded with json.loads without it
+    orjson = None
+
+DEFAULT_TIMEOUT = 30.0
+
+# Share of the deadline given to the engine as its evaluation budget; the
+# rest covers start-up and the trip back
+BUDGET_SHARE = 0.8
+
+
+def decode_response(text) -> Any:
+    """Decode a Précis response (str or bytes), with orjson when installed"""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def wrap_policy(formula: str, regulation: str = "HIPAA") -> str:
+    """A bare formula as the one-policy file Précis expects as a query"""
+    return f"""regulation {regulation} version "1.0"
+policy starts
+{formula}
+;
+policy ends"""
+
+
+def verifiable_facts(facts: List[Any]) -> List[Any]:
+    """The facts a bare-formula verification sends: those with arguments"""
+    return [f for f in facts if len(f) >= 2]
+
+
+# ============================================================================
+# HANDSHAKE
+# ============================================================================
+
+@dataclass(frozen=True)
+class EngineInfo:
+    """What `precis version` reported for one executable"""
+    path: str
+    root: str  # directory holding policies/ and data/
+    protocol: int  # 0: the engine predates `precis version`
+    features: FrozenSet[str]
+    error: str = ""  # why the handshake failed, if it did
+
+    def supports(self, feature: str) -> bool:
+        return feature in self.features
+
+
+# Engines answering `precis version` with nothing are assumed to take
+# plain inline-fact `precis json` requests only
+_BASELINE_FEATURES = frozenset({"json"})
+
+_handshakes: Dict[Tuple[str, int], EngineInfo] = {}
+_handshakes_lock = threading.Lock()
+
+
+def handshake(precis_path: str) -> EngineInfo:
+    """`precis version`, run once per executable (and again if it is replaced)"""
+    path = os.path.abspath(precis_path)
+    try:
+        stamp = os.stat(path).st_mtime_ns
+    except OSError:
+        stamp = 0
+    with _handshakes_lock:
+        info = _handshakes.get((path, stamp))
+    if info is not None:
+        return info
+
+    root = os.path.dirname(path)
+    protocol, features, error = 0, _BASELINE_FEATURES, ""
+    try:
+        proc = subprocess.run([path, "version"], capture_output=True, text=True,
+                              timeout=10, cwd=root)
+        reply = json.loads(proc.stdout)
+        protocol = int(reply["protocol"])
+        features = frozenset(reply.get("features", [])) | _BASELINE_FEATURES
+    except (OSError, subprocess.SubprocessError) as e:
+        error = str(e)
+    except (ValueError, KeyError, TypeError):
+        pass  # an older engine printing its usage text
+
+    info = EngineInfo(path, root, protocol, features, error)
+    with _handshakes_lock:
+        _handshakes[(path, stamp)] = info
+    return info
+
+
+# ============================================================================
+# RESULT
+# ============================================================================
+
+def response_verified(response: Dict[str, Any]) -> bool:
+    """Every evaluated policy holds (no violations when none matched);
+    an unknown verdict is not verified"""
+    evaluations = response.get("evaluations", [])
+    if evaluations:
+        return all(e.get("evaluation", {}).get("result") == "true" for e in evaluations)
+    return not response.get("violations", [])
+
+
+@dataclass
+class PrecisResult:
+    """Outcome of one Précis request"""
+    success: bool
+    response: Dict[str, Any] = field(default_factory=dict)  # the engine's JSON response
+    error: str = ""
+    retryable: bool = False  # timeouts and transport failures; the request itself may be fine
+    elapsed_ms: float = 0.0
+    cancelled: bool = False  # stopped by the caller's cancel event
+
+    @property
+    def evaluations(self) -> List[Dict[str, Any]]:
+        return self.response.get("evaluations", [])
+
+    @property
+    def violations(self) -> List[str]:
+        return self.response.get("violations", [])
+
+    @property
+    def matched_policies(self) -> List[Dict[str, Any]]:
+        return self.response.get("matched_policies", [])
+
+    @property
+    def verified(self) -> bool:
+        return self.success and response_verified(self.response)
+
+    def to_verification(self) -> Dict[str, Any]:
+        """The dict the verifier wrappers have always returned"""
+        return {
+            "success": self.success,
+            "verified": self.verified,
+            "output": json.dumps(self.response, indent=2) if self.success else "",
+            "error": self.error,
+            "evaluations": self.evaluations,
+            "violations": self.violations,
+            "json_response": self.response,
+            "result": self.response,
+        }
+
+
+def with_budget(request: Dict[str, Any], timeout: float, info: Optional[EngineInfo]) -> Dict[str, Any]:
+    """request with BUDGET_SHARE of the deadline as its request budget,
+    unless it sets its own or the engine takes no budgets"""
+    if "budget" in request or info is None or not info.supports("budget"):
+        return request
+    return {**request, "budget": {"request": {"timeout_ms": int(timeout * 1000 * BUDGET_SHARE)}}}
+
+
+def to_result(response: Any, elapsed_ms: float = 0.0) -> PrecisResult:
+    """PrecisResult for a decoded engine (or transport) response"""
+    if not isinstance(response, dict):
+        return PrecisResult(False, error="Invalid JSON response", elapsed_ms=elapsed_ms)
+    if "error" in response:
+        return PrecisResult(False, response, error=str(response["error"]),
+                            retryable=bool(response.get("retryable")),
+                            cancelled=bool(response.get("cancelled")), elapsed_ms=elapsed_ms)
+    return PrecisResult(True, response, elapsed_ms=elapsed_ms)
+
+
+# ============================================================================
+# CLIENT
+# ============================================================================
+
+class PrecisEngine:
+    """
+    Client for one Précis executable
+
+    precis_path: the executable (default: config.get_precis_path()).
+    pool_size: resident `precis serve` workers; 0 starts a `precis json`
+    process per request (default PRECIS_POOL_SIZE).
+    timeout: default deadline in seconds (default PRECIS_TIMEOUT).
+    """
+
+    def __init__(self, precis_path: Optional[str] = None, pool_size: Optional[int] = None,
+                 timeout: Optional[float] = None):
+        self.precis_path = precis_path or get_precis_path()
+        self.pool_size = _env_int("PRECIS_POOL_SIZE", 0) if pool_size is None else pool_size
+        self.timeout = _env_float("PRECIS_TIMEOUT", DEFAULT_TIMEOUT) if timeout is None else timeout
+        self.info: Optional[EngineInfo] = handshake(self.precis_path) if self.precis_path else None
+        self._pool: Optional[PrecisServerPool] = None
+        if self.pool_size > 0 and self.info is not None and self.info.supports("serve"):
+            # Same formula_text default as `precis json`
+            self._pool = PrecisServerPool(self.precis_path, size=self.pool_size,
+                                          timeout=self.timeout, formula_text=True)
+
+    @property
+    def available(self) -> bool:
+        return self.precis_path is not None
+
+    def supports(self, feature: str) -> bool:
+        return self.info is not None and self.info.supports(feature)
+
+    def request(self, request: Dict[str, Any], timeout: Optional[float] = None,
+                cancel: Optional[threading.Event] = None) -> PrecisResult:
+        """
+        Send a `precis json` request (formula, facts, regulation, ...).
+        Setting `cancel` stops the engine's work on it; the result is then
+        an error with cancelled=True.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        if not self.available:
+            return PrecisResult(False, error="Précis executable not found")
+        request = with_budget(request, timeout, self.info)
+
+        start = time.perf_counter()
+        try:
+            if self._pool is not None:
+                response = self._pool.cached_request(request, timeout, cancel)
+            else:
+                returncode, stdout, stderr = cached_precis_call(
+                    self.precis_path, request, timeout=timeout, cwd=self.info.root, cancel=cancel)
+                if returncode != 0 or not stdout.strip():
+                    return PrecisResult(False, error=stderr or f"Précis exited with status {returncode}",
+                                        elapsed_ms=_ms_since(start))
+                response = decode_response(stdout)
+        except PrecisCancelled:
+            return PrecisResult(False, error="Précis request cancelled", retryable=True,
+                                cancelled=True, elapsed_ms=_ms_since(start))
+        except subprocess.TimeoutExpired:
+            return PrecisResult(False, error=f"Précis request timed out after {timeout} seconds",
+                                retryable=True, elapsed_ms=_ms_since(start))
+        except OSError as e:
+            return PrecisResult(False, error=f"Précis could not be run: {e}", retryable=True,
+                                elapsed_ms=_ms_since(start))
+        except ValueError as e:
+            return PrecisResult(False, error=f"Invalid JSON response: {e}", elapsed_ms=_ms_since(start))
+
+        return to_result(response, _ms_since(start))
+
+    def query(self, formula: str, facts: List[Any] = (), regulation: Optional[str] = None,
+              facts_file: Any = None, timeout: Optional[float] = None,
+              cancel: Optional[threading.Event] = None, **fields) -> PrecisResult:
+        """
+        Query with a policy-file formula. facts: ["pred", *args] lists,
+        tuples or {"predicate", "arguments"} dicts; large sets and
+        facts_file go by facts file (see utils.fact_file). Extra fields
+        (workers, budget, stats, formula_text) are passed through.
+        """
+        request = {"formula": formula}
+        if regulation:
+            request["regulation"] = regulation
+        request.update(fields)
+        with_facts(request, list(facts), facts_file, allow_file=self.supports("facts_file"))
+        return self.request(request, timeout, cancel)
+
+    def verify(self, formula: str, facts: List[Any], regulation: str = "HIPAA",
+               facts_file: Any = None, timeout: Optional[float] = None,
+               cancel: Optional[threading.Event] = None) -> PrecisResult:
+        """Verify a bare formula (wrapped as a one-policy query) against facts"""
+        return self.query(wrap_policy(formula, regulation), verifiable_facts(facts),
+                          regulation=regulation, facts_file=facts_file, timeout=timeout,
+                          cancel=cancel)
+
+    def validate(self, formula: str, timeout: float = 10) -> Tuple[bool, str]:
+        """(True, "Valid"), or (False, the engine's parse or type error)"""
+        result = self.query(wrap_policy(formula, "TEST"), [], regulation="TEST", timeout=timeout)
+        return (True, "Valid") if result.success else (False, result.error)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Cache, coalescing and in-process counters, with the handshake"""
+        out = cache_metrics()
+        if self.info is not None:
+            out["engine"] = {"path": self.info.path, "protocol": self.info.protocol,
+                             "features": sorted(self.info.features), "pool_size": self.pool_size}
+        return out
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _ms_since(start: float) -> float:
+    return (time.perf_counter() - start) * 1000
+
+
+_engines: Dict[Optional[str], PrecisEngine] = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(precis_path: Optional[str] = None) -> PrecisEngine:
+    """The process-wide PrecisEngine for an executable (default: the configured one)"""
+    key = os.path.abspath(precis_path) if precis_path else None
+    with _engines_lock:
+        if key not in _engines:
+            _engines[key] = PrecisEngine(precis_path)
+        return _engines[key]
@@ -0,0 +1,852 @@
+"""
+reference_evaluator.py - In-process reference implementation of `precis json`
+
+For a handful of facts and a short formula, spawning Précis costs far more
+than the evaluation. ReferenceEngine answers such requests in Python with
+the engine's semantics:
+
+- policies are loaded from the engine's policies/ directory and grouped
+  by regulation like Policy_loader
+- matching uses the same Jaccard relevance over predicate names
+- the query is type-checked against data/*_types.txt like Type_checker
+- policies are evaluated like Evaluator.eval_node, with early-exit
+  quantifiers over the sorted fact entities and a hashed fact index
+- witnesses are read back like Evaluator.witness_of
+
+The response has the same shape as the engine's, so callers cannot tell
+which one answered. Routing is opt-in: route_small answers nothing until
+PRECIS_INPROCESS_MAX_COST is set above 0 (50000 is about the cost of a
+Précis start-up). It becomes the default once recorded Précis answers
+(tests/fixtures/precis) confirm the two engines agree on the bundled
+policies. Requests the reference does not cover are declined
+(route_small returns None) and go to Précis as before:
+
+- type or parse errors, whose messages are the engine's to give
+- requests asking for stats
+- requests with assignment or lookup budgets
+- requests whose estimated cost exceeds PRECIS_INPROCESS_MAX_COST
+
+    response = route_small(precis_path, request)   # dict, or None for Précis
+
+Run `python -m utils.differential_check` to compare both engines, or
+tests/test_differential.py, which also replays recorded answers.
+"""
+
+import itertools
+import os
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from utils.fotl_parser import (
+    COMPARISONS, Annotated, BinLogical, BinTemporal, Const, FalseF, Formula,
+    FOTLSyntaxError, Func, Not, Predicate, Quantified, Term, TrueF, UnTemporal,
+    Var, free_variables, parse_policy_file,
+)
+from utils.witnesses import describe_witness
+
+# Upper bound on atom evaluations for a request answered in-process;
+# 0 leaves every request to Précis unless PRECIS_INPROCESS_MAX_COST opts in
+DEFAULT_MAX_COST = 0
+
+# Same as Evaluator.max_witness_atoms
+MAX_WITNESS_ATOMS = 16
+
+# Type files read by Environment_config.load_multi_regulation_types, in order
+TYPE_FILES = ("hipaa_types.txt", "gdpr_types.txt", "ccpa_types.txt")
+
+# Characters removed by OCaml's String.trim
+_OCAML_BLANKS = " \t\n\r\x0c"
+
+
+def max_cost() -> int:
+    """PRECIS_INPROCESS_MAX_COST; 0 disables in-process evaluation"""
+    try:
+        return int(os.environ.get("PRECIS_INPROCESS_MAX_COST", DEFAULT_MAX_COST))
+    except ValueError:
+        return DEFAULT_MAX_COST
+
+
+# ============================================================================
+# TYPE CHECKING (mirrors src/type_system_db.ml and src/type_checker.ml)
+# ============================================================================
+
+def _checker_type(name: str) -> str:
+    """Type_system_db.parse_type then ast_type_to_checker_type"""
+    name = name.strip(_OCAML_BLANKS)
+    if name in ("Bool", "Int", "String", "Time"):
+        return name
+    return "Entity"
+
+
+@dataclass
+class TypeEnvironment:
+    predicates: Dict[str, List[str]]        # name -> argument types
+    functions: Dict[str, Tuple[List[str], str]]
+    constants: Dict[str, str]
+
+    @classmethod
+    def load(cls, data_dir: str) -> "TypeEnvironment":
+        predicates: Dict[str, List[str]] = {}
+        functions: Dict[str, Tuple[List[str], str]] = {}
+        constants: Dict[str, str] = {}
+        # The first declaration of a name wins across files
+        for name in TYPE_FILES:
+            path = os.path.join(data_dir, name)
+            if not os.path.exists(path):
+                continue
+            section = ""
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip(_OCAML_BLANKS)
+                    if not line or line.startswith("#"):
+                        continue
+                    if line in ("PREDICATES", "FUNCTIONS", "CONSTANTS"):
+                        section = line
+                        continue
+                    parts = line.split(":")
+                    if len(parts) != 2:
+                        continue
+                    decl = parts[0].strip(_OCAML_BLANKS)
+                    if section == "CONSTANTS":
+                        constants.setdefault(decl, _checker_type(parts[1]))
+                        continue
+                    tokens = [t.strip(_OCAML_BLANKS) for t in parts[1].strip(_OCAML_BLANKS).split(" ")]
+                    tokens = [t for t in tokens if t and t != "->"]
+                    if not tokens:
+                        continue
+                    args = [_checker_type(t) for t in tokens[:-1]]
+                    if section == "PREDICATES":
+                        predicates.setdefault(decl, args)
+                    elif section == "FUNCTIONS":
+                        functions.setdefault(decl, (args, _checker_type(tokens[-1])))
+        return cls(predicates, functions, constants)
+
+    def check(self, f: Formula) -> Optional[str]:
+        """First type error in f (Type_checker.typecheck_formula), or None"""
+        try:
+            self._formula(f, {})
+        except TypeError as e:
+            return str(e)
+        return None
+
+    def _term(self, t: Term, ctx: Dict[str, str]) -> str:
+        if isinstance(t, Var):
+            if t.name not in ctx:
+                raise TypeError(f"Unbound variable: {t.name}")
+            return ctx[t.name]
+        if isinstance(t, Const):
+            if t.value not in self.constants:
+                raise TypeError(f"Unknown constant: {t.value}")
+            return self.constants[t.value]
+        if t.name not in self.functions:
+            raise TypeError(f"Unknown function: {t.name}")
+        args, result = self.functions[t.name]
+        self._arguments(t.name, args, t.args, ctx)
+        return result
+
+    def _arguments(self, name: str, expected: List[str], args: Tuple[Term, ...], ctx: Dict[str, str]):
+        if len(expected) != len(args):
+            raise TypeError(f"{name} expects {len(expected)} arguments, got {len(args)}")
+        for i, (want, arg) in enumerate(zip(expected, args)):
+            got = self._term(arg, ctx)
+            if got != want:
+                raise TypeError(f"Argument {i}: expected {want}, got {got}")
+
+    def _formula(self, f: Formula, ctx: Dict[str, str]):
+        if isinstance(f, Quantified):
+            self._formula(f.body, {**ctx, **{v: "Entity" for v in f.variables}})
+        elif isinstance(f, Predicate):
+            if f.name not in self.predicates:
+                raise TypeError(f"Unknown predicate: {f.name}")
+            self._arguments(f.name, self.predicates[f.name], f.args, ctx)
+        elif isinstance(f, (BinLogical, BinTemporal)):
+            if isinstance(f, BinTemporal):
+                _check_bound(f.bound)
+            self._formula(f.left, ctx)
+            self._formula(f.right, ctx)
+        elif isinstance(f, UnTemporal):
+            _check_bound(f.bound)
+            self._formula(f.body, ctx)
+        elif isinstance(f, (Not, Annotated)):
+            self._formula(f.body, ctx)
+
+
+def _check_bound(bound: Optional[Tuple[int, int]]):
+    if bound is not None and not (0 <= bound[0] <= bound[1]):
+        raise TypeError(f"Invalid temporal bound: bounds must be: 0 <= l <= u, got [{bound[0]},{bound[1]}]")
+
+
+# ============================================================================
+# POLICIES (mirrors src/policy_loader.ml)
+# ============================================================================
+
+@dataclass(frozen=True)
+class PolicyEntry:
+    id: str
+    regulation: str
+    section: str
+    description: str
+    formula: Formula
+
+
+def _entries(regulation: str, formulas: List[Formula]) -> List[PolicyEntry]:
+    """Policy_loader.formulas_to_entries"""
+    entries = []
+    for idx, f in enumerate(formulas):
+        if isinstance(f, Annotated):
+            parts = f.citation.split("-")
+            section = parts[0].strip(_OCAML_BLANKS)
+            desc = "-".join(parts[1:]).strip(_OCAML_BLANKS) if len(parts) > 1 else "No description"
+            f = f.body
+        else:
+            section, desc = f"Policy-{idx}", "Unannotated policy"
+        entries.append(PolicyEntry(f"{regulation}-{idx}", regulation, section, desc, f))
+    return entries
+
+
+def _strip_comments(line: str, in_comment: bool) -> Tuple[str, bool]:
+    """A line without its comments, and whether a comment is still open at
+    its end. Comments do not nest, as in lexer.mll."""
+    code, pos = [], 0
+    while True:
+        if in_comment:
+            end = line.find("*)", pos)
+            if end < 0:
+                return "".join(code), True
+            in_comment, pos = False, end + 2
+        else:
+            start = line.find("(*", pos)
+            if start < 0:
+                code.append(line[pos:])
+                return "".join(code), False
+            code.append(line[pos:start] + " ")
+            in_comment, pos = True, start + 2
+
+
+def peek_regulation(path: str) -> str:
+    """Regulation named by a file's header, the first line with anything but
+    comments and blanks, else its file name (policy_loader.ml's rule)"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            in_comment = False
+            for line in f:
+                code, in_comment = _strip_comments(line, in_comment)
+                words = code.split()
+                if words:
+                    return words[1] if len(words) > 1 and words[0] == "regulation" else os.path.basename(path)
+    except OSError:
+        pass
+    return os.path.basename(path)
+
+
+class PolicyStore:
+    """Parsed .policy files of one directory, re-read when a file changes"""
+
+    def __init__(self, policies_dir: str):
+        self.policies_dir = policies_dir
+        self._files: Dict[str, Tuple[int, List[PolicyEntry]]] = {}  # path -> (mtime_ns, entries)
+        self.load_errors: Dict[str, str] = {}
+
+    def regulation_files(self) -> Dict[str, List[str]]:
+        index: Dict[str, List[str]] = {}
+        if os.path.isdir(self.policies_dir):
+            for name in sorted(os.listdir(self.policies_dir)):
+                if name.endswith(".policy"):
+                    path = os.path.join(self.policies_dir, name)
+                    index.setdefault(peek_regulation(path), []).append(path)
+        return index
+
+    def _load(self, path: str) -> List[PolicyEntry]:
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return []
+        cached = self._files.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        try:
+            with open(path, encoding="utf-8") as f:
+                pf = parse_policy_file(f.read())
+            regulation = pf.regulation or os.path.basename(path)
+            entries = _entries(regulation, pf.policies)
+            self.load_errors.pop(path, None)
+        except (FOTLSyntaxError, OSError, UnicodeDecodeError) as e:
+            # The engine skips such files with a warning, too
+            entries = []
+            self.load_errors[path] = str(e)
+        self._files[path] = (mtime, entries)
+        return entries
+
+    def policies(self, regulation: Optional[str]) -> List[PolicyEntry]:
+        """get_regulation_database, or get_combined_database for None"""
+        index = self.regulation_files()
+        if regulation is not None:
+            return [p for f in index.get(regulation, []) for p in self._load(f)
+                    if p.regulation == regulation]
+        return [p for reg in sorted(index) for f in index[reg] for p in self._load(f)]
+
+
+# ============================================================================
+# MATCHING (mirrors Query_engine.find_relevant_policies)
+# ============================================================================
+
+def predicate_names(f: Formula) -> List[str]:
+    if isinstance(f, Predicate):
+        return [f.name]
+    if isinstance(f, (Not, UnTemporal, Quantified, Annotated)):
+        return predicate_names(f.body)
+    if isinstance(f, (BinLogical, BinTemporal)):
+        return predicate_names(f.left) + predicate_names(f.right)
+    return []
+
+
+def relevance(query: Formula, policy: Formula) -> Tuple[float, List[str]]:
+    """Jaccard similarity of predicate names, and the shared names"""
+    q = sorted(set(predicate_names(query)))
+    p = set(predicate_names(policy))
+    matched = [name for name in q if name in p]
+    union = len(set(q) | p)
+    return (len(matched) / union if union else 0.0), matched
+
+
+def find_relevant_policies(query: Formula, policies: List[PolicyEntry],
+                           min_score: float = 0.1) -> List[Tuple[PolicyEntry, float, List[str]]]:
+    found = []
+    for policy in policies:
+        score, matched = relevance(query, policy.formula)
+        if score >= min_score:
+            found.append((policy, score, matched))
+    return sorted(found, key=lambda m: -m[1])
+
+
+# ============================================================================
+# EVALUATION (mirrors Evaluator.eval_node and Evaluator.witness_of)
+# ============================================================================
+
+def _ocaml_int(s: str) -> Optional[int]:
+    if s != s.strip():
+        return None
+    try:
+        return int(s)
+    except ValueError:
+        try:
+            return int(s, 0)
+        except ValueError:
+            return None
+
+
+def _compare(op: str, v1: str, v2: str) -> bool:
+    if op == "=":
+        return v1 == v2
+    if op == "!=":
+        return v1 != v2
+    i1, i2 = _ocaml_int(v1), _ocaml_int(v2)
+    if i1 is None or i2 is None:
+        return False
+    return {"<": i1 < i2, "<=": i1 <= i2, ">": i1 > i2, ">=": i1 >= i2}[op]
+
+
+def _term_value(t: Term, assignment: Dict[str, str]) -> Optional[str]:
+    # The engine answers `precis json` with an empty function table, so a
+    # function term never has a value
+    if isinstance(t, Var):
+        return assignment.get(t.name)
+    if isinstance(t, Const):
+        return t.value
+    return None
+
+
+Closure = Callable[[Dict[str, str]], bool]
+
+
+class FactEvaluator:
+    """
+    Evaluates formulas over one fact set
+
+    Like the engine's shared DAG, structurally equal subformulas (across
+    all policies evaluated here) are compiled once into one closure, and
+    each closure memoises its verdict per binding of its free variables.
+    Facts are a hashed set of (predicate, arguments); quantifiers stop at
+    the first deciding binding, enumerating the sorted entities in the
+    engine's order, and remember it for the witness.
+    """
+
+    def __init__(self, facts: List[Tuple[str, Tuple[str, ...]]]):
+        self.facts = set(facts)
+        self.entities = sorted({a for _, args in self.facts for a in args})
+        self._nodes: Dict[Formula, Tuple[int, Tuple[str, ...], Closure]] = {}
+        self._by_id: Dict[int, Tuple[Formula, Tuple[int, Tuple[str, ...], Closure]]] = {}
+        self._results: Dict[Tuple, bool] = {}
+        self._witnesses: Dict[Tuple, List[Tuple[str, str]]] = {}
+        self._next_uid = 0
+
+    def holds(self, f: Formula, assignment: Optional[Dict[str, str]] = None) -> bool:
+        return self.compile(f)(assignment or {})
+
+    def _key(self, f: Formula, assignment: Dict[str, str]) -> Tuple:
+        uid, free, _ = self._node(f)
+        return (uid, tuple(assignment.get(v) for v in free))
+
+    def compile(self, f: Formula) -> Closure:
+        return self._node(f)[2]
+
+    def _node(self, f: Formula) -> Tuple[int, Tuple[str, ...], Closure]:
+        if isinstance(f, Annotated):
+            return self._node(f.body)
+        seen = self._by_id.get(id(f))
+        if seen is not None:
+            return seen[1]
+        node = self._nodes.get(f)
+        if node is None:
+            uid, free = self._next_uid, tuple(sorted(set(free_variables(f))))
+            self._next_uid += 1
+            raw, results = self._compile(f, uid, free), self._results
+
+            def memoised(a: Dict[str, str]) -> bool:
+                key = (uid, tuple(a.get(v) for v in free))
+                verdict = results.get(key)
+                if verdict is None:
+                    verdict = results[key] = raw(a)
+                return verdict
+
+            # An atom is one set lookup; a memo entry would cost more
+            node = (uid, free, raw if isinstance(f, (Predicate, TrueF, FalseF)) else memoised)
+            self._nodes[f] = node
+        # Structural hashing walks the whole formula; look it up once per object
+        self._by_id[id(f)] = (f, node)
+        return node
+
+    def _compile(self, f: Formula, uid: int, free: Tuple[str, ...]) -> Closure:
+        if isinstance(f, TrueF):
+            return lambda a: True
+        if isinstance(f, FalseF):
+            return lambda a: False
+        if isinstance(f, Predicate):
+            return self._compile_atom(f)
+        if isinstance(f, Not):
+            body = self.compile(f.body)
+            return lambda a: not body(a)
+        if isinstance(f, UnTemporal):
+            # Temporal operators are evaluated at a single point, as in the engine
+            return self.compile(f.body)
+        if isinstance(f, (BinLogical, BinTemporal)):
+            left, right = self.compile(f.left), self.compile(f.right)
+            op = f.op if isinstance(f, BinLogical) else "and"
+            if op == "and":
+                return lambda a: left(a) and right(a)
+            if op == "or":
+                return lambda a: left(a) or right(a)
+            if op == "implies":
+                return lambda a: (not left(a)) or right(a)
+            if op == "iff":
+                return lambda a: left(a) == right(a)
+            return lambda a: left(a) != right(a)
+        if isinstance(f, Quantified):
+            body, variables, entities = self.compile(f.body), f.variables, self.entities
+            want = f.quantifier == "exists"   # the verdict of the body that decides
+            witnesses = self._witnesses
+
+            def decided(a: Dict[str, str]) -> bool:
+                for values in itertools.product(entities, repeat=len(variables)):
+                    b = dict(a)
+                    b.update(zip(variables, values))
+                    if body(b) == want:
+                        witnesses[(uid, tuple(a.get(v) for v in free))] = list(zip(variables, values))
+                        return True
+                return False
+
+            return (lambda a: decided(a)) if want else (lambda a: not decided(a))
+        raise ValueError(f"Cannot evaluate {f!r}")
+
+    def _compile_atom(self, f: Predicate) -> Closure:
+        name, args, facts = f.name, f.args, self.facts
+        if name in COMPARISONS:
+            def compare(a: Dict[str, str]) -> bool:
+                values = [_term_value(t, a) for t in args]
+                return len(values) == 2 and None not in values and _compare(name, *values)
+            return compare
+
+        def lookup(a: Dict[str, str]) -> bool:
+            values = tuple(_term_value(t, a) for t in args)
+            return None not in values and (name, values) in facts
+        return lookup
+
+    def witness(self, f: Formula) -> Optional[Dict[str, Any]]:
+        """
+        The deciding binding and atoms of f, as the engine's `witness`
+        field; after evaluation it only reads the memo tables
+        """
+        binding: List[Tuple[str, str]] = []
+        atoms: List[Dict[str, Any]] = []
+        quantified: List[Dict[str, Any]] = []
+        self.holds(f)
+        root = f
+        while isinstance(root, Annotated):  # compiled away by the engine
+            root = root.body
+
+        def walk(a: Dict[str, str], g: Formula):
+            if len(atoms) + len(quantified) >= MAX_WITNESS_ATOMS or isinstance(g, (TrueF, FalseF)):
+                return
+            if isinstance(g, Predicate):
+                values = [_term_value(t, a) for t in g.args]
+                atoms.append({"predicate": g.name,
+                              "arguments": ["?" if v is None else v for v in values],
+                              "holds": self.holds(g, a)})
+            elif isinstance(g, (Not, UnTemporal, Annotated)):
+                walk(a, g.body)
+            elif isinstance(g, (BinLogical, BinTemporal)):
+                v = self.holds(g, a)
+                op = g.op if isinstance(g, BinLogical) else "and"
+                # A single child decides these; prefer the left one
+                if op == "and" and not v:
+                    walk(a, g.left if not self.holds(g.left, a) else g.right)
+                elif op == "or" and v:
+                    walk(a, g.left if self.holds(g.left, a) else g.right)
+                elif op == "implies" and v:
+                    walk(a, g.left if not self.holds(g.left, a) else g.right)
+                else:
+                    walk(a, g.left)
+                    walk(a, g.right)
+            elif isinstance(g, Quantified):
+                # A violated forall or a satisfied exists has one binding; a
+                # failed exists or satisfied forall is explained by the claim
+                bound = self._witnesses.get(self._key(g, a))
+                if bound is None:
+                    # At the root the claim would only restate the policy
+                    if g is not root and self.holds(g, a) == (g.quantifier == "forall"):
+                        quantified.append({"quantifier": g.quantifier, "variables": list(g.variables),
+                                           "formula": string_of_formula(_substitute(g.body, a, g.variables))})
+                    return
+                binding.extend(bound)
+                b = dict(a)
+                for var, entity in reversed(bound):
+                    b[var] = entity
+                walk(b, g.body)
+
+        walk({}, f)
+        if not binding and not atoms and not quantified:
+            return None
+        witness = {"binding": dict(binding), "atoms": atoms}
+        if quantified:
+            witness["quantified"] = quantified
+        return witness
+
+
+def _substitute(f: Formula, a: Dict[str, str], shadowed: Tuple[str, ...] = ()) -> Formula:
+    """Evaluator.formula_of_node: f with the variables bound in `a` (except
+    `shadowed`) replaced by their values, and annotations dropped"""
+    def term(t: Term, shadowed: Tuple[str, ...]) -> Term:
+        if isinstance(t, Var):
+            return Const(a[t.name]) if t.name in a and t.name not in shadowed else t
+        if isinstance(t, Func):
+            return Func(t.name, tuple(term(x, shadowed) for x in t.args))
+        return t
+
+    def go(g: Formula, shadowed: Tuple[str, ...]) -> Formula:
+        if isinstance(g, Predicate):
+            return Predicate(g.name, tuple(term(x, shadowed) for x in g.args))
+        if isinstance(g, Not):
+            return Not(go(g.body, shadowed))
+        if isinstance(g, BinLogical):
+            return BinLogical(g.op, go(g.left, shadowed), go(g.right, shadowed))
+        if isinstance(g, BinTemporal):
+            return BinTemporal(g.op, go(g.left, shadowed), go(g.right, shadowed), g.bound)
+        if isinstance(g, UnTemporal):
+            return UnTemporal(g.op, go(g.body, shadowed), g.bound)
+        if isinstance(g, Quantified):
+            return Quantified(g.quantifier, g.variables, go(g.body, shadowed + tuple(g.variables)))
+        if isinstance(g, Annotated):
+            return go(g.body, shadowed)
+        return g
+    return go(f, tuple(shadowed))
+
+
+# ============================================================================
+# RENDERING (mirrors Ast.string_of_formula and Json_interface.formula_to_json)
+# ============================================================================
+
+_LOGICAL_SYMBOLS = {"and": "∧", "or": "∨", "implies": "→", "iff": "↔", "xor": "⊕"}
+_TEMPORAL_SYMBOLS = {"until": "U", "since": "S", "next": "X", "always": "G", "eventually": "F",
+                     "historically": "H", "once": "O", "yesterday": "Y"}
+
+
+def _string_of_term(t: Term) -> str:
+    if isinstance(t, Var):
+        return t.name
+    if isinstance(t, Const):
+        return t.value
+    return f"{t.name}({', '.join(_string_of_term(a) for a in t.args)})"
+
+
+def _string_of_bound(bound: Optional[Tuple[int, int]]) -> str:
+    return "" if bound is None else f"[{bound[0]},{bound[1]}]"
+
+
+def string_of_formula(f: Formula) -> str:
+    if isinstance(f, TrueF):
+        return "True"
+    if isinstance(f, FalseF):
+        return "False"
+    if isinstance(f, Predicate):
+        if not f.args:
+            return f.name
+        return f"{f.name}({', '.join(_string_of_term(a) for a in f.args)})"
+    if isinstance(f, Not):
+        return f"¬({string_of_formula(f.body)})"
+    if isinstance(f, BinLogical):
+        return f"({string_of_formula(f.left)} {_LOGICAL_SYMBOLS[f.op]} {string_of_formula(f.right)})"
+    if isinstance(f, BinTemporal):
+        return (f"({string_of_formula(f.left)} {_TEMPORAL_SYMBOLS[f.op]}{_string_of_bound(f.bound)} "
+                f"{string_of_formula(f.right)})")
+    if isinstance(f, UnTemporal):
+        return f"{_TEMPORAL_SYMBOLS[f.op]}{_string_of_bound(f.bound)}({string_of_formula(f.body)})"
+    if isinstance(f, Quantified):
+        symbol = "∀" if f.quantifier == "forall" else "∃"
+        return f"{symbol}{','.join(f.variables)}.({string_of_formula(f.body)})"
+    return f"@[\"{f.citation}\"] {string_of_formula(f.body)}"
+
+
+def _term_to_json(t: Term) -> Dict[str, Any]:
+    if isinstance(t, Var):
+        return {"type": "var", "name": t.name}
+    if isinstance(t, Const):
+        return {"type": "const", "name": t.value}
+    return {"type": "func", "name": t.name, "args": [_term_to_json(a) for a in t.args]}
+
+
+def _bound_to_json(bound: Optional[Tuple[int, int]]) -> Optional[Dict[str, int]]:
+    return None if bound is None else {"lower": bound[0], "upper": bound[1]}
+
+
+def formula_to_json(f: Formula) -> Dict[str, Any]:
+    if isinstance(f, TrueF):
+        return {"type": "true"}
+    if isinstance(f, FalseF):
+        return {"type": "false"}
+    if isinstance(f, Predicate):
+        return {"type": "predicate", "name": f.name, "args": [_term_to_json(a) for a in f.args]}
+    if isinstance(f, Not):
+        return {"type": "not", "formula": formula_to_json(f.body)}
+    if isinstance(f, BinLogical):
+        return {"type": "binary_logical", "operator": f.op,
+                "left": formula_to_json(f.left), "right": formula_to_json(f.right)}
+    if isinstance(f, BinTemporal):
+        return {"type": "binary_temporal", "operator": f.op, "left": formula_to_json(f.left),
+                "right": formula_to_json(f.right), "bound": _bound_to_json(f.bound)}
+    if isinstance(f, UnTemporal):
+        return {"type": "unary_temporal", "operator": f.op,
+                "formula": formula_to_json(f.body), "bound": _bound_to_json(f.bound)}
+    if isinstance(f, Quantified):
+        return {"type": "quantified", "quantifier": f.quantifier,
+                "variables": list(f.variables), "formula": formula_to_json(f.body)}
+    return {"type": "annotated", "citation": f.citation, "formula": formula_to_json(f.body)}
+
+
+# ============================================================================
+# COST ESTIMATE AND ROUTING
+# ============================================================================
+
+def estimate_cost(f: Formula, entities: int) -> int:
+    """Atom evaluations without early exit: each quantifier multiplies its body by entities^vars"""
+    def cost(g: Formula, scale: int) -> int:
+        if isinstance(g, Predicate):
+            return scale
+        if isinstance(g, (Not, UnTemporal, Annotated)):
+            return cost(g.body, scale)
+        if isinstance(g, (BinLogical, BinTemporal)):
+            return cost(g.left, scale) + cost(g.right, scale)
+        if isinstance(g, Quantified):
+            return scale + cost(g.body, scale * max(1, entities) ** len(g.variables))
+        return 0
+    return cost(f, 1)
+
+
+class Declined(Exception):
+    """The request is outside what the reference evaluator answers"""
+
+
+_REQUEST_KEYS = {"formula", "facts", "regulation", "workers", "budget", "formula_text"}
+
+
+def _request_facts(request: Dict[str, Any]) -> List[Tuple[str, Tuple[str, ...]]]:
+    facts = request.get("facts")
+    items = facts.get("facts") if isinstance(facts, dict) else None
+    if not isinstance(items, list):
+        raise Declined("no inline facts")
+    out = []
+    for item in items:
+        if not isinstance(item, dict):
+            raise Declined("malformed fact")
+        pred, args = item.get("predicate"), item.get("arguments")
+        if not isinstance(pred, str) or not isinstance(args, list) or \
+                not all(isinstance(a, str) for a in args):
+            raise Declined("malformed fact")
+        out.append((pred, tuple(args)))
+    return out
+
+
+def _check_request(request: Dict[str, Any]):
+    if not isinstance(request, dict) or set(request) - _REQUEST_KEYS:
+        raise Declined("unsupported request fields")
+    if not isinstance(request.get("formula"), str):
+        raise Declined("no formula")
+    if request.get("regulation") is not None and not isinstance(request["regulation"], str):
+        raise Declined("malformed regulation")
+    budget = request.get("budget")
+    if budget is not None:
+        # A wall-clock allowance is never reached by a small request;
+        # counted limits could make the engine answer "unknown"
+        for scope in (budget.values() if isinstance(budget, dict) else [None]):
+            if not isinstance(scope, dict) or set(scope) - {"timeout_ms"}:
+                raise Declined("counted budget")
+
+
+class ReferenceEngine:
+    """
+    Python stand-in for the engine installed at `root`
+    (root/policies and root/data, as beside the precis executable)
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.store = PolicyStore(os.path.join(root, "policies"))
+        self._types: Optional[Tuple[Tuple, TypeEnvironment]] = None
+        self._lock = threading.Lock()
+
+    def types(self) -> TypeEnvironment:
+        data_dir = os.path.join(self.root, "data")
+        stamp = tuple(_mtime(os.path.join(data_dir, name)) for name in TYPE_FILES)
+        if self._types is None or self._types[0] != stamp:
+            self._types = (stamp, TypeEnvironment.load(data_dir))
+        return self._types[1]
+
+    def prepare(self, request: Dict[str, Any]):
+        """(query formula, matched policies, facts), or Declined"""
+        _check_request(request)
+        facts = _request_facts(request)
+        try:
+            pf = parse_policy_file(request["formula"])
+        except FOTLSyntaxError as e:
+            raise Declined(f"parse error: {e}")
+        if not pf.policies:
+            raise Declined("no formula provided")
+        query = pf.policies[0]
+        error = self.types().check(query)
+        if error:
+            raise Declined(f"type error: {error}")
+        matched = find_relevant_policies(query, self.store.policies(request.get("regulation")))
+        return query, matched, facts
+
+    def cost(self, matched, facts) -> int:
+        entities = len({a for _, args in facts for a in args})
+        return sum(estimate_cost(policy.formula, entities) for policy, _, _ in matched)
+
+    def formula_text(self, regulation: str, policy_id: str, section: Optional[str] = None,
+                     description: Optional[str] = None) -> Optional[str]:
+        """
+        The formula_text the engine reports for a policy, from the policy
+        files. Ids restart in every file of a regulation, so the section and
+        description narrow the match; None if the policy is still ambiguous.
+        """
+        texts = {string_of_formula(p.formula) for p in self.store.policies(regulation)
+                 if p.id == policy_id
+                 and (section is None or p.section == section)
+                 and (description is None or p.description == description)}
+        return texts.pop() if len(texts) == 1 else None
+
+    def answer(self, request: Dict[str, Any], formula_text: bool = True,
+               max_cost: Optional[int] = None) -> Dict[str, Any]:
+        """
+        The engine's response to `request`; raises Declined if it is not
+        one the reference answers (or costs more than max_cost)
+        """
+        with self._lock:
+            query, matched, facts = self.prepare(request)
+        if max_cost is not None and self.cost(matched, facts) > max_cost:
+            raise Declined("estimated cost too high")
+
+        evaluator = FactEvaluator(facts)
+        formula_text = request.get("formula_text", formula_text)
+        evaluations = []
+        for policy, _, _ in matched:
+            verdict = evaluator.holds(policy.formula)
+            explanation = (f"Policy {policy.id} is satisfied by current facts" if verdict
+                           else f"Policy {policy.id} is VIOLATED by current facts")
+            evaluation = {"policy_id": policy.id, "regulation": policy.regulation,
+                          "section": policy.section, "description": policy.description}
+            if formula_text:
+                evaluation["formula_text"] = string_of_formula(policy.formula)
+            evaluation["evaluation"] = {"result": "true" if verdict else "false"}
+            witness = evaluator.witness(policy.formula)
+            if witness is not None:
+                explanation = f"{explanation} ({describe_witness(witness)})"
+            evaluation["explanation"] = explanation
+            if witness is not None:
+                evaluation["witness"] = witness
+            evaluations.append(evaluation)
+
+        violations = [e["policy_id"] for e in evaluations if e["evaluation"]["result"] == "false"]
+        return {
+            "query_formula": formula_to_json(query),
+            "matched_policies": [{
+                "policy_id": policy.id,
+                "regulation": policy.regulation,
+                "section": policy.section,
+                "description": policy.description,
+                "relevance_score": score,
+                "matched_terms": terms
+            } for policy, score, terms in matched],
+            "evaluations": evaluations,
+            "overall_compliant": not violations,
+            "violations": violations,
+            "undecided": []
+        }
+
+
+def _mtime(path: str) -> int:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return 0
+
+
+_engines: Dict[str, ReferenceEngine] = {}
+_engines_lock = threading.Lock()
+_stats = {"answered": 0, "declined": 0}
+
+
+def engine_for(precis_path: str) -> ReferenceEngine:
+    root = os.path.dirname(os.path.abspath(precis_path))
+    with _engines_lock:
+        if root not in _engines:
+            _engines[root] = ReferenceEngine(root)
+        return _engines[root]
+
+
+def route_small(precis_path: Optional[str], request: Dict[str, Any],
+                formula_text: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    Answer `request` in-process if it is small enough, else None
+
+    formula_text: whether evaluations carry formula_text when the request
+    does not say (`precis json` includes it; `precis serve` negotiates it).
+    """
+    limit = max_cost()
+    if limit <= 0 or precis_path is None:
+        return None
+    try:
+        response = engine_for(precis_path).answer(request, formula_text, limit)
+    except Declined:
+        with _engines_lock:
+            _stats["declined"] += 1
+        return None
+    with _engines_lock:
+        _stats["answered"] += 1
+    return response
+
+
+def stats() -> Dict[str, int]:
+    """Requests answered in-process and requests left to Précis"""
+    with _engines_lock:
+        return dict(_stats)
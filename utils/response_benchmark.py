@@ -0,0 +1,174 @@
+"""
+response_benchmark.py - Replay recorded Précis responses through the parsers
+
+Measures what it costs to turn a Précis response into Python objects:
+the standard and lean (slotted, formula_text left out by the engine)
+response modes of PolicyChecker.parse_response, each with json.loads and,
+when installed, orjson. Every response is parsed `--repeat` times; the
+best time is reported, with the memory still held by the parsed responses
+and the peak while parsing (tracemalloc).
+
+Responses are replayed from recorded files: any *.json under the given
+paths, e.g. the PRECIS_CACHE_DIR on-disk tier. Without paths, responses
+are recorded first from ReferenceEngine (which produces Précis's output)
+for queries spanning several policies each, and --save keeps them.
+
+    python -m utils.response_benchmark $PRECIS_CACHE_DIR
+    python -m utils.response_benchmark --cases 50 --policies 30 --save /tmp/responses
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import get_precis_path
+from policy_checker import PolicyChecker
+from utils.differential_check import predicates_of, random_facts
+from utils.fotl_parser import to_source
+from utils.precis_engine import orjson
+from utils.reference_evaluator import Declined, engine_for
+
+
+def load_recorded(paths: List[str]) -> List[str]:
+    """Texts of the successful responses among *.json files under paths"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(os.path.join(root, n) for n in sorted(names) if n.endswith(".json"))
+        else:
+            files.append(path)
+    texts = []
+    for f in files:
+        with open(f, encoding="utf-8") as fh:
+            text = fh.read()
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(data, dict) and "evaluations" in data and "error" not in data:
+            texts.append(text)
+    return texts
+
+
+def record(precis_path: str, cases: int, policies: int, entities: int, seed: int) -> List[str]:
+    """Responses to queries conjoining `policies` random policies of one regulation"""
+    engine = engine_for(precis_path)
+    rng = random.Random(seed)
+    types = engine.types()
+    # Only policies that type-check as queries can be conjoined into one
+    by_regulation = {reg: [p for p in engine.store.policies(reg) if types.check(p.formula) is None]
+                     for reg in sorted(engine.store.regulation_files())}
+    by_regulation = {reg: ps for reg, ps in by_regulation.items() if ps}
+    texts = []
+    attempts = 0
+    while len(texts) < cases and attempts < cases * 20:
+        attempts += 1
+        reg = rng.choice(sorted(by_regulation))
+        chosen = rng.sample(by_regulation[reg], min(policies, len(by_regulation[reg])))
+        body = " and ".join(f"({to_source(p.formula)})" for p in chosen)
+        predicates: Dict[str, int] = {}
+        for p in chosen:
+            for name, arity in predicates_of(p.formula).items():
+                predicates.setdefault(name, arity)
+        request = {"formula": f"regulation {reg}\npolicy starts\n{body}\n;\npolicy ends",
+                   "facts": {"facts": random_facts(rng, predicates, entities, 0.3)},
+                   "regulation": reg}
+        try:
+            texts.append(json.dumps(engine.answer(request)))
+        except Declined:
+            continue
+    return texts
+
+
+def strip_formula_text(text: str) -> str:
+    """The response as Précis sends it to a lean request"""
+    data = json.loads(text)
+    for e in data.get("evaluations", []):
+        e.pop("formula_text", None)
+    return json.dumps(data)
+
+
+def measure(texts: List[str], parse: Callable[[str], Any], repeat: int) -> Dict[str, float]:
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        for text in texts:
+            parse(text)
+        best = min(best, time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    kept = [parse(text) for text in texts]
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return {"seconds": best, "retained_mb": retained / 2 ** 20, "peak_mb": peak / 2 ** 20}
+
+
+def modes() -> List[Tuple[str, bool, Callable[[Any], Any]]]:
+    """(name, lean, decoder)"""
+    out = [("json / dataclasses", False, json.loads), ("json / lean", True, json.loads)]
+    if orjson is not None:
+        out += [("orjson / dataclasses", False, orjson.loads), ("orjson / lean", True, orjson.loads)]
+    return out
+
+
+def run(texts: List[str], repeat: int) -> List[Tuple[str, Dict[str, float]]]:
+    lean_texts = [strip_formula_text(t) for t in texts]
+    results = []
+    for name, lean, decode in modes():
+        corpus = lean_texts if lean else texts
+        results.append((name, measure(
+            corpus, lambda t: PolicyChecker.parse_response(decode(t), lean=lean), repeat)))
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Replay recorded Précis responses through the parsers")
+    parser.add_argument("paths", nargs="*", help="recorded responses (*.json files or directories)")
+    parser.add_argument("--precis", help="Précis executable, for recording (default: config.get_precis_path())")
+    parser.add_argument("--cases", type=int, default=30, help="responses to record")
+    parser.add_argument("--policies", type=int, default=20, help="policies conjoined per recorded query")
+    parser.add_argument("--entities", type=int, default=4, help="entities per recorded fact set")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5, help="timed passes over the responses")
+    parser.add_argument("--save", help="directory to keep the recorded responses in")
+    args = parser.parse_args(argv)
+
+    if args.paths:
+        texts = load_recorded(args.paths)
+    else:
+        precis_path = args.precis or get_precis_path()
+        if precis_path is None:
+            print("❌ Précis executable not found (needed to locate policies/ and data/)")
+            return 2
+        texts = record(precis_path, args.cases, args.policies, args.entities, args.seed)
+        if args.save:
+            os.makedirs(args.save, exist_ok=True)
+            for i, text in enumerate(texts):
+                with open(os.path.join(args.save, f"response-{i:04d}.json"), "w", encoding="utf-8") as f:
+                    f.write(text)
+    if not texts:
+        print("❌ No responses to replay")
+        return 2
+
+    evaluations = sum(len(json.loads(t).get("evaluations", [])) for t in texts)
+    size = sum(len(t.encode("utf-8")) for t in texts)
+    print(f"{len(texts)} responses, {evaluations} evaluations, {size / 2 ** 20:.2f} MB of JSON"
+          f"{'' if orjson is not None else ' (orjson not installed)'}\n")
+    print(f"{'decoder / objects':<22} {'time (ms)':>10} {'retained (MB)':>14} {'peak (MB)':>10}")
+    for name, r in run(texts, args.repeat):
+        print(f"{name:<22} {r['seconds'] * 1000:>10.1f} {r['retained_mb']:>14.2f} {r['peak_mb']:>10.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
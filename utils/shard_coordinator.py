@@ -0,0 +1,216 @@
+"""
+shard_coordinator.py - Sharded verification across several Précis engines
+
+A verification job checks a set of cases against a set of regulations.
+The coordinator splits it into one shard per (case, regulation) pair and
+hands shards to N engine workers, each a resident `precis serve` process
+or a `precis serve --listen` engine reached over a socket. Shards that fail
+in transport are retried on another worker; the per-policy results are
+merged into a single report.
+
+Usage:
+    coordinator = ShardCoordinator(workers=4)
+    report = coordinator.run(cases, ["HIPAA", "GDPR"])
+    print(report.summary())
+
+    # or engines on other hosts
+    coordinator = ShardCoordinator(addresses=["10.0.0.5:7878", "10.0.0.6:7878"])
+"""
+
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Any
+
+from utils.precis_client import PrecisServer, RemotePrecisServer
+
+
+@dataclass
+class VerificationCase:
+    """One archived case: a query formula and its facts"""
+    case_id: str
+    formula: str
+    facts: list
+
+
+@dataclass
+class ShardResult:
+    """Outcome of one (case, regulation) shard"""
+    case_id: str
+    regulation: str
+    attempts: int
+    elapsed_s: float
+    response: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    worker: Optional[str] = None
+
+
+@dataclass
+class PolicyTally:
+    """Merged results for one policy across all cases"""
+    policy_id: str
+    regulation: str
+    checked: int = 0
+    violations: int = 0
+    unknown: int = 0
+    violating_cases: List[str] = field(default_factory=list)
+
+
+@dataclass
+class ShardReport:
+    """Merged report of a sharded verification job"""
+    shards: List[ShardResult]
+    policies: Dict[str, PolicyTally]
+    wall_s: float
+    workers: int
+
+    @property
+    def failed(self) -> List[ShardResult]:
+        return [s for s in self.shards if s.error is not None]
+
+    @property
+    def non_compliant_cases(self) -> List[str]:
+        return sorted({s.case_id for s in self.shards
+                       if s.response and not s.response.get("overall_compliant", False)})
+
+    @property
+    def throughput(self) -> float:
+        """Completed shards per second"""
+        done = len(self.shards) - len(self.failed)
+        return done / self.wall_s if self.wall_s > 0 else 0.0
+
+    def summary(self) -> str:
+        lines = [
+            f"Shards: {len(self.shards)} ({len(self.failed)} failed) on {self.workers} worker(s)",
+            f"Wall time: {self.wall_s:.2f}s, throughput: {self.throughput:.1f} shards/s",
+            f"Non-compliant cases: {len(self.non_compliant_cases)}",
+        ]
+        for tally in sorted(self.policies.values(), key=lambda t: -t.violations):
+            if tally.violations or tally.unknown:
+                lines.append(f"  {tally.policy_id} ({tally.regulation}): "
+                             f"{tally.violations}/{tally.checked} violated, {tally.unknown} unknown")
+        return "\n".join(lines)
+
+
+class ShardCoordinator:
+    """
+    Distribute (case, regulation) shards over several engine workers
+
+    workers: number of local `precis serve` processes (ignored when
+    addresses are given). addresses: "host:port" or socket paths of
+    `precis serve --listen` engines, one worker each.
+    retries: extra attempts for a shard whose worker failed in transport;
+    engine errors (bad formula, type error) are not retried.
+    """
+
+    def __init__(self, workers: int = 4, addresses: Optional[List[str]] = None,
+                 precis_path: Optional[str] = None, retries: int = 2, timeout: int = 30):
+        self.addresses = addresses or []
+        self.workers = len(self.addresses) if self.addresses else max(1, workers)
+        self.precis_path = precis_path
+        self.retries = retries
+        self.timeout = timeout
+
+    def _make_server(self, index: int) -> PrecisServer:
+        if self.addresses:
+            return RemotePrecisServer(self.addresses[index], timeout=self.timeout)
+        return PrecisServer(self.precis_path, timeout=self.timeout)
+
+    def _worker(self, index: int, shards: "queue.Queue", total: int,
+                results: List[ShardResult], lock: threading.Lock):
+        server = self._make_server(index)
+        name = self.addresses[index] if self.addresses else f"local-{index}"
+        try:
+            while True:
+                item = shards.get()
+                if item is None:
+                    break
+                case, regulation, attempt = item
+                start = time.time()
+                try:
+                    response = server.query(case.formula, case.facts, regulation)
+                except Exception as e:
+                    response = {"success": False, "error": f"Shard failed: {e}"}
+                elapsed = time.time() - start
+
+                if response.get("retryable") and attempt <= self.retries:
+                    # Hand the shard back; another (or a restarted) worker takes it
+                    shards.put((case, regulation, attempt + 1))
+                    continue
+
+                error = response.get("error")
+                with lock:
+                    results.append(ShardResult(
+                        case_id=case.case_id,
+                        regulation=regulation,
+                        attempts=attempt,
+                        elapsed_s=elapsed,
+                        response=None if error else response,
+                        error=error,
+                        worker=name
+                    ))
+                    if len(results) == total:
+                        for _ in range(self.workers):
+                            shards.put(None)
+        finally:
+            server.close()
+
+    def run(self, cases: List[VerificationCase], regulations: List[str]) -> ShardReport:
+        """Verify every case against every regulation and merge the results"""
+        shards: "queue.Queue" = queue.Queue()
+        total = len(cases) * len(regulations)
+        for case in cases:
+            for regulation in regulations:
+                shards.put((case, regulation, 1))
+        if total == 0:
+            return ShardReport(shards=[], policies={}, wall_s=0.0, workers=self.workers)
+
+        results: List[ShardResult] = []
+        lock = threading.Lock()
+        start = time.time()
+        threads = [threading.Thread(target=self._worker, args=(i, shards, total, results, lock), daemon=True)
+                   for i in range(self.workers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall = time.time() - start
+
+        return ShardReport(shards=results, policies=merge_results(results),
+                           wall_s=wall, workers=self.workers)
+
+    def benchmark(self, cases: List[VerificationCase], regulations: List[str]) -> Dict[str, Any]:
+        """Throughput of this coordinator against a single-process baseline"""
+        baseline = ShardCoordinator(workers=1, addresses=self.addresses[:1],
+                                    precis_path=self.precis_path, retries=self.retries,
+                                    timeout=self.timeout).run(cases, regulations)
+        sharded = self.run(cases, regulations)
+        return {
+            "shards": len(sharded.shards),
+            "workers": self.workers,
+            "baseline_s": baseline.wall_s,
+            "sharded_s": sharded.wall_s,
+            "baseline_throughput": baseline.throughput,
+            "sharded_throughput": sharded.throughput,
+            "speedup": baseline.wall_s / sharded.wall_s if sharded.wall_s > 0 else 0.0,
+        }
+
+
+def merge_results(results: List[ShardResult]) -> Dict[str, PolicyTally]:
+    """Tally each policy's verdicts over all successful shards"""
+    policies: Dict[str, PolicyTally] = {}
+    for shard in results:
+        if not shard.response:
+            continue
+        for e in shard.response.get("evaluations", []):
+            tally = policies.setdefault(
+                e["policy_id"], PolicyTally(policy_id=e["policy_id"], regulation=e["regulation"]))
+            tally.checked += 1
+            verdict = e["evaluation"]["result"]
+            if verdict == "unknown":
+                tally.unknown += 1
+            elif verdict == "false":
+                tally.violations += 1
+                tally.violating_cases.append(shard.case_id)
+    return policies
@@ -1,6 +1,5 @@
 
 import streamlit as st
-import subprocess
 import json
 import time
 from anthropic import Anthropic
@@ -15,6 +14,8 @@ import PyPDF2
 from io import BytesIO
 import re
 from config import get_precis_path, ARITY_MAP, EXPERIMENTS
+from utils.precis_engine import get_engine
+from utils.fotl_parser import check_formula
 
 PRECIS_PATH = get_precis_path()
 ANTHROPIC_API_KEY = os.environ.get("ANTHROPIC_API_KEY")
@@ -95,51 +96,27 @@ def get_fallback_database() -> list:
 # PRÉCIS INTERFACE
 # ============================================
 
-def call_precis_json(formula: str, facts: list) -> dict:
+def call_precis_json(formula: str, facts: list, facts_file=None) -> dict:
     """
     Call OCaml Précis engine in JSON mode
     
     This is the bridge: Python → OCaml
+
+    Large fact lists (PRECIS_FACTS_FILE_MIN and up) are handed over in a
+    memory-mapped facts file instead of the pipe; facts_file reuses a
+    file already on disk (see utils.fact_file).
     """
-    
-    # Prepare JSON input for OCaml
-    request = {
-        "formula": formula,
-        "facts": {
-            "facts": [[pred] + args for pred, *args in facts]
-        },
-        "regulation": "HIPAA"
-    }
-    
-    try:
-        # Call OCaml in JSON mode
-        proc = subprocess.Popen(
-            [PRECIS_PATH, "json"],
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
-        
-        stdout, stderr = proc.communicate(input=json.dumps(request), timeout=30)
-        
-        if proc.returncode == 0:
-            return {
-                "success": True,
-                "output": stdout,
-                "response": json.loads(stdout) if stdout.strip() else {}
-            }
-        else:
-            return {
-                "success": False,
-                "error": stderr or "Unknown error"
-            }
-    
-    except Exception as e:
+    result = get_engine(PRECIS_PATH).query(formula, facts, regulation="HIPAA", facts_file=facts_file)
+    if result.success:
         return {
-            "success": False,
-            "error": str(e)
+            "success": True,
+            "output": json.dumps(result.response),
+            "response": result.response
         }
+    return {
+        "success": False,
+        "error": result.error or "Unknown error"
+    }
 
 
 def analyze_compliance_answer(answer: str, question: str = "") -> dict:
@@ -432,40 +409,13 @@ class FormulaValidator:
         self.precis_path = precis_path
     
     def validate(self, formula: str) -> tuple:
-        """Validate formula with Précis"""
-        wrapped = f"""regulation TEST version "1.0"
-policy starts
-{formula}
-;
-policy ends"""
-        
-        request = {
-            "formula": wrapped,
-            "facts": {"facts": []},
-            "regulation": "TEST"
-        }
+        """Validate formula, in-process first and then with Précis"""
+        # Syntax and arity errors never need the engine
+        check = check_formula(formula)
+        if not check.ok:
+            return False, "; ".join(str(e) for e in check.errors)
         
-        try:
-            proc = subprocess.Popen(
-                [self.precis_path, "json"],
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                timeout=10
-            )
-            
-            stdout, stderr = proc.communicate(input=json.dumps(request))
-            
-            if proc.returncode == 0:
-                response = json.loads(stdout)
-                if 'error' in response:
-                    return False, response['error']
-                return True, "Valid"
-            else:
-                return False, stderr
-        except Exception as e:
-            return False, str(e)
+        return get_engine(self.precis_path).validate(formula, timeout=10)
 
 ##====MULTI-POLICY IMPLEMENTATION========##
 
@@ -0,0 +1,569 @@
+"""
+verification_cache.py - Canonicalised cache of Précis verification results
+
+The same (formula, facts) pairs reach Précis again and again, often
+differing only in bound variable names, fact order or whitespace. Requests
+are keyed after canonicalisation:
+
+  - the formula is re-tokenised the way lexer.mll reads it, so whitespace,
+    comments and operator spellings ("and", "&&", "∧") do not matter, and
+    quantified variables are renamed in binding order (alpha-renaming);
+  - facts are sorted and deduplicated;
+  - the regulation filter and any other request fields are part of the key;
+  - a "facts_file" is keyed by its path, offset, size and mtime.
+
+Results live in a bounded in-memory LRU and, when PRECIS_CACHE_DIR is set,
+in an on-disk tier shared between processes. Every key also carries a
+fingerprint of the files the engine loads (policies/*.policy, data/*, and
+the executable itself), so editing a policy or type file invalidates
+everything computed before.
+
+Configuration:
+    PRECIS_CACHE_SIZE   in-memory entries (default 1024; 0 disables caching)
+    PRECIS_CACHE_DIR    directory for the on-disk tier (unset: memory only)
+
+Concurrent identical requests (same canonical key) are coalesced: one
+Précis run is made and every caller receives its result. When
+PRECIS_INPROCESS_MAX_COST is set, small `json` requests are answered
+in-process by utils.reference_evaluator instead of spawning Précis.
+metrics() reports cache hits, coalesced calls and in-process answers.
+
+Usage:
+    returncode, stdout, stderr = cached_precis_call(precis_path, request)
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from utils.reference_evaluator import route_small, stats as reference_stats
+
+# ============================================================================
+# FORMULA CANONICALISATION
+# ============================================================================
+
+# Spellings lexer.mll maps to the same token
+_KEYWORDS = {
+    **dict.fromkeys(["True", "true", "TRUE"], "true"),
+    **dict.fromkeys(["False", "false", "FALSE"], "false"),
+    **dict.fromkeys(["Forall", "forall"], "forall"),
+    **dict.fromkeys(["Exists", "exists"], "exists"),
+    **dict.fromkeys(["Not", "not"], "!"),
+    **dict.fromkeys(["And", "and"], "&"),
+    **dict.fromkeys(["Or", "or"], "|"),
+    **dict.fromkeys(["Implies", "implies"], "->"),
+    **dict.fromkeys(["Iff", "iff"], "<->"),
+    **dict.fromkeys(["Xor", "xor"], "xor"),
+    **dict.fromkeys(["Globally", "globally", "Always", "always", "G"], "G"),
+    **dict.fromkeys(["Finally", "finally", "Eventually", "eventually", "F"], "F"),
+    **dict.fromkeys(["Next", "next", "X"], "X"),
+    **dict.fromkeys(["Until", "until", "U"], "U"),
+    **dict.fromkeys(["Historically", "historically", "H"], "H"),
+    **dict.fromkeys(["Yesterday", "yesterday", "Previously", "previously", "Y"], "Y"),
+    **dict.fromkeys(["Once", "once", "O"], "O"),
+    **dict.fromkeys(["Since", "since", "S"], "S"),
+}
+
+_OPERATORS = {
+    **dict.fromkeys(["⊤"], "true"),
+    **dict.fromkeys(["⊥"], "false"),
+    **dict.fromkeys(["∀"], "forall"),
+    **dict.fromkeys(["∃"], "exists"),
+    **dict.fromkeys(["!=", "≠"], "!="),
+    **dict.fromkeys(["!", "¬", "~"], "!"),
+    **dict.fromkeys(["&&", "&", "∧", "/\\"], "&"),
+    **dict.fromkeys(["||", "|", "∨", "\\/"], "|"),
+    **dict.fromkeys(["=>", "→", "⇒", "==>", "-->", "->"], "->"),
+    **dict.fromkeys(["↔", "<=>", "<==>", "<-->", "<->"], "<->"),
+    **dict.fromkeys(["⊕"], "xor"),
+    **dict.fromkeys(["<=", "≤"], "<="),
+    **dict.fromkeys([">=", "≥"], ">="),
+    **dict.fromkeys(["<", ">", "=", "(", ")", "[", "]", ",", ";", ".", "@["], None),
+}
+
+_TOKEN = re.compile(
+    r"(?P<ws>\s+)"
+    r"|(?P<comment>\(\*.*?\*\))"
+    r'|(?P<str>"(?:\\.|[^"\\])*")'
+    r"|(?P<const>@[A-Za-z_][A-Za-z0-9_]*)"
+    r"|(?P<int>[0-9]+)"
+    r"|(?P<op>" + "|".join(re.escape(op) for op in sorted(_OPERATORS, key=len, reverse=True)) + r")"
+    r"|(?P<id>[A-Za-z_][A-Za-z0-9_]*)"
+    r"|(?P<other>.)",
+    re.S
+)
+
+
+def _tokens(text: str) -> List[str]:
+    tokens = []
+    for m in _TOKEN.finditer(text):
+        kind, value = m.lastgroup, m.group()
+        if kind in ("ws", "comment"):
+            continue
+        if kind == "op":
+            value = _OPERATORS[value] or value
+        elif kind == "id":
+            value = _KEYWORDS.get(value, value)
+        tokens.append(value)
+    return tokens
+
+
+def canonical_formula(text: str) -> str:
+    """
+    Token stream of `text` with quantified variables alpha-renamed
+
+    A quantifier's scope runs to the end of the enclosing parentheses (or
+    the policy's ";"), as in parser.mly where `forall x. f` extends as far
+    right as possible. Bound variables become _v0, _v1, ... in binding
+    order; predicate and function names are never renamed.
+    """
+    tokens = _tokens(text)
+    out: List[str] = []
+    scopes: List[Tuple[int, Dict[str, str]]] = []  # (paren depth, renaming)
+    depth = 0
+    bound = 0
+    i = 0
+    while i < len(tokens):
+        tok = tokens[i]
+        if tok in ("forall", "exists"):
+            out.append(tok)
+            renaming: Dict[str, str] = {}
+            i += 1
+            while i < len(tokens) and tokens[i] != ".":
+                if tokens[i] != ",":
+                    renaming[tokens[i]] = f"_v{bound}"
+                    bound += 1
+                out.append(renaming.get(tokens[i], tokens[i]))
+                i += 1
+            scopes.append((depth, renaming))
+            continue
+        if tok == "(":
+            depth += 1
+        elif tok == ")":
+            depth -= 1
+            while scopes and scopes[-1][0] > depth:
+                scopes.pop()
+        elif tok == ";":
+            while scopes and scopes[-1][0] >= depth:
+                scopes.pop()
+        elif not (i + 1 < len(tokens) and tokens[i + 1] == "("):
+            for _, renaming in reversed(scopes):
+                if tok in renaming:
+                    tok = renaming[tok]
+                    break
+        out.append(tok)
+        i += 1
+    return " ".join(out)
+
+
+def canonical_facts(facts: Any) -> List[List[str]]:
+    """Sorted, deduplicated [predicate, *arguments] rows"""
+    if isinstance(facts, dict):
+        facts = facts.get("facts", [])
+    rows = set()
+    for f in facts or []:
+        if isinstance(f, dict):
+            rows.add((f["predicate"], *f.get("arguments", [])))
+        elif hasattr(f, "predicate"):
+            rows.add((f.predicate, *f.arguments))
+        else:
+            rows.add(tuple(f))
+    return [list(r) for r in sorted(rows)]
+
+
+def canonical_request(request: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The parts of a Précis request that decide its result, canonicalised.
+    The budget is left out: it only matters when it runs out, and then
+    the verdict is unknown and the response is not cached (cacheable).
+    """
+    canon = {k: v for k, v in request.items() if k not in ("formula", "facts", "facts_file", "budget")}
+    canon["formula"] = canonical_formula(request.get("formula", ""))
+    canon["facts"] = canonical_facts(request.get("facts", []))
+    if request.get("facts_file"):
+        # The file's contents are not hashed (it can be huge); its identity
+        # and modification time stand in for them
+        ff = request["facts_file"]
+        canon["facts_file"] = [ff.get("offset", 0), fingerprint([os.path.abspath(ff["path"])])]
+    return canon
+
+
+# ============================================================================
+# ENGINE FINGERPRINT
+# ============================================================================
+
+def engine_files(root: str, precis_path: Optional[str] = None) -> List[str]:
+    """Files whose contents decide the engine's answers: policies, data, binary"""
+    files = []
+    for sub, suffix in (("policies", ".policy"), ("data", "")):
+        d = os.path.join(root, sub)
+        if os.path.isdir(d):
+            files.extend(os.path.join(d, f) for f in sorted(os.listdir(d)) if f.endswith(suffix))
+    if precis_path:
+        files.append(precis_path)
+    return files
+
+
+def fingerprint(files: Sequence[str]) -> str:
+    h = hashlib.sha256()
+    for f in files:
+        try:
+            st = os.stat(f)
+            h.update(f"{f}\0{st.st_mtime_ns}\0{st.st_size}\n".encode("utf-8"))
+        except OSError:
+            h.update(f"{f}\0missing\n".encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+# ============================================================================
+# CACHE
+# ============================================================================
+
+class VerificationCache:
+    """
+    Bounded LRU of Précis responses with an optional on-disk tier
+
+    max_entries: in-memory capacity; 0 disables the cache entirely.
+    disk_dir: directory for the on-disk tier, one subdirectory per engine
+    fingerprint.
+    check_interval: seconds between re-stats of the engine's files.
+    """
+
+    def __init__(self, max_entries: int = 1024, disk_dir: Optional[str] = None,
+                 check_interval: float = 1.0):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.check_interval = check_interval
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._fingerprints: Dict[str, Tuple[str, float]] = {}  # precis path -> (fingerprint, checked at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def engine_fingerprint(self, precis_path: str) -> str:
+        """Fingerprint of the engine at precis_path; a change drops stale entries"""
+        now = time.monotonic()
+        with self._lock:
+            known = self._fingerprints.get(precis_path)
+            if known and now - known[1] < self.check_interval:
+                return known[0]
+        path = os.path.abspath(precis_path)
+        current = fingerprint(engine_files(os.path.dirname(path), path))
+        with self._lock:
+            self._fingerprints[precis_path] = (current, now)
+            if known and known[0] != current:
+                self._entries.clear()
+                if self.disk_dir:
+                    shutil.rmtree(os.path.join(self.disk_dir, known[0]), ignore_errors=True)
+        return current
+
+    def key(self, precis_path: str, request: Dict[str, Any], mode: Sequence[str] = ("json",),
+            cwd: Optional[str] = None) -> str:
+        """Cache key of `request` sent to precis_path with command-line `mode`,
+        run in directory `cwd` (relative policy and data paths depend on it)"""
+        engine = self.engine_fingerprint(precis_path)
+        fields = {"mode": list(mode), "request": canonical_request(request)}
+        if cwd is not None:
+            fields["cwd"] = os.path.abspath(cwd)
+        material = json.dumps(fields, sort_keys=True, ensure_ascii=False)
+        return engine + "/" + hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key + ".json")
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+        if self.disk_dir:
+            try:
+                with open(self._disk_path(key), encoding="utf-8") as f:
+                    value = f.read()
+                with self._lock:
+                    self.disk_hits += 1
+                self._remember(key, value)
+                return value
+            except OSError:
+                pass
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _remember(self, key: str, value: str):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def put(self, key: str, value: str):
+        self._remember(key, value)
+        if self.disk_dir:
+            path = self._disk_path(key)
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = f"{path}.{os.getpid()}.tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    f.write(value)
+                os.replace(tmp, path)
+            except OSError:
+                pass  # the disk tier is best effort
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.disk_dir:
+            shutil.rmtree(self.disk_dir, ignore_errors=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "hits": self.hits,
+                "disk_hits": self.disk_hits, "misses": self.misses}
+
+
+# ============================================================================
+# IN-FLIGHT COALESCING
+# ============================================================================
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key into one
+
+    The first caller of a key (the leader) runs the work; callers arriving
+    while it runs wait for it and receive the same result or exception.
+    Results are shared, so the work should return immutable values (e.g.
+    response text rather than parsed dicts). A follower waits at most its
+    own `timeout` and then raises TimeoutError; the leader runs on.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Flight] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key: str, fn: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Flight()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            if not call.done.wait(timeout):
+                raise TimeoutError(f"shared call still running after {timeout} seconds")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> Dict[str, int]:
+        return {"leaders": self.leaders, "coalesced": self.coalesced, "in_flight": len(self._calls)}
+
+
+class AsyncSingleFlight:
+    """
+    SingleFlight for coroutines on one event loop
+
+    If the leader is cancelled, its followers are not: one of them takes
+    over and runs the work again.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, "asyncio.Future"] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        while key in self._calls:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(self._calls[key])
+            except _LeaderCancelled:
+                self.coalesced -= 1
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        self.leaders += 1
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.set_exception(_LeaderCancelled())
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
+            if future.done() and not future.cancelled():
+                future.exception()  # retrieved here when nobody was waiting
+
+    def stats(self) -> Dict[str, int]:
+        return {"leaders": self.leaders, "coalesced": self.coalesced, "in_flight": len(self._calls)}
+
+
+class _LeaderCancelled(Exception):
+    """Tells followers to retry when the leading coroutine was cancelled"""
+
+
+_in_flight = SingleFlight()
+
+
+def in_flight() -> SingleFlight:
+    """Process-wide coalescing of synchronous Précis calls"""
+    return _in_flight
+
+
+def cacheable(response_text: str) -> bool:
+    """Only complete, successful verdicts are cached; budget-limited ones are not"""
+    try:
+        data = json.loads(response_text)
+    except ValueError:
+        return False
+    return (isinstance(data, dict) and "error" not in data
+            and not data.get("undecided") and "stats" not in data)
+
+
+_default_cache: Optional[VerificationCache] = None
+
+
+def default_cache() -> VerificationCache:
+    """Process-wide cache configured from PRECIS_CACHE_SIZE and PRECIS_CACHE_DIR"""
+    global _default_cache
+    if _default_cache is None:
+        try:
+            size = int(os.environ.get("PRECIS_CACHE_SIZE", "1024"))
+        except ValueError:
+            size = 1024
+        _default_cache = VerificationCache(max_entries=size,
+                                           disk_dir=os.environ.get("PRECIS_CACHE_DIR") or None)
+    return _default_cache
+
+
+class PrecisCancelled(Exception):
+    """A cancellable Précis call was cancelled before it finished"""
+
+
+# How often a cancellable call checks its cancel event
+CANCEL_POLL_SECONDS = 0.05
+
+
+def cached_precis_call(precis_path: str, request: Dict[str, Any],
+                       args: Sequence[str] = ("json",), timeout: float = 30,
+                       cwd: Optional[str] = None,
+                       cancel: Optional[threading.Event] = None) -> Tuple[int, str, str]:
+    """
+    Run `precis <args>` on `request` through the cache
+
+    Concurrent calls with the same canonical key share one Précis run.
+    Returns (returncode, stdout, stderr) like Popen.communicate would;
+    subprocess.TimeoutExpired propagates as before, also when the call was
+    waiting on another caller's run for longer than its own timeout.
+
+    Setting `cancel` kills the Précis process and raises PrecisCancelled.
+    Cancellable calls still use the cache but run on their own rather than
+    sharing a run, so cancelling one never fails another caller.
+    """
+    cache = default_cache()
+    key = cache.key(precis_path, request, args, cwd)
+    if cache.enabled:
+        hit = cache.get(key)
+        if hit is not None:
+            return 0, hit, ""
+
+    def run() -> Tuple[int, str, str]:
+        routed = route_small(precis_path, request) if tuple(args) == ("json",) else None
+        if routed is not None:
+            stdout = json.dumps(routed)
+            if cache.enabled:
+                cache.put(key, stdout)
+            return 0, stdout, ""
+
+        proc = subprocess.Popen(
+            [precis_path, *args],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            cwd=cwd
+        )
+        try:
+            if cancel is None:
+                stdout, stderr = proc.communicate(input=json.dumps(request), timeout=timeout)
+            else:
+                stdout, stderr = _communicate_until_cancelled(proc, json.dumps(request), timeout, cancel)
+        except (subprocess.TimeoutExpired, PrecisCancelled):
+            proc.kill()
+            proc.communicate()
+            raise
+
+        if cache.enabled and proc.returncode == 0 and cacheable(stdout):
+            cache.put(key, stdout)
+        return proc.returncode, stdout, stderr
+
+    if cancel is not None:
+        return run()
+    try:
+        return in_flight().do(key, run, timeout)
+    except TimeoutError:
+        raise subprocess.TimeoutExpired([precis_path, *args], timeout)
+
+
+def _communicate_until_cancelled(proc: subprocess.Popen, text: str, timeout: float,
+                                 cancel: threading.Event) -> Tuple[str, str]:
+    """proc.communicate(text, timeout), giving up early once cancel is set"""
+    deadline = time.monotonic() + timeout
+    pending: Optional[str] = text  # communicate() keeps unsent input across retries
+    while True:
+        if cancel.is_set():
+            raise PrecisCancelled("Précis call cancelled")
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise subprocess.TimeoutExpired(proc.args, timeout)
+        try:
+            return proc.communicate(input=pending, timeout=min(remaining, CANCEL_POLL_SECONDS))
+        except subprocess.TimeoutExpired:
+            pending = None
+
+
+def metrics() -> Dict[str, Any]:
+    """Cache and coalescing counters for dashboards and benchmarks"""
+    return {"cache": default_cache().stats(), "in_flight": in_flight().stats(),
+            "inprocess": reference_stats()}
@@ -0,0 +1,84 @@
+"""
+witnesses.py - Template explanations from Précis counterexample witnesses
+
+For each decided policy the engine returns a `witness`: the quantifier
+binding that decided it (for a violated "forall", the entities that break
+it) and the ground atoms on the deciding path with their truth values:
+
+    "witness": {
+        "binding": {"x": "alice", "y": "bob"},
+        "atoms": [{"predicate": "disclose", "arguments": ["alice", "bob"], "holds": true},
+                  {"predicate": "hasConsent", "arguments": ["bob"], "holds": false}]
+    }
+
+A failed "exists" (or satisfied "forall") on the path has no binding to
+show; the witness states the claim instead, with the binding filled in:
+
+    "quantified": [{"quantifier": "exists", "variables": ["y"],
+                    "formula": "hasConsent(alice, y)"}]
+
+A violation with a small witness can be explained without an LLM call.
+describe_witness() is also what the engine appends to each explanation
+(Query_engine.describe_witness), so the reference evaluator uses it too.
+"""
+
+from typing import Any, Dict, List, Optional
+
+# Witnesses with more atoms than this are left to the LLM explainer
+MAX_TEMPLATED_ATOMS = 6
+
+
+def describe_atom(atom: Dict[str, Any]) -> str:
+    call = f"{atom['predicate']}({', '.join(atom['arguments'])})"
+    return call if atom["holds"] else f"not {call}"
+
+
+def describe_claim(claim: Dict[str, Any]) -> str:
+    variables = ", ".join(claim["variables"])
+    if claim["quantifier"] == "exists":
+        return f"no {variables} such that {claim['formula']}"
+    return f"{claim['formula']} for every {variables}"
+
+
+def describe_witness(witness: Dict[str, Any]) -> str:
+    """e.g. 'for x=alice: disclose(alice) and no y such that hasConsent(alice, y)'"""
+    binding = ", ".join(f"{v}={e}" for v, e in witness.get("binding", {}).items())
+    facts = " and ".join([describe_atom(a) for a in witness.get("atoms", [])] +
+                         [describe_claim(c) for c in witness.get("quantified", [])])
+    if binding and facts:
+        return f"for {binding}: {facts}"
+    if binding:
+        return f"for {binding}"
+    return facts
+
+
+def is_simple(witness: Optional[Dict[str, Any]]) -> bool:
+    """Small enough to template: at least one atom or claim, at most
+    MAX_TEMPLATED_ATOMS of them"""
+    if not witness:
+        return False
+    size = len(witness.get("atoms", [])) + len(witness.get("quantified", []))
+    return 0 < size <= MAX_TEMPLATED_ATOMS
+
+
+def _label(evaluation: Dict[str, Any]) -> str:
+    section = evaluation.get("section")
+    name = f"{evaluation.get('regulation', '')} {section}".strip() if section else evaluation["policy_id"]
+    return f"{name} ({evaluation['description']})" if evaluation.get("description") else name
+
+
+def explain_violations(evaluations: List[Dict[str, Any]]) -> Optional[str]:
+    """
+    Templated explanation of the violated policies in a Précis response's
+    `evaluations`, or None when one of them has no simple witness (or
+    none is violated) and the caller should fall back to the LLM.
+    """
+    violated = [e for e in evaluations if e.get("evaluation", {}).get("result") == "false"]
+    if not violated or not all(is_simple(e.get("witness")) for e in violated):
+        return None
+
+    lines = [f"NO - the scenario violates {len(violated)} "
+             f"polic{'y' if len(violated) == 1 else 'ies'}:"]
+    for e in violated:
+        lines.append(f"- {_label(e)}: violated {describe_witness(e['witness'])}.")
+    return "\n".join(lines)